@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 import scrapy
 import os
+import re
 from scrapy.linkextractors import LinkExtractor
 from scrapy.spiders import CrawlSpider, Rule
+
+from instrumentacion import RegistroEjecucion
 from scrapy.crawler import CrawlerProcess
 from urllib import parse
 from os import path
@@ -10,6 +13,9 @@ from scrapy.http.response.html import HtmlResponse
 import multiprocessing
 from typing import List
 
+# ID de una nota al comienzo del nombre de archivo o del final de la url
+regex_id_nota = re.compile(r'(\d{6,})-')
+
 class NewsSpider(CrawlSpider):
 
     DOWNLOAD_HANDLERS = {
@@ -31,7 +37,8 @@ class NewsSpider(CrawlSpider):
             deny_domains=['auth.pagina12.com.ar'],
             canonicalize=True,
             deny_extensions=['7z', '7zip', 'apk', 'bz2', 'cdr', 'dmg', 'ico', 'iso', 'tar', 'tar.gz', 'pdf', 'docx', 'jpg', 'png', 'css', 'js']
-        ), callback='parse_response', follow=False),
+        ), callback='parse_response', follow=False,
+            process_links='filtrar_links_guardados'),
     )
     
     # configuracion de scrappy, ver https://docs.scrapy.org/en/latest/topics/settings.html
@@ -47,7 +54,26 @@ class NewsSpider(CrawlSpider):
         'ROBOTSTXT_OBEY': False,
         # esperar entre 0.5*DOWNLOAD_DELAY y 1.5*DOWNLOAD_DELAY segundo entre descargas
         'DOWNLOAD_DELAY': 2.5,
-        'RANDOMIZE_DOWNLOAD_DELAY': True
+        'RANDOMIZE_DOWNLOAD_DELAY': True,
+        # ajustar concurrencia y delay segun responda el servidor,
+        # arrancando con 1 pedido a la vez cada DOWNLOAD_DELAY segundos
+        # y sin pasar el techo de concurrencia (ver control_adaptativo.py)
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'DOWNLOADER_MIDDLEWARES': {
+            'control_adaptativo.ControlAdaptativoMiddleware': 900,
+            'fetch_eficiente.FetchCondicionalMiddleware': 580,
+        },
+        'ADAPTATIVO_ENABLED': True,
+        'ADAPTATIVO_CONCURRENCIA_MAXIMA': 8,
+        'ADAPTATIVO_DELAY_MINIMO': 0.25,
+        # pedir con If-None-Match/If-Modified-Since lo ya descargado, y
+        # cortar la descarga de una nota con paywall o de autor apenas
+        # aparece el marcador (ver fetch_eficiente.py)
+        'FETCH_CONDICIONAL_ENABLED': True,
+        'EXTENSIONS': {
+            'fetch_eficiente.CorteTempranoExtension': 500,
+        },
+        'CORTE_TEMPRANO_ENABLED': True,
     }
 
     def __init__(self, save_pages_in_dir='.', *args, **kwargs):
@@ -56,6 +82,29 @@ class NewsSpider(CrawlSpider):
         self.basedir = save_pages_in_dir
         self.page_count = kwargs.get('current_pages', 0)
         self.max_pages = kwargs.get('max_pages', 100)
+        self.registro = RegistroEjecucion("1-web-scrapping")
+        # IDs de las notas ya guardadas, para no volver a pedirlas
+        self.ids_guardados = set()
+        if path.isdir(self.basedir):
+            for nombre in os.listdir(self.basedir):
+                m = regex_id_nota.match(nombre)
+                if m:
+                    self.ids_guardados.add(m.group(1))
+
+    def filtrar_links_guardados(self, links):
+        """
+        Descarta los links a notas cuyo ID ya esta guardado (o ya se pidio en esta corrida).
+        """
+        nuevos = []
+        for link in links:
+            m = regex_id_nota.match(link.url[link.url.rfind("/")+1:])
+            if m and m.group(1) in self.ids_guardados:
+                self.registro.contar("omitidas_ya_guardadas")
+                continue
+            if m:
+                self.ids_guardados.add(m.group(1))
+            nuevos.append(link)
+        return nuevos
 
     def parse_response(self, response:HtmlResponse):
         """
@@ -69,17 +118,28 @@ class NewsSpider(CrawlSpider):
             if not html_filename.endswith(".html"):
                 html_filename+=".html"
             # decodificar el HTML
-            html_content = response.body.decode("utf-8")
+            # si la descarga se corto (ver fetch_eficiente.py) el cuerpo esta
+            # incompleto y puede terminar en medio de un caracter
+            descarga_cortada = "download_stopped" in response.flags
+            with self.registro.etapa("decodificacion"):
+                html_content = response.body.decode(
+                    "utf-8", errors="ignore" if descarga_cortada else "strict")
             
             # chequear si contiene el marcador de paywall
             if '<div class="paywall-inner-text">' in html_content:
-                print("Página omitida (paywall detectado):", html_filename)
+                self.registro.contar("omitidas_paywall")
+                self.registro.detalle(f"Página omitida (paywall detectado): {html_filename}")
+            elif '<div class="author-hero">' in html_content:
+                self.registro.contar("omitidas_autor")
+                self.registro.detalle(f"Página omitida (pagina de autor detectada): {html_filename}")
+            elif descarga_cortada:
+                self.registro.contar("omitidas_tamanio")
+                self.registro.detalle(f"Página omitida (supera el tamaño maximo): {html_filename}")
             else:
-                if '<div class="author-hero">' in html_content:
-                    print("Página omitida (pagina de autor detectada):", html_filename)
-                else:
-                    self.page_count += 1
-                    print("Página guardada en:", html_filename)
+                self.page_count += 1
+                self.registro.contar("guardadas")
+                self.registro.detalle(f"Página guardada en: {html_filename}")
+                with self.registro.etapa("escritura"):
                     with open(html_filename, "wt", encoding="utf-8") as html_file:
                         html_file.write(html_content)
         else:
@@ -87,6 +147,7 @@ class NewsSpider(CrawlSpider):
 
 def start_crawler(save_pages_in_dir:str, start_urls:List[str], current_pages:int, max_pages:int, result_dict:multiprocessing.Queue):
     def spider_closed(spider, reason):
+        spider.registro.resumen(imprimir=False)
         result = {
             "pages_scraped": spider.page_count,
             "reason": reason
@@ -123,6 +184,7 @@ def create_directory(dir_path: str):
 if __name__ == "__main__":
     DIR_BASE="./1000paginas"
     create_directory(DIR_BASE)
+    registro = RegistroEjecucion("1-web-scrapping")
     secciones = ['el-mundo','el-pais','economia','sociedad']
     # Cantidad máxima de páginas por sección a scrapear
     max_pages_por_seccion = 1000
@@ -152,9 +214,15 @@ if __name__ == "__main__":
                     q
                 )
             )
-            process.start()
-            process.join()
-            process_result = q.get()
+            with registro.etapa("pagina_indice"):
+                process.start()
+                process.join()
+                process_result = q.get()
+            registro.contar("paginas_guardadas",
+                            process_result["pages_scraped"] - seccion_count)
+            registro.evento("pagina_indice", seccion=seccion,
+                            page_index=page_index, **process_result)
             seccion_count = process_result["pages_scraped"]
             print(f"||| Acumulado de páginas scrapeadas {seccion_count} de {max_pages_por_seccion}")
             page_index += 1
+    registro.resumen()
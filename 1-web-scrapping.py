@@ -1,7 +1,8 @@
 import multiprocessing
 import os
+import re
 from os import path
-from typing import List
+from typing import List, Optional, Tuple
 from urllib import parse
 
 import scrapy
@@ -10,6 +11,21 @@ from scrapy.http.response.html import HtmlResponse
 from scrapy.linkextractors import LinkExtractor
 from scrapy.spiders import CrawlSpider, Rule
 
+from cargador_scripts import aplicar_parametros
+from instrumentacion import RegistroEjecucion
+from metadatos_indice import agregar_tarjetas, tarjetas_de_indice
+
+
+# ID de una nota al comienzo del nombre de archivo o del final de la url
+regex_id_nota = re.compile(r'(\d{6,})-')
+
+# contador -> motivo, de las paginas descargadas que no se guardan
+MOTIVOS_OMISION = {
+    "omitidas_paywall": "paywall detectado",
+    "omitidas_autor": "pagina de autor detectada",
+    "omitidas_tamanio": "supera el tamaño maximo",
+}
+
 
 class NewsSpider(CrawlSpider):
 
@@ -36,7 +52,8 @@ class NewsSpider(CrawlSpider):
                              'cdr', 'dmg', 'ico', 'iso',
                              'tar', 'tar.gz', 'pdf', 'docx',
                              'jpg', 'png', 'css', 'js']
-        ), callback='parse_response', follow=False),
+        ), callback='parse_response', follow=False,
+            process_links='filtrar_links_guardados'),
     )
 
     # configuracion de scrappy,
@@ -57,15 +74,99 @@ class NewsSpider(CrawlSpider):
         # esperar entre 0.5*DOWNLOAD_DELAY y
         # 1.5*DOWNLOAD_DELAY segundos entre descargas
         'DOWNLOAD_DELAY': 2.5,
-        'RANDOMIZE_DOWNLOAD_DELAY': True
+        'RANDOMIZE_DOWNLOAD_DELAY': True,
+        # ajustar concurrencia y delay segun responda el servidor,
+        # arrancando con 1 pedido a la vez cada DOWNLOAD_DELAY segundos
+        # y sin pasar el techo de concurrencia (ver control_adaptativo.py)
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'DOWNLOADER_MIDDLEWARES': {
+            'control_adaptativo.ControlAdaptativoMiddleware': 900,
+            'fetch_eficiente.FetchCondicionalMiddleware': 580,
+        },
+        'ADAPTATIVO_ENABLED': True,
+        'ADAPTATIVO_CONCURRENCIA_MAXIMA': 8,
+        'ADAPTATIVO_DELAY_MINIMO': 0.25,
+        # pedir con If-None-Match/If-Modified-Since lo ya descargado, y
+        # cortar la descarga de una nota con paywall o de autor apenas
+        # aparece el marcador (ver fetch_eficiente.py)
+        'FETCH_CONDICIONAL_ENABLED': True,
+        'EXTENSIONS': {
+            'fetch_eficiente.CorteTempranoExtension': 500,
+        },
+        'CORTE_TEMPRANO_ENABLED': True,
     }
 
-    def __init__(self, save_pages_in_dir='.', *args, **kwargs):
+    def __init__(self, save_pages_in_dir='.', metadatos_indice=None,
+                 *args, **kwargs):
         super().__init__(*args, **kwargs)
         # guardar el directorio en donde vamos a descargar las paginas
         self.basedir = save_pages_in_dir
+        # tabla donde agregar las tarjetas de las paginas de indice
+        # (ver metadatos_indice.py), o None para no guardarlas
+        self.metadatos_indice = metadatos_indice
         self.page_count = kwargs.get('current_pages', 0)
         self.max_pages = kwargs.get('max_pages', 100)
+        self.registro = RegistroEjecucion("1-web-scrapping")
+        # IDs de las notas ya guardadas, para no volver a pedirlas
+        self.ids_guardados = set()
+        if path.isdir(self.basedir):
+            for nombre in os.listdir(self.basedir):
+                m = regex_id_nota.match(nombre)
+                if m:
+                    self.ids_guardados.add(m.group(1))
+
+    def filtrar_links_guardados(self, links):
+        """
+        Descarta los links a notas cuyo ID ya esta guardado (o ya se pidio en esta corrida).
+        """
+        nuevos = []
+        for link in links:
+            m = regex_id_nota.match(link.url[link.url.rfind("/")+1:])
+            if m and m.group(1) in self.ids_guardados:
+                self.registro.contar("omitidas_ya_guardadas")
+                continue
+            if m:
+                self.ids_guardados.add(m.group(1))
+            nuevos.append(link)
+        return nuevos
+
+    def parse_start_url(self, response, **kwargs):
+        """
+        Las start_urls son paginas de indice: ademas de seguir sus links
+        (rules), guardar titulo, fecha y bajada de cada tarjeta.
+        """
+        if self.metadatos_indice and isinstance(response, HtmlResponse):
+            with self.registro.etapa("metadatos_indice"):
+                tarjetas = tarjetas_de_indice(response.text, response.url)
+                agregar_tarjetas(self.metadatos_indice, tarjetas)
+            self.registro.contar("tarjetas_indice", len(tarjetas))
+        return []
+
+    def decodificar(self, response: HtmlResponse) -> Tuple[str, bool]:
+        """
+        :return: (html decodificado, True si la descarga se corto)
+        """
+        # si la descarga se corto (ver fetch_eficiente.py) el cuerpo esta
+        # incompleto y puede terminar en medio de un caracter
+        descarga_cortada = "download_stopped" in response.flags
+        html_content = response.body.decode(
+            "utf-8", errors="ignore" if descarga_cortada else "strict")
+        return html_content, descarga_cortada
+
+    def motivo_omision(self, html_content: str,
+                       descarga_cortada: bool) -> Optional[str]:
+        """
+        :return: El contador del motivo por el que la pagina no se guarda
+            (ver MOTIVOS_OMISION), o None si se guarda.
+        """
+        # chequear si contiene el marcador de paywall
+        if '<div class="paywall-inner-text">' in html_content:
+            return "omitidas_paywall"
+        if '<div class="author-hero">' in html_content:
+            return "omitidas_autor"
+        if descarga_cortada:
+            return "omitidas_tamanio"
+        return None
 
     def parse_response(self, response: HtmlResponse):
         """
@@ -79,19 +180,21 @@ class NewsSpider(CrawlSpider):
                 response.url[response.url.rfind("/")+1:]))
             if not html_filename.endswith(".html"):
                 html_filename += ".html"
-            # decodificar el HTML
-            html_content = response.body.decode("utf-8")
+            with self.registro.etapa("decodificacion"):
+                html_content, descarga_cortada = self.decodificar(response)
 
-            # chequear si contiene el marcador de paywall
-            if '<div class="paywall-inner-text">' in html_content:
-                print("Página omitida (paywall detectado):", html_filename)
+            motivo = self.motivo_omision(html_content, descarga_cortada)
+            if motivo is not None:
+                self.registro.contar(motivo)
+                self.registro.detalle(
+                    f"Página omitida ({MOTIVOS_OMISION[motivo]}): "
+                    f"{html_filename}")
             else:
-                if '<div class="author-hero">' in html_content:
-                    print("Página omitida (pagina de autor detectada):",
-                          html_filename)
-                else:
-                    self.page_count += 1
-                    print("Página guardada en:", html_filename)
+                self.page_count += 1
+                self.registro.contar("guardadas")
+                self.registro.detalle(
+                    f"Página guardada en: {html_filename}")
+                with self.registro.etapa("escritura"):
                     with open(html_filename, "wt",
                               encoding="utf-8") as html_file:
                         html_file.write(html_content)
@@ -102,8 +205,10 @@ class NewsSpider(CrawlSpider):
 
 def start_crawler(save_pages_in_dir: str, start_urls: List[str],
                   current_pages: int, max_pages: int,
-                  result_dict: multiprocessing.Queue):
+                  result_dict: multiprocessing.Queue,
+                  metadatos_indice: Optional[str] = None):
     def spider_closed(spider, reason):
+        spider.registro.resumen(imprimir=False)
         result = {
             "pages_scraped": spider.page_count,
             "reason": reason
@@ -122,7 +227,8 @@ def start_crawler(save_pages_in_dir: str, start_urls: List[str],
         save_pages_in_dir=save_pages_in_dir,
         start_urls=start_urls,
         current_pages=current_pages,
-        max_pages=max_pages
+        max_pages=max_pages,
+        metadatos_indice=metadatos_indice
     )
 
     process.start()
@@ -141,11 +247,16 @@ def create_directory(dir_path: str):
 
 if __name__ == "__main__":
     DIR_BASE = "./paginas"
-    create_directory(DIR_BASE)
-    secciones = ['el-mundo', 'el-pais', 'economia', 'sociedad']
+    # tarjetas de las paginas de indice (titulo, fecha, bajada de cada nota)
+    ARCHIVO_METADATOS = "./metadatos_indice.csv"
+    SECCIONES = ['el-mundo', 'el-pais', 'economia', 'sociedad']
     # Cantidad máxima de páginas por sección a scrapear
-    max_pages_por_seccion = 20
-    for seccion in secciones:
+    MAX_PAGINAS_POR_SECCION = 20
+    # las constantes de arriba se pueden pisar con TP_PARAMETROS (ver cargador_scripts.py y tp.py)
+    aplicar_parametros(globals())
+    create_directory(DIR_BASE)
+    registro = RegistroEjecucion("1-web-scrapping")
+    for seccion in SECCIONES:
         print("//////////////////////////////////////")
         print(f" Scrapeando sección {seccion}")
         print("//////////////////////////////////////")
@@ -157,7 +268,7 @@ if __name__ == "__main__":
         # para un problema particular de scrappy.
         seccion_count = 0
         page_index = 1
-        while seccion_count < max_pages_por_seccion:
+        while seccion_count < MAX_PAGINAS_POR_SECCION:
             base_url = 'http://www.pagina12.com.ar/secciones/'
             start_url = f'{base_url}{seccion}?page={page_index}'
             print("|||")
@@ -169,14 +280,21 @@ if __name__ == "__main__":
                 args=(DIR_SECCION,
                       [start_url],
                       seccion_count,
-                      max_pages_por_seccion,
-                      q
+                      MAX_PAGINAS_POR_SECCION,
+                      q,
+                      ARCHIVO_METADATOS
                       )
             )
-            process.start()
-            process.join()
-            process_result = q.get()
+            with registro.etapa("pagina_indice"):
+                process.start()
+                process.join()
+                process_result = q.get()
+            registro.contar("paginas_guardadas",
+                            process_result["pages_scraped"] - seccion_count)
+            registro.evento("pagina_indice", seccion=seccion,
+                            page_index=page_index, **process_result)
             seccion_count = process_result["pages_scraped"]
             print(
-                f"||| Scrapeadas {seccion_count} de {max_pages_por_seccion}")
-            page_index += 1
\ No newline at end of file
+                f"||| Scrapeadas {seccion_count} de {MAX_PAGINAS_POR_SECCION}")
+            page_index += 1
+    registro.resumen()
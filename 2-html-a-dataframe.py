@@ -3,10 +3,8 @@
 Este script transforma un grupo de paginas html, agrupadas en directorios, a 1 directorio por categoria, en un dataset para entrenar.
 Espera que haya 1 directorio por categoria dentro del directorio padre cuyo path esta en la variable DIR_BASE_CATEGORIAS. Usa el nombre del directorio como nombre de la categoria.
 """
-from nltk.stem.snowball import SnowballStemmer
 from typing import List, Callable, Optional, Pattern
 import re
-from sklearn.feature_extraction.text import CountVectorizer
 from bs4 import BeautifulSoup
 import os
 import joblib
@@ -14,8 +12,15 @@ from typing import Pattern, Optional, List, Tuple
 import json
 import pandas as pd
 import datetime
+from instrumentacion import RegistroEjecucion
+from cargador_scripts import aplicar_parametros
+from corpus_tokenizado import CorpusTokenizado, VectorizadorTokens, config_tokenizador
+from dataset_particionado import escribir_dataset
+from deduplicacion import detectar_duplicados, guardar_grupos, representantes, describir_grupos, UMBRAL_JACCARD
 
-stemmer = SnowballStemmer("spanish")
+# se crea recien en el 1er stem(): importar NLTK tarda mas de 1 segundo y la mayoria de las corridas no lo usan
+stemmer = None
+registro = RegistroEjecucion("2-html-a-dataframe")
 
 def stem(tokens: List[str]) -> List[str]:
     """
@@ -24,17 +29,22 @@ def stem(tokens: List[str]) -> List[str]:
     :return La secuencia de tokens transformada por el stemmer.
     """
     global stemmer
+    if stemmer is None:
+        from nltk.stem.snowball import SnowballStemmer
+        stemmer = SnowballStemmer("spanish")
     return [stemmer.stem(w.lower()) for w in tokens]
 
 
+# definicion de que es un token: una letra seguida de letras y numeros
+TOKEN_REGEX = r"[a-zA-ZâáàãõáêéíóôõúüÁÉÍÓÚñÑçÇ][0-9a-zA-ZâáàãõáêéíóôõúüÁÉÍÓÚñÑçÇ]+"
+
 def tokenizador(token_regex: Optional[Pattern] = None) -> Callable[[str],List[str]]:
     """
     :param token_regex: Una expresion regular que define que es un token
     :return: Una funcion que recibe un texto y retorna el texto tokenizado.
     """
     if token_regex is None:
-        # definicion de que es un token: una letra seguida de letras y numeros
-        token_regex = r"[a-zA-ZâáàãõáêéíóôõúüÁÉÍÓÚñÑçÇ][0-9a-zA-ZâáàãõáêéíóôõúüÁÉÍÓÚñÑçÇ]+"
+        token_regex = TOKEN_REGEX
     token_pattern = re.compile(token_regex)
     return lambda doc: token_pattern.findall(doc)
 
@@ -57,7 +67,6 @@ MARCADOR_COMIENZO_INTERESANTE="<div class=\"article-main-content article-text  \
 # este es el texto que tiene que aparecer en las notas, despues del texto de la nota
 MARCADOR_FIN_INTERESANTE="<div class=\"share-mobile hide-on-desktop\">"
 extractor_de_parte_de_html_que_interesa = re.compile(re.escape(MARCADOR_COMIENZO_INTERESANTE) + "(.+)" + re.escape(MARCADOR_FIN_INTERESANTE))
-print(f"*** Usando la siguiente regex para extraer la parte del html que interesa:\n{extractor_de_parte_de_html_que_interesa.pattern}")
 
 # cantidad minima de docs que tienen que tener a un token para conservarlo.
 MIN_DF=3
@@ -68,12 +77,41 @@ MAX_DF=0.8
 MIN_NGRAMS=1
 MAX_NGRAMS=2
 
+# los bigramas se cuentan solo si sus 2 palabras llegan a MIN_DF (mismo vocabulario, mucha menos memoria).
+# Con un ancho (p.ej. 2**22 contadores por fila) se filtran ademas los bigramas con un count-min sketch,
+# para no guardar los que aparecen en menos de MIN_DF docs; conviene con corpus muy grandes.
+ANCHO_SKETCH_DF=None
+
 DATA_FILE = "data.joblib"
 VECTORS_FILE = "vectores.joblib"
 TARGETS_FILE = "targets.joblib"
 FEATURE_NAMES_FILE = "features.joblib"
 
-DF_PARQUET_FILE = "data.parquet"
+# dataset Parquet particionado por seccion y mes (ver dataset_particionado.py)
+DIR_DATASET = "./dataset"
+# ID de la nota al comienzo del nombre de archivo
+regex_id_nota = re.compile(r'(\d{6,})-')
+# directorio con los corpus ya tokenizados (ver corpus_tokenizado.py)
+DIR_CACHE_TOKENS = "./cache_tokens"
+
+# que hacer con las notas casi duplicadas o de plantilla (ver deduplicacion.py):
+# "eliminar" deja 1 nota por grupo; "ponderar" y "agrupar" las conservan y guardan el grupo de cada nota (y el modo)
+# en GRUPOS_FILE, para que 3-entrenar-y-evaluar.py no las separe entre folds y, con "ponderar", ademas les baje el
+# peso. None para no buscarlas.
+MODO_DUPLICADOS = "agrupar"
+UMBRAL_DUPLICADOS = UMBRAL_JACCARD
+GRUPOS_FILE = "grupos.joblib"
+
+# las constantes de arriba se pueden pisar con TP_PARAMETROS (ver cargador_scripts.py y orquestador.py)
+aplicar_parametros(globals())
+
+def id_de_nota(archivo:str) -> Optional[int]:
+    """
+    :return: El ID de la nota (los digitos al comienzo del nombre de archivo), o None si el nombre no lo tiene.
+    """
+    match = regex_id_nota.match(archivo)
+    return int(match.group(1)) if match is not None else None
+
 
 def extraer_parte_que_interesa_de_html(regex:Pattern, texto:str) -> Optional[str]:
     """
@@ -112,7 +150,8 @@ def extraer_datos_nota(html_doc: str) -> Optional[Tuple[Optional[str], Optional[
     - texto: el contenido plano del articleBody (limpio de tags HTML)
     """
     try:
-        soup = BeautifulSoup(html_doc, 'html.parser')
+        with registro.etapa("parseo"):
+            soup = BeautifulSoup(html_doc, 'html.parser')
         titulo = None
         fecha_publicacion = None
         texto = None
@@ -168,20 +207,25 @@ def htmls_y_target(dir_de_1_categoria:str) -> Tuple[List[str],List[str],List[str
     archivos = []
     for archivo_html in os.listdir(dir_de_1_categoria):
         path_completo_html = os.path.join(dir_de_1_categoria, archivo_html)
-        print(f"Procesando archivo {path_completo_html}...")
+        registro.detalle(f"Procesando archivo {path_completo_html}...")
         if os.path.isfile(path_completo_html):
             # texto = pasar_html_a_texto(leer_archivo(path_completo_html))
-            titulo, fecha, texto = extraer_datos_nota(leer_archivo(path_completo_html))
+            with registro.etapa("lectura"):
+                html_doc = leer_archivo(path_completo_html)
+            with registro.etapa("extraccion"):
+                titulo, fecha, texto = extraer_datos_nota(html_doc)
             if texto is not None:
-                print(f"OK- Archivo {archivo_html} leído")
-                print(f"    Titulo: {titulo}")
-                print(f"    Fecha publicación: {fecha}")
-                print(f"    Cantidad de caracteres en el texto extraído: {len(texto)}")
+                registro.detalle(f"OK- Archivo {archivo_html} leído")
+                registro.detalle(f"    Titulo: {titulo}")
+                registro.detalle(f"    Fecha publicación: {fecha}")
+                registro.detalle(f"    Cantidad de caracteres en el texto extraído: {len(texto)}")
+                registro.contar("notas_extraidas")
                 archivos.append(archivo_html)
                 titulos.append(titulo)
                 fechas.append(fecha)
                 htmls.append(texto)
             else:
+                registro.contar("notas_sin_texto")
                 print(f"ERROR - No fue posible extraer texto de {path_completo_html}")
     target_class = [dir_por_categoria] * len(htmls)
     return archivos, titulos, fechas, htmls, target_class
@@ -189,6 +233,7 @@ def htmls_y_target(dir_de_1_categoria:str) -> Tuple[List[str],List[str],List[str
 
 if __name__ == "__main__":
 
+    registro.detalle(f"*** Usando la siguiente regex para extraer la parte del html que interesa:\n{extractor_de_parte_de_html_que_interesa.pattern}")
     todos_los_archivos = []
     todos_los_titulos = []
     todas_las_fechas = []
@@ -200,7 +245,7 @@ if __name__ == "__main__":
     # recorrer c/u de los subdirectorios dentro de DIR_BASE_CATEGORIAS, y extraer el texto de c/ archivo html en cada subdirectorio. La categoria asignada
     # a cada html sera el nombre del subdirectorio que lo contiene.
     for dir_por_categoria in un_dir_por_categoria:
-        print(f"Procesando directorio: {dir_por_categoria}")
+        registro.info(f"Procesando directorio: {dir_por_categoria}")
         archivos, titulos, fechas, htmls, targets  = htmls_y_target(os.path.join(DIR_BASE_CATEGORIAS, dir_por_categoria))
         todos_los_archivos.extend(archivos)
         todos_los_titulos.extend(titulos)
@@ -209,36 +254,82 @@ if __name__ == "__main__":
         todos_los_targets.extend(targets)
 
     mi_lista_stopwords = leer_stopwords(STOPWORDS_FILE_SIN_ACENTOS)
-    mi_tokenizer = tokenizador()
-    vectorizer = CountVectorizer(
-        stop_words=mi_lista_stopwords, 
-        tokenizer=mi_tokenizer,
-        lowercase=True, 
-        strip_accents='unicode', 
-        decode_error='ignore',
+    # tokenizar 1 sola vez (minusculas, sin acentos, regex de tokenizador()) y guardar los IDs de token en la cache;
+    # si los textos y la configuracion no cambiaron, se lee de la cache sin volver a tokenizar
+    with registro.etapa("tokenizacion", items=len(todos_los_htmls)):
+        corpus = CorpusTokenizado.construir(
+            todos_los_htmls,
+            config_tokenizador(token_pattern=TOKEN_REGEX, lowercase=True, strip_accents='unicode'),
+            dir_cache=DIR_CACHE_TOKENS,
+            ids_docs=todos_los_archivos
+        )
+    registro.detalle(f"Corpus tokenizado en {corpus.directorio}: {len(corpus.tokens)} tokens, {len(corpus.vocabulario)} distintos")
+
+    grupos = None
+    if MODO_DUPLICADOS is not None:
+        with registro.etapa("deduplicacion", items=len(todos_los_htmls)):
+            grupos, estadisticas_duplicados = detectar_duplicados(corpus, UMBRAL_DUPLICADOS, titulos=todos_los_titulos)
+        registro.info(f"Notas casi duplicadas o de plantilla: {estadisticas_duplicados['notas_duplicadas']} "
+                      f"en {estadisticas_duplicados['grupos_con_duplicados']} grupos")
+        registro.detalle(describir_grupos(grupos, todos_los_archivos))
+        registro.contar("notas_duplicadas", estadisticas_duplicados["notas_duplicadas"])
+        if MODO_DUPLICADOS == "eliminar":
+            quedan = representantes(grupos)
+            todos_los_archivos = [todos_los_archivos[i] for i in quedan]
+            todos_los_titulos = [todos_los_titulos[i] for i in quedan]
+            todas_las_fechas = [todas_las_fechas[i] for i in quedan]
+            todos_los_htmls = [todos_los_htmls[i] for i in quedan]
+            todos_los_targets = [todos_los_targets[i] for i in quedan]
+            grupos = None
+            with registro.etapa("tokenizacion", items=len(todos_los_htmls)):
+                corpus = CorpusTokenizado.construir(todos_los_htmls, corpus.config, dir_cache=DIR_CACHE_TOKENS,
+                                                    ids_docs=todos_los_archivos)
+        else:
+            guardar_grupos(GRUPOS_FILE, grupos, MODO_DUPLICADOS)
+            registro.info(f"El grupo de duplicados de cada nota esta en {GRUPOS_FILE}.")
+    if grupos is None and os.path.exists(GRUPOS_FILE):
+        # los de una corrida anterior ya no corresponden a las filas de los vectores que se van a guardar
+        os.remove(GRUPOS_FILE)
+    # mismo resultado que CountVectorizer(stop_words, tokenizer=tokenizador(), lowercase, strip_accents='unicode', ngram_range, min_df, max_df)
+    vectorizer = VectorizadorTokens(
+        stop_words=mi_lista_stopwords,
         ngram_range=(MIN_NGRAMS, MAX_NGRAMS), 
         min_df=MIN_DF, 
-        max_df=MAX_DF
+        max_df=MAX_DF,
+        podar_ngramas=True,
+        ancho_sketch=ANCHO_SKETCH_DF
     )
 
-    # fit = tokenizar y codificar documentos como filas
-    todos_los_vectores = vectorizer.fit_transform(todos_los_htmls)
+    # fit = codificar documentos como filas
+    with registro.etapa("vectorizacion", items=len(todos_los_htmls)):
+        todos_los_vectores = vectorizer.fit_transform(corpus)
+    registro.detalle(f"Conteo de n-gramas: {vectorizer.estadisticas_}")
     
     # guardar vectores de docs y la correspondiente categoria asignada a cada doc.
-    joblib.dump(todos_los_vectores, VECTORS_FILE)
-    joblib.dump(todos_los_targets, TARGETS_FILE)
-    nombres_features = vectorizer.get_feature_names_out()
-    print(f"Feature names: \n{nombres_features}")
-    joblib.dump(nombres_features, FEATURE_NAMES_FILE)
-    print(f"El nombre de cada columna de features esta en {FEATURE_NAMES_FILE}.")
-
-    # Generar DataFrame a partir de los vectores
-    df_vectores = pd.DataFrame(todos_los_vectores.toarray(), columns=nombres_features)
-    df_vectores['_target'] = pd.DataFrame(todos_los_targets, columns=['target'])
-    df_vectores['_archivo'] = todos_los_archivos
-    df_vectores['_titulo'] = todos_los_titulos
-    df_vectores['_fecha'] = todas_las_fechas
-    df_vectores['_token'] = todos_los_vectores.toarray().tolist()
-    print(f"DataFrame generado con forma: {df_vectores.shape}")
-    # almacenar datafram en archivo .parquet
-    df_vectores.to_parquet(DF_PARQUET_FILE)
\ No newline at end of file
+    with registro.etapa("escritura"):
+        joblib.dump(todos_los_vectores, VECTORS_FILE)
+        joblib.dump(todos_los_targets, TARGETS_FILE)
+        nombres_features = vectorizer.get_feature_names_out()
+        registro.detalle(f"Feature names: \n{nombres_features}")
+        joblib.dump(nombres_features, FEATURE_NAMES_FILE)
+    registro.info(f"El nombre de cada columna de features esta en {FEATURE_NAMES_FILE}.")
+
+    # Generar DataFrame con los metadatos y el texto de cada nota; las features van aparte, en formato largo
+    with registro.etapa("dataframe"):
+        df_notas = pd.DataFrame({
+            'id_nota': [id_de_nota(archivo) for archivo in todos_los_archivos],
+            'archivo': todos_los_archivos,
+            'titulo': todos_los_titulos,
+            'fecha': todas_las_fechas,
+            'seccion': todos_los_targets,
+            'texto': todos_los_htmls,
+        })
+        if grupos is not None:
+            df_notas['grupo_duplicados'] = grupos
+    registro.info(f"DataFrame de notas generado con forma: {df_notas.shape}")
+    # almacenar en un dataset parquet particionado por seccion y mes de publicacion
+    with registro.etapa("escritura"):
+        escribir_dataset(DIR_DATASET, df_notas, todos_los_vectores, nombres_features)
+    registro.info(f"Dataset particionado guardado en {DIR_DATASET}")
+    registro.contar("features", len(nombres_features))
+    registro.resumen()
\ No newline at end of file
@@ -2,21 +2,40 @@
 """
 Lee el dataset vectorizado y entrena/evalúa con CV.
 """
-from typing import Dict
+import os
+import time
+import warnings
+from typing import Dict, List, Optional, Sequence
 
 import joblib
 import numpy as np
+from sklearn import config_context
+from sklearn.base import clone
+from sklearn.exceptions import ConvergenceWarning
 from sklearn.feature_selection import SelectKBest, chi2
+from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, auc, confusion_matrix, roc_curve
-from sklearn.model_selection import StratifiedKFold
+from sklearn.model_selection import StratifiedGroupKFold, StratifiedKFold
 from sklearn.multiclass import OneVsRestClassifier
 from sklearn.preprocessing import LabelEncoder, label_binarize
 from sklearn.svm import SVC
 
+from dataset_particionado import DIR_DATASET, Fecha, leer_features
+from deduplicacion import leer_grupos, pesos_por_grupo
+from indice_vectores import ClasificadorKNN
+from intervalos_bootstrap import bootstrap, guardar_predicciones, imprimir_intervalos
+from ranking_features import RankingFeatures, imprimir_ranking, imprimir_top
+from cargador_scripts import aplicar_parametros
+from instrumentacion import RegistroEjecucion
+
 DATA_FILE = "data.joblib"
 VECTORS_FILE = "vectores.joblib"
 TARGETS_FILE = "targets.joblib"
 FEATURE_NAMES_FILE = "features.joblib"
+# grupo de notas casi duplicadas de cada nota, de 2-html-a-dataframe.py (ver deduplicacion.py)
+GRUPOS_FILE = "grupos.joblib"
+
+registro = RegistroEjecucion("3-entrenar-y-evaluar")
 
 def _calcular_auc_por_clase(targets_reales_bin, targets_scores) -> Dict[int, float]:
     """
@@ -36,22 +55,74 @@ def _calcular_auc_por_clase(targets_reales_bin, targets_scores) -> Dict[int, flo
         roc_auc[i] = auc(fpr[i], tpr[i])
     return roc_auc
 
-def calcular_e_imprimir_auc(clasificador, train_X, train_y, test_X, test_y, idx_a_clase):
+def entrenar_ovr(clasificador, train_X, train_y, pesos: Optional[np.ndarray] = None) -> OneVsRestClassifier:
     """
-    Entrena OneVsRest y calcula AUC por clase usando scores continuos.
+    Entrena OneVsRest, pasandole a cada clasificador binario el peso de cada nota si hay pesos.
     """
-    ovr = OneVsRestClassifier(clasificador)
-    ovr.fit(train_X, train_y)
+    if pesos is None:
+        return OneVsRestClassifier(clasificador).fit(train_X, train_y)
+    # OneVsRestClassifier solo le pasa sample_weight al clasificador con metadata routing
+    with config_context(enable_metadata_routing=True):
+        ovr = OneVsRestClassifier(clone(clasificador).set_fit_request(sample_weight=True))
+        return ovr.fit(train_X, train_y, sample_weight=pesos)
 
-    if hasattr(ovr, "decision_function"):
-        scores = ovr.decision_function(test_X)
-    else:
-        scores = ovr.predict_proba(test_X)
 
+def scores_ovr(ovr, test_X) -> np.ndarray:
+    """
+    :return: Scores continuos (n, n_clases) de un OneVsRest ya entrenado (decision_function o predict_proba).
+    """
+    with registro.etapa("prediccion", items=test_X.shape[0]):
+        if hasattr(ovr, "decision_function"):
+            scores = ovr.decision_function(test_X)
+        else:
+            scores = ovr.predict_proba(test_X)
+    # con 2 clases hay 1 sola columna de scores (la de la clase 1)
+    if scores.ndim == 1:
+        scores = np.column_stack([-scores, scores])
+    return scores
+
+
+def imprimir_auc(test_y, scores, idx_a_clase) -> Dict[int, float]:
+    """
+    :return: Un diccionario de indice de categoria -> AUC de esa categoria
+    """
     n_clases = len(idx_a_clase)
     test_bin = label_binarize(test_y, classes=range(0, n_clases))
-    for i, valor_auc in _calcular_auc_por_clase(test_bin, scores).items():
+    if test_bin.shape[1] == 1 and n_clases == 2:
+        test_bin = np.column_stack([1 - test_bin[:, 0], test_bin[:, 0]])
+    auc_por_clase = _calcular_auc_por_clase(test_bin, scores)
+    for i, valor_auc in auc_por_clase.items():
         print("\tAUC para la clase #{} ({}): {}".format(i, idx_a_clase[i], valor_auc))
+    return auc_por_clase
+
+
+def calcular_e_imprimir_auc(clasificador, train_X, train_y, test_X, test_y, idx_a_clase, pesos=None):
+    """
+    Entrena OneVsRest y calcula AUC por clase usando scores continuos.
+    :param pesos: El peso de cada nota de entrenamiento, o None.
+    :return: Un diccionario de indice de categoria -> AUC de esa categoria
+    """
+    with registro.etapa("entrenamiento_auc", items=train_X.shape[0]):
+        ovr = entrenar_ovr(clasificador, train_X, train_y, pesos)
+    return imprimir_auc(test_y, scores_ovr(ovr, test_X), idx_a_clase)
+
+
+def intervalos_y_predicciones(targets, preds, scores, idx_a_clase, remuestreos: int,
+                              archivo: Optional[str] = None, etiqueta: str = "cv"):
+    """
+    Imprime los intervalos de confianza por bootstrap (ver intervalos_bootstrap.py) y guarda las predicciones, para
+    poder comparar modelos despues sin volver a entrenar.
+    """
+    if remuestreos:
+        with registro.etapa(f"bootstrap_{etiqueta}", items=remuestreos):
+            resultado = bootstrap(targets, preds, scores, len(idx_a_clase), remuestreos)
+        imprimir_intervalos(resultado, idx_a_clase)
+        registro.evento(f"intervalos_{etiqueta}", remuestreos=remuestreos,
+                        **{metrica: [float(resultado[metrica][extremo]) for extremo in ("valor", "inferior", "superior")]
+                           for metrica in ("accuracy", "f1_macro")})
+    if archivo:
+        guardar_predicciones(archivo, targets, preds, scores, idx_a_clase)
+        print(f"[OK] Predicciones ({etiqueta}) en {archivo}")
 
 def pesos_de_features(score_fn, train_fold, train_targets_fold) -> np.ndarray:
     # score_fn debe aceptar matriz 2D (todas las columnas a la vez), p.ej., chi2
@@ -61,95 +132,298 @@ def pesos_de_features(score_fn, train_fold, train_targets_fold) -> np.ndarray:
 
 
 def imprimir_features_con_pesos(score_fn, train_fold, train_targets_fold, nombres_features, top_n=-1):
-    pesos_features = pesos_de_features(score_fn, train_fold, train_targets_fold)
-    idx_desc = np.argsort(pesos_features)[::-1]
-    n_feats = train_fold.shape[1]
-    if top_n == -1 or top_n > n_feats:
-        top_n = n_feats
-    for i in range(top_n):
-        j = idx_desc[i]
-        print(nombres_features[j], '\t', float(pesos_features[j]))
+    # top_n -1 imprime todas; si no, argpartition elige las top_n sin ordenar todas las features
+    imprimir_top(pesos_de_features(score_fn, train_fold, train_targets_fold), nombres_features, top_n)
 
 
 def nombres_features_seleccionadas(selector_features, nombres_features):
     cols = selector_features.get_support()
     return [feat for selected, feat in zip(cols, nombres_features) if selected]
 
-# --- carga
-datos = joblib.load(DATA_FILE)
-vectores = joblib.load(VECTORS_FILE)
-nombres_targets = joblib.load(TARGETS_FILE)
-nombres_features = joblib.load(FEATURE_NAMES_FILE)
+# kNN por coseno (ver indice_vectores.py) en vez del SVC lineal
+USAR_KNN = False
+K_VECINOS = 10
+MAX_FEATURES = 150
+CANT_FOLDS_CV = 5
+# entrenar con menos peso las notas casi duplicadas (las de grupos de GRUPOS_FILE), aunque se hayan guardado con
+# MODO_DUPLICADOS = "agrupar" (con "ponderar" ya se les baja el peso)
+PONDERAR_DUPLICADOS = False
+# valores de C del camino de regularizacion que se evalua ademas en cada fold, para elegir C (p.ej.
+# np.logspace(-3, 2, 11), o --param VALORES_C='[0.001, 0.01, 0.1, 1, 10, 100]' en tp.py); None para no evaluarlo
+VALORES_C = None
+MAX_ITERACIONES_CAMINO = 200
+# fraccion de las notas (las mas nuevas) que se usan para testear en la division temporal
+FRACCION_TEST_TEMPORAL = 0.2
+# reporte con el ranking de features (chi2, F, info mutua, log-odds) juntado de todos los folds (ver ranking_features.py)
+ARCHIVO_RANKING_FEATURES = "ranking_features.csv"
+# remuestreos bootstrap para los intervalos de confianza de las metricas (0 para no calcularlos), y adonde guardar
+# las predicciones out-of-fold y las del periodo de test (ver intervalos_bootstrap.py)
+REMUESTREOS_BOOTSTRAP = 2000
+ARCHIVO_PREDICCIONES_CV = "predicciones_cv.npz"
+ARCHIVO_PREDICCIONES_TEMPORAL = "predicciones_temporal.npz"
+# frenar despues de imprimir los vectores y los datos (el orquestador lo apaga, corre sin consola)
+PAUSAR = True
 
-print(vectores)
-input("Press Enter to continue...")
-print(datos)
-input("Press Enter to continue...")
+# las constantes de arriba se pueden pisar con TP_PARAMETROS (ver cargador_scripts.py y orquestador.py)
+aplicar_parametros(globals())
+clasificador = ClasificadorKNN(k=K_VECINOS) if USAR_KNN else SVC(kernel='linear', probability=True)
 
-label_encoder = LabelEncoder()
-targets = label_encoder.fit_transform(nombres_targets)
-idx_a_clase = label_encoder.classes_
-n_categorias = len(idx_a_clase)
 
-clasificador = SVC(kernel='linear', probability=True)
-MAX_FEATURES = 150
-CANT_FOLDS_CV = 5
+def camino_regularizacion(train_X, train_y, test_X, test_y, n_clases: int,
+                          valores_c: Sequence[float] = tuple(np.logspace(-3, 2, 11)),
+                          pesos: Optional[np.ndarray] = None, max_iter: int = MAX_ITERACIONES_CAMINO) -> List[Dict]:
+    """
+    Entrena una regresion logistica (lineal, como el SVC) para cada C, de menor a mayor, arrancando cada vez de la
+    solucion del C anterior (warm start): con C cercanos las soluciones son parecidas y cada fit termina en pocas
+    iteraciones, asi que el camino entero cuesta poco mas que 1 fit desde cero.
+    :return: Por cada C: {"C", "accuracy", "auc" (promedio de las clases), "iteraciones", "segundos"}.
+    """
+    modelo = LogisticRegression(warm_start=True, max_iter=max_iter)
+    test_bin = label_binarize(test_y, classes=range(n_clases))
+    if test_bin.shape[1] == 1:
+        test_bin = np.column_stack([1 - test_bin[:, 0], test_bin[:, 0]])
+    resultados = []
+    for c in sorted(valores_c):
+        inicio = time.perf_counter()
+        modelo.set_params(C=c)
+        with warnings.catch_warnings():
+            # con C grandes puede no converger en max_iter; el siguiente C arranca desde ahi igual
+            warnings.simplefilter("ignore", ConvergenceWarning)
+            modelo.fit(train_X, train_y, sample_weight=pesos)
+        segundos = time.perf_counter() - inicio
+        probabilidades = modelo.predict_proba(test_X)
+        scores = np.zeros((test_X.shape[0], n_clases))
+        # si en el fold de train falta alguna clase, su columna queda en 0
+        scores[:, modelo.classes_] = probabilidades
+        auc_por_clase = _calcular_auc_por_clase(test_bin, scores)
+        resultados.append({"C": float(c), "accuracy": accuracy_score(test_y, modelo.classes_[probabilidades.argmax(axis=1)]),
+                           "auc": float(np.nanmean(list(auc_por_clase.values()))),
+                           "iteraciones": int(np.max(modelo.n_iter_)), "segundos": segundos})
+    return resultados
 
-n_fold = 1
-accuracy_promedio = 0.0
 
-# EVALUACION CON 5 FOLDS
-print(f"Evaluando con {CANT_FOLDS_CV} folds:")
-for train_index, test_index in StratifiedKFold(n_splits=CANT_FOLDS_CV, shuffle=True, random_state=None).split(vectores, targets):
-    train_fold = vectores[train_index]
-    train_targets_fold = targets[train_index]
-    test_fold = vectores[test_index]
-    test_targets_fold = targets[test_index]
+def imprimir_camino(resultados_por_fold: List[List[Dict]]) -> Dict:
+    """
+    Imprime accuracy y AUC promedio de los folds para cada C, y el costo del camino.
+    :return: El resultado promedio del C con mejor accuracy.
+    """
+    promedios = []
+    print("\nCamino de regularizacion (promedio de los folds):")
+    print(f"{'C':>10}  {'accuracy':>9}  {'AUC':>7}  {'iter':>6}  {'seg':>7}")
+    for resultados_c in zip(*resultados_por_fold):
+        promedio = {clave: float(np.mean([r[clave] for r in resultados_c])) for clave in resultados_c[0]}
+        promedios.append(promedio)
+        print(f"{promedio['C']:>10.4g}  {promedio['accuracy']:>9.4f}  {promedio['auc']:>7.4f}  "
+              f"{promedio['iteraciones']:>6.1f}  {promedio['segundos']:>7.3f}")
+    mejor = max(promedios, key=lambda r: r["accuracy"])
+    print(f"Mejor C = {mejor['C']:.4g} (accuracy {mejor['accuracy']:.4f}, AUC {mejor['auc']:.4f})")
+    return mejor
 
-    # Imprimir pesos (ojo: puede ser lento)
-    imprimir_features_con_pesos(chi2, train_fold, train_targets_fold, nombres_features, MAX_FEATURES)
 
-    k_sel = min(MAX_FEATURES, train_fold.shape[1])
-    selector_features = SelectKBest(score_func=chi2, k=k_sel).fit(train_fold, train_targets_fold)
+def evaluar_cv(vectores, targets, idx_a_clase, nombres_features, clasificador=clasificador,
+               max_features=MAX_FEATURES, cant_folds=CANT_FOLDS_CV, imprimir_pesos=True,
+               grupos: Optional[np.ndarray] = None, ponderar: bool = False,
+               valores_c: Optional[Sequence[float]] = None, archivo_ranking: Optional[str] = None,
+               remuestreos: int = REMUESTREOS_BOOTSTRAP, archivo_predicciones: Optional[str] = None) -> float:
+    """
+    Evalua al clasificador con cross-validation estratificada, seleccionando features con chi2 en cada fold.
+    :param valores_c: Si no es None, en cada fold se evalua ademas el camino de regularizacion con estos C sobre las
+        mismas features seleccionadas (ver camino_regularizacion), y al final se imprime el promedio por C.
+    :param archivo_ranking: Si imprimir_pesos, guardar ahi el ranking de features de todos los folds (CSV).
+    :param remuestreos: Remuestreos bootstrap para los intervalos de las predicciones out-of-fold (0: ninguno).
+    :param archivo_predicciones: Si no es None, guardar ahi las predicciones y scores out-of-fold.
+    :param grupos: El grupo de notas casi duplicadas de cada nota (ver deduplicacion.py); las notas de un mismo
+        grupo quedan siempre en el mismo fold, para no testear con copias de notas de entrenamiento.
+    :param ponderar: Si hay grupos, entrenar con peso 1 / tamaño del grupo para cada nota.
+    :return: La accuracy promedio de los folds.
+    """
+    n_fold = 1
+    accuracy_promedio = 0.0
 
-    train_fold_selected = selector_features.transform(train_fold)
-    test_fold_selected = selector_features.transform(test_fold)
+    if grupos is None:
+        folds = StratifiedKFold(n_splits=cant_folds, shuffle=True, random_state=None).split(vectores, targets)
+    else:
+        folds = StratifiedGroupKFold(n_splits=cant_folds, shuffle=True, random_state=None).split(vectores, targets, grupos)
+    pesos = pesos_por_grupo(grupos) if grupos is not None and ponderar else None
+    resultados_camino = []
+    ranking = RankingFeatures(vectores.shape[1], len(idx_a_clase), top=max_features) if imprimir_pesos else None
+    preds_oof = np.zeros(vectores.shape[0], dtype=np.int64)
+    scores_oof = np.zeros((vectores.shape[0], len(idx_a_clase)))
+    print(f"Evaluando con {cant_folds} folds" + (" por grupo de duplicados:" if grupos is not None else ":"))
+    for train_index, test_index in folds:
+        train_fold = vectores[train_index]
+        train_targets_fold = targets[train_index]
+        test_fold = vectores[test_index]
+        test_targets_fold = targets[test_index]
+        pesos_fold = pesos[train_index] if pesos is not None else None
 
-    # One-vs-Rest + scores para AUC
-    ovr = OneVsRestClassifier(clasificador)
-    ovr.fit(train_fold_selected, train_targets_fold)
-    preds_fold = ovr.predict(test_fold_selected)  # para accuracy
-    print("FOLD #{}, # train = {}, # test = {}".format(n_fold, train_fold.shape[0], test_fold_selected.shape[0]))
+        # Imprimir pesos: los 4 puntajes de todas las features en 1 pasada, y el top de chi2 de este fold
+        if ranking is not None:
+            with registro.etapa("pesos_features", items=train_fold.shape[1]):
+                puntajes_fold = ranking.agregar_fold(train_fold, train_targets_fold)
+                imprimir_top(puntajes_fold["chi2"], nombres_features, max_features)
+
+        with registro.etapa("seleccion", items=train_fold.shape[0]):
+            k_sel = min(max_features, train_fold.shape[1])
+            selector_features = SelectKBest(score_func=chi2, k=k_sel).fit(train_fold, train_targets_fold)
+
+            train_fold_selected = selector_features.transform(train_fold)
+            test_fold_selected = selector_features.transform(test_fold)
+
+        # One-vs-Rest + scores para AUC
+        with registro.etapa("entrenamiento", items=train_fold_selected.shape[0]):
+            ovr = entrenar_ovr(clasificador, train_fold_selected, train_targets_fold, pesos_fold)
+        with registro.etapa("prediccion", items=test_fold_selected.shape[0]):
+            preds_fold = ovr.predict(test_fold_selected)  # para accuracy
+        print("FOLD #{}, # train = {}, # test = {}".format(n_fold, train_fold.shape[0], test_fold_selected.shape[0]))
+
+        print("FEATURES SELECCIONADAS:")
+        print(nombres_features_seleccionadas(selector_features, nombres_features))
+
+        accuracy_fold = accuracy_score(test_targets_fold, preds_fold)
+        accuracy_promedio += accuracy_fold
+        print("Accuracy del fold #{} = {}".format(n_fold, accuracy_fold))
+
+        # AUC por clase con scores continuos, del mismo OneVsRest que predijo el fold
+        scores_fold = scores_ovr(ovr, test_fold_selected)
+        auc_por_clase = imprimir_auc(test_targets_fold, scores_fold, idx_a_clase)
+        preds_oof[test_index] = preds_fold
+        scores_oof[test_index] = scores_fold
 
-    print("FEATURES SELECCIONADAS:")
-    print(nombres_features_seleccionadas(selector_features, nombres_features))
+        if valores_c is not None:
+            with registro.etapa("camino_c", items=train_fold_selected.shape[0] * len(valores_c)):
+                resultados_camino.append(camino_regularizacion(train_fold_selected, train_targets_fold, test_fold_selected,
+                                                               test_targets_fold, len(idx_a_clase), valores_c, pesos_fold))
+            registro.evento("camino_c", n_fold=n_fold, resultados=resultados_camino[-1])
 
-    accuracy_fold = accuracy_score(test_targets_fold, preds_fold)
-    accuracy_promedio += accuracy_fold
-    print("Accuracy del fold #{} = {}".format(n_fold, accuracy_fold))
+        print("\tMatriz de confusion (filas=real, columnas=prediccion):")
+        mat_conf = confusion_matrix(test_targets_fold, preds_fold)
+        print(mat_conf)
+        registro.evento("fold", n_fold=n_fold, n_train=train_fold.shape[0], n_test=test_fold_selected.shape[0],
+                        accuracy=accuracy_fold, auc_por_clase={str(idx_a_clase[i]): v for i, v in auc_por_clase.items()},
+                        matriz_confusion=mat_conf)
 
-    # AUC por clase con scores continuos
-    calcular_e_imprimir_auc(clasificador, train_fold_selected, train_targets_fold, test_fold_selected, test_targets_fold, idx_a_clase)
+        n_fold += 1
 
+    accuracy_promedio = accuracy_promedio / (n_fold - 1)
+    print("\nAccuracy promedio = {}".format(accuracy_promedio))
+    registro.evento("cv", folds=cant_folds, accuracy_promedio=accuracy_promedio)
+    print("Predicciones out-of-fold de todos los folds:")
+    intervalos_y_predicciones(targets, preds_oof, scores_oof, idx_a_clase, remuestreos, archivo_predicciones, "cv")
+    if resultados_camino:
+        mejor = imprimir_camino(resultados_camino)
+        registro.evento("mejor_c", **mejor)
+    if ranking is not None:
+        imprimir_ranking(ranking, nombres_features, idx_a_clase)
+        if archivo_ranking:
+            ranking.escribir_reporte(archivo_ranking, nombres_features, idx_a_clase)
+            print(f"[OK] Ranking de features de los {ranking.folds} folds en {archivo_ranking}")
+    return accuracy_promedio
+
+
+def evaluar_division_temporal(dir_dataset=DIR_DATASET, fraccion_test=FRACCION_TEST_TEMPORAL, secciones=None,
+                              desde: Fecha = None, hasta: Fecha = None, clasificador=clasificador,
+                              max_features=MAX_FEATURES, remuestreos: int = REMUESTREOS_BOOTSTRAP,
+                              archivo_predicciones: Optional[str] = None) -> float:
+    """
+    Entrena con las notas mas viejas y testea con las mas nuevas: la ultima "fraccion_test" de las notas de cada
+    seccion por fecha (como 4-split_validacion_por_id.py), porque cada seccion se pudo crawlear en un rango de
+    fechas distinto y con 1 solo corte global el test podria quedar con 1 sola seccion. Del dataset particionado
+    solo se leen las particiones de las secciones y el rango de fechas pedidos, y solo la seccion, la fecha y las
+    features de cada nota, sin leer los textos. Las notas sin fecha no se usan.
+    :param remuestreos: Remuestreos bootstrap para los intervalos de las metricas del periodo de test (0: ninguno).
+    :param archivo_predicciones: Si no es None, guardar ahi las predicciones y scores del periodo de test.
+    :return: La accuracy en el periodo de test.
+    """
+    print("\nEvaluando con division temporal:")
+    with registro.etapa("lectura"):
+        notas, vectores, nombres_features = leer_features(dir_dataset, columnas=["seccion", "fecha"],
+                                                          secciones=secciones, desde=desde, hasta=hasta)
+    con_fecha = notas["fecha"].notna()
+    por_seccion = notas["fecha"].where(con_fecha).groupby(notas["seccion"])
+    # posicion de cada nota en su seccion, de la mas nueva (1) a la mas vieja, y cuantas van a test en la seccion
+    posicion = por_seccion.rank(method="first", ascending=False)
+    con_fecha_en_seccion = por_seccion.transform("count")
+    n_test = np.rint(con_fecha_en_seccion * fraccion_test)
+    # como en 4-: si da 0 y hay al menos 5 notas, 1 va a test
+    n_test = n_test.where((n_test > 0) | (con_fecha_en_seccion < 5), 1)
+    es_test = (con_fecha & (posicion <= n_test)).to_numpy()
+    es_train = (con_fecha & ~(posicion <= n_test)).to_numpy()
+
+    label_encoder = LabelEncoder()
+    targets = label_encoder.fit_transform(notas["seccion"])
+    idx_a_clase = label_encoder.classes_
+    train_X, train_y = vectores[es_train], targets[es_train]
+    test_X, test_y = vectores[es_test], targets[es_test]
+    cortes = notas["fecha"][es_test].groupby(notas["seccion"][es_test]).min()
+    print(f"# train = {train_X.shape[0]} (desde {notas['fecha'][es_train].min()}), "
+          f"# test = {test_X.shape[0]} (hasta {notas['fecha'][es_test].max()})")
+    for seccion, corte in cortes.items():
+        print(f"\t{seccion}: test desde {corte} ({int((notas['seccion'][es_test] == seccion).sum())} notas)")
+    if len(np.unique(test_y)) < 2:
+        raise ValueError(f"El periodo de test tiene notas de {len(np.unique(test_y))} seccion(es): con menos de 2 "
+                         "la accuracy, el AUC y la matriz de confusion no significan nada")
+
+    with registro.etapa("seleccion", items=train_X.shape[0]):
+        selector_features = SelectKBest(score_func=chi2, k=min(max_features, train_X.shape[1])).fit(train_X, train_y)
+        train_X_selected = selector_features.transform(train_X)
+        test_X_selected = selector_features.transform(test_X)
+    ovr = OneVsRestClassifier(clasificador)
+    with registro.etapa("entrenamiento", items=train_X_selected.shape[0]):
+        ovr.fit(train_X_selected, train_y)
+    with registro.etapa("prediccion", items=test_X_selected.shape[0]):
+        preds = ovr.predict(test_X_selected)
+
+    accuracy = accuracy_score(test_y, preds)
+    print("Accuracy en el periodo de test = {}".format(accuracy))
+    scores = scores_ovr(ovr, test_X_selected)
+    auc_por_clase = imprimir_auc(test_y, scores, idx_a_clase)
     print("\tMatriz de confusion (filas=real, columnas=prediccion):")
-    print(confusion_matrix(test_targets_fold, preds_fold))
+    mat_conf = confusion_matrix(test_y, preds, labels=range(len(idx_a_clase)))
+    print(mat_conf)
+    registro.evento("division_temporal", cortes={str(k): str(v) for k, v in cortes.items()}, n_train=train_X.shape[0], n_test=test_X.shape[0],
+                    accuracy=accuracy, auc_por_clase={str(idx_a_clase[i]): v for i, v in auc_por_clase.items()},
+                    matriz_confusion=mat_conf)
+    intervalos_y_predicciones(test_y, preds, scores, idx_a_clase, remuestreos, archivo_predicciones, "temporal")
+    return accuracy
+
+
+def main():
+    # --- carga
+    with registro.etapa("lectura"):
+        # 2-html-a-dataframe.py ya no escribe DATA_FILE (los datos estan en el dataset Parquet)
+        datos = joblib.load(DATA_FILE) if os.path.exists(DATA_FILE) else None
+        vectores = joblib.load(VECTORS_FILE)
+        nombres_targets = joblib.load(TARGETS_FILE)
+        nombres_features = joblib.load(FEATURE_NAMES_FILE)
+
+    print(vectores)
+    if PAUSAR:
+        input("Press Enter to continue...")
+    if datos is not None:
+        print(datos)
+        if PAUSAR:
+            input("Press Enter to continue...")
+
+    label_encoder = LabelEncoder()
+    targets = label_encoder.fit_transform(nombres_targets)
+    idx_a_clase = label_encoder.classes_
 
-    n_fold += 1
+    # con grupos de duplicados (si 2-html-a-dataframe.py los guardo) las copias no se reparten entre folds
+    # y, si se guardaron con MODO_DUPLICADOS = "ponderar", se entrena con menos peso para las copias
+    grupos, modo_duplicados = leer_grupos(GRUPOS_FILE, vectores.shape[0])
 
-print("\nAccuracy promedio = {}".format(accuracy_promedio / (n_fold - 1)))
+    # EVALUACION CON 5 FOLDS
+    evaluar_cv(vectores, targets, idx_a_clase, nombres_features, grupos=grupos,
+               ponderar=PONDERAR_DUPLICADOS or modo_duplicados == "ponderar",
+               valores_c=VALORES_C, archivo_ranking=ARCHIVO_RANKING_FEATURES,
+               archivo_predicciones=ARCHIVO_PREDICCIONES_CV)
 
-# EVALUACION CON DIVISON TEMPORAL
-print("\nEvaluando con division temporal:")
-# Carga de datos de data.parquet
-import pandas as pd
-from sklearn.model_selection import train_test_split
+    # EVALUACION CON DIVISON TEMPORAL
+    evaluar_division_temporal(archivo_predicciones=ARCHIVO_PREDICCIONES_TEMPORAL)
 
-DF_PARQUET_FILE = "data.parquet"
+    registro.resumen()
 
-df = pd.read_parquet(DF_PARQUET_FILE)
-# ordernar por fecha
-df = df.sort_values(by=['_fecha'])
-X = df.drop(columns=['_target'])
-y = df['_target']
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 # ------------------------------------------------------------
 # Toma el 20% más "nuevo" por categoría, donde "nuevo" = ID numérico
 # más alto extraído del nombre del archivo (p.ej. 826016-*.html).
+# Con --metadatos (tabla de metadatos_indice.py) "nuevo" = fecha de
+# publicación de la tarjeta del índice, en las categorías donde todas
+# las notas con ID la tienen (si no, se ordena por ID: una nota vieja
+# con fecha no debe pasar adelante de una nueva sin fecha).
 # Mueve los archivos a Validacion/<categoria>/, con dry-run y restore.
 # ------------------------------------------------------------
 
@@ -12,6 +16,8 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+from instrumentacion import RegistroEjecucion
+
 def is_html(p: Path, exts):
     return p.is_file() and p.suffix.lower() in exts
 
@@ -47,6 +53,30 @@ def safe_move(src: Path, dst_dir: Path) -> Path:
             return candidate
         k += 1
 
+def rank_by_recency(htmls, fechas):
+    """
+    Ordena las notas de 1 categoría de la más nueva a la más vieja, con 1 solo criterio para las que tienen ID:
+    la fecha de publicación si todas la tienen en "fechas", y si no el ID (mayor a menor). Al final las que no
+    tienen ID, por fecha de modificación (recientes primero).
+    :return: (lista ordenada de (grupo, clave, path), True si se ordenó por fecha)
+    """
+    ids = [(extract_leading_id(p), p) for p in htmls]
+    con_id = [(fid, p) for fid, p in ids if fid is not None]
+    por_fecha = bool(con_id) and all(fid in fechas for fid, _ in con_id)
+    ranked = []
+    for fid, p in con_id:
+        # mismo grupo para todas: el orden lo da solo la clave (fecha o ID, desc); a igual fecha, el ID
+        ranked.append((0, (-fechas[fid].timestamp(), -fid) if por_fecha else (-fid,), p))
+    for fid, p in ids:
+        if fid is None:
+            try:
+                mtime = p.stat().st_mtime
+            except Exception:
+                mtime = 0.0
+            ranked.append((1, (-mtime,), p))  # 1 => sin ID; recientes primero
+    ranked.sort()
+    return ranked, por_fecha
+
 def sample_count(n_total: int, pct: float) -> int:
     # Redondeo clásico; si hay >=5 archivos y da 0, movemos 1.
     n = int(round(n_total * pct))
@@ -97,7 +127,10 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="No mueve nada; sólo muestra el plan")
     parser.add_argument("--manifest", default="manifest_validacion.csv", help="Archivo manifest (default: manifest_validacion.csv)")
     parser.add_argument("--restore", help="Ruta a manifest CSV para revertir")
+    parser.add_argument("--metadatos", help="Tabla de metadatos_indice.py: ordenar por fecha de publicación en vez de por ID")
+    parser.add_argument("--verbosidad", type=int, choices=[0, 1, 2], default=None, help="0 = silencioso, 1 = normal, 2 = una linea por archivo (default: TP_VERBOSIDAD o 1)")
     args = parser.parse_args()
+    registro = RegistroEjecucion("4-split_validacion_por_id", verbosidad=args.verbosidad)
 
     base = Path(args.base).resolve()
     val_root = base / args.val_folder
@@ -111,6 +144,14 @@ def main():
         print(f"[ERROR] Base no existe: {base}")
         sys.exit(1)
 
+    # ID -> fecha de publicación, tomada de las tarjetas de los índices
+    fechas = {}
+    if args.metadatos:
+        from metadatos_indice import fechas_por_id
+        with registro.etapa("metadatos"):
+            fechas = fechas_por_id(args.metadatos)
+        print(f"[INFO] Metadatos: {len(fechas)} notas con fecha en {args.metadatos}")
+
     categories = collect_categories(base, args.val_folder)
     if not categories:
         print("[WARN] No se encontraron carpetas de categorías.")
@@ -129,28 +170,18 @@ def main():
         if val_root in cat_dir.parents or cat_dir == val_root:
             continue
 
-        htmls = rglob_htmls(cat_dir, exts)
+        with registro.etapa("listado"):
+            htmls = rglob_htmls(cat_dir, exts)
         n_total = len(htmls)
         n_move = sample_count(n_total, args.pct)
 
         if n_total == 0 or n_move == 0:
-            print(f"[CAT] {cat_dir.name}: {n_total} archivos | a mover: 0")
+            registro.info(f"[CAT] {cat_dir.name}: {n_total} archivos | a mover: 0")
             continue
 
-        # Rank: primero con ID (mayor a menor), luego sin ID por fecha de modif. (recientes primero)
-        ranked = []
-        for p in htmls:
-            fid = extract_leading_id(p)  # None si no hay
-            if fid is not None:
-                ranked.append((0, -fid, p))  # 0 => tiene ID; -fid para ordenar desc
-            else:
-                try:
-                    mtime = p.stat().st_mtime
-                except Exception:
-                    mtime = 0.0
-                ranked.append((1, -mtime, p))  # 1 => sin ID; recientes primero
-
-        ranked.sort()  # orden asc: (0, -id) van antes que (1, -mtime)
+        # Rank: con ID por fecha de publicación (si todas la tienen) o por ID, luego sin ID por fecha de modif.
+        with registro.etapa("ranking", items=n_total):
+            ranked, por_fecha = rank_by_recency(htmls, fechas)
 
         picks = [t[2] for t in ranked[:n_move]]
         # Armar plan
@@ -161,7 +192,10 @@ def main():
 
         # Métrica informativa
         con_id = sum(1 for t in ranked if t[0] == 0)
-        print(f"[CAT] {cat_dir.name}: {n_total} archivos (con ID: {con_id}) | a mover: {len(picks)}")
+        con_fecha = sum(1 for t in ranked if t[0] == 0 and extract_leading_id(t[2]) in fechas)
+        orden = "fecha" if por_fecha else "ID"
+        registro.info(f"[CAT] {cat_dir.name}: {n_total} archivos (con ID: {con_id}, con fecha: {con_fecha}, "
+                      f"orden por {orden}) | a mover: {len(picks)}")
 
     if not plan:
         print("[INFO] Nada para mover.")
@@ -174,13 +208,17 @@ def main():
             tag = f"ID={fid}" if fid is not None else "SIN_ID"
             print(f"  [{cat}] {src.name:<80} -> {dst.parent}/   ({tag})")
         print(f"\n[DRY-RUN] Total: {total_to_move} archivos.")
+        registro.contar("a_mover", total_to_move)
+        registro.resumen()
         return
 
     # Ejecutar movimientos y registrar manifest
     manifest_rows = []
     moved = 0
     for cat, src, dst, k in plan:
-        moved_path = safe_move(src, dst.parent)
+        with registro.etapa("movimiento"):
+            moved_path = safe_move(src, dst.parent)
+        registro.detalle(f"  [{cat}] {src.name} -> {moved_path}")
         moved += 1
         manifest_rows.append({
             "moved_at": datetime.now().isoformat(timespec="seconds"),
@@ -192,6 +230,8 @@ def main():
 
     write_manifest(base / args.manifest, manifest_rows)
     print(f"\n[OK] Movidos {moved} archivos. Manifest: {base / args.manifest}")
+    registro.contar("movidos", moved)
+    registro.resumen()
 
 if __name__ == "__main__":
     main()
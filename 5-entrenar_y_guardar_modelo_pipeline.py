@@ -5,7 +5,7 @@ Entrena un pipeline TFIDF -> SelectKBest(chi2) -> OneVsRest(SVC) con TODO lo que
 y guarda: modelo_pipeline.joblib + label_encoder.joblib
 
 Cómo usar:
-1) Editá CONFIG con tus rutas.
+1) Editá CONFIG con tus rutas (o pasalas sin editar el archivo en TP_PARAMETROS, ver cargador_scripts.py).
 2) Abrí en VS Code y Run ▶️.
 """
 
@@ -22,6 +22,10 @@ from sklearn.svm import SVC
 from sklearn.pipeline import Pipeline
 from collections import Counter
 
+from cargador_scripts import aplicar_parametros
+from instrumentacion import RegistroEjecucion
+from corpus_tokenizado import CorpusTokenizado, VectorizadorTokens, config_tokenizador
+
 # ==========
 # CONFIG (EDITAR)
 # ==========
@@ -30,8 +34,25 @@ VALIDACION_DIRNAME = "Validacion"                           # nombre exacto de l
 MODELS_DIR = Path(r"C:\Users\juanm\tp_web_mining1\models")  # adonde guardar el modelo
 MAX_FEATURES_TFIDF = 50000                                  # vocabulario máx TFIDF
 K_SELECT = 150                                              # k para SelectKBest (se ajusta a min(k, n_feats))
+USAR_CORPUS_TOKENIZADO = True                               # tokenizar 1 sola vez y reusar la cache (ver corpus_tokenizado.py)
+CACHE_TOKENS_DIR = None                                     # adonde guardar los corpus tokenizados (None: MODELS_DIR / "cache_tokens")
+MODELO_EMBEDDINGS_BERT = None                               # p.ej. "dccuchile/bert-base-spanish-wwm-uncased" o un directorio:
+                                                            # usar embeddings de BERT en vez de TFIDF (ver embeddings_bert.py)
+CACHE_EMBEDDINGS_DIR = None                                 # adonde guardar los embeddings ya calculados (None: MODELS_DIR / "cache_embeddings")
+CLASIFICADOR_KNN = False                                    # con embeddings: kNN por coseno en vez de OneVsRest(SVC)
+                                                            # (ver indice_vectores.py)
+TEXTOS_ENTRENAMIENTO = None                                 # joblib con (textos, labels) ya leídos de BASE_RAW (ver orquestador.py);
+                                                            # None: leer los HTML
+
+aplicar_parametros(globals())
+CACHE_TOKENS_DIR = Path(CACHE_TOKENS_DIR) if CACHE_TOKENS_DIR else MODELS_DIR / "cache_tokens"
+CACHE_EMBEDDINGS_DIR = Path(CACHE_EMBEDDINGS_DIR) if CACHE_EMBEDDINGS_DIR else MODELS_DIR / "cache_embeddings"
 
 EXTS = {".html", ".htm"}
+# misma tokenizacion que TfidfVectorizer por defecto: minusculas, sin acentos, token_pattern de sklearn
+CONFIG_TOKENIZADOR = config_tokenizador(lowercase=True, strip_accents="unicode")
+
+registro = RegistroEjecucion("5-entrenar_y_guardar_modelo_pipeline")
 
 def leer_html(path: Path) -> str:
     txt = path.read_text(encoding="utf-8", errors="ignore")
@@ -44,14 +65,63 @@ def cargar_textos_y_labels_entrenamiento(base_raw: Path, validacion_name: str) -
         categoria = cat_dir.name
         for p in cat_dir.rglob("*"):
             if p.is_file() and p.suffix.lower() in EXTS:
-                textos.append(leer_html(p))
+                with registro.etapa("lectura"):
+                    textos.append(leer_html(p))
                 labels.append(categoria)
+                registro.detalle(f"[INFO] Leído {p}")
     return textos, labels
 
+def construir_pipeline(max_features_tfidf: int = MAX_FEATURES_TFIDF, k_select: int = K_SELECT,
+                       pretokenizado: bool = False) -> Pipeline:
+    """
+    :param pretokenizado: Si es True, el paso "tfidf" es un VectorizadorTokens (mismo resultado que el TfidfVectorizer),
+    que se entrena con un CorpusTokenizado y predice sobre textos.
+    """
+    if pretokenizado:
+        tfidf = VectorizadorTokens(
+            config=CONFIG_TOKENIZADOR,
+            ngram_range=(1, 2),
+            max_features=max_features_tfidf,
+            min_df=2,
+            tfidf=True
+        )
+    else:
+        tfidf = TfidfVectorizer(
+            ngram_range=(1, 2),
+            max_features=max_features_tfidf,
+            min_df=2,
+            lowercase=True,
+            strip_accents="unicode"
+        )
+    return Pipeline(steps=[
+        ("tfidf", tfidf),
+        ("selector", SelectKBest(score_func=chi2, k=k_select)),
+        ("clf", OneVsRestClassifier(SVC(kernel="linear", probability=True)))
+    ])
+
+def construir_pipeline_embeddings(modelo_bert: str, dir_cache: Path = CACHE_EMBEDDINGS_DIR,
+                                  knn: bool = False) -> Pipeline:
+    """
+    Pipeline embeddings de BERT -> OneVsRest(SVC). Sin SelectKBest(chi2): chi2 necesita features no negativas.
+    :param modelo_bert: Nombre del modelo en Huggingface o directorio local.
+    :param knn: Clasificar por los vecinos mas cercanos (ClasificadorKNN) en vez de OneVsRest(SVC).
+    """
+    from embeddings_bert import EmbeddingsBert
+    from indice_vectores import ClasificadorKNN
+
+    return Pipeline(steps=[
+        ("embeddings", EmbeddingsBert(modelo=modelo_bert, pooling="media", capas=4, dir_cache=str(dir_cache))),
+        ("clf", ClasificadorKNN() if knn else OneVsRestClassifier(SVC(kernel="linear", probability=True)))
+    ])
+
 def main():
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"[INFO] Leyendo entrenamiento desde: {BASE_RAW} (excluyendo '{VALIDACION_DIRNAME}/')")
-    X_texts, y_labels = cargar_textos_y_labels_entrenamiento(BASE_RAW, VALIDACION_DIRNAME)
+    if TEXTOS_ENTRENAMIENTO is not None:
+        print(f"[INFO] Leyendo textos de entrenamiento ya extraídos de: {TEXTOS_ENTRENAMIENTO}")
+        X_texts, y_labels = joblib.load(TEXTOS_ENTRENAMIENTO)
+    else:
+        print(f"[INFO] Leyendo entrenamiento desde: {BASE_RAW} (excluyendo '{VALIDACION_DIRNAME}/')")
+        X_texts, y_labels = cargar_textos_y_labels_entrenamiento(BASE_RAW, VALIDACION_DIRNAME)
     if not X_texts:
         raise SystemExit("[ERROR] No se encontraron HTMLs de entrenamiento.")
 
@@ -63,26 +133,27 @@ def main():
     y = le.fit_transform(y_labels)
 
     # Pipeline completo
-    pipeline = Pipeline(steps=[
-        ("tfidf", TfidfVectorizer(
-            ngram_range=(1, 2),
-            max_features=MAX_FEATURES_TFIDF,
-            min_df=2,
-            lowercase=True,
-            strip_accents="unicode"
-        )),
-        ("selector", SelectKBest(score_func=chi2, k=K_SELECT)),
-        ("clf", OneVsRestClassifier(SVC(kernel="linear", probability=True)))
-    ])
+    if MODELO_EMBEDDINGS_BERT is not None:
+        pipeline = construir_pipeline_embeddings(MODELO_EMBEDDINGS_BERT, knn=CLASIFICADOR_KNN)
+    else:
+        pipeline = construir_pipeline(pretokenizado=USAR_CORPUS_TOKENIZADO)
+
+    X_entrenamiento = X_texts
+    if USAR_CORPUS_TOKENIZADO and MODELO_EMBEDDINGS_BERT is None:
+        with registro.etapa("tokenizacion", items=len(X_texts)):
+            X_entrenamiento = CorpusTokenizado.construir(X_texts, CONFIG_TOKENIZADOR, dir_cache=CACHE_TOKENS_DIR)
+        print(f"[INFO] Corpus tokenizado en: {X_entrenamiento.directorio}")
 
     print("[INFO] Entrenando pipeline...")
-    pipeline.fit(X_texts, y)
+    with registro.etapa("entrenamiento", items=len(X_texts)):
+        pipeline.fit(X_entrenamiento, y)
 
     # Guardar artefactos
     model_path = MODELS_DIR / "modelo_pipeline.joblib"
     le_path    = MODELS_DIR / "label_encoder.joblib"
-    joblib.dump(pipeline, model_path)
-    joblib.dump(le, le_path)
+    with registro.etapa("escritura"):
+        joblib.dump(pipeline, model_path)
+        joblib.dump(le, le_path)
 
     # Info útil
     try:
@@ -96,6 +167,8 @@ def main():
     print(f"[OK] Modelo guardado: {model_path}")
     print(f"[OK] LabelEncoder guardado: {le_path}")
     print(f"[INFO] Vocab TFIDF: {n_feats_total} | K SelectKBest: {n_feats_sel}")
+    registro.contar("documentos", len(X_texts))
+    registro.resumen()
 
 if __name__ == "__main__":
     main()
@@ -2,10 +2,11 @@
 """
 predecir_en_validacion.py
 Aplica un modelo ya ENTRENADO a los HTMLs del grupo de Validación.
-Imprime métricas y guarda un CSV con las predicciones.
+Imprime métricas y guarda un CSV con las predicciones y, con un pipeline lineal, los n-gramas que más aportaron a
+cada una (columna "explicacion", ver explicaciones_lineales.py).
 
 Cómo usarlo:
-1) Editar el bloque CONFIG con tus rutas.
+1) Editar el bloque CONFIG con tus rutas (o pasarlas sin editar el archivo en TP_PARAMETROS, ver cargador_scripts.py).
 2) Abrir este archivo en VS Code y presionar Run ▶️.
 """
 
@@ -22,6 +23,11 @@ from sklearn.metrics import (
     roc_auc_score
 )
 
+from cargador_scripts import aplicar_parametros
+from explicaciones_lineales import explicar, nombres_de_features, separar_pipeline
+from instrumentacion import RegistroEjecucion
+from intervalos_bootstrap import bootstrap, guardar_predicciones, imprimir_intervalos
+
 # ==========
 # CONFIG (EDITAR ESTAS RUTAS)
 # ==========
@@ -33,10 +39,22 @@ VECTORIZER_PATH = Path(r"C:\Users\juanm\tp_web_mining1\models\vectorizer.joblib"
 SELECTOR_PATH   = Path(r"C:\Users\juanm\tp_web_mining1\models\selector.joblib")     # opcional
 
 SALIDA_DIR  = Path(r"C:\Users\juanm\tp_web_mining1\reports")
-CSV_SALIDA  = SALIDA_DIR / "predicciones_validacion.csv"
+CSV_SALIDA  = None   # None: SALIDA_DIR / "predicciones_validacion.csv"
 
 EXTS = {".html", ".htm"}  # extensiones válidas
 
+# remuestreos bootstrap para los intervalos de confianza de las métricas (0 para no calcularlos); las predicciones
+# se guardan además en CSV_SALIDA con extensión .npz, para comparar modelos con intervalos_bootstrap.py --comparar
+REMUESTREOS_BOOTSTRAP = 2000
+
+EXPLICAR_PREDICCIONES = True  # n-gramas que más aportaron a cada predicción (solo clasificadores lineales)
+TOP_NGRAMAS_EXPLICACION = 5   # cuántos por nota
+
+aplicar_parametros(globals())
+CSV_SALIDA = Path(CSV_SALIDA) if CSV_SALIDA else SALIDA_DIR / "predicciones_validacion.csv"
+
+registro = RegistroEjecucion("6-predecir_en_validacion")
+
 # ===================================
 # Utilitarios de lectura y preparación
 # ===================================
@@ -55,9 +73,11 @@ def cargar_docs_y_labels(base_validacion: Path) -> Tuple[List[str], List[str], L
         categoria = categoria_dir.name
         for p in categoria_dir.rglob("*"):
             if p.is_file() and p.suffix.lower() in EXTS:
-                textos.append(leer_html(p))
+                with registro.etapa("lectura"):
+                    textos.append(leer_html(p))
                 labels.append(categoria)
                 rutas.append(p)
+                registro.detalle(f"[INFO] Leído {p}")
     return textos, labels, rutas
 
 def cargar_modelo_y_encoder() -> Tuple[object, LabelEncoder, object, object]:
@@ -133,7 +153,8 @@ def main():
     print(f"[INFO] Docs: {len(X_textos)} | Categorías reales: {len(set(y_labels))}")
 
     print("[INFO] Cargando modelo y LabelEncoder...")
-    modelo, le, vectorizer, selector = cargar_modelo_y_encoder()
+    with registro.etapa("carga_modelo"):
+        modelo, le, vectorizer, selector = cargar_modelo_y_encoder()
 
     # Codificar labels reales con el encoder del entrenamiento
     # (si aparece una clase no vista, la ignoramos en métricas agregadas)
@@ -146,24 +167,49 @@ def main():
 
     # Transformar textos -> features, de acuerdo a lo que tengamos guardado
     print("[INFO] Transformando textos...")
-    use_pipeline_direct = hasattr(modelo, "named_steps") and ("tfidf" in getattr(modelo, "named_steps"))
+    # pipeline con tfidf o embeddings, o un modelo que recibe los textos (p.ej. clasificador_llm.ClasificadorLLM)
+    use_pipeline_direct = (
+        (hasattr(modelo, "named_steps")
+         and any(paso in getattr(modelo, "named_steps") for paso in ("tfidf", "embeddings")))
+        or getattr(modelo, "recibe_textos", False)
+    )
     X = None
-    if not use_pipeline_direct:
+    modelo_prediccion = modelo
+    nombres_features = None
+    pasos_lineales = separar_pipeline(modelo) if EXPLICAR_PREDICCIONES and use_pipeline_direct else None
+    if pasos_lineales is not None:
+        # se vectoriza 1 sola vez y el clasificador predice sobre esa matriz, que también sirve para explicar
+        transformacion, modelo_prediccion, nombres_features = pasos_lineales
+        use_pipeline_direct = False
+        with registro.etapa("vectorizacion", items=len(X_textos)):
+            X = transformacion.transform(X_textos)
+    elif not use_pipeline_direct:
         if vectorizer is not None:
-            X = vectorizer.transform(X_textos)
-            if selector is not None:
-                X = selector.transform(X)
+            nombres_features = nombres_de_features(vectorizer, selector)
+            with registro.etapa("vectorizacion", items=len(X_textos)):
+                X = vectorizer.transform(X_textos)
+                if selector is not None:
+                    X = selector.transform(X)
 
     # Predicción y scores
     print("[INFO] Prediciendo...")
     if use_pipeline_direct:
-        y_pred = modelo.predict(X_textos)              # <- texto crudo
-        scores = _obtener_scores(modelo, X_textos)
+        with registro.etapa("prediccion", items=len(X_textos)):
+            y_pred = modelo.predict(X_textos)              # <- texto crudo
+            scores = _obtener_scores(modelo, X_textos)
     else:
         if X is None:
             raise SystemExit("[ERROR] No hay vectorizador/selector externo cargado y el modelo no es pipeline con tfidf.")
-        y_pred = modelo.predict(X)                     # <- matriz vectorizada
-        scores = _obtener_scores(modelo, X)
+        with registro.etapa("prediccion", items=len(X_textos)):
+            y_pred = modelo_prediccion.predict(X)          # <- matriz vectorizada
+            scores = _obtener_scores(modelo_prediccion, X)
+
+    explicaciones = None
+    if EXPLICAR_PREDICCIONES and X is not None and nombres_features is not None:
+        with registro.etapa("explicacion", items=len(X_textos)):
+            explicaciones = explicar(X, modelo_prediccion, y_pred, nombres_features, TOP_NGRAMAS_EXPLICACION)
+    if EXPLICAR_PREDICCIONES and explicaciones is None:
+        print("[INFO] El modelo no es lineal sobre n-gramas; omito las explicaciones.")
 
     # Métricas (sobre docs con clases vistas)
     y_labels_vistas = [lbl for lbl, ok in zip(y_labels, mask_vistas) if ok]
@@ -179,6 +225,7 @@ def main():
 
     # Accuracy & reporte
     acc = accuracy_score(y_labels_vistas, y_pred_vistas) if y_labels_vistas else float("nan")
+    registro.evento("metricas", accuracy=acc, n_docs=len(X_textos), n_no_vistas=unseen)
     print(f"\n[METRICAS] Accuracy (solo clases vistas) = {acc:.4f}")
     print("\n[METRICAS] Matriz de confusión (solo clases vistas):")
     print(confusion_matrix(y_labels_vistas, y_pred_vistas, labels=list(le.classes_)))
@@ -197,11 +244,29 @@ def main():
             auc_weighted = roc_auc_score(y_true_bin, scores_vistas, average="weighted", multi_class="ovr")
             print(f"\n[METRICAS] ROC AUC macro     = {auc_macro:.4f}")
             print(f"[METRICAS] ROC AUC weighted  = {auc_weighted:.4f}")
+            registro.evento("auc", auc_macro=auc_macro, auc_weighted=auc_weighted)
         except Exception as e:
             print(f"[WARN] No se pudo calcular AUC multiclase: {e}")
     else:
         print("\n[INFO] No hay scores continuos disponibles; omito AUC.")
 
+    # Intervalos de confianza por bootstrap (solo clases vistas)
+    y_true_idx = le.transform(y_labels_vistas) if y_labels_vistas else np.zeros(0, dtype=np.int64)
+    y_pred_idx = le.transform(y_pred_vistas) if y_pred_vistas else np.zeros(0, dtype=np.int64)
+    scores_vistas = None
+    if scores is not None:
+        scores_vistas = np.asarray([s for s, ok in zip(scores, mask_vistas) if ok], dtype=np.float64)
+        if scores_vistas.ndim == 1:
+            # binario con decision_function: 1 sola columna de scores (la de la clase 1)
+            scores_vistas = np.column_stack([-scores_vistas, scores_vistas])
+    if REMUESTREOS_BOOTSTRAP and len(y_true_idx) > 1:
+        with registro.etapa("bootstrap", items=REMUESTREOS_BOOTSTRAP):
+            intervalos = bootstrap(y_true_idx, y_pred_idx, scores_vistas, len(le.classes_), REMUESTREOS_BOOTSTRAP)
+        print("\n[METRICAS] Solo clases vistas:")
+        imprimir_intervalos(intervalos, list(le.classes_))
+        registro.evento("intervalos", remuestreos=REMUESTREOS_BOOTSTRAP,
+                        accuracy=[float(intervalos["accuracy"][extremo]) for extremo in ("valor", "inferior", "superior")])
+
     # CSV de salida con top-3
     print(f"\n[INFO] Guardando CSV en {CSV_SALIDA}")
     SALIDA_DIR.mkdir(parents=True, exist_ok=True)
@@ -230,16 +295,25 @@ def main():
         top1 = ["" for _ in rutas]
         top2 = ["" for _ in rutas]
         top3 = ["" for _ in rutas]
+    if explicaciones is None:
+        explicaciones = ["" for _ in rutas]
 
     # Escribir CSV (sin pandas para evitar dependencias)
     import csv
-    with open(CSV_SALIDA, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["ruta_archivo", "label_real", "label_predicha", "top1", "top2", "top3"])
-        for r, vr, vp, t1, t2, t3 in zip(rutas_str, verdaderas, predichas, top1, top2, top3):
-            w.writerow([r, vr, vp, t1, t2, t3])
+    with registro.etapa("escritura"):
+        with open(CSV_SALIDA, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["ruta_archivo", "label_real", "label_predicha", "top1", "top2", "top3", "explicacion"])
+            for r, vr, vp, t1, t2, t3, ex in zip(rutas_str, verdaderas, predichas, top1, top2, top3, explicaciones):
+                w.writerow([r, vr, vp, t1, t2, t3, ex])
+
+    npz_salida = CSV_SALIDA.with_suffix(".npz")
+    guardar_predicciones(npz_salida, y_true_idx, y_pred_idx, scores_vistas, list(le.classes_),
+                         ids=[r for r, ok in zip(rutas_str, mask_vistas) if ok])
+    print(f"[INFO] Predicciones (solo clases vistas) en {npz_salida}")
 
     print("[OK] Proceso finalizado.")
+    registro.resumen()
 
 if __name__ == "__main__":
     # Evita que VS Code ejecute cosas al importar.
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del tiempo de arranque de cada comando de tp.py, antes y despues de diferir los imports.
+
+Por comando se mide, cada vez en un proceso nuevo:
+- antes: lo que pagaba el script de la etapa antes de hacer nada, o sea importarlo entero (Scrapy, scikit-learn,
+  BeautifulSoup, NLTK, pandas...), que es lo que costaba "python 5-....py" aunque solo se quisiera ver la
+  configuracion. Para los scripts con argparse propio, "python <script> --help".
+- despues: "python tp.py <comando> --help".
+Se informa la mediana de REPETICIONES corridas, el arranque de un interprete vacio como referencia, y que paquetes
+pesados se llegaron a importar en cada caso (con python -X importtime).
+
+Ejemplos:
+    python benchmark_arranque.py
+    python benchmark_arranque.py --repeticiones 10 --comandos train predict --salida arranque.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from cargador_scripts import DIR_SCRIPTS
+from tp import COMANDOS
+
+REPETICIONES = 5
+PAQUETES_PESADOS = ["scrapy", "sklearn", "bs4", "nltk", "pandas", "scipy", "joblib", "numpy", "pyarrow", "torch"]
+
+
+def medir(comando: List[str], repeticiones: int = REPETICIONES) -> float:
+    """
+    :return: La mediana, en segundos, del tiempo de correr el comando en un proceso nuevo.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run(comando, cwd=DIR_SCRIPTS, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def paquetes_importados(comando: List[str]) -> List[str]:
+    """
+    :return: Los paquetes de PAQUETES_PESADOS que importa el comando (segun python -X importtime).
+    """
+    salida = subprocess.run([comando[0], "-X", "importtime"] + comando[1:], cwd=DIR_SCRIPTS,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True).stderr
+    modulos = {linea.rsplit("|", 1)[-1].strip() for linea in salida.splitlines() if linea.startswith("import time:")}
+    return [paquete for paquete in PAQUETES_PESADOS if paquete in modulos]
+
+
+def comandos_a_medir(nombre: str) -> Dict[str, List[str]]:
+    """
+    :return: {"antes": comando, "despues": comando} de un comando de tp.py.
+    """
+    script = COMANDOS[nombre].script
+    if COMANDOS[nombre].argparse_propio:
+        antes = [sys.executable, script, "--help"]
+    else:
+        antes = [sys.executable, "-c", f"from cargador_scripts import importar_script; importar_script({script!r})"]
+    return {"antes": antes, "despues": [sys.executable, "tp.py", nombre, "--help"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de cada comando de tp.py, antes/despues")
+    parser.add_argument("--comandos", nargs="+", default=list(COMANDOS), choices=list(COMANDOS),
+                        help="Comandos a medir (default: todos)")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES,
+                        help=f"Corridas por medicion, se toma la mediana (default: {REPETICIONES})")
+    parser.add_argument("--salida", help="Guardar los resultados en este JSON")
+    args = parser.parse_args()
+
+    vacio = medir([sys.executable, "-c", "pass"], args.repeticiones)
+    print(f"[INFO] Interprete vacio: {vacio:.3f}s (mediana de {args.repeticiones})")
+    print(f"\n{'comando':<10}{'antes (s)':>10}{'despues (s)':>13}{'x':>7}  paquetes pesados antes -> despues")
+    resultados = []
+    for nombre in args.comandos:
+        resultado = {"comando": nombre, "script": COMANDOS[nombre].script}
+        for momento, comando in comandos_a_medir(nombre).items():
+            resultado[f"segundos_{momento}"] = round(medir(comando, args.repeticiones), 3)
+            resultado[f"paquetes_{momento}"] = paquetes_importados(comando)
+        resultados.append(resultado)
+        print(f"{nombre:<10}{resultado['segundos_antes']:>10.3f}{resultado['segundos_despues']:>13.3f}"
+              f"{resultado['segundos_antes'] / resultado['segundos_despues']:>6.1f}x  "
+              f"{','.join(resultado['paquetes_antes']) or '-'} -> {','.join(resultado['paquetes_despues']) or '-'}")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"interprete_vacio": round(vacio, 3), "resultados": resultados}, f, indent=2)
+        print(f"[OK] Resultados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del crawler (NewsSpider de 1-web-scrapping.py) contra el servidor local de servidor_fixture.py.
+
+Para cada combinacion de CONCURRENT_REQUESTS y DOWNLOAD_DELAY corre un crawl completo de los indices de las secciones
+(en un proceso nuevo, porque el reactor de Scrapy no se puede reiniciar) y reporta paginas/s, CPU, pico de RSS,
+bytes descargados, reintentos y errores. El servidor puede simular latencia, errores y notas con paywall/autor.
+Con --adaptativo agrega una corrida con el control adaptativo de control_adaptativo.py, que arranca con 1 pedido a la vez.
+
+Cada configuracion se corre en los modos de fetch pedidos (ver fetch_eficiente.py), para comparar bytes por nota guardada:
+    completo     sin pedidos condicionales ni corte temprano (como antes)
+    optimizado   con corte temprano de notas con paywall/autor y guardando ETag/Last-Modified
+    recrawl      otra vez sobre lo guardado por "optimizado": pedidos condicionales y sin pedir IDs ya guardados
+
+Ejemplos:
+    python benchmark_crawl.py --concurrencias 1 4 16 --delays 0
+    python benchmark_crawl.py --latencia 0.2 --jitter 0.1 --tasa-errores 0.02 --tasa-429 0.02 --concurrencias 2 8 32
+    python benchmark_crawl.py --concurrencias 4 16 --adaptativo --techo 16 --tasa-429 0.01
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from instrumentacion import LOG_ENV, VERBOSIDAD_ENV, pico_rss_mb
+from servidor_fixture import DIR_PAGINAS, ServidorFixture
+
+ARCHIVO_RESULTADOS = "resultados_benchmark_crawl.json"
+CONCURRENCIAS = [1, 2, 4, 8, 16]
+DELAYS = [0.0]
+MODOS_FETCH = ["completo", "optimizado", "recrawl"]
+
+
+def crear_spider_local(settings: Dict):
+    """
+    Crea una subclase de NewsSpider que acepta el dominio del servidor local y usa los settings dados.
+    Los custom_settings del spider tienen prioridad sobre los del CrawlerProcess, por eso se pisan aca.
+    """
+    from cargador_scripts import importar_script
+    NewsSpider = importar_script("1-web-scrapping.py").NewsSpider
+    return type("NewsSpiderLocal", (NewsSpider,), {
+        "allowed_domains": ("127.0.0.1", "localhost"),
+        "custom_settings": {**NewsSpider.custom_settings, **settings},
+    })
+
+
+def _crawl_en_proceso(start_urls: List[str], settings: Dict, directorio: str, cola: multiprocessing.Queue,
+                      dir_salida: Optional[str] = None):
+    """
+    Punto de entrada del proceso hijo: corre 1 crawl completo y envia las metricas al proceso padre.
+    :param dir_salida: Directorio donde guardar las notas; si es None se usa uno temporal.
+    """
+    os.chdir(directorio)
+    sys.path.insert(0, directorio)
+    # el crawl medido no escribe en el log de ejecuciones ni imprime 1 linea por pagina
+    os.environ[LOG_ENV] = ""
+    os.environ[VERBOSIDAD_ENV] = "0"
+    try:
+        import scrapy
+        from scrapy.crawler import CrawlerProcess
+
+        spider_cls = crear_spider_local(settings)
+        resultado = {}
+
+        def spider_closed(spider, reason):
+            resultado["paginas_guardadas"] = spider.page_count
+            resultado["razon"] = reason
+            resultado["contadores_spider"] = dict(spider.registro.contadores)
+
+        with tempfile.TemporaryDirectory() if dir_salida is None else contextlib.nullcontext(dir_salida) as dir_salida:
+            # el logging se configura con los settings del proceso, no con los del spider
+            process = CrawlerProcess({"LOG_LEVEL": settings.get("LOG_LEVEL", "WARNING")})
+            crawler = process.create_crawler(spider_cls)
+            crawler.signals.connect(spider_closed, signal=scrapy.signals.spider_closed)
+            process.crawl(crawler, save_pages_in_dir=dir_salida, start_urls=start_urls, max_pages=10 ** 9)
+            cpu_inicial = time.process_time()
+            inicio = time.perf_counter()
+            process.start()
+            segundos = time.perf_counter() - inicio
+            cpu = time.process_time() - cpu_inicial
+
+        stats = crawler.stats.get_stats()
+        respuestas = stats.get("response_received_count", 0)
+        resultado.update({
+            "segundos": round(segundos, 3),
+            "cpu_segundos": round(cpu, 3),
+            "paginas_por_segundo": round(resultado.get("paginas_guardadas", 0) / segundos, 2) if segundos > 0 else None,
+            "respuestas": respuestas,
+            "respuestas_por_segundo": round(respuestas / segundos, 2) if segundos > 0 else None,
+            "bytes_descargados": stats.get("downloader/response_bytes", 0),
+            "kb_por_nota_guardada": (round(stats.get("downloader/response_bytes", 0) / 1024 / resultado["paginas_guardadas"], 1)
+                                     if resultado.get("paginas_guardadas") else None),
+            "no_modificadas": stats.get("fetch_condicional/no_modificadas", 0),
+            "cortes_tempranos": {k.rsplit("/", 1)[1]: v for k, v in stats.items() if k.startswith("corte_temprano/")},
+            "reintentos": stats.get("retry/count", 0),
+            "reintentos_agotados": stats.get("retry/max_reached", 0),
+            "excepciones": stats.get("downloader/exception_count", 0),
+            "por_status": {k.rsplit("/", 1)[1]: v for k, v in stats.items() if k.startswith("downloader/response_status_count/")},
+            "pico_rss_mb": pico_rss_mb(),
+            "adaptativo": {k[len("adaptativo/"):]: v for k, v in stats.items() if k.startswith("adaptativo/")},
+        })
+        cola.put(resultado)
+    except Exception as e:
+        cola.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def correr_crawl(start_urls: List[str], settings: Dict, dir_salida: Optional[str] = None) -> Dict:
+    ctx = multiprocessing.get_context("spawn")
+    cola = ctx.Queue()
+    proceso = ctx.Process(target=_crawl_en_proceso,
+                          args=(start_urls, settings, str(Path(__file__).resolve().parent), cola, dir_salida))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def correr_modos_fetch(start_urls: List[str], settings: Dict, modos: List[str], servidor: ServidorFixture,
+                       etiquetas: Dict) -> List[Dict]:
+    """
+    Corre el mismo crawl en cada modo de fetch. "recrawl" reusa el directorio (notas y validadores HTTP)
+    que dejo "optimizado".
+    """
+    resultados = []
+    dir_salida = tempfile.mkdtemp(prefix="benchmark_crawl_")
+    try:
+        for modo in modos:
+            optimizado = modo != "completo"
+            settings_modo = {**settings, "FETCH_CONDICIONAL_ENABLED": optimizado, "CORTE_TEMPRANO_ENABLED": optimizado}
+            servidor.estadisticas.reiniciar()
+            if modo == "completo":
+                resultado = correr_crawl(start_urls, settings_modo)
+            else:
+                resultado = correr_crawl(start_urls, settings_modo, dir_salida)
+            resultado.update({**etiquetas, "modo": modo, "servidor": servidor.estadisticas.como_dict()})
+            resultados.append(resultado)
+    finally:
+        shutil.rmtree(dir_salida, ignore_errors=True)
+    return resultados
+
+
+def imprimir_resultados(resultados: List[Dict]):
+    print(f"\n{'concurr.':>9}{'delay':>7}{'modo':>12}{'guardadas':>10}{'segundos':>10}{'pags/s':>9}{'resp/s':>9}{'CPU s':>8}"
+          f"{'RSS MB':>8}{'MB desc.':>10}{'KB/nota':>9}{'reintentos':>11}  status")
+    for r in resultados:
+        if "error" in r:
+            print(f"{str(r['concurrencia']):>9}{r['delay']:>7}{r['modo']:>12}  ERROR: {r['error']}")
+            continue
+        rss = f"{r['pico_rss_mb']:.0f}" if r["pico_rss_mb"] is not None else "?"
+        kb_nota = f"{r['kb_por_nota_guardada']:.1f}" if r["kb_por_nota_guardada"] is not None else "-"
+        print(f"{str(r['concurrencia']):>9}{r['delay']:>7}{r['modo']:>12}{r['paginas_guardadas']:>10}{r['segundos']:>10.2f}"
+              f"{r['paginas_por_segundo']:>9.1f}{r['respuestas_por_segundo']:>9.1f}{r['cpu_segundos']:>8.2f}{rss:>8}"
+              f"{r['bytes_descargados'] / 2 ** 20:>10.1f}{kb_nota:>9}{r['reintentos']:>11}  {r['por_status']}")
+        if r["adaptativo"]:
+            a = r["adaptativo"]
+            print(f"{'':>9}  adaptativo: {a['cantidad_ajustes']} ajustes, concurrencia maxima {a['concurrencia_maxima_alcanzada']}, "
+                  f"final {a['concurrencia_final']} con delay {a['delay_final']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del crawler contra el servidor local con distintas concurrencias")
+    parser.add_argument("--paginas", default=DIR_PAGINAS, help=f"Directorio con 1 subdirectorio por seccion (default: {DIR_PAGINAS})")
+    parser.add_argument("--secciones", nargs="*", default=None, help="Secciones a crawlear (default: todas)")
+    parser.add_argument("--paginas-indice", type=int, default=None, help="Paginas de indice por seccion (default: todas)")
+    parser.add_argument("--concurrencias", nargs="*", type=int, default=CONCURRENCIAS, help=f"Valores de CONCURRENT_REQUESTS (default: {CONCURRENCIAS})")
+    parser.add_argument("--delays", nargs="*", type=float, default=DELAYS, help=f"Valores de DOWNLOAD_DELAY (default: {DELAYS})")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Segundos de demora del servidor por respuesta (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Variacion +/- de la latencia (default: 0.02)")
+    parser.add_argument("--tasa-errores", type=float, default=0.0, help="Fraccion de respuestas 503 (default: 0)")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Fraccion de respuestas 429 (default: 0)")
+    parser.add_argument("--tasa-timeouts", type=float, default=0.0, help="Fraccion de pedidos que no responden (default: 0)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="DOWNLOAD_TIMEOUT del crawler y cuelgue del servidor (default: 10)")
+    parser.add_argument("--fraccion-paywall", type=float, default=0.1, help="Fraccion de notas con paywall (default: 0.1)")
+    parser.add_argument("--fraccion-autor", type=float, default=0.05, help="Fraccion de notas de autor (default: 0.05)")
+    parser.add_argument("--modos-fetch", nargs="*", default=MODOS_FETCH, choices=MODOS_FETCH,
+                        help=f"Modos de fetch a comparar (default: {MODOS_FETCH}); recrawl requiere optimizado")
+    parser.add_argument("--adaptativo", action="store_true", help="Agregar una corrida con el control adaptativo")
+    parser.add_argument("--techo", type=int, default=16, help="Concurrencia maxima del control adaptativo (default: 16)")
+    parser.add_argument("--delay-inicial", type=float, default=0.5, help="Delay inicial del control adaptativo (default: 0.5)")
+    parser.add_argument("--delay-minimo", type=float, default=0.0, help="Delay minimo del control adaptativo (default: 0)")
+    parser.add_argument("--salida", default=ARCHIVO_RESULTADOS, help=f"JSON de resultados (default: {ARCHIVO_RESULTADOS})")
+    args = parser.parse_args()
+
+    servidor = ServidorFixture(args.paginas, latencia=args.latencia, jitter=args.jitter,
+                               tasa_errores=args.tasa_errores, tasa_429=args.tasa_429,
+                               tasa_timeouts=args.tasa_timeouts, segundos_timeout=args.timeout * 2,
+                               fraccion_paywall=args.fraccion_paywall, fraccion_autor=args.fraccion_autor)
+    secciones = args.secciones or list(servidor.corpus.secciones)
+    with servidor:
+        start_urls = []
+        for seccion in secciones:
+            cant_paginas = servidor.corpus.cantidad_paginas_indice(seccion)
+            if args.paginas_indice is not None:
+                cant_paginas = min(cant_paginas, args.paginas_indice)
+            start_urls.extend(servidor.url_indice(seccion, p) for p in range(1, cant_paginas + 1))
+        print(f"[INFO] Servidor en {servidor.url_base} | {len(start_urls)} paginas de indice de {len(secciones)} secciones")
+
+        resultados = []
+        for delay in args.delays:
+            for concurrencia in args.concurrencias:
+                settings = {
+                    "LOG_LEVEL": "WARNING",
+                    "TELNETCONSOLE_ENABLED": False,
+                    "CONCURRENT_REQUESTS": concurrencia,
+                    "CONCURRENT_REQUESTS_PER_DOMAIN": concurrencia,
+                    "DOWNLOAD_DELAY": delay,
+                    "DOWNLOAD_TIMEOUT": args.timeout,
+                    "ADAPTATIVO_ENABLED": False,
+                }
+                print(f"[INFO] Crawl con CONCURRENT_REQUESTS={concurrencia} DOWNLOAD_DELAY={delay}...")
+                resultados.extend(correr_modos_fetch(start_urls, settings, args.modos_fetch, servidor,
+                                                     {"concurrencia": concurrencia, "delay": delay}))
+        if args.adaptativo:
+            settings = {
+                "LOG_LEVEL": "WARNING",
+                "TELNETCONSOLE_ENABLED": False,
+                "CONCURRENT_REQUESTS": args.techo,
+                "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
+                "DOWNLOAD_DELAY": args.delay_inicial,
+                "DOWNLOAD_TIMEOUT": args.timeout,
+                "ADAPTATIVO_ENABLED": True,
+                "ADAPTATIVO_CONCURRENCIA_MAXIMA": args.techo,
+                "ADAPTATIVO_DELAY_MINIMO": args.delay_minimo,
+            }
+            print(f"[INFO] Crawl con control adaptativo (techo {args.techo}, delay inicial {args.delay_inicial})...")
+            resultados.extend(correr_modos_fetch(start_urls, settings, args.modos_fetch, servidor,
+                                                 {"concurrencia": "adapt.", "delay": args.delay_inicial}))
+
+    imprimir_resultados(resultados)
+
+    reporte = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "servidor": {**servidor.config, "fraccion_paywall": args.fraccion_paywall, "fraccion_autor": args.fraccion_autor},
+        "start_urls": len(start_urls),
+        "resultados": resultados,
+    }
+    Path(args.salida).write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n[OK] Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
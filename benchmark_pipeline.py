@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de las etapas del TP: crawl -> extraccion -> vectorizacion -> CV -> prediccion.
+
+Corre cada etapa sobre el corpus de "paginas/" y sobre copias escaladas sinteticamente (por defecto 1x, 10x y 100x),
+cada una en un proceso nuevo para poder medir el pico de memoria (RSS) de esa etapa sola.
+Guarda tiempo, throughput (docs/s) y pico de RSS en un JSON, y lo compara contra un baseline guardado.
+Con --memoria, las etapas de vectorizacion miden ademas el pico de memoria del fit solo (con tracemalloc), sin
+contar los textos ya cargados; con --palabras-nuevas las copias escaladas tienen tambien palabras que no
+estan en el corpus original (como nombres propios o errores de tipeo), que generan unigramas y bigramas raros.
+
+Ejemplos:
+    python benchmark_pipeline.py --escalas 1 10 --guardar-baseline
+    python benchmark_pipeline.py --escalas 1 10 --etapas extraccion vectorizacion_count
+    python benchmark_pipeline.py --escalas 10 --memoria --palabras-nuevas 0.02 \
+        --etapas vectorizacion_count vectorizacion_tokens_sin_poda vectorizacion_tokens vectorizacion_tokens_sketch
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from instrumentacion import LOG_ENV, VERBOSIDAD_ENV, pico_rss_mb
+
+DIR_PAGINAS = "./paginas"
+ARCHIVO_RESULTADOS = "resultados_benchmark.json"
+ARCHIVO_BASELINE = "benchmarks/baseline.json"
+ESCALAS = [1, 10, 100]
+ETAPAS = ["crawl", "extraccion", "vectorizacion_count", "vectorizacion_tfidf", "vectorizacion_tokens",
+          "vectorizacion_tokens_sin_poda", "vectorizacion_tokens_sketch", "cv", "prediccion"]
+# contadores del count-min sketch de la etapa vectorizacion_tokens_sketch (por fila)
+ANCHO_SKETCH = 2 ** 20
+# variacion relativa de tiempo a partir de la cual se marca una regresion/mejora contra el baseline
+TOLERANCIA = 0.10
+# cada cuantos segundos se chequea que el proceso de la etapa siga vivo mientras se espera su resultado, y maximo de
+# segundos por etapa (None: sin limite)
+SEGUNDOS_CHEQUEO_PROCESO = 5
+TIMEOUT_ETAPA = None
+
+
+def listar_corpus(dir_paginas: str) -> Tuple[List[Path], List[str]]:
+    """
+    :return: un par ([paths de los html], [seccion de cada html]), usando el nombre del directorio como seccion.
+    """
+    paths, secciones = [], []
+    for dir_seccion in sorted(d for d in Path(dir_paginas).iterdir() if d.is_dir()):
+        for archivo in sorted(dir_seccion.glob("*.html")):
+            paths.append(archivo)
+            secciones.append(dir_seccion.name)
+    return paths, secciones
+
+
+def _sufijo_copia(copia: int) -> str:
+    # solo letras, para que el tokenizador lo tome como parte de la palabra
+    letras = ""
+    while copia > 0:
+        copia, resto = divmod(copia, 26)
+        letras += chr(ord("a") + resto)
+    return letras
+
+
+def escalar_textos(textos: List[str], targets: List[str], factor: int, semilla: int = 0,
+                   fraccion_palabras_nuevas: float = 0.0) -> Tuple[List[str], List[str]]:
+    """
+    Genera un corpus "factor" veces mas grande. La 1ra copia es el corpus original; en las demas copias
+    se intercambia ~10% de los pares de palabras consecutivas de cada texto, asi aparecen bigramas nuevos
+    (como en un corpus real mas grande) pero se conserva la distribucion de palabras.
+    :param fraccion_palabras_nuevas: Fraccion de las palabras de cada copia a las que se agrega un sufijo propio
+        de la copia, para que aparezcan palabras nuevas como en un corpus real (con 0 no cambia nada).
+    """
+    import numpy as np
+    rng = np.random.default_rng(semilla)
+    textos_escalados, targets_escalados = list(textos), list(targets)
+    for copia in range(1, factor):
+        for texto in textos:
+            palabras = texto.split()
+            if len(palabras) > 1:
+                posiciones = np.flatnonzero(rng.random(len(palabras) - 1) < 0.1)
+                for i in posiciones:
+                    palabras[i], palabras[i + 1] = palabras[i + 1], palabras[i]
+            if fraccion_palabras_nuevas > 0:
+                sufijo = _sufijo_copia(copia)
+                for i in np.flatnonzero(rng.random(len(palabras)) < fraccion_palabras_nuevas):
+                    palabras[i] += sufijo
+            textos_escalados.append(" ".join(palabras))
+        targets_escalados.extend(targets)
+    return textos_escalados, targets_escalados
+
+
+# ==========
+# Etapas. Cada una prepara sus datos, y mide solo el trabajo de la etapa.
+# Retornan (cantidad de docs procesados, segundos), y opcionalmente un dict con otras metricas.
+# ==========
+
+def _pico_memoria_mb(funcion) -> float:
+    """
+    :return: El pico de memoria reservada (Python y NumPy) mientras corre funcion(), sin contar lo que ya estaba.
+    """
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024 ** 2, 1)
+
+
+def _medir_fit(fit, contexto: Dict) -> Tuple[float, Dict]:
+    """
+    Mide los segundos de fit(). Con contexto["memoria"], lo vuelve a correr con tracemalloc para medir su pico
+    de memoria (tracemalloc lo hace mas lento, por eso el tiempo es el de la 1ra corrida).
+    :return: (segundos, metricas extra)
+    """
+    inicio = time.perf_counter()
+    fit()
+    segundos = time.perf_counter() - inicio
+    if not contexto.get("memoria"):
+        return segundos, {}
+    return segundos, {"pico_memoria_fit_mb": _pico_memoria_mb(fit)}
+
+
+def _etapa_crawl(escala: int, contexto: Dict) -> Tuple[int, float]:
+    from scrapy.http.response.html import HtmlResponse
+    from cargador_scripts import importar_script
+    from servidor_fixture import ServidorFixture
+
+    NewsSpider = importar_script("1-web-scrapping.py").NewsSpider
+    with tempfile.TemporaryDirectory() as dir_salida, ServidorFixture(contexto["paginas"]) as servidor:
+        spider = NewsSpider(save_pages_in_dir=dir_salida, max_pages=10 ** 9)
+        urls = [servidor.url_nota(ruta) for ruta in servidor.corpus.notas] * escala
+        inicio = time.perf_counter()
+        for url in urls:
+            with urllib.request.urlopen(url) as respuesta:
+                cuerpo = respuesta.read()
+            spider.parse_response(HtmlResponse(url=url, body=cuerpo, encoding="utf-8"))
+        return len(urls), time.perf_counter() - inicio
+
+
+def _etapa_extraccion(escala: int, contexto: Dict) -> Tuple[int, float]:
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    paths = [Path(p) for p in contexto["paths"]] * escala
+    inicio = time.perf_counter()
+    for path in paths:
+        script.extraer_datos_nota(script.leer_archivo(str(path)))
+    return len(paths), time.perf_counter() - inicio
+
+
+def _count_vectorizer():
+    from sklearn.feature_extraction.text import CountVectorizer
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    # misma configuracion que en 2-html-a-dataframe.py
+    return CountVectorizer(
+        stop_words=script.leer_stopwords(script.STOPWORDS_FILE_SIN_ACENTOS),
+        tokenizer=script.tokenizador(),
+        lowercase=True,
+        strip_accents='unicode',
+        decode_error='ignore',
+        ngram_range=(script.MIN_NGRAMS, script.MAX_NGRAMS),
+        min_df=script.MIN_DF,
+        max_df=script.MAX_DF
+    )
+
+
+def _cargar_textos(escala: int, contexto: Dict) -> Tuple[List[str], List[str]]:
+    import joblib
+    textos, targets = joblib.load(contexto["textos"])
+    return escalar_textos(textos, targets, escala, fraccion_palabras_nuevas=contexto.get("palabras_nuevas", 0.0))
+
+
+def _etapa_vectorizacion_count(escala: int, contexto: Dict) -> Tuple[int, float, Dict]:
+    textos, _ = _cargar_textos(escala, contexto)
+    vectorizer = _count_vectorizer()
+    segundos, metricas = _medir_fit(lambda: vectorizer.fit_transform(textos), contexto)
+    return len(textos), segundos, metricas
+
+
+def _etapa_vectorizacion_tfidf(escala: int, contexto: Dict) -> Tuple[int, float]:
+    from sklearn.base import clone
+    from cargador_scripts import importar_script
+
+    textos, _ = _cargar_textos(escala, contexto)
+    # misma configuracion que en 5-entrenar_y_guardar_modelo_pipeline.py
+    tfidf = clone(importar_script("5-entrenar_y_guardar_modelo_pipeline.py").construir_pipeline().named_steps["tfidf"])
+    inicio = time.perf_counter()
+    tfidf.fit_transform(textos)
+    return len(textos), time.perf_counter() - inicio
+
+
+def _etapa_vectorizacion_tokens(escala: int, contexto: Dict, **parametros) -> Tuple[int, float, Dict]:
+    """
+    Misma salida que vectorizacion_count, pero desde el corpus pre-tokenizado: la tokenizacion (que se hace
+    1 sola vez y queda en la cache) no se mide, solo el armado de la matriz.
+    :param parametros: Parametros extra de VectorizadorTokens.
+    """
+    from cargador_scripts import importar_script
+    from corpus_tokenizado import CorpusTokenizado, VectorizadorTokens, config_tokenizador
+
+    script = importar_script("2-html-a-dataframe.py")
+    textos, _ = _cargar_textos(escala, contexto)
+    with tempfile.TemporaryDirectory() as dir_cache:
+        corpus = CorpusTokenizado.construir(textos, config_tokenizador(script.TOKEN_REGEX, True, "unicode"), dir_cache)
+        vectorizer = VectorizadorTokens(
+            stop_words=script.leer_stopwords(script.STOPWORDS_FILE_SIN_ACENTOS),
+            ngram_range=(script.MIN_NGRAMS, script.MAX_NGRAMS),
+            min_df=script.MIN_DF,
+            max_df=script.MAX_DF,
+            **parametros
+        )
+        segundos, metricas = _medir_fit(lambda: vectorizer.fit_transform(corpus), contexto)
+        if contexto.get("memoria"):
+            # solo el conteo de n-gramas y la eleccion del vocabulario, sin armar la matriz
+            metricas["pico_memoria_vocabulario_mb"] = _pico_memoria_mb(lambda: vectorizer.fit(corpus))
+        metricas.update(vectorizer.estadisticas_)
+        del corpus
+    return len(textos), segundos, metricas
+
+
+def _etapa_cv(escala: int, contexto: Dict) -> Tuple[int, float]:
+    from sklearn.preprocessing import LabelEncoder
+    from cargador_scripts import importar_script
+
+    script = importar_script("3-entrenar-y-evaluar.py")
+    textos, nombres_targets = _cargar_textos(escala, contexto)
+    vectorizer = _count_vectorizer()
+    vectores = vectorizer.fit_transform(textos)
+    nombres_features = vectorizer.get_feature_names_out()
+    label_encoder = LabelEncoder()
+    targets = label_encoder.fit_transform(nombres_targets)
+    inicio = time.perf_counter()
+    script.evaluar_cv(vectores, targets, label_encoder.classes_, nombres_features, cant_folds=contexto["folds"])
+    return len(textos), time.perf_counter() - inicio
+
+
+def _etapa_prediccion(escala: int, contexto: Dict) -> Tuple[int, float]:
+    import joblib
+    from cargador_scripts import importar_script
+
+    script_5 = importar_script("5-entrenar_y_guardar_modelo_pipeline.py")
+    script_6 = importar_script("6-predecir_en_validacion.py")
+    textos_entrenamiento, targets_entrenamiento = joblib.load(contexto["textos"])
+    pipeline = script_5.construir_pipeline()
+    pipeline.fit(textos_entrenamiento, targets_entrenamiento)
+
+    textos, _ = _cargar_textos(escala, contexto)
+    inicio = time.perf_counter()
+    pipeline.predict(textos)
+    script_6._obtener_scores(pipeline, textos)
+    return len(textos), time.perf_counter() - inicio
+
+
+FUNCIONES_ETAPAS = {
+    "crawl": _etapa_crawl,
+    "extraccion": _etapa_extraccion,
+    "vectorizacion_count": _etapa_vectorizacion_count,
+    "vectorizacion_tfidf": _etapa_vectorizacion_tfidf,
+    "vectorizacion_tokens": _etapa_vectorizacion_tokens,
+    "vectorizacion_tokens_sin_poda": partial(_etapa_vectorizacion_tokens, podar_ngramas=False),
+    "vectorizacion_tokens_sketch": partial(_etapa_vectorizacion_tokens, ancho_sketch=ANCHO_SKETCH),
+    "cv": _etapa_cv,
+    "prediccion": _etapa_prediccion,
+}
+
+
+def _correr_etapa_en_proceso(etapa: str, escala: int, contexto: Dict, cola: multiprocessing.Queue):
+    """
+    Punto de entrada del proceso hijo: corre 1 etapa y envia el resultado al proceso padre.
+    """
+    os.chdir(contexto["directorio"])
+    sys.path.insert(0, contexto["directorio"])
+    # las etapas no escriben en el log de ejecuciones de los scripts
+    os.environ[LOG_ENV] = ""
+    if contexto["silenciar"]:
+        os.environ[VERBOSIDAD_ENV] = "0"
+    try:
+        rss_inicial = pico_rss_mb()
+        # los scripts imprimen 1 linea por archivo; no medimos la consola
+        with contextlib.redirect_stdout(io.StringIO()) if contexto["silenciar"] else contextlib.nullcontext():
+            n_docs, segundos, *extra = FUNCIONES_ETAPAS[etapa](escala, contexto)
+        resultado = {
+            "etapa": etapa,
+            "escala": escala,
+            "n_docs": n_docs,
+            "segundos": round(segundos, 4),
+            "docs_por_segundo": round(n_docs / segundos, 2) if segundos > 0 else None,
+            "pico_rss_mb": pico_rss_mb(),
+            "rss_inicial_mb": rss_inicial,
+        }
+        for metricas in extra:
+            resultado.update(metricas)
+        cola.put(resultado)
+    except Exception as e:
+        cola.put({"etapa": etapa, "escala": escala, "error": f"{type(e).__name__}: {e}"})
+
+
+def correr_etapa(etapa: str, escala: int, contexto: Dict, timeout: Optional[float] = TIMEOUT_ETAPA) -> Dict:
+    """
+    :return: El resultado de la etapa, o {"etapa", "escala", "error"} si el proceso murio sin mandarlo (segfault,
+    OOM killer) o tardo mas de timeout segundos.
+    """
+    # "spawn" para que el proceso hijo arranque limpio y su pico de RSS sea solo de la etapa
+    ctx = multiprocessing.get_context("spawn")
+    cola = ctx.Queue()
+    proceso = ctx.Process(target=_correr_etapa_en_proceso, args=(etapa, escala, contexto, cola))
+    inicio = time.perf_counter()
+    proceso.start()
+    resultado = None
+    while resultado is None:
+        try:
+            resultado = cola.get(timeout=SEGUNDOS_CHEQUEO_PROCESO)
+        except queue.Empty:
+            if not proceso.is_alive():
+                # lo que mando justo antes de terminar puede tardar en llegar a la cola
+                try:
+                    resultado = cola.get(timeout=1)
+                except queue.Empty:
+                    resultado = {"etapa": etapa, "escala": escala,
+                                 "error": f"el proceso termino con codigo {proceso.exitcode} sin resultado"}
+            elif timeout is not None and time.perf_counter() - inicio > timeout:
+                proceso.terminate()
+                resultado = {"etapa": etapa, "escala": escala, "error": f"no termino en {timeout}s"}
+    proceso.join()
+    return resultado
+
+
+def preparar_textos(paths: List[Path], secciones: List[str], archivo_salida: str):
+    """
+    Extrae 1 sola vez el texto de cada nota del corpus 1x; las etapas que parten de texto lo escalan desde aca.
+    """
+    import joblib
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    textos, targets = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path, seccion in zip(paths, secciones):
+            datos = script.extraer_datos_nota(script.leer_archivo(str(path)))
+            if datos is not None and datos[2] is not None:
+                textos.append(datos[2])
+                targets.append(seccion)
+    joblib.dump((textos, targets), archivo_salida)
+    return len(textos)
+
+
+def commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar_con_baseline(resultados: List[Dict], baseline: Dict, tolerancia: float) -> List[Dict]:
+    """
+    Compara el tiempo de cada (etapa, escala) contra el mismo par en el baseline.
+    :return: Una lista con 1 comparacion por cada par presente en ambos.
+    """
+    base_por_clave = {(r["etapa"], r["escala"]): r for r in baseline.get("resultados", []) if "error" not in r}
+    comparaciones = []
+    for r in resultados:
+        base = base_por_clave.get((r["etapa"], r["escala"]))
+        if base is None or "error" in r:
+            continue
+        ratio = r["segundos"] / base["segundos"] if base["segundos"] > 0 else float("nan")
+        if ratio > 1 + tolerancia:
+            estado = "REGRESION"
+        elif ratio < 1 - tolerancia:
+            estado = "MEJORA"
+        else:
+            estado = "igual"
+        comparaciones.append({
+            "etapa": r["etapa"],
+            "escala": r["escala"],
+            "segundos_baseline": base["segundos"],
+            "segundos": r["segundos"],
+            "ratio_tiempo": round(ratio, 3),
+            "pico_rss_mb_baseline": base.get("pico_rss_mb"),
+            "pico_rss_mb": r.get("pico_rss_mb"),
+            "estado": estado,
+        })
+    return comparaciones
+
+
+def imprimir_resultados(resultados: List[Dict], comparaciones: List[Dict]):
+    con_memoria = any("pico_memoria_fit_mb" in r for r in resultados)
+    print(f"\n{'etapa':<30}{'escala':>7}{'docs':>9}{'segundos':>11}{'docs/s':>11}{'pico RSS MB':>13}"
+          + (f"{'pico fit MB':>13}" if con_memoria else ""))
+    for r in resultados:
+        if "error" in r:
+            print(f"{r['etapa']:<30}{r['escala']:>7}  ERROR: {r['error']}")
+            continue
+        rss = f"{r['pico_rss_mb']:.1f}" if r["pico_rss_mb"] is not None else "?"
+        print(f"{r['etapa']:<30}{r['escala']:>7}{r['n_docs']:>9}{r['segundos']:>11.3f}{r['docs_por_segundo']:>11.1f}{rss:>13}"
+              + (f"{r.get('pico_memoria_fit_mb', '-'):>13}" if con_memoria else ""))
+    if comparaciones:
+        print(f"\n{'etapa':<30}{'escala':>7}{'baseline s':>12}{'actual s':>11}{'ratio':>8}  estado")
+        for c in comparaciones:
+            print(f"{c['etapa']:<30}{c['escala']:>7}{c['segundos_baseline']:>12.3f}{c['segundos']:>11.3f}{c['ratio_tiempo']:>8.2f}  {c['estado']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas crawl/extraccion/vectorizacion/CV/prediccion")
+    parser.add_argument("--paginas", default=DIR_PAGINAS, help=f"Directorio con 1 subdirectorio por seccion (default: {DIR_PAGINAS})")
+    parser.add_argument("--escalas", nargs="*", type=int, default=ESCALAS, help=f"Factores de escala del corpus (default: {ESCALAS})")
+    parser.add_argument("--etapas", nargs="*", default=ETAPAS, choices=ETAPAS, help="Etapas a medir (default: todas)")
+    parser.add_argument("--folds", type=int, default=5, help="Cantidad de folds de la etapa cv (default: 5)")
+    parser.add_argument("--salida", default=ARCHIVO_RESULTADOS, help=f"JSON de resultados (default: {ARCHIVO_RESULTADOS})")
+    parser.add_argument("--baseline", default=ARCHIVO_BASELINE, help=f"JSON de baseline contra el cual comparar (default: {ARCHIVO_BASELINE})")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guardar estos resultados como nuevo baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help=f"Variacion relativa tolerada (default: {TOLERANCIA})")
+    parser.add_argument("--timeout-etapa", type=float, default=TIMEOUT_ETAPA,
+                        help="Segundos maximos por etapa; si se pasa, la etapa queda con error (default: sin limite)")
+    parser.add_argument("--memoria", action="store_true",
+                        help="Medir tambien el pico de memoria del fit en las etapas de vectorizacion (tracemalloc)")
+    parser.add_argument("--palabras-nuevas", type=float, default=0.0,
+                        help="Fraccion de palabras con un sufijo nuevo en cada copia escalada (default: 0)")
+    parser.add_argument("--mostrar-salida", action="store_true", help="No silenciar lo que imprimen los scripts")
+    args = parser.parse_args()
+
+    paths, secciones = listar_corpus(args.paginas)
+    if not paths:
+        print(f"[ERROR] No se encontraron html en {args.paginas}")
+        sys.exit(1)
+    print(f"[INFO] Corpus: {len(paths)} notas en {len(set(secciones))} secciones | Escalas: {args.escalas}")
+
+    with tempfile.TemporaryDirectory() as dir_temporal:
+        archivo_textos = os.path.join(dir_temporal, "textos.joblib")
+        n_textos = preparar_textos(paths, secciones, archivo_textos)
+        print(f"[INFO] Textos extraidos para las etapas de texto: {n_textos}")
+        contexto = {
+            "directorio": str(Path(__file__).resolve().parent),
+            "paginas": str(Path(args.paginas).resolve()),
+            "paths": [str(p.resolve()) for p in paths],
+            "textos": archivo_textos,
+            "folds": args.folds,
+            "silenciar": not args.mostrar_salida,
+            "memoria": args.memoria,
+            "palabras_nuevas": args.palabras_nuevas,
+        }
+        resultados = []
+        for etapa in args.etapas:
+            for escala in args.escalas:
+                print(f"[INFO] Corriendo etapa '{etapa}' con escala {escala}x...")
+                resultados.append(correr_etapa(etapa, escala, contexto, args.timeout_etapa))
+
+    comparaciones = []
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.guardar_baseline:
+        comparaciones = comparar_con_baseline(resultados, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerancia)
+
+    imprimir_resultados(resultados, comparaciones)
+
+    reporte = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_actual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "resultados": resultados,
+        "comparacion_baseline": comparaciones,
+    }
+    Path(args.salida).write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n[OK] Resultados guardados en {args.salida}")
+    if args.guardar_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[OK] Baseline guardado en {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
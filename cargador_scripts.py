@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Permite importar los scripts numerados (p.ej. "2-html-a-dataframe.py") como modulos.
+Sus nombres empiezan con un numero y tienen guiones, asi que no se pueden importar con "import".
+
+Tambien permite pisar las constantes de configuracion de un script (rutas, K_SELECT, ...) sin editarlo, con un JSON
+en la variable de entorno TP_PARAMETROS, p.ej. TP_PARAMETROS='{"K_SELECT": 300, "MODELS_DIR": "modelos"}'.
+"""
+import ast
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Tuple
+
+DIR_SCRIPTS = Path(__file__).resolve().parent
+PARAMETROS_ENV = "TP_PARAMETROS"
+
+_modulos_cargados = {}
+
+
+def importar_script(nombre_archivo: str) -> ModuleType:
+    """
+    Importa un script numerado del directorio del TP, sin ejecutar su bloque "__main__".
+    Cada script se importa una sola vez; las llamadas siguientes devuelven el mismo modulo.
+    :param nombre_archivo: Nombre del archivo, p.ej. "2-html-a-dataframe.py".
+    :return: El modulo importado.
+    """
+    if nombre_archivo in _modulos_cargados:
+        return _modulos_cargados[nombre_archivo]
+    path_script = DIR_SCRIPTS / nombre_archivo
+    if not path_script.exists():
+        raise FileNotFoundError(f"No existe el script {path_script}")
+    nombre_modulo = "script_" + path_script.stem.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(nombre_modulo, path_script)
+    modulo = importlib.util.module_from_spec(spec)
+    # registrarlo antes de ejecutarlo para que pickle/multiprocessing encuentren sus clases
+    sys.modules[nombre_modulo] = modulo
+    spec.loader.exec_module(modulo)
+    _modulos_cargados[nombre_archivo] = modulo
+    return modulo
+
+
+def aplicar_parametros(variables: Dict) -> Dict:
+    """
+    Pisa constantes de un script con los valores del JSON de la variable de entorno TP_PARAMETROS. Cada script la
+    llama con globals() despues de su bloque de configuracion. Los valores toman el tipo de la constante que
+    reemplazan (Path, tuple); un nombre que el script no define es un error, para no ignorar un parametro mal escrito.
+    :return: Los parametros aplicados.
+    """
+    parametros = json.loads(os.environ.get(PARAMETROS_ENV) or "{}")
+    desconocidos = [nombre for nombre in parametros if nombre not in variables]
+    if desconocidos:
+        raise ValueError(f"Parametros desconocidos en {PARAMETROS_ENV}: {desconocidos}")
+    for nombre, valor in parametros.items():
+        actual = variables[nombre]
+        if isinstance(actual, Path) and valor is not None:
+            valor = Path(valor)
+        elif isinstance(actual, tuple) and isinstance(valor, list):
+            valor = tuple(valor)
+        variables[nombre] = valor
+    return parametros
+
+
+def _es_llamada_a_aplicar_parametros(nodo: ast.stmt) -> bool:
+    return (isinstance(nodo, ast.Expr) and isinstance(nodo.value, ast.Call)
+            and getattr(nodo.value.func, "id", None) == "aplicar_parametros")
+
+
+def _es_bloque_main(nodo: ast.stmt) -> bool:
+    return (isinstance(nodo, ast.If) and isinstance(nodo.test, ast.Compare)
+            and getattr(nodo.test.left, "id", None) == "__name__")
+
+
+def constantes_de_script(nombre_archivo: str) -> List[Tuple[str, str, str]]:
+    """
+    Lista las constantes de configuracion de un script numerado sin importarlo (lee su codigo con ast): las
+    asignaciones a nombres en MAYUSCULAS, a nivel de modulo o en el bloque "__main__", anteriores a la llamada a
+    aplicar_parametros, que son las que se pueden pisar con TP_PARAMETROS.
+    :param nombre_archivo: Nombre del archivo, p.ej. "5-entrenar_y_guardar_modelo_pipeline.py".
+    :return: Lista de (nombre, valor por defecto como esta escrito en el script, comentario de la constante). El
+    comentario es el de la misma linea o, si no hay, el de las lineas de comentario justo arriba.
+    """
+    codigo = (DIR_SCRIPTS / nombre_archivo).read_text(encoding="utf-8")
+    lineas = codigo.splitlines()
+    constantes = []
+
+    def es_comentario(i: int, columna: int, continuacion: bool) -> bool:
+        # un comentario mas sangrado que la constante continua al de la linea anterior (ver el bloque CONFIG de 5-)
+        if not (0 <= i < len(lineas) and lineas[i].strip().startswith("#")):
+            return False
+        sangria = len(lineas[i]) - len(lineas[i].lstrip())
+        return sangria > columna if continuacion else sangria == columna
+
+    def comentario(nodo: ast.stmt) -> str:
+        linea = lineas[nodo.end_lineno - 1]
+        if "#" in linea[nodo.end_col_offset:]:
+            partes = [linea[nodo.end_col_offset:].split("#", 1)[1]]
+            i = nodo.end_lineno
+            while es_comentario(i, nodo.col_offset, continuacion=True):
+                partes.append(lineas[i].strip().lstrip("#"))
+                i += 1
+        else:
+            partes = []
+            i = nodo.lineno - 2
+            while es_comentario(i, nodo.col_offset, continuacion=False):
+                partes.insert(0, lineas[i].strip().lstrip("#"))
+                i -= 1
+        return " ".join(p.strip() for p in partes if p.strip("= "))
+
+    def recorrer(cuerpo: List[ast.stmt]) -> bool:
+        for nodo in cuerpo:
+            if _es_llamada_a_aplicar_parametros(nodo):
+                return True
+            if _es_bloque_main(nodo):
+                if recorrer(nodo.body):
+                    return True
+            elif (isinstance(nodo, ast.Assign) and len(nodo.targets) == 1 and isinstance(nodo.targets[0], ast.Name)
+                  and nodo.targets[0].id.isupper()):
+                valor = " ".join(ast.get_source_segment(codigo, nodo.value).split())
+                constantes.append((nodo.targets[0].id, valor, comentario(nodo)))
+        return False
+
+    recorrer(ast.parse(codigo).body)
+    return constantes
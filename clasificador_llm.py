@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Clasificacion few-shot con un LLM causal, puntuando las categorias en vez de generar texto.
+
+gemma-para-clasificar-espaniol-en_kaggle.ipynb genera texto despues de un prompt con ejemplos y corta con el
+token ")"; cada nota vuelve a codificar todo el prompt, y la respuesta puede no ser ninguna categoria. Aca:
+- el prefijo del prompt (instrucciones + ejemplos) se codifica 1 sola vez y se guarda su cache de keys/values;
+- las notas se procesan de a lotes, ordenadas por largo, sobre copias de esa cache: solo se calcula la nota;
+- para cada nota se calcula la log-verosimilitud de cada continuacion "<categoria></CATEGORY>" (las 4 a la vez,
+  reusando la cache de la nota), y un softmax sobre las categorias da el vector de probabilidades.
+
+ClasificadorLLM tiene predict/predict_proba con classes_ en orden alfabetico (el mismo orden que el LabelEncoder),
+asi que 6-predecir_en_validacion.py lo puede usar como modelo (guardado con joblib, sin la red) y calcular el AUC.
+
+Ejemplos:
+    python clasificador_llm.py --crear-modelo-aleatorio ./lm_chico      # LM causal chico con pesos al azar
+    python clasificador_llm.py --modelo ./lm_chico --comparar            # notas/s: generar vs sin cache vs con cache
+    python clasificador_llm.py --modelo google/gemma-2-2b-it --guardar modelo_llm.joblib
+"""
+import argparse
+import copy
+import hashlib
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+# un modelo chico de Huggingface en vez del Gemma de keras_hub de la notebook
+MODELO_LLM = "google/gemma-2-2b-it"
+CATEGORIAS = ("economia", "el-mundo", "el-pais", "sociedad")
+INSTRUCCIONES = ("Noticias con su categoria. Cada noticia empieza con <EXAMPLE> y termina con </EXAMPLE>, y pertenece "
+                 "a una sola categoria, entre <CATEGORY> y </CATEGORY>. Las categorias son: {categorias}.\n\n")
+PLANTILLA_NOTA = "<EXAMPLE>\n<INPUT>\n{texto}\n</INPUT>\n<CATEGORY>"
+PLANTILLA_CATEGORIA = "{categoria}</CATEGORY>"
+PALABRAS_POR_TEXTO = 150
+EJEMPLOS_POR_CATEGORIA = 1
+TAMANIO_LOTE = 8
+
+
+def cargar_modelo(modelo: str = MODELO_LLM):
+    """
+    :return: (tokenizador rapido, LM causal en modo evaluacion)
+    """
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizador = AutoTokenizer.from_pretrained(modelo, use_fast=True)
+    red = AutoModelForCausalLM.from_pretrained(modelo)
+    red.eval()
+    return tokenizador, red
+
+
+def _recortar(texto: str, palabras: Optional[int]) -> str:
+    partes = texto.split()
+    return " ".join(partes if palabras is None else partes[:palabras])
+
+
+def armar_prefijo(ejemplos: Sequence[Tuple[str, str]], categorias: Sequence[str] = CATEGORIAS,
+                  palabras_por_texto: Optional[int] = PALABRAS_POR_TEXTO) -> str:
+    """
+    :param ejemplos: Pares (texto, categoria) para el few-shot.
+    :return: Instrucciones + ejemplos, la parte del prompt que es igual para todas las notas.
+    """
+    prefijo = INSTRUCCIONES.format(categorias=", ".join(categorias))
+    for texto, categoria in ejemplos:
+        prefijo += (PLANTILLA_NOTA.format(texto=_recortar(texto, palabras_por_texto))
+                    + PLANTILLA_CATEGORIA.format(categoria=categoria) + "\n</EXAMPLE>\n\n")
+    return prefijo
+
+
+def _copiar_cache(cache, repeticiones: int):
+    # la red agrega las keys/values nuevas a la cache que recibe: cada lote trabaja sobre una copia
+    copia = copy.deepcopy(cache)
+    if repeticiones > 1:
+        copia.batch_repeat_interleave(repeticiones)
+    return copia
+
+
+def puntuar_lote(red, cache_prefijo, largo_prefijo: int, ids_notas: Sequence[Sequence[int]],
+                 ids_categorias: Sequence[Sequence[int]], id_pad: int = 0) -> np.ndarray:
+    """
+    Log-verosimilitud de cada categoria a continuacion de cada nota, usando la cache del prefijo.
+    :param cache_prefijo: Cache de keys/values del prefijo (lote de 1), no se modifica.
+    :param largo_prefijo: Tokens del prefijo.
+    :param ids_notas: Tokens de cada nota (ya con la plantilla), sin el prefijo.
+    :param ids_categorias: Tokens de cada continuacion "<categoria></CATEGORY>".
+    :return: Matriz (notas, categorias) con la suma de log-probabilidades de los tokens de cada continuacion.
+    """
+    n_notas, n_categorias = len(ids_notas), len(ids_categorias)
+    dispositivo = next(red.parameters()).device
+
+    # 1) las notas, con padding a la izquierda (entre el prefijo y la nota): el ultimo token de todas queda alineado
+    largo = max(len(ids) for ids in ids_notas)
+    input_ids = torch.full((n_notas, largo), id_pad, dtype=torch.long)
+    mascara = torch.zeros((n_notas, largo_prefijo + largo), dtype=torch.long)
+    mascara[:, :largo_prefijo] = 1
+    posiciones = torch.full((n_notas, largo), largo_prefijo, dtype=torch.long)
+    largos = torch.tensor([len(ids) for ids in ids_notas])
+    for fila, ids in enumerate(ids_notas):
+        relleno = largo - len(ids)
+        input_ids[fila, relleno:] = torch.tensor(ids)
+        mascara[fila, largo_prefijo + relleno:] = 1
+        posiciones[fila, relleno:] = largo_prefijo + torch.arange(len(ids))
+    cache = _copiar_cache(cache_prefijo, n_notas)
+    salida = red(input_ids=input_ids.to(dispositivo), attention_mask=mascara.to(dispositivo),
+                 position_ids=posiciones.to(dispositivo), past_key_values=cache, use_cache=True)
+    log_probs = torch.log_softmax(salida.logits[:, -1].float(), dim=-1)
+    primeros = torch.tensor([ids[0] for ids in ids_categorias], device=dispositivo)
+    puntajes = log_probs[:, primeros]
+
+    # 2) el resto de los tokens de cada categoria: 1 fila por (nota, categoria), sobre la cache de la nota
+    largo_categorias = max(len(ids) for ids in ids_categorias)
+    if largo_categorias > 1:
+        cache = salida.past_key_values
+        cache.batch_repeat_interleave(n_categorias)
+        entradas = torch.full((n_categorias, largo_categorias - 1), id_pad, dtype=torch.long)
+        siguientes = torch.zeros((n_categorias, largo_categorias - 1), dtype=torch.long)
+        validos = torch.zeros((n_categorias, largo_categorias - 1), dtype=torch.bool)
+        for j, ids in enumerate(ids_categorias):
+            entradas[j, :len(ids) - 1] = torch.tensor(ids[:-1])
+            siguientes[j, :len(ids) - 1] = torch.tensor(ids[1:])
+            validos[j, :len(ids) - 1] = True
+        # el padding de las categorias va a la derecha: no cambia las log-probabilidades de los tokens anteriores
+        mascara_continuacion = torch.cat([mascara.repeat_interleave(n_categorias, dim=0),
+                                          torch.ones((n_notas * n_categorias, largo_categorias - 1), dtype=torch.long)], dim=1)
+        posiciones_continuacion = (largo_prefijo + largos.repeat_interleave(n_categorias)[:, None]
+                                   + torch.arange(largo_categorias - 1)[None, :])
+        salida = red(input_ids=entradas.repeat(n_notas, 1).to(dispositivo),
+                     attention_mask=mascara_continuacion.to(dispositivo),
+                     position_ids=posiciones_continuacion.to(dispositivo), past_key_values=cache, use_cache=True)
+        log_probs = torch.log_softmax(salida.logits.float(), dim=-1)
+        siguientes = siguientes.repeat(n_notas, 1).to(dispositivo)
+        por_token = log_probs.gather(-1, siguientes[..., None])[..., 0] * validos.repeat(n_notas, 1).to(dispositivo)
+        puntajes = puntajes + por_token.sum(dim=1).view(n_notas, n_categorias)
+    return puntajes.cpu().numpy()
+
+
+def _softmax(puntajes: np.ndarray) -> np.ndarray:
+    puntajes = puntajes - puntajes.max(axis=1, keepdims=True)
+    exponenciales = np.exp(puntajes)
+    return exponenciales / exponenciales.sum(axis=1, keepdims=True)
+
+
+class ClasificadorLLM(BaseEstimator, ClassifierMixin):
+    """
+    Clasificador de sklearn: lista de textos -> categoria, por log-verosimilitud few-shot de un LLM causal.
+    fit solo elige los ejemplos del prompt (ejemplos_por_categoria notas al azar de cada categoria).
+    El modelo se carga la 1ra vez que se usa, y no se guarda al serializar (joblib) el clasificador.
+    """
+    # para 6-predecir_en_validacion.py: predict/predict_proba reciben los textos, no features
+    recibe_textos = True
+
+    def __init__(self, modelo: str = MODELO_LLM, categorias: Sequence[str] = CATEGORIAS,
+                 ejemplos: Optional[Sequence[Tuple[str, str]]] = None,
+                 ejemplos_por_categoria: int = EJEMPLOS_POR_CATEGORIA,
+                 palabras_por_texto: Optional[int] = PALABRAS_POR_TEXTO, tamanio_lote: int = TAMANIO_LOTE,
+                 semilla: int = 0):
+        self.modelo = modelo
+        self.categorias = categorias
+        self.ejemplos = ejemplos
+        self.ejemplos_por_categoria = ejemplos_por_categoria
+        self.palabras_por_texto = palabras_por_texto
+        self.tamanio_lote = tamanio_lote
+        self.semilla = semilla
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        for atributo in ("_tokenizador_y_red_", "_prefijo_", "_ultimas_probabilidades_"):
+            estado.pop(atributo, None)
+        return estado
+
+    def _tokenizador_y_red(self):
+        if getattr(self, "_tokenizador_y_red_", None) is None:
+            self._tokenizador_y_red_ = cargar_modelo(self.modelo)
+        return self._tokenizador_y_red_
+
+    def fit(self, X=None, y=None):
+        self.classes_ = np.array(sorted(self.categorias))
+        if self.ejemplos is not None:
+            self.ejemplos_ = list(self.ejemplos)
+        elif X is not None and y is not None:
+            rng = np.random.default_rng(self.semilla)
+            textos, etiquetas = list(X), np.asarray(y)
+            self.ejemplos_ = []
+            for categoria in self.classes_:
+                indices = np.flatnonzero(etiquetas == categoria)
+                for i in rng.permutation(indices)[:self.ejemplos_por_categoria]:
+                    self.ejemplos_.append((textos[i], str(categoria)))
+            # intercalar las categorias, para que la ultima del prompt no sea siempre la misma
+            self.ejemplos_ = [self.ejemplos_[i] for i in rng.permutation(len(self.ejemplos_))]
+        else:
+            self.ejemplos_ = []
+        self.prefijo_ = armar_prefijo(self.ejemplos_, self.classes_, self.palabras_por_texto)
+        self._prefijo_ = None
+        return self
+
+    def _cache_prefijo(self):
+        """
+        :return: (cache de keys/values del prefijo, tokens del prefijo), calculada 1 sola vez.
+        """
+        if getattr(self, "_prefijo_", None) is None:
+            tokenizador, red = self._tokenizador_y_red()
+            ids = tokenizador(self.prefijo_, return_tensors="pt")["input_ids"]
+            with torch.inference_mode():
+                salida = red(input_ids=ids.to(next(red.parameters()).device), use_cache=True)
+            self._prefijo_ = (salida.past_key_values, ids.shape[1])
+        return self._prefijo_
+
+    def _ids_notas(self, textos: Sequence[str]) -> List[List[int]]:
+        tokenizador, red = self._tokenizador_y_red()
+        notas = [PLANTILLA_NOTA.format(texto=_recortar(texto, self.palabras_por_texto)) for texto in textos]
+        ids_notas = tokenizador(notas, add_special_tokens=False)["input_ids"]
+        # que entre el prefijo + la nota + la categoria mas larga en el contexto del modelo
+        maximo = getattr(red.config, "max_position_embeddings", None)
+        if maximo is not None:
+            lugar = maximo - self._cache_prefijo()[1] - max(len(ids) for ids in self._ids_categorias())
+            ids_notas = [ids[:max(lugar, 1)] for ids in ids_notas]
+        return ids_notas
+
+    def _ids_categorias(self) -> List[List[int]]:
+        tokenizador, _ = self._tokenizador_y_red()
+        return tokenizador([PLANTILLA_CATEGORIA.format(categoria=c) for c in self.classes_],
+                           add_special_tokens=False)["input_ids"]
+
+    def log_verosimilitudes(self, X) -> np.ndarray:
+        """
+        :return: Matriz (textos, categorias) con la log-verosimilitud de cada categoria, columnas en orden de classes_.
+        """
+        if not hasattr(self, "prefijo_"):
+            self.fit()
+        if isinstance(X, str):
+            raise ValueError("Se esperaba una lista de textos, no 1 texto")
+        textos = list(X)
+        tokenizador, red = self._tokenizador_y_red()
+        cache_prefijo, largo_prefijo = self._cache_prefijo()
+        ids_notas, ids_categorias = self._ids_notas(textos), self._ids_categorias()
+        id_pad = tokenizador.pad_token_id if tokenizador.pad_token_id is not None else 0
+        # ordenar por largo: cada lote tiene notas de largo parecido y casi no hay padding
+        orden = np.argsort([-len(ids) for ids in ids_notas], kind="stable")
+        puntajes = np.zeros((len(textos), len(ids_categorias)), dtype=np.float32)
+        with torch.inference_mode():
+            for inicio in range(0, len(orden), self.tamanio_lote):
+                indices = orden[inicio:inicio + self.tamanio_lote]
+                puntajes[indices] = puntuar_lote(red, cache_prefijo, largo_prefijo, [ids_notas[i] for i in indices],
+                                                 ids_categorias, id_pad)
+        return puntajes
+
+    def predict_proba(self, X) -> np.ndarray:
+        textos = list(X)
+        # 6-predecir_en_validacion.py llama a predict y despues a predict_proba con los mismos textos
+        huella = hashlib.sha1("\x00".join(textos).encode("utf-8", errors="ignore")).hexdigest()
+        ultimas = getattr(self, "_ultimas_probabilidades_", None)
+        if ultimas is not None and ultimas[0] == huella:
+            return ultimas[1]
+        probabilidades = _softmax(self.log_verosimilitudes(textos))
+        self._ultimas_probabilidades_ = (huella, probabilidades)
+        return probabilidades
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def puntuar_sin_cache(clasificador: ClasificadorLLM, textos: Sequence[str]) -> np.ndarray:
+    """
+    Lo mismo que log_verosimilitudes, pero codificando prefijo + nota + categoria completos para cada par
+    (nota, categoria), sin cache. Para verificar y comparar velocidades.
+    """
+    tokenizador, red = clasificador._tokenizador_y_red()
+    ids_prefijo = tokenizador(clasificador.prefijo_)["input_ids"]
+    ids_notas, ids_categorias = clasificador._ids_notas(textos), clasificador._ids_categorias()
+    puntajes = np.zeros((len(textos), len(ids_categorias)), dtype=np.float32)
+    with torch.inference_mode():
+        for i, ids_nota in enumerate(ids_notas):
+            for j, ids_categoria in enumerate(ids_categorias):
+                ids = torch.tensor([ids_prefijo + ids_nota + ids_categoria])
+                log_probs = torch.log_softmax(red(input_ids=ids).logits[0].float(), dim=-1)
+                inicio = len(ids_prefijo) + len(ids_nota)
+                puntajes[i, j] = float(sum(log_probs[inicio + k - 1, t] for k, t in enumerate(ids_categoria)))
+    return puntajes
+
+
+def generar_1_a_1(clasificador: ClasificadorLLM, textos: Sequence[str], max_tokens: int = 8) -> List[str]:
+    """
+    Como en la notebook: 1 prompt completo por nota y generacion greedy hasta "</CATEGORY>". Solo para comparar.
+    :return: El texto generado para cada nota (puede no ser ninguna categoria).
+    """
+    tokenizador, red = clasificador._tokenizador_y_red()
+    respuestas = []
+    with torch.inference_mode():
+        for texto in textos:
+            prompt = clasificador.prefijo_ + PLANTILLA_NOTA.format(texto=_recortar(texto, clasificador.palabras_por_texto))
+            ids = tokenizador(prompt, return_tensors="pt")
+            generados = red.generate(**ids, max_new_tokens=max_tokens, do_sample=False,
+                                     pad_token_id=tokenizador.pad_token_id, stop_strings=["</CATEGORY>"],
+                                     tokenizer=tokenizador)
+            respuesta = tokenizador.decode(generados[0, ids["input_ids"].shape[1]:], skip_special_tokens=True)
+            respuestas.append(respuesta.split("</CATEGORY>")[0].strip())
+    return respuestas
+
+
+def crear_lm_aleatorio(directorio: str, textos: Sequence[str], tamanio_vocabulario: int = 4000, capas: int = 4,
+                       dimension: int = 128, largo_maximo: int = 2048, semilla: int = 0) -> str:
+    """
+    Crea un LM causal chico (GPT-2) con pesos al azar y un tokenizador BPE entrenado con los textos, para probar
+    el clasificador en CPU sin descargar un modelo. Las predicciones no significan nada, pero el costo por token
+    escala como el de un LLM real.
+    :return: El directorio del modelo.
+    """
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    torch.manual_seed(semilla)
+    Path(directorio).mkdir(parents=True, exist_ok=True)
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    entrenador = trainers.BpeTrainer(vocab_size=tamanio_vocabulario, special_tokens=["<|endoftext|>"],
+                                     initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    bpe.train_from_iterator(list(textos) + [armar_prefijo([])] + list(CATEGORIAS), trainer=entrenador)
+    tokenizador = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token="<|endoftext|>", eos_token="<|endoftext|>",
+                                          pad_token="<|endoftext|>")
+    tokenizador.save_pretrained(directorio)
+    config = GPT2Config(vocab_size=bpe.get_vocab_size(), n_positions=largo_maximo, n_embd=dimension, n_layer=capas,
+                        n_head=max(dimension // 64, 1), bos_token_id=tokenizador.bos_token_id,
+                        eos_token_id=tokenizador.eos_token_id)
+    GPT2LMHeadModel(config).save_pretrained(directorio)
+    return directorio
+
+
+def _leer_corpus(dir_paginas: str) -> Tuple[List[str], List[str]]:
+    """
+    :return: (textos, seccion de cada texto), extraidos como en 2-html-a-dataframe.py.
+    """
+    from benchmark_pipeline import listar_corpus
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    textos, secciones = [], []
+    for path, seccion in zip(*listar_corpus(dir_paginas)):
+        datos = script.extraer_datos_nota(script.leer_archivo(str(path)))
+        if datos is not None and datos[2]:
+            textos.append(datos[2])
+            secciones.append(seccion)
+    return textos, secciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clasificacion few-shot con un LLM, por log-verosimilitud de las categorias")
+    parser.add_argument("--modelo", default=MODELO_LLM, help=f"Modelo de Huggingface o directorio local (default: {MODELO_LLM})")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio con 1 subdirectorio por seccion (default: ./paginas)")
+    parser.add_argument("--ejemplos-por-categoria", type=int, default=EJEMPLOS_POR_CATEGORIA,
+                        help=f"Ejemplos de cada categoria en el prompt (default: {EJEMPLOS_POR_CATEGORIA})")
+    parser.add_argument("--palabras", type=int, default=PALABRAS_POR_TEXTO,
+                        help=f"Palabras de cada texto en el prompt (default: {PALABRAS_POR_TEXTO})")
+    parser.add_argument("--tamanio-lote", type=int, default=TAMANIO_LOTE, help=f"Notas por lote (default: {TAMANIO_LOTE})")
+    parser.add_argument("--limite", type=int, default=None, help="Clasificar solo N notas (al azar)")
+    parser.add_argument("--guardar", metavar="ARCHIVO", help="Guardar el clasificador (sin la red) con joblib en ARCHIVO")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Medir notas/s generando (como la notebook), puntuando sin cache y puntuando con cache")
+    parser.add_argument("--crear-modelo-aleatorio", metavar="DIRECTORIO",
+                        help="Crear un LM causal chico con pesos al azar (vocabulario del corpus) en DIRECTORIO y salir")
+    args = parser.parse_args()
+
+    textos, secciones = _leer_corpus(args.paginas)
+    print(f"[INFO] {len(textos)} notas leidas de {args.paginas}")
+    if args.crear_modelo_aleatorio:
+        crear_lm_aleatorio(args.crear_modelo_aleatorio, textos)
+        print(f"[OK] Modelo aleatorio guardado en {args.crear_modelo_aleatorio}")
+        return
+
+    # los ejemplos del prompt salen de la mitad de las notas, y se clasifica la otra mitad
+    orden = np.random.default_rng(0).permutation(len(textos))
+    mitad = len(orden) // 2
+    clasificador = ClasificadorLLM(modelo=args.modelo, ejemplos_por_categoria=args.ejemplos_por_categoria,
+                                   palabras_por_texto=args.palabras, tamanio_lote=args.tamanio_lote)
+    clasificador.fit([textos[i] for i in orden[:mitad]], [secciones[i] for i in orden[:mitad]])
+    a_clasificar = orden[mitad:][:args.limite]
+    textos_test, secciones_test = [textos[i] for i in a_clasificar], [secciones[i] for i in a_clasificar]
+
+    if args.guardar:
+        import joblib
+        joblib.dump(clasificador, args.guardar)
+        print(f"[OK] Clasificador guardado en {args.guardar}")
+
+    if not args.comparar:
+        inicio = time.perf_counter()
+        probabilidades = clasificador.predict_proba(textos_test)
+        segundos = time.perf_counter() - inicio
+        predicciones = clasificador.classes_[probabilidades.argmax(axis=1)]
+        accuracy = float(np.mean(predicciones == np.asarray(secciones_test)))
+        print(f"[OK] {len(textos_test)} notas en {segundos:.2f}s ({len(textos_test) / segundos:.1f} notas/s), "
+              f"accuracy {accuracy:.3f}")
+        return
+
+    resultados: Dict[str, np.ndarray] = {}
+    corridas = [
+        ("generar 1 a 1", lambda: generar_1_a_1(clasificador, textos_test)),
+        ("puntuar sin cache", lambda: puntuar_sin_cache(clasificador, textos_test)),
+        ("puntuar con cache", lambda: clasificador.log_verosimilitudes(textos_test)),
+    ]
+    print(f"\n{'corrida':<22}{'segundos':>10}{'notas/s':>10}")
+    for nombre, correr in corridas:
+        clasificador._prefijo_ = None
+        inicio = time.perf_counter()
+        resultados[nombre] = correr()
+        segundos = time.perf_counter() - inicio
+        print(f"{nombre:<22}{segundos:>10.2f}{len(textos_test) / segundos:>10.1f}")
+    diferencia = np.abs(resultados["puntuar sin cache"] - resultados["puntuar con cache"]).max()
+    print(f"\n[INFO] Maxima diferencia de log-verosimilitud con y sin cache: {diferencia:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Compara varios clasificadores con la misma cross-validation, sin repetir la preparacion de features por modelo.
+
+En cada fold las representaciones (matrices de features) se construyen 1 sola vez y las comparten todos los
+modelos que las usan:
+- "chi2": las MAX_FEATURES features con mas chi2 en el train del fold, como en 3-entrenar-y-evaluar.py;
+- "embedding_medio": el promedio de los vectores de las palabras de cada nota, pesado por sus conteos (lo que hace
+  MeanEmbeddingVectorizer de web_mining_python/text_mining/word2vec.py, pero como 1 producto de matrices sobre los
+  conteos ya calculados). Los vectores de palabras son los de word2vec si se pasa un archivo de KeyedVectors de
+  gensim, o los de LSA (TruncatedSVD del TF-IDF del train del fold) si no.
+Despues se entrenan todos los modelos del fold en paralelo (joblib), asi el costo que crece con la cantidad de
+modelos es solo el de entrenar y predecir. Con las probabilidades de los modelos que las tienen se arma ademas un
+ensamble por voto suave (promedio de probabilidades).
+
+El resultado es 1 tabla con accuracy, AUC (promedio y por clase) y segundos de entrenamiento y prediccion de cada
+modelo, y la matriz de confusion de cada modelo sumando los folds.
+
+Ejemplos:
+    python comparar_modelos.py                                   # todos los modelos de MODELOS, 5 folds
+    python comparar_modelos.py --modelos svc naive_bayes --csv comparacion.csv
+    python comparar_modelos.py --word2vec word2vec_es.kv --n-jobs 4
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.feature_selection import SelectKBest, chi2
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, confusion_matrix
+from sklearn.model_selection import StratifiedGroupKFold, StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler, label_binarize, normalize
+from sklearn.svm import SVC
+
+from cargador_scripts import importar_script
+from deduplicacion import leer_grupos
+from instrumentacion import RegistroEjecucion
+
+evaluacion = importar_script("3-entrenar-y-evaluar.py")
+registro = RegistroEjecucion("comparar_modelos")
+
+REPRESENTACIONES = ("chi2", "embedding_medio")
+# nombre -> (representacion, clasificador); se clona 1 vez por fold
+MODELOS = {
+    "svc": ("chi2", SVC(kernel='linear', probability=True)),
+    "regresion_logistica": ("chi2", LogisticRegression(max_iter=1000)),
+    "naive_bayes": ("chi2", MultinomialNB()),
+    "embedding_medio+lineal": ("embedding_medio", make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))),
+}
+NOMBRE_ENSAMBLE = "ensamble (voto suave)"
+MAX_FEATURES = evaluacion.MAX_FEATURES
+CANT_FOLDS_CV = evaluacion.CANT_FOLDS_CV
+# dimension de los vectores de palabras de LSA, si no se usa word2vec
+DIMENSION_EMBEDDING = 100
+# -1: 1 proceso por CPU
+N_JOBS = -1
+
+
+def vectores_de_palabras(nombres_features: Sequence[str], train_X, dimension: int = DIMENSION_EMBEDDING,
+                         archivo_word2vec: Optional[str] = None, semilla: int = 0) -> np.ndarray:
+    """
+    :param nombres_features: El nombre de cada columna de train_X; los bigramas quedan con vector 0 con word2vec.
+    :param train_X: Conteos (notas, features) del train del fold, para LSA.
+    :param archivo_word2vec: Archivo de KeyedVectors de gensim (ver ejemplo_uso_word2vec.py), o None para LSA.
+    :return: Matriz (features, dimension) con el vector de cada feature.
+    """
+    if archivo_word2vec is not None:
+        from gensim.models import KeyedVectors
+
+        vectores_palabras = KeyedVectors.load(archivo_word2vec, mmap='r')
+        vectores = np.zeros((len(nombres_features), vectores_palabras.vector_size), dtype=np.float32)
+        for j, nombre in enumerate(nombres_features):
+            if nombre in vectores_palabras.key_to_index:
+                vectores[j] = vectores_palabras[nombre]
+        return vectores
+    tfidf = TfidfTransformer().fit_transform(train_X)
+    svd = TruncatedSVD(n_components=min(dimension, min(tfidf.shape) - 1), random_state=semilla).fit(tfidf)
+    return (svd.components_.T * svd.singular_values_).astype(np.float32)
+
+
+def embedding_medio(X, vectores: np.ndarray) -> np.ndarray:
+    """
+    :return: Por cada fila de X (conteos), el promedio de los vectores de sus features pesado por los conteos.
+    """
+    return np.asarray(normalize(sp.csr_matrix(X, dtype=np.float32), norm="l1") @ vectores)
+
+
+def construir_representaciones(train_X, train_y, test_X, nombres_features: Sequence[str],
+                               usadas: Sequence[str] = REPRESENTACIONES, max_features: int = MAX_FEATURES,
+                               archivo_word2vec: Optional[str] = None) -> Dict[str, Tuple]:
+    """
+    Construye 1 vez por fold, con el train del fold, las representaciones que usan los modelos.
+    :return: representacion -> (train, test)
+    """
+    representaciones = {}
+    if "chi2" in usadas:
+        selector = SelectKBest(score_func=chi2, k=min(max_features, train_X.shape[1])).fit(train_X, train_y)
+        representaciones["chi2"] = (selector.transform(train_X), selector.transform(test_X))
+    if "embedding_medio" in usadas:
+        vectores = vectores_de_palabras(nombres_features, train_X, archivo_word2vec=archivo_word2vec)
+        representaciones["embedding_medio"] = (embedding_medio(train_X, vectores), embedding_medio(test_X, vectores))
+    return representaciones
+
+
+def _entrenar_y_predecir(clasificador, train_X, train_y, test_X, n_clases: int) -> Dict:
+    """
+    Entrena 1 modelo y predice el test (corre en un proceso de joblib).
+    :return: {"preds", "scores" (n_test, n_clases), "probabilidades" (o None), "segundos_fit", "segundos_predict"}
+    """
+    inicio = time.perf_counter()
+    clasificador.fit(train_X, train_y)
+    segundos_fit = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    preds = clasificador.predict(test_X)
+    probabilidades = None
+    if hasattr(clasificador, "predict_proba"):
+        probabilidades = np.zeros((test_X.shape[0], n_clases))
+        # si en el train del fold falta alguna clase, su columna queda en 0
+        probabilidades[:, clasificador.classes_] = clasificador.predict_proba(test_X)
+        scores = probabilidades
+    else:
+        scores = np.zeros((test_X.shape[0], n_clases))
+        decision = clasificador.decision_function(test_X)
+        scores[:, clasificador.classes_] = decision if decision.ndim == 2 else np.column_stack([-decision, decision])
+    return {"preds": preds, "scores": scores, "probabilidades": probabilidades,
+            "segundos_fit": segundos_fit, "segundos_predict": time.perf_counter() - inicio}
+
+
+def _metricas(test_y, preds, scores, n_clases: int) -> Dict:
+    test_bin = label_binarize(test_y, classes=range(n_clases))
+    if test_bin.shape[1] == 1:
+        test_bin = np.column_stack([1 - test_bin[:, 0], test_bin[:, 0]])
+    return {"accuracy": accuracy_score(test_y, preds),
+            "auc_por_clase": evaluacion._calcular_auc_por_clase(test_bin, scores),
+            "matriz_confusion": confusion_matrix(test_y, preds, labels=range(n_clases))}
+
+
+def comparar_modelos(vectores, targets, idx_a_clase, nombres_features, modelos: Dict[str, Tuple] = MODELOS,
+                     cant_folds: int = CANT_FOLDS_CV, max_features: int = MAX_FEATURES, ensamble: bool = True,
+                     grupos: Optional[np.ndarray] = None, archivo_word2vec: Optional[str] = None,
+                     n_jobs: int = N_JOBS, semilla: Optional[int] = None) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
+    """
+    Evalua todos los modelos con los mismos folds (estratificados; por grupo de duplicados si hay grupos).
+    :param modelos: nombre -> (representacion, clasificador de sklearn).
+    :param ensamble: Agregar el voto suave de los modelos con predict_proba.
+    :return: (tabla con 1 fila por modelo, nombre del modelo -> matriz de confusion sumando los folds)
+    """
+    n_clases = len(idx_a_clase)
+    usadas = sorted({representacion for representacion, _ in modelos.values()})
+    if grupos is None:
+        folds = StratifiedKFold(n_splits=cant_folds, shuffle=True, random_state=semilla).split(vectores, targets)
+    else:
+        folds = StratifiedGroupKFold(n_splits=cant_folds, shuffle=True, random_state=semilla).split(vectores, targets, grupos)
+    por_modelo: Dict[str, List[Dict]] = {nombre: [] for nombre in list(modelos) + ([NOMBRE_ENSAMBLE] if ensamble else [])}
+    segundos_representaciones = 0.0
+
+    with Parallel(n_jobs=n_jobs) as paralelo:
+        for n_fold, (train_index, test_index) in enumerate(folds, start=1):
+            train_X, test_X = vectores[train_index], vectores[test_index]
+            train_y, test_y = targets[train_index], targets[test_index]
+            inicio = time.perf_counter()
+            with registro.etapa("representaciones", items=len(train_index)):
+                representaciones = construir_representaciones(train_X, train_y, test_X, nombres_features, usadas,
+                                                              max_features, archivo_word2vec)
+            segundos_representaciones += time.perf_counter() - inicio
+
+            with registro.etapa("entrenamiento", items=len(train_index) * len(modelos)):
+                resultados = paralelo(delayed(_entrenar_y_predecir)(clone(clasificador), representaciones[representacion][0],
+                                                                    train_y, representaciones[representacion][1], n_clases)
+                                      for representacion, clasificador in modelos.values())
+            resultados = dict(zip(modelos, resultados))
+            if ensamble:
+                con_probabilidades = [r for r in resultados.values() if r["probabilidades"] is not None]
+                if con_probabilidades:
+                    promedio = np.mean([r["probabilidades"] for r in con_probabilidades], axis=0)
+                    resultados[NOMBRE_ENSAMBLE] = {"preds": promedio.argmax(axis=1), "scores": promedio,
+                                                   "segundos_fit": sum(r["segundos_fit"] for r in con_probabilidades),
+                                                   "segundos_predict": sum(r["segundos_predict"] for r in con_probabilidades)}
+
+            for nombre, resultado in resultados.items():
+                metricas = _metricas(test_y, resultado["preds"], resultado["scores"], n_clases)
+                metricas.update(segundos_fit=resultado["segundos_fit"], segundos_predict=resultado["segundos_predict"])
+                por_modelo[nombre].append(metricas)
+                registro.evento("modelo_fold", modelo=nombre, n_fold=n_fold, accuracy=metricas["accuracy"],
+                                auc_por_clase={str(idx_a_clase[i]): v for i, v in metricas["auc_por_clase"].items()},
+                                segundos_fit=metricas["segundos_fit"], segundos_predict=metricas["segundos_predict"])
+            print(f"[INFO] Fold #{n_fold}: " + ", ".join(f"{nombre} {por_modelo[nombre][-1]['accuracy']:.3f}"
+                                                       for nombre in resultados))
+
+    filas, matrices = [], {}
+    for nombre, folds_modelo in por_modelo.items():
+        if not folds_modelo:
+            continue
+        auc_por_clase = np.array([[fold["auc_por_clase"][i] for i in range(n_clases)] for fold in folds_modelo])
+        fila = {"modelo": nombre,
+                "accuracy": np.mean([fold["accuracy"] for fold in folds_modelo]),
+                "accuracy_std": np.std([fold["accuracy"] for fold in folds_modelo]),
+                "auc": np.nanmean(auc_por_clase)}
+        fila.update({f"auc_{idx_a_clase[i]}": np.nanmean(auc_por_clase[:, i]) for i in range(n_clases)})
+        fila.update(segundos_fit=sum(fold["segundos_fit"] for fold in folds_modelo),
+                    segundos_predict=sum(fold["segundos_predict"] for fold in folds_modelo))
+        filas.append(fila)
+        matrices[nombre] = sum(fold["matriz_confusion"] for fold in folds_modelo)
+    tabla = pd.DataFrame(filas).sort_values("accuracy", ascending=False, ignore_index=True)
+    registro.evento("comparacion", folds=cant_folds, segundos_representaciones=segundos_representaciones,
+                    tabla=tabla.to_dict(orient="records"))
+    print(f"[INFO] Representaciones: {segundos_representaciones:.2f}s en total (1 vez por fold, para todos los modelos)")
+    return tabla, matrices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara clasificadores con las mismas features por fold")
+    parser.add_argument("--modelos", nargs="+", choices=list(MODELOS), default=list(MODELOS),
+                        help="Modelos a comparar (default: todos)")
+    parser.add_argument("--folds", type=int, default=CANT_FOLDS_CV, help=f"Folds de CV (default: {CANT_FOLDS_CV})")
+    parser.add_argument("--max-features", type=int, default=MAX_FEATURES, help=f"Features chi2 (default: {MAX_FEATURES})")
+    parser.add_argument("--word2vec", help="KeyedVectors de gensim para embedding_medio (default: LSA del fold)")
+    parser.add_argument("--sin-ensamble", action="store_true", help="No agregar el ensamble por voto suave")
+    parser.add_argument("--n-jobs", type=int, default=N_JOBS, help=f"Procesos para entrenar (default: {N_JOBS})")
+    parser.add_argument("--csv", help="Guardar la tabla comparativa en este CSV")
+    args = parser.parse_args()
+
+    with registro.etapa("lectura"):
+        vectores = joblib.load(evaluacion.VECTORS_FILE)
+        nombres_targets = joblib.load(evaluacion.TARGETS_FILE)
+        nombres_features = joblib.load(evaluacion.FEATURE_NAMES_FILE)
+        grupos, _ = leer_grupos(evaluacion.GRUPOS_FILE, vectores.shape[0])
+    label_encoder = LabelEncoder()
+    targets = label_encoder.fit_transform(nombres_targets)
+    idx_a_clase = label_encoder.classes_
+
+    tabla, matrices = comparar_modelos(vectores, targets, idx_a_clase, nombres_features,
+                                       {nombre: MODELOS[nombre] for nombre in args.modelos}, args.folds,
+                                       args.max_features, not args.sin_ensamble, grupos, args.word2vec, args.n_jobs)
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.4f}".format):
+        print(tabla.to_string(index=False))
+    for nombre, matriz in matrices.items():
+        print(f"\nMatriz de confusion de {nombre} (filas=real, columnas=prediccion; {', '.join(idx_a_clase)}):")
+        print(matriz)
+    if args.csv:
+        tabla.to_csv(args.csv, index=False)
+        print(f"[OK] Tabla guardada en {args.csv}")
+    registro.resumen()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Control adaptativo de concurrencia y delay para el crawler de Scrapy.
+
+En vez de un DOWNLOAD_DELAY fijo, el downloader middleware ControlAdaptativoMiddleware ajusta cada N respuestas
+la concurrencia y el delay del slot de descarga (1 por dominio) segun lo que responde el servidor:
+
+- si mas de TASA_SOBRECARGA_TOLERADA de las respuestas fueron 429, 5xx o timeouts: baja la concurrencia a la mitad,
+  o si ya era 1 duplica el delay (y respeta el Retry-After del servidor)
+- si la latencia promedio supera FACTOR_LATENCIA veces la de la ventana mas rapida (el servidor se esta saturando):
+  baja la concurrencia en 1
+- si no: baja el delay a la mitad hasta el piso configurado, y despues sube la concurrencia hasta el techo
+  (al principio la duplica, y despues de la 1ra saturacion la sube de a 1)
+
+Tambien junta estadisticas por seccion (respuestas, errores, latencia, bytes) en las stats de Scrapy.
+
+Se activa con estos settings (ver NewsSpider.custom_settings en 1-web-scrapping.py):
+    DOWNLOADER_MIDDLEWARES = {"control_adaptativo.ControlAdaptativoMiddleware": 900}
+    ADAPTATIVO_ENABLED = True
+    ADAPTATIVO_CONCURRENCIA_MAXIMA (techo), ADAPTATIVO_DELAY_MINIMO (piso de cortesia), ADAPTATIVO_DELAY_MAXIMO
+    ADAPTATIVO_VENTANA (respuestas entre ajustes), ADAPTATIVO_FACTOR_LATENCIA, ADAPTATIVO_TASA_SOBRECARGA_TOLERADA
+Los valores iniciales son los de CONCURRENT_REQUESTS_PER_DOMAIN y DOWNLOAD_DELAY.
+La concurrencia total del downloader se limita a la suma de la de los slots (sin pasar CONCURRENT_REQUESTS),
+porque algunas versiones de Scrapy no respetan del todo la concurrencia por slot cuando el delay es 0.
+"""
+import re
+import time
+from typing import Dict, Optional
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+CONCURRENCIA_MAXIMA = 8
+DELAY_MINIMO = 0.25
+DELAY_MAXIMO = 60.0
+VENTANA = 20
+SEGUNDOS_VENTANA = 2.0
+FACTOR_LATENCIA = 2.0
+# fraccion de 429/5xx/timeouts en la ventana a partir de la cual se baja el ritmo
+TASA_SOBRECARGA_TOLERADA = 0.1
+# cantidad de sobrecargas que hacen bajar el ritmo sin esperar a completar la ventana
+SOBRECARGAS_INMEDIATAS = 3
+# status que indican que hay que bajar el ritmo
+STATUS_SOBRECARGA = (429, 500, 502, 503, 504, 520, 522, 524)
+
+regex_seccion = re.compile(r"/secciones/([^/?#]+)")
+
+
+def seccion_de_request(request) -> str:
+    """
+    :return: La seccion de la url ("/secciones/<seccion>"), o la de la pagina de indice que la referencio,
+    o "otras" si no se puede saber.
+    """
+    if "seccion" in request.meta:
+        return request.meta["seccion"]
+    m = regex_seccion.search(request.url)
+    if m is None:
+        referer = request.headers.get("Referer")
+        if referer:
+            m = regex_seccion.search(referer.decode("latin-1"))
+    return m.group(1) if m else "otras"
+
+
+class _EstadoSlot:
+    """
+    Lo observado en 1 slot de descarga desde el ultimo ajuste.
+    """
+
+    def __init__(self):
+        self.respuestas = 0
+        self.sobrecargas = 0
+        self.latencia_total = 0.0
+        # el menor promedio de latencia de una ventana: la latencia del servidor sin carga
+        self.latencia_base: Optional[float] = None
+        self.retry_after = 0.0
+        self.ultimo_descenso = 0.0
+        # como en TCP: duplicar la concurrencia hasta la 1ra señal de saturacion, despues sumar de a 1
+        self.arranque_lento = True
+        self.inicio_ventana = time.monotonic()
+
+    def reiniciar_ventana(self):
+        self.inicio_ventana = time.monotonic()
+        self.respuestas = 0
+        self.sobrecargas = 0
+        self.latencia_total = 0.0
+        self.retry_after = 0.0
+
+
+class ControlAdaptativoMiddleware:
+    """
+    Downloader middleware que ajusta concurrencia y delay de cada slot de descarga segun las respuestas.
+    Va con prioridad alta (cerca del downloader) para ver los 429/5xx antes que RetryMiddleware.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTATIVO_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.concurrencia_inicial = settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        self.concurrencia_maxima = settings.getint("ADAPTATIVO_CONCURRENCIA_MAXIMA", CONCURRENCIA_MAXIMA)
+        self.delay_inicial = settings.getfloat("DOWNLOAD_DELAY")
+        self.delay_minimo = settings.getfloat("ADAPTATIVO_DELAY_MINIMO", DELAY_MINIMO)
+        self.delay_maximo = settings.getfloat("ADAPTATIVO_DELAY_MAXIMO", DELAY_MAXIMO)
+        self.ventana = settings.getint("ADAPTATIVO_VENTANA", VENTANA)
+        self.factor_latencia = settings.getfloat("ADAPTATIVO_FACTOR_LATENCIA", FACTOR_LATENCIA)
+        self.tasa_tolerada = settings.getfloat("ADAPTATIVO_TASA_SOBRECARGA_TOLERADA", TASA_SOBRECARGA_TOLERADA)
+        self.estados: Dict[str, _EstadoSlot] = {}
+        self.por_seccion: Dict[str, Dict] = {}
+        self.ajustes = []
+        self.inicio = time.monotonic()
+        self.concurrencia_total_maxima = settings.getint("CONCURRENT_REQUESTS")
+        crawler.signals.connect(self.engine_started, signal=signals.engine_started)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def engine_started(self):
+        self._limitar_concurrencia_total()
+
+    def _limitar_concurrencia_total(self):
+        slots = self.crawler.engine.downloader.slots
+        total = sum(slots[clave].concurrency for clave in self.estados if clave in slots)
+        self.crawler.engine.downloader.total_concurrency = min(self.concurrencia_total_maxima,
+                                                               max(total, self.concurrencia_inicial))
+
+    def _slot(self, request):
+        clave = request.meta.get("download_slot")
+        if clave is None:
+            return None, None
+        slot = self.crawler.engine.downloader.slots.get(clave)
+        if slot is not None and clave not in self.estados:
+            self.estados[clave] = _EstadoSlot()
+        return clave, slot
+
+    def _stats_seccion(self, request) -> Dict:
+        seccion = seccion_de_request(request)
+        if seccion not in self.por_seccion:
+            self.por_seccion[seccion] = {"respuestas": 0, "status_429": 0, "status_5xx": 0, "timeouts": 0,
+                                         "excepciones": 0, "latencia_total": 0.0, "bytes": 0}
+        return self.por_seccion[seccion]
+
+    def process_response(self, request, response, spider):
+        clave, slot = self._slot(request)
+        stats = self._stats_seccion(request)
+        latencia = request.meta.get("download_latency", 0.0)
+        stats["respuestas"] += 1
+        stats["latencia_total"] += latencia
+        stats["bytes"] += len(response.body)
+        if response.status == 429:
+            stats["status_429"] += 1
+        elif response.status >= 500:
+            stats["status_5xx"] += 1
+        if slot is None:
+            return response
+        estado = self.estados[clave]
+        estado.respuestas += 1
+        if response.status in STATUS_SOBRECARGA:
+            estado.sobrecargas += 1
+            try:
+                estado.retry_after = max(estado.retry_after, float(response.headers.get("Retry-After", b"0")))
+            except ValueError:
+                pass
+        else:
+            estado.latencia_total += latencia
+        self._ajustar(clave, slot, estado)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        clave, slot = self._slot(request)
+        stats = self._stats_seccion(request)
+        if "Timeout" in type(exception).__name__:
+            stats["timeouts"] += 1
+        else:
+            stats["excepciones"] += 1
+        if slot is not None:
+            estado = self.estados[clave]
+            estado.respuestas += 1
+            estado.sobrecargas += 1
+            self._ajustar(clave, slot, estado)
+        # seguir con el manejo normal (RetryMiddleware)
+        return None
+
+    def _ajustar(self, clave: str, slot, estado: _EstadoSlot):
+        # la ventana se completa con VENTANA respuestas o SEGUNDOS_VENTANA segundos (cuando el delay es alto),
+        # y ante varias sobrecargas seguidas no se espera a completarla
+        ventana_completa = (estado.respuestas >= self.ventana
+                            or (estado.respuestas >= 3 and time.monotonic() - estado.inicio_ventana >= SEGUNDOS_VENTANA))
+        if not ventana_completa and estado.sobrecargas < SOBRECARGAS_INMEDIATAS:
+            return
+        if estado.sobrecargas >= SOBRECARGAS_INMEDIATAS or estado.sobrecargas / estado.respuestas > self.tasa_tolerada:
+            # las respuestas que ya estaban en vuelo cuando se bajo el ritmo no cuentan 2 veces
+            if time.monotonic() - estado.ultimo_descenso < max(1.0, slot.delay):
+                motivo = "espera"
+            else:
+                estado.ultimo_descenso = time.monotonic()
+                estado.arranque_lento = False
+                if slot.concurrency > 1:
+                    slot.concurrency = max(1, slot.concurrency // 2)
+                else:
+                    slot.delay = max(slot.delay * 2, self.delay_minimo, 0.25)
+                slot.delay = min(self.delay_maximo, max(slot.delay, estado.retry_after))
+                motivo = "sobrecarga"
+        else:
+            respuestas_ok = estado.respuestas - estado.sobrecargas
+            latencia_promedio = estado.latencia_total / respuestas_ok
+            if estado.latencia_base is None or latencia_promedio < estado.latencia_base:
+                estado.latencia_base = latencia_promedio
+            if latencia_promedio > self.factor_latencia * estado.latencia_base:
+                slot.concurrency = max(1, slot.concurrency - 1)
+                estado.arranque_lento = False
+                motivo = "latencia"
+            elif slot.delay > self.delay_minimo:
+                # con delay > 0 Scrapy manda 1 pedido cada "delay" segundos sin importar la concurrencia,
+                # asi que primero se baja el delay y recien despues se sube la concurrencia
+                slot.delay = slot.delay / 2 if slot.delay / 2 > max(self.delay_minimo, 0.05) else self.delay_minimo
+                motivo = "menos_delay"
+            else:
+                aumento = slot.concurrency if estado.arranque_lento else 1
+                slot.concurrency = min(self.concurrencia_maxima, slot.concurrency + aumento)
+                motivo = "mas_concurrencia"
+        self._limitar_concurrencia_total()
+        self.ajustes.append({
+            "t": round(time.monotonic() - self.inicio, 3),
+            "slot": clave,
+            "motivo": motivo,
+            "concurrencia": slot.concurrency,
+            "delay": round(slot.delay, 3),
+        })
+        estado.reiniciar_ventana()
+
+    def resumen(self) -> Dict:
+        secciones = {}
+        for seccion, s in self.por_seccion.items():
+            secciones[seccion] = {**s, "latencia_promedio": round(s["latencia_total"] / s["respuestas"], 4) if s["respuestas"] else None}
+            del secciones[seccion]["latencia_total"]
+        ultimo = self.ajustes[-1] if self.ajustes else {}
+        return {
+            "secciones": secciones,
+            "cantidad_ajustes": len(self.ajustes),
+            "concurrencia_final": ultimo.get("concurrencia", self.concurrencia_inicial),
+            "delay_final": ultimo.get("delay", self.delay_inicial),
+            "concurrencia_maxima_alcanzada": max((a["concurrencia"] for a in self.ajustes), default=self.concurrencia_inicial),
+        }
+
+    def spider_closed(self, spider, reason):
+        resumen = self.resumen()
+        stats = self.crawler.stats
+        for seccion, valores in resumen["secciones"].items():
+            for nombre, valor in valores.items():
+                stats.set_value(f"adaptativo/{seccion}/{nombre}", valor)
+        for nombre in ("cantidad_ajustes", "concurrencia_final", "delay_final", "concurrencia_maxima_alcanzada"):
+            stats.set_value(f"adaptativo/{nombre}", resumen[nombre])
+        registro = getattr(spider, "registro", None)
+        if registro is not None:
+            registro.evento("control_adaptativo", **resumen)
@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+"""
+Corpus pre-tokenizado: los textos se normalizan (minusculas, sin acentos) y se tokenizan 1 sola vez, y se guardan como
+un array uint32 de IDs de token (memory-mapped), los offsets de cada documento y el vocabulario.
+El directorio de cache depende de la configuracion del tokenizador y del contenido del corpus, asi que
+cambiar la regex o los textos genera otra cache y nunca se mezclan.
+
+VectorizadorTokens arma las matrices de conteo o TF-IDF (unigramas, bigramas, ...) directamente desde los IDs con NumPy,
+con la misma salida que CountVectorizer / TfidfVectorizer de sklearn. Probar otro ngram_range, min_df, max_df
+o lista de stopwords no vuelve a tokenizar: las stopwords se filtran sobre los IDs.
+
+Ejemplo:
+    config = config_tokenizador(token_pattern=r"[a-zA-Z...]+", lowercase=True, strip_accents="unicode")
+    corpus = CorpusTokenizado.construir(textos, config, ids_docs=archivos)
+    vectores = VectorizadorTokens(stop_words=stopwords, ngram_range=(1, 2), min_df=3, max_df=0.8).fit_transform(corpus)
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from array import array
+from numbers import Integral
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import TfidfTransformer, strip_accents_unicode
+
+DIR_CACHE_TOKENS = "./cache_tokens"
+# la misma que usa sklearn por defecto
+TOKEN_PATTERN_SKLEARN = r"(?u)\b\w\w+\b"
+ARCHIVO_TOKENS = "tokens.u32"
+ARCHIVO_OFFSETS = "offsets.npy"
+ARCHIVO_VOCABULARIO = "vocabulario.json"
+ARCHIVO_DOCS = "docs.json"
+ARCHIVO_CONFIG = "config.json"
+# cada cuantos documentos se vuelcan los IDs al archivo mientras se tokeniza
+DOCS_POR_BLOQUE = 5000
+# de a cuantos documentos se cuentan los n-gramas: acota la memoria de los arrays intermedios
+DOCS_POR_BLOQUE_CONTEO = 500
+
+
+def config_tokenizador(token_pattern: str = TOKEN_PATTERN_SKLEARN, lowercase: bool = True,
+                       strip_accents: Optional[str] = "unicode") -> Dict:
+    """
+    :param token_pattern: Regex que define que es un token.
+    :param lowercase: Pasar el texto a minusculas antes de tokenizar (como sklearn).
+    :param strip_accents: "unicode" para quitar acentos antes de tokenizar (como sklearn), o None.
+    :return: La configuracion del tokenizador, que tambien es la clave de la cache.
+    """
+    if strip_accents not in ("unicode", None):
+        raise ValueError(f"strip_accents debe ser 'unicode' o None, no {strip_accents!r}")
+    return {"token_pattern": token_pattern, "lowercase": lowercase, "strip_accents": strip_accents}
+
+
+def clave_config(config: Dict) -> str:
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def huella_corpus(textos: Iterable[str]) -> str:
+    h = hashlib.sha1()
+    for texto in textos:
+        h.update(texto.encode("utf-8", errors="ignore"))
+        h.update(b"\0")
+    return h.hexdigest()[:12]
+
+
+def _tokenizar(textos: Iterable[str], config: Dict, destino) -> Tuple[np.ndarray, List[str]]:
+    """
+    Tokeniza los textos escribiendo los IDs en "destino" (un archivo binario abierto) por bloques.
+    :return: (offsets de cada documento, vocabulario)
+    """
+    regex = re.compile(config["token_pattern"])
+    ids_por_token: Dict[str, int] = {}
+    offsets = [0]
+    bloque = array("I")
+    for i, texto in enumerate(textos, start=1):
+        if config["lowercase"]:
+            texto = texto.lower()
+        if config["strip_accents"] == "unicode":
+            texto = strip_accents_unicode(texto)
+        tokens = regex.findall(texto)
+        # setdefault asigna el proximo ID a los tokens nuevos
+        bloque.extend([ids_por_token.setdefault(t, len(ids_por_token)) for t in tokens])
+        offsets.append(offsets[-1] + len(tokens))
+        if i % DOCS_POR_BLOQUE == 0:
+            bloque.tofile(destino)
+            bloque = array("I")
+    bloque.tofile(destino)
+    return np.asarray(offsets, dtype=np.int64), list(ids_por_token)
+
+
+class CorpusTokenizado:
+    """
+    Un corpus como IDs de token: tokens[offsets[i]:offsets[i+1]] son los IDs del documento i,
+    y vocabulario[id] es el token.
+    """
+
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, vocabulario: List[str], config: Dict,
+                 ids_docs: Optional[List] = None, directorio: Optional[Path] = None):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.vocabulario = vocabulario
+        self.config = config
+        self.ids_docs = ids_docs if ids_docs is not None else list(range(len(offsets) - 1))
+        self.directorio = directorio
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def documento(self, i: int) -> List[str]:
+        """
+        :return: Los tokens del documento i (util para revisar la tokenizacion).
+        """
+        return [self.vocabulario[t] for t in self.tokens[self.offsets[i]:self.offsets[i + 1]]]
+
+    @classmethod
+    def desde_textos(cls, textos: Sequence[str], config: Dict, ids_docs: Optional[List] = None) -> "CorpusTokenizado":
+        """
+        Tokeniza en memoria, sin cache (para pocos documentos, p.ej. los que se quieren predecir).
+        """
+        buffer = io.BytesIO()
+        offsets, vocabulario = _tokenizar(textos, config, buffer)
+        return cls(np.frombuffer(buffer.getvalue(), dtype=np.uint32), offsets, vocabulario, config, ids_docs)
+
+    @classmethod
+    def construir(cls, textos: Sequence[str], config: Dict, dir_cache: Union[str, Path] = DIR_CACHE_TOKENS,
+                  ids_docs: Optional[List] = None) -> "CorpusTokenizado":
+        """
+        Devuelve el corpus tokenizado desde la cache, o lo tokeniza y lo guarda en la cache si no estaba.
+        :param textos: Los textos del corpus.
+        :param config: La configuracion del tokenizador (ver config_tokenizador).
+        :param dir_cache: Directorio de la cache; adentro se crea 1 subdirectorio por configuracion y corpus.
+        :param ids_docs: Un identificador por documento (p.ej. el nombre de archivo), que se guarda con el corpus.
+        """
+        directorio = Path(dir_cache) / f"{clave_config(config)}-{huella_corpus(textos)}"
+        if not (directorio / ARCHIVO_CONFIG).exists():
+            Path(dir_cache).mkdir(parents=True, exist_ok=True)
+            # escribir en un directorio temporal y renombrar, para no dejar una cache a medio escribir
+            dir_temporal = Path(tempfile.mkdtemp(dir=dir_cache, prefix=".tmp-"))
+            try:
+                with open(dir_temporal / ARCHIVO_TOKENS, "wb") as f:
+                    offsets, vocabulario = _tokenizar(textos, config, f)
+                np.save(dir_temporal / ARCHIVO_OFFSETS, offsets)
+                (dir_temporal / ARCHIVO_VOCABULARIO).write_text(json.dumps(vocabulario, ensure_ascii=False), encoding="utf-8")
+                (dir_temporal / ARCHIVO_DOCS).write_text(json.dumps(ids_docs if ids_docs is not None else list(range(len(textos))),
+                                                                    ensure_ascii=False), encoding="utf-8")
+                (dir_temporal / ARCHIVO_CONFIG).write_text(json.dumps(config, ensure_ascii=False), encoding="utf-8")
+                os.replace(dir_temporal, directorio)
+            except OSError:
+                # otro proceso la escribio primero
+                shutil.rmtree(dir_temporal, ignore_errors=True)
+                if not (directorio / ARCHIVO_CONFIG).exists():
+                    raise
+        corpus = cls.cargar(directorio)
+        if ids_docs is not None:
+            corpus.ids_docs = list(ids_docs)
+        return corpus
+
+    @classmethod
+    def cargar(cls, directorio: Union[str, Path]) -> "CorpusTokenizado":
+        directorio = Path(directorio)
+        offsets = np.load(directorio / ARCHIVO_OFFSETS)
+        if offsets[-1] > 0:
+            tokens = np.memmap(directorio / ARCHIVO_TOKENS, dtype=np.uint32, mode="r")
+        else:
+            # np.memmap no acepta archivos vacios
+            tokens = np.zeros(0, dtype=np.uint32)
+        return cls(
+            tokens, offsets,
+            json.loads((directorio / ARCHIVO_VOCABULARIO).read_text(encoding="utf-8")),
+            json.loads((directorio / ARCHIVO_CONFIG).read_text(encoding="utf-8")),
+            json.loads((directorio / ARCHIVO_DOCS).read_text(encoding="utf-8")),
+            directorio,
+        )
+
+
+def _claves_ngramas(ids: np.ndarray, docs: np.ndarray, n: int, tamanio_vocabulario: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Codifica cada n-grama (n tokens consecutivos del mismo documento) como 1 entero en base tamanio_vocabulario.
+    Los IDs negativos (tokens desconocidos o podados) invalidan los n-gramas que los contienen.
+    :return: (claves de los n-gramas, documento de cada uno)
+    """
+    m = len(ids) - n + 1
+    if m <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    claves = ids[:m].astype(np.int64)
+    validas = ids[:m] >= 0
+    for k in range(1, n):
+        claves = claves * tamanio_vocabulario + ids[k:k + m]
+        validas &= (ids[k:k + m] >= 0) & (docs[k:k + m] == docs[:m])
+    return claves[validas], docs[:m][validas]
+
+
+def _decodificar_claves(claves: np.ndarray, n: int, tamanio_vocabulario: int) -> np.ndarray:
+    """
+    :return: Matriz (len(claves), n) con los IDs de los tokens de cada n-grama.
+    """
+    ids = np.empty((len(claves), n), dtype=np.int64)
+    resto = claves.copy()
+    for k in range(n - 1, -1, -1):
+        ids[:, k] = resto % tamanio_vocabulario
+        resto //= tamanio_vocabulario
+    return ids
+
+
+def _contar_bloque(claves: np.ndarray, docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: (claves distintas, en cuantos documentos aparece cada una, cuantas veces aparece cada una)
+    """
+    unicas, inversa, tf = np.unique(claves, return_inverse=True, return_counts=True)
+    # pares (clave, documento) distintos: ordenar por clave y documento y quedarse con los cambios
+    orden = np.lexsort((docs, inversa))
+    inversa, docs = inversa[orden], docs[orden]
+    nuevos = np.ones(len(inversa), dtype=bool)
+    nuevos[1:] = (inversa[1:] != inversa[:-1]) | (docs[1:] != docs[:-1])
+    df = np.bincount(inversa[nuevos], minlength=len(unicas))
+    return unicas, df, tf
+
+
+def _fusionar_conteos(conteos: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Suma los conteos (claves, df, tf) de varios bloques. Los bloques tienen documentos distintos, asi que el DF se suma.
+    """
+    if len(conteos) == 1:
+        return conteos[0]
+    claves = np.concatenate([c[0] for c in conteos])
+    if len(claves) == 0:
+        return conteos[0]
+    orden = np.argsort(claves, kind="stable")
+    claves = claves[orden]
+    inicios = np.flatnonzero(np.r_[True, claves[1:] != claves[:-1]])
+    df = np.add.reduceat(np.concatenate([c[1] for c in conteos])[orden], inicios)
+    tf = np.add.reduceat(np.concatenate([c[2] for c in conteos])[orden], inicios)
+    return claves[inicios], df, tf
+
+
+def _apilar_filas(bloques: List[sp.csr_matrix], n_columnas: int) -> sp.csr_matrix:
+    """
+    Como sp.vstack, pero copiando cada bloque al resultado y liberandolo enseguida: el pico de memoria es la matriz
+    final mas 1 bloque, y no el doble de la matriz final.
+    """
+    nnz = sum(b.nnz for b in bloques)
+    n_filas = sum(b.shape[0] for b in bloques)
+    tipo_indice = np.int32 if max(nnz, n_columnas) < 2 ** 31 else np.int64
+    data = np.empty(nnz, dtype=np.int64)
+    indices = np.empty(nnz, dtype=tipo_indice)
+    indptr = np.zeros(n_filas + 1, dtype=tipo_indice)
+    fila, posicion = 0, 0
+    bloques.reverse()
+    while bloques:
+        bloque = bloques.pop()
+        data[posicion:posicion + bloque.nnz] = bloque.data
+        indices[posicion:posicion + bloque.nnz] = bloque.indices
+        indptr[fila + 1:fila + bloque.shape[0] + 1] = bloque.indptr[1:] + posicion
+        fila += bloque.shape[0]
+        posicion += bloque.nnz
+        del bloque
+    return sp.csr_matrix((data, indices, indptr), shape=(n_filas, n_columnas), copy=False)
+
+
+class SketchCountMin:
+    """
+    Count-min sketch sobre claves enteras: "profundidad" filas de "ancho" contadores, 1 hash por fila.
+    La estimacion de una clave es el minimo de sus contadores, que nunca es menor que el valor real
+    (las colisiones solo suman), asi que sirve para descartar claves que seguro no llegan a un umbral.
+    """
+
+    def __init__(self, ancho: int, profundidad: int = 4, semilla: int = 0):
+        # multiply-shift: el ancho se redondea a potencia de 2
+        self.bits = max(int(np.ceil(np.log2(max(ancho, 2)))), 1)
+        self.ancho = 1 << self.bits
+        self.profundidad = profundidad
+        rng = np.random.default_rng(semilla)
+        self.multiplicadores = rng.integers(1, 2 ** 63, size=profundidad, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.contadores = np.zeros((profundidad, self.ancho), dtype=np.uint32)
+
+    def _posiciones(self, claves: np.ndarray) -> np.ndarray:
+        claves = claves.astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return np.stack([(claves * a) >> np.uint64(64 - self.bits) for a in self.multiplicadores]).astype(np.int64)
+
+    def sumar(self, claves: np.ndarray, cantidades: np.ndarray):
+        posiciones = self._posiciones(claves)
+        for fila in range(self.profundidad):
+            self.contadores[fila] += np.bincount(posiciones[fila], weights=cantidades, minlength=self.ancho).astype(np.uint32)
+
+    def estimar(self, claves: np.ndarray) -> np.ndarray:
+        posiciones = self._posiciones(claves)
+        return np.min([self.contadores[fila][posiciones[fila]] for fila in range(self.profundidad)], axis=0)
+
+    @property
+    def megabytes(self) -> float:
+        return self.contadores.nbytes / 1024 ** 2
+
+
+class VectorizadorTokens(BaseEstimator, TransformerMixin):
+    """
+    Equivalente a CountVectorizer (o TfidfVectorizer con tfidf=True) que trabaja sobre un CorpusTokenizado.
+    Tambien acepta una lista de textos, que tokeniza con "config" (o, ya entrenado, con la configuracion del
+    corpus de entrenamiento), asi un Pipeline entrenado con un CorpusTokenizado puede predecir sobre textos nuevos.
+
+    El conteo se hace de a bloques de documentos y en 2 pasadas: primero el DF de los unigramas, y despues solo
+    los n-gramas cuyos tokens llegan a min_df (el DF de un n-grama nunca supera el de sus tokens, asi que el
+    vocabulario final es el mismo). Con ancho_sketch, una pasada intermedia cuenta el DF aproximado de los
+    n-gramas en un count-min sketch y solo se cuentan exactamente los que pueden llegar a min_df: los n-gramas
+    que aparecen 1 sola vez, que son la mayoria, nunca se guardan.
+    Los candidatos descartados en cada pasada quedan en estadisticas_.
+    """
+
+    def __init__(self, config: Optional[Dict] = None, stop_words: Optional[List[str]] = None,
+                 ngram_range: Tuple[int, int] = (1, 1), min_df: Union[int, float] = 1, max_df: Union[int, float] = 1.0,
+                 max_features: Optional[int] = None, tfidf: bool = False, norm: Optional[str] = "l2",
+                 use_idf: bool = True, smooth_idf: bool = True, sublinear_tf: bool = False,
+                 podar_ngramas: bool = True, ancho_sketch: Optional[int] = None, profundidad_sketch: int = 4,
+                 docs_por_bloque: int = DOCS_POR_BLOQUE_CONTEO):
+        self.config = config
+        self.stop_words = stop_words
+        self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.max_df = max_df
+        self.max_features = max_features
+        self.tfidf = tfidf
+        self.norm = norm
+        self.use_idf = use_idf
+        self.smooth_idf = smooth_idf
+        self.sublinear_tf = sublinear_tf
+        self.podar_ngramas = podar_ngramas
+        self.ancho_sketch = ancho_sketch
+        self.profundidad_sketch = profundidad_sketch
+        self.docs_por_bloque = docs_por_bloque
+
+    def _corpus(self, X) -> CorpusTokenizado:
+        # una vez entrenado, los textos se tokenizan como el corpus de entrenamiento
+        config = getattr(self, "config_", None) or self.config or config_tokenizador()
+        if isinstance(X, CorpusTokenizado):
+            if (self.config is not None or hasattr(self, "config_")) and X.config != config:
+                raise ValueError(f"El corpus fue tokenizado con {X.config}, y el vectorizador espera {config}")
+            return X
+        if isinstance(X, str):
+            raise ValueError("Se esperaba una lista de textos, no 1 texto")
+        return CorpusTokenizado.desde_textos(list(X), config)
+
+    def _corpus_entrenamiento(self, X) -> CorpusTokenizado:
+        # al volver a entrenar no se exige la configuracion del entrenamiento anterior
+        if hasattr(self, "config_"):
+            del self.config_
+        return self._corpus(X)
+
+    def _bloques(self, corpus: CorpusTokenizado, mapa: Optional[np.ndarray]) -> Iterable[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        Recorre el corpus de a docs_por_bloque documentos, leyendo del memmap solo ese tramo.
+        :param mapa: IDs del corpus -> IDs del vocabulario entrenado (-1 si no existe); None si son los mismos.
+        :return: (primer documento del bloque, IDs sin stopwords, documento de cada ID relativo al bloque)
+        """
+        es_stopword = None
+        if self.stop_words:
+            stop = set(self.stop_words)
+            es_stopword = np.fromiter((t in stop for t in corpus.vocabulario), dtype=bool, count=len(corpus.vocabulario))
+        for inicio in range(0, len(corpus), self.docs_por_bloque):
+            fin = min(inicio + self.docs_por_bloque, len(corpus))
+            offsets = corpus.offsets[inicio:fin + 1]
+            ids = np.asarray(corpus.tokens[offsets[0]:offsets[-1]], dtype=np.int64)
+            docs = np.repeat(np.arange(fin - inicio, dtype=np.int64), np.diff(offsets))
+            if es_stopword is not None:
+                conservar = ~es_stopword[ids]
+                ids, docs = ids[conservar], docs[conservar]
+            if mapa is not None:
+                ids = mapa[ids]
+            yield inicio, ids, docs
+
+    def fit(self, X, y=None):
+        if self.tfidf:
+            # los idf se entrenan con la matriz de conteos, asi que hay que armarla igual
+            self.fit_transform(X)
+        else:
+            self._fit(self._corpus_entrenamiento(X))
+        return self
+
+    def fit_transform(self, X, y=None):
+        corpus = self._corpus_entrenamiento(X)
+        self._fit(corpus)
+        X_conteos = self._conteos(corpus, None)
+        if self.tfidf:
+            return self._tfidf.fit_transform(X_conteos)
+        return X_conteos
+
+    def _fit(self, corpus: CorpusTokenizado):
+        self.config_ = corpus.config
+        n_docs = len(corpus)
+        vocabulario = corpus.vocabulario
+        tamanio_vocabulario = max(len(vocabulario), 1)
+        min_n, max_n = self.ngram_range
+        if tamanio_vocabulario ** max_n >= 2 ** 63:
+            raise ValueError(f"Vocabulario de {len(vocabulario)} tokens demasiado grande para n-gramas de {max_n}")
+        # mismo criterio que CountVectorizer._limit_features
+        max_doc_count = self.max_df if isinstance(self.max_df, Integral) else self.max_df * n_docs
+        min_doc_count = self.min_df if isinstance(self.min_df, Integral) else self.min_df * n_docs
+        if max_doc_count < min_doc_count:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        self.estadisticas_ = {}
+
+        # 1ra pasada: DF y frecuencia de los unigramas
+        df_tokens = np.zeros(tamanio_vocabulario, dtype=np.int64)
+        tf_tokens = np.zeros(tamanio_vocabulario, dtype=np.int64)
+        for _, ids, docs in self._bloques(corpus, None):
+            pares = np.unique(docs * tamanio_vocabulario + ids)
+            df_tokens += np.bincount(pares % tamanio_vocabulario, minlength=tamanio_vocabulario)
+            tf_tokens += np.bincount(ids, minlength=tamanio_vocabulario)
+        # por cada n: (n-gramas distintos, su DF, su frecuencia total)
+        candidatos = {}
+        if min_n <= 1:
+            unicas = np.flatnonzero(tf_tokens)
+            candidatos[1] = (unicas, df_tokens[unicas], tf_tokens[unicas])
+        # los tokens que no llegan a min_df no pueden formar un n-grama que llegue
+        mapa_poda = None
+        if self.podar_ngramas and min_doc_count > 1:
+            mapa_poda = np.where(df_tokens >= min_doc_count, np.arange(tamanio_vocabulario), -1)
+            self.estadisticas_["tokens_podados"] = int(np.count_nonzero((mapa_poda < 0) & (tf_tokens > 0)))
+
+        for n in range(max(min_n, 2), max_n + 1):
+            # pasada opcional: DF aproximado en el sketch, para contar exacto solo los que pueden llegar a min_df
+            sketch = None
+            if self.ancho_sketch and min_doc_count > 1:
+                sketch = SketchCountMin(self.ancho_sketch, self.profundidad_sketch)
+                for _, ids, docs in self._bloques(corpus, mapa_poda):
+                    claves, docs_n = _claves_ngramas(ids, docs, n, tamanio_vocabulario)
+                    unicas, df, _ = _contar_bloque(claves, docs_n)
+                    sketch.sumar(unicas, df)
+                self.estadisticas_[f"sketch_mb_{n}"] = round(sketch.megabytes, 2)
+            conteos, tamanio_fusionado, descartados_sketch = [], 0, 0
+            for _, ids, docs in self._bloques(corpus, mapa_poda):
+                claves, docs_n = _claves_ngramas(ids, docs, n, tamanio_vocabulario)
+                if sketch is not None:
+                    posibles = sketch.estimar(claves) >= min_doc_count
+                    descartados_sketch += int(np.count_nonzero(~posibles))
+                    claves, docs_n = claves[posibles], docs_n[posibles]
+                conteos.append(_contar_bloque(claves, docs_n))
+                # fusionar cada tanto para que los bloques no repitan las mismas claves en memoria
+                if sum(len(c[0]) for c in conteos) > 2 * tamanio_fusionado + 100_000:
+                    conteos = [_fusionar_conteos(conteos)]
+                    tamanio_fusionado = len(conteos[0][0])
+            candidatos[n] = _fusionar_conteos(conteos) if conteos else (np.zeros(0, dtype=np.int64),) * 3
+            self.estadisticas_[f"candidatos_{n}"] = len(candidatos[n][0])
+            if sketch is not None:
+                self.estadisticas_[f"ocurrencias_descartadas_sketch_{n}"] = descartados_sketch
+
+        # n y posicion entre los candidatos de cada nombre, en arrays y no en tuplas para no ocupar de mas
+        nombres, origen_n, origen_indice, frecuencias = [], [], [], []
+        for n, (unicas, df, tf) in candidatos.items():
+            conservar = np.flatnonzero((df >= min_doc_count) & (df <= max_doc_count))
+            nombres.extend(" ".join(vocabulario[t] for t in fila)
+                           for fila in _decodificar_claves(unicas[conservar], n, tamanio_vocabulario).tolist())
+            origen_n.append(np.full(len(conservar), n, dtype=np.int64))
+            origen_indice.append(conservar)
+            frecuencias.append(tf[conservar])
+        if not nombres:
+            raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+        origen_n, origen_indice = np.concatenate(origen_n), np.concatenate(origen_indice)
+        frecuencias = np.concatenate(frecuencias)
+        # como sklearn: orden alfabetico, y max_features se elige por frecuencia total sobre ese orden
+        orden = np.array(sorted(range(len(nombres)), key=nombres.__getitem__), dtype=np.int64)
+        if self.max_features is not None and self.max_features < len(orden):
+            elegidos = np.sort((-frecuencias[orden]).argsort()[:self.max_features])
+            orden = orden[elegidos]
+
+        self.feature_names_ = np.array([nombres[j] for j in orden], dtype=object)
+        self.vocabulary_ = {nombre: col for col, nombre in enumerate(self.feature_names_)}
+        self._token_a_id = {t: i for i, t in enumerate(vocabulario)}
+        self._tamanio_vocabulario = tamanio_vocabulario
+        columna_de_candidato = {n: np.full(len(c[0]), -1, dtype=np.int64) for n, c in candidatos.items()}
+        for n in columna_de_candidato:
+            de_n = origen_n[orden] == n
+            columna_de_candidato[n][origen_indice[orden][de_n]] = np.flatnonzero(de_n)
+        # por cada n: claves conservadas (ordenadas) y su columna, para armar la matriz
+        self._claves, self._columnas = {}, {}
+        for n, (unicas, _, _) in candidatos.items():
+            conservadas = columna_de_candidato[n] >= 0
+            self._claves[n] = unicas[conservadas]
+            self._columnas[n] = columna_de_candidato[n][conservadas]
+        if self.tfidf:
+            self._tfidf = TfidfTransformer(norm=self.norm, use_idf=self.use_idf, smooth_idf=self.smooth_idf,
+                                           sublinear_tf=self.sublinear_tf)
+
+    def _conteos(self, corpus: CorpusTokenizado, mapa: Optional[np.ndarray]) -> sp.csr_matrix:
+        """
+        :return: La matriz de conteos del corpus con el vocabulario entrenado, armada de a bloques.
+        """
+        bloques = []
+        for inicio, ids, docs in self._bloques(corpus, mapa):
+            filas, columnas = [], []
+            for n, claves_entrenadas in self._claves.items():
+                claves, docs_n = _claves_ngramas(ids, docs, n, self._tamanio_vocabulario)
+                posiciones = np.searchsorted(claves_entrenadas, claves)
+                posiciones[posiciones == len(claves_entrenadas)] = 0
+                encontradas = claves_entrenadas[posiciones] == claves if len(claves_entrenadas) else np.zeros(len(claves), dtype=bool)
+                filas.append(docs_n[encontradas])
+                columnas.append(self._columnas[n][posiciones[encontradas]])
+            n_docs_bloque = min(inicio + self.docs_por_bloque, len(corpus)) - inicio
+            bloques.append(self._matriz(filas, columnas, n_docs_bloque))
+        return _apilar_filas(bloques, len(self.feature_names_))
+
+    def _matriz(self, filas: List[np.ndarray], columnas: List[np.ndarray], n_docs: int) -> sp.csr_matrix:
+        filas = np.concatenate(filas) if filas else np.zeros(0, dtype=np.int64)
+        columnas = np.concatenate(columnas) if columnas else np.zeros(0, dtype=np.int64)
+        # csr suma los duplicados: cada ocurrencia aporta 1 al conteo
+        X = sp.csr_matrix((np.ones(len(filas), dtype=np.int64), (filas, columnas)),
+                          shape=(n_docs, len(self.feature_names_)))
+        X.sum_duplicates()
+        X.sort_indices()
+        return X
+
+    def transform(self, X):
+        if not hasattr(self, "feature_names_"):
+            raise ValueError("El vectorizador no esta entrenado; llamar a fit() primero")
+        corpus = self._corpus(X)
+        # los IDs de este corpus -> los IDs del vocabulario con el que se entreno
+        mapa = np.fromiter((self._token_a_id.get(t, -1) for t in corpus.vocabulario), dtype=np.int64,
+                           count=len(corpus.vocabulario))
+        X_conteos = self._conteos(corpus, mapa)
+        if self.tfidf:
+            return self._tfidf.transform(X_conteos)
+        return X_conteos
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return self.feature_names_
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Dataset de notas en Parquet, particionado por seccion y mes de publicacion (particiones estilo hive:
+seccion=economia/mes=2025-04/...).
+
+    <directorio>/notas/      1 fila por nota, columnas angostas: id_nota, archivo, titulo, fecha, texto, fila
+    <directorio>/features/   la matriz de features en formato largo (fila, columna, valor), solo los valores != 0,
+                             con las mismas particiones que las notas
+    <directorio>/features.json   el nombre de cada columna de features
+
+Los lectores empujan los filtros de seccion y rango de fechas a Parquet: solo se abren las particiones
+(seccion, mes) que pueden tener filas del rango, y solo se leen las columnas pedidas. Leer la fecha y la
+seccion para un corte temporal no toca el texto ni las features.
+
+Ejemplo:
+    escribir_dataset("dataset", metadatos, vectores, nombres_features)
+    notas = leer_notas("dataset", columnas=["id_nota", "fecha"], secciones=["economia"], desde="2025-01-01")
+    notas, X, nombres_features = leer_features("dataset", desde="2025-03-01", hasta="2025-04-30")
+"""
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import scipy.sparse as sp
+
+DIR_DATASET = "./dataset"
+DIR_NOTAS = "notas"
+DIR_FEATURES = "features"
+ARCHIVO_NOMBRES_FEATURES = "features.json"
+# particion de las notas sin fecha de publicacion
+MES_SIN_FECHA = "sin-fecha"
+# filas por row group: el filtro de fechas tambien saltea row groups enteros usando sus estadisticas
+FILAS_POR_GRUPO = 50_000
+
+Fecha = Union[str, datetime.date, datetime.datetime, pd.Timestamp, None]
+
+
+def _particionado() -> ds.Partitioning:
+    return ds.partitioning(pa.schema([("seccion", pa.string()), ("mes", pa.string())]), flavor="hive")
+
+
+def _timestamp(fecha: Fecha) -> Optional[pd.Timestamp]:
+    if fecha is None:
+        return None
+    fecha = pd.Timestamp(fecha)
+    return fecha.tz_localize("UTC") if fecha.tzinfo is None else fecha.tz_convert("UTC")
+
+
+def _filtro(secciones: Optional[Sequence[str]], desde: Fecha, hasta: Fecha) -> Optional[ds.Expression]:
+    """
+    Arma el filtro de seccion y rango de fechas [desde, hasta]. Las condiciones sobre "mes" descartan particiones
+    enteras sin abrirlas; la condicion sobre "fecha" filtra las filas dentro de las particiones que quedan.
+    """
+    condiciones = []
+    if secciones is not None:
+        condiciones.append(ds.field("seccion").isin(list(secciones)))
+    desde, hasta = _timestamp(desde), _timestamp(hasta)
+    if desde is not None:
+        # "sin-fecha" es mayor que cualquier "AAAA-MM", y se excluye por la condicion sobre la fecha
+        condiciones.append(ds.field("mes") >= desde.strftime("%Y-%m"))
+        condiciones.append(ds.field("fecha") >= pa.scalar(desde, type=pa.timestamp("us", tz="UTC")))
+    if hasta is not None:
+        condiciones.append(ds.field("mes") <= hasta.strftime("%Y-%m"))
+        if hasta == hasta.normalize():
+            # una fecha sin hora incluye todo ese dia
+            condiciones.append(ds.field("fecha") < pa.scalar(hasta + pd.Timedelta(days=1), type=pa.timestamp("us", tz="UTC")))
+        else:
+            condiciones.append(ds.field("fecha") <= pa.scalar(hasta, type=pa.timestamp("us", tz="UTC")))
+    filtro = None
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+    return filtro
+
+
+def _escribir(tabla: pa.Table, directorio: Path):
+    ds.write_dataset(tabla, directorio, format="parquet", partitioning=_particionado(),
+                     basename_template="parte-{i}.parquet", max_rows_per_group=FILAS_POR_GRUPO,
+                     min_rows_per_group=min(FILAS_POR_GRUPO, max(tabla.num_rows, 1)))
+
+
+def escribir_dataset(directorio: Union[str, Path], metadatos: pd.DataFrame, vectores: Optional[sp.spmatrix] = None,
+                     nombres_features: Optional[Sequence[str]] = None):
+    """
+    Escribe (reemplazando) el dataset particionado.
+    :param directorio: Directorio del dataset.
+    :param metadatos: 1 fila por nota, con al menos las columnas "seccion" y "fecha" (texto ISO o datetime; las que
+        no se pueden interpretar quedan en la particion "sin-fecha"). El resto de las columnas se guardan tal cual.
+    :param vectores: Matriz (n_notas, n_features) con las features de cada nota, en el mismo orden que metadatos.
+    :param nombres_features: El nombre de cada columna de vectores.
+    """
+    directorio = Path(directorio)
+    notas = metadatos.reset_index(drop=True).copy()
+    notas["fecha"] = pd.to_datetime(notas["fecha"], utc=True, errors="coerce", format="ISO8601").astype("datetime64[us, UTC]")
+    notas["mes"] = notas["fecha"].dt.strftime("%Y-%m").fillna(MES_SIN_FECHA)
+    # posicion de cada nota en la matriz original: une las notas con sus features
+    notas["fila"] = np.arange(len(notas), dtype=np.int64)
+
+    directorio.parent.mkdir(parents=True, exist_ok=True)
+    # escribir en un directorio temporal y renombrar, para no dejar un dataset a medio escribir
+    dir_temporal = Path(tempfile.mkdtemp(dir=directorio.parent, prefix=f".{directorio.name}-tmp-"))
+    try:
+        tabla_notas = pa.Table.from_pandas(notas, preserve_index=False)
+        _escribir(tabla_notas, dir_temporal / DIR_NOTAS)
+        if vectores is not None:
+            coo = sp.coo_matrix(vectores)
+            tipo_valor = pa.int32() if np.issubdtype(coo.data.dtype, np.integer) else pa.float32()
+            # la fecha va repetida en cada valor para poder filtrar las features por rango sin leer las notas
+            de_cada_valor = tabla_notas.select(["fecha", "seccion", "mes"]).take(pa.array(coo.row))
+            features = pa.table({
+                "fila": pa.array(coo.row.astype(np.int64)),
+                "columna": pa.array(coo.col.astype(np.int32)),
+                "valor": pa.array(coo.data).cast(tipo_valor),
+                "fecha": de_cada_valor.column("fecha"),
+                "seccion": de_cada_valor.column("seccion").cast(pa.string()),
+                "mes": de_cada_valor.column("mes"),
+            })
+            _escribir(features.sort_by([("fila", "ascending")]), dir_temporal / DIR_FEATURES)
+            nombres = list(nombres_features) if nombres_features is not None else [str(i) for i in range(vectores.shape[1])]
+            (dir_temporal / ARCHIVO_NOMBRES_FEATURES).write_text(json.dumps(nombres, ensure_ascii=False), encoding="utf-8")
+        if directorio.exists():
+            shutil.rmtree(directorio)
+        os.replace(dir_temporal, directorio)
+    except BaseException:
+        shutil.rmtree(dir_temporal, ignore_errors=True)
+        raise
+
+
+def particiones(directorio: Union[str, Path], secciones: Optional[Sequence[str]] = None,
+                desde: Fecha = None, hasta: Fecha = None) -> List[str]:
+    """
+    :return: Los archivos de notas que se leerian con estos filtros (util para verificar que se podan las particiones).
+    """
+    dataset = ds.dataset(Path(directorio) / DIR_NOTAS, format="parquet", partitioning=_particionado())
+    filtro = _filtro(secciones, desde, hasta)
+    return sorted(fragmento.path for fragmento in dataset.get_fragments(filter=filtro))
+
+
+def leer_notas(directorio: Union[str, Path] = DIR_DATASET, columnas: Optional[Sequence[str]] = None,
+               secciones: Optional[Sequence[str]] = None, desde: Fecha = None, hasta: Fecha = None) -> pd.DataFrame:
+    """
+    Lee las notas del dataset, ordenadas por fila.
+    :param columnas: Columnas a leer (p.ej. ["fecha", "seccion"]); None para todas, incluido el texto.
+    :param secciones: Leer solo estas secciones.
+    :param desde: Leer solo las notas publicadas desde esta fecha (inclusive).
+    :param hasta: Leer solo las notas publicadas hasta esta fecha (inclusive).
+    """
+    dataset = ds.dataset(Path(directorio) / DIR_NOTAS, format="parquet", partitioning=_particionado())
+    columnas_a_leer = None if columnas is None else list(dict.fromkeys(list(columnas) + ["fila"]))
+    tabla = dataset.to_table(columns=columnas_a_leer, filter=_filtro(secciones, desde, hasta))
+    notas = tabla.sort_by([("fila", "ascending")]).to_pandas()
+    if columnas is not None and "fila" not in columnas:
+        notas = notas.drop(columns=["fila"])
+    return notas.reset_index(drop=True)
+
+
+def leer_nombres_features(directorio: Union[str, Path] = DIR_DATASET) -> List[str]:
+    return json.loads((Path(directorio) / ARCHIVO_NOMBRES_FEATURES).read_text(encoding="utf-8"))
+
+
+def leer_features(directorio: Union[str, Path] = DIR_DATASET, columnas: Sequence[str] = ("id_nota", "seccion", "fecha"),
+                  secciones: Optional[Sequence[str]] = None, desde: Fecha = None,
+                  hasta: Fecha = None) -> Tuple[pd.DataFrame, sp.csr_matrix, List[str]]:
+    """
+    Lee la matriz de features de las notas que pasan los filtros, solo de las particiones necesarias.
+    :param columnas: Columnas de las notas a devolver junto con la matriz (siempre se agrega "fila").
+    :return: (notas, matriz csr con 1 fila por nota en el mismo orden, nombres de las features)
+    """
+    notas = leer_notas(directorio, columnas=list(columnas) + ["fila"], secciones=secciones, desde=desde, hasta=hasta)
+    nombres_features = leer_nombres_features(directorio)
+    dataset = ds.dataset(Path(directorio) / DIR_FEATURES, format="parquet", partitioning=_particionado())
+    tabla = dataset.to_table(columns=["fila", "columna", "valor"], filter=_filtro(secciones, desde, hasta))
+    filas = tabla.column("fila").to_numpy()
+    # fila original -> posicion en "notas" (ordenadas por fila)
+    posiciones = np.searchsorted(notas["fila"].to_numpy(), filas)
+    X = sp.csr_matrix((tabla.column("valor").to_numpy(), (posiciones, tabla.column("columna").to_numpy())),
+                      shape=(len(notas), len(nombres_features)))
+    X.sort_indices()
+    return notas, X, nombres_features
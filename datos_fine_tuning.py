@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Carga de datos para el fine-tuning de BERT (web_mining_python/fine-tuning-de-BERT.ipynb) en CPU.
+
+La notebook llama a tokenizer.encode_plus frase por frase y rellena todas con [PAD] hasta MY_DATASET_MAX_TOKENS,
+asi que un titulo de 20 tokens cuesta lo mismo que uno de 128. Aca:
+- todos los textos se tokenizan en 1 sola llamada al tokenizador rapido, sin padding;
+- los textos mas largos que largo_maximo se recortan "cabeza + cola": se conservan los primeros tokens_cabeza
+  tokens y los ultimos (largo_maximo - 2 - tokens_cabeza), en vez de descartar todo el final de la nota;
+- MuestreadorPorLargo arma lotes de textos de largo parecido (ordenando por largo dentro de grupos al azar de
+  varios lotes), y colacionar rellena cada lote solo hasta su texto mas largo.
+
+Los lotes son la misma tupla (input_ids, attention_mask, labels) que arma la notebook con TensorDataset, asi que
+el loop de entrenamiento de BertForSequenceClassification no cambia (entrenar_epoca es ese loop).
+
+Ejemplos:
+    python embeddings_bert.py --crear-modelo-aleatorio ./bert_chico          # BERT chico con pesos al azar
+    python datos_fine_tuning.py --modelo ./bert_chico --comparar              # tokens/s: padding fijo vs dinamico
+    python datos_fine_tuning.py --modelo ./bert_chico --epocas 2 --guardar ./bert_secciones
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, Sampler, SequentialSampler
+
+# el mismo modelo que usa fine-tuning-de-BERT.ipynb
+MODELO_BERT = "Recognai/bert-base-spanish-wwm-cased-xnli"
+# MY_DATASET_MAX_TOKENS de la notebook
+LARGO_MAXIMO = 128
+TAMANIO_LOTE = 32
+# cuantos lotes se mezclan antes de ordenar por largo: mas grande = lotes mas parejos, pero menos al azar
+LOTES_POR_GRUPO = 50
+FRACCION_ENTRENAMIENTO = 0.8
+EPOCAS = 4
+SEMILLA = 42
+
+
+def codificar_textos(tokenizador, textos: Sequence[str], largo_maximo: int = LARGO_MAXIMO,
+                     tokens_cabeza: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Tokeniza todos los textos en 1 llamada, sin padding, con [CLS] y [SEP].
+    :param tokenizador: Tokenizador rapido (PreTrainedTokenizerFast).
+    :param largo_maximo: Tokens por texto, incluidos [CLS] y [SEP].
+    :param tokens_cabeza: De los textos mas largos, cuantos tokens del comienzo se conservan; el resto del lugar es
+        para el final del texto. None para 1/4 del lugar (el titulo y la bajada van al comienzo de la nota, el cierre
+        al final).
+    :return: Los IDs de tokens de cada texto (int64).
+    """
+    if largo_maximo < 3:
+        raise ValueError(f"largo_maximo debe ser al menos 3 ([CLS], 1 token y [SEP]), pero es {largo_maximo}")
+    lugar = largo_maximo - 2
+    if tokens_cabeza is None:
+        tokens_cabeza = lugar // 4
+    tokens_cabeza = min(max(tokens_cabeza, 0), lugar)
+    tokens_cola = lugar - tokens_cabeza
+    # sin truncar aca: el recorte cabeza + cola se hace despues, sobre los IDs
+    ids_textos = tokenizador(list(textos), add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+    codificados = []
+    for ids in ids_textos:
+        if len(ids) > lugar:
+            ids = ids[:tokens_cabeza] + (ids[len(ids) - tokens_cola:] if tokens_cola else [])
+        codificados.append(np.asarray([tokenizador.cls_token_id] + ids + [tokenizador.sep_token_id], dtype=np.int64))
+    return codificados
+
+
+def codificar_1_a_1(tokenizador, textos: Sequence[str], largo_maximo: int = LARGO_MAXIMO) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Como en fine-tuning-de-BERT.ipynb: frase por frase, con padding hasta largo_maximo. Solo para comparar.
+    (llama al tokenizador con 1 texto, que es lo que hace encode_plus; transformers 5 ya no tiene encode_plus)
+    :return: (input_ids, attention_masks), tensores (cantidad de textos, largo_maximo).
+    """
+    input_ids, attention_masks = [], []
+    for texto in textos:
+        codificado = tokenizador(texto, add_special_tokens=True, max_length=largo_maximo, padding="max_length",
+                                 truncation=True, return_attention_mask=True, return_tensors="pt")
+        input_ids.append(codificado["input_ids"])
+        attention_masks.append(codificado["attention_mask"])
+    return torch.cat(input_ids, dim=0), torch.cat(attention_masks, dim=0)
+
+
+class DatasetTokenizado(Dataset):
+    """
+    Textos ya tokenizados (de largo variable) con su label.
+    """
+
+    def __init__(self, codificados: Sequence[np.ndarray], labels: Sequence[int]):
+        if len(codificados) != len(labels):
+            raise ValueError(f"Hay {len(codificados)} textos pero {len(labels)} labels")
+        self.codificados = list(codificados)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.largos = np.fromiter((len(ids) for ids in self.codificados), dtype=np.int64, count=len(self.codificados))
+
+    def __len__(self) -> int:
+        return len(self.codificados)
+
+    def __getitem__(self, indice: int) -> Tuple[np.ndarray, int]:
+        return self.codificados[indice], int(self.labels[indice])
+
+    def subconjunto(self, indices: Sequence[int]) -> "DatasetTokenizado":
+        return DatasetTokenizado([self.codificados[i] for i in indices], self.labels[np.asarray(indices, dtype=np.int64)])
+
+
+class MuestreadorPorLargo(Sampler):
+    """
+    Batch sampler que agrupa textos de largo parecido: en cada epoch mezcla los indices, los parte en grupos de
+    tamanio_lote * lotes_por_grupo, ordena cada grupo por largo, lo corta en lotes y mezcla el orden de los lotes.
+    Asi cada lote tiene poco padding y el entrenamiento sigue viendo los ejemplos en orden aleatorio.
+    """
+
+    def __init__(self, largos: Sequence[int], tamanio_lote: int = TAMANIO_LOTE, lotes_por_grupo: int = LOTES_POR_GRUPO,
+                 semilla: int = SEMILLA):
+        self.largos = np.asarray(largos, dtype=np.int64)
+        self.tamanio_lote = tamanio_lote
+        self.lotes_por_grupo = lotes_por_grupo
+        self.semilla = semilla
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        return -(-len(self.largos) // self.tamanio_lote)
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = np.random.default_rng(self.semilla + self.epoch)
+        self.epoch += 1
+        indices = rng.permutation(len(self.largos))
+        tamanio_grupo = self.tamanio_lote * self.lotes_por_grupo
+        lotes = []
+        for inicio in range(0, len(indices), tamanio_grupo):
+            grupo = indices[inicio:inicio + tamanio_grupo]
+            grupo = grupo[np.argsort(self.largos[grupo], kind="stable")]
+            lotes.extend(grupo[i:i + self.tamanio_lote] for i in range(0, len(grupo), self.tamanio_lote))
+        for orden in rng.permutation(len(lotes)):
+            yield lotes[orden].tolist()
+
+
+def colacionar(ejemplos: Sequence[Tuple[np.ndarray, int]], id_pad: int = 0) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Rellena el lote solo hasta su texto mas largo.
+    :return: (input_ids, attention_mask, labels), como los lotes del TensorDataset de la notebook.
+    """
+    largo = max(len(ids) for ids, _ in ejemplos)
+    input_ids = np.full((len(ejemplos), largo), id_pad, dtype=np.int64)
+    attention_mask = np.zeros((len(ejemplos), largo), dtype=np.int64)
+    for fila, (ids, _) in enumerate(ejemplos):
+        input_ids[fila, :len(ids)] = ids
+        attention_mask[fila, :len(ids)] = 1
+    labels = np.fromiter((label for _, label in ejemplos), dtype=np.int64, count=len(ejemplos))
+    return torch.from_numpy(input_ids), torch.from_numpy(attention_mask), torch.from_numpy(labels)
+
+
+class _Colacionador:
+    # una clase y no un lambda, para que el DataLoader pueda usar num_workers > 0
+    def __init__(self, id_pad: int):
+        self.id_pad = id_pad
+
+    def __call__(self, ejemplos):
+        return colacionar(ejemplos, self.id_pad)
+
+
+def crear_dataloaders(codificados: Sequence[np.ndarray], labels: Sequence[int], id_pad: int = 0,
+                      tamanio_lote: int = TAMANIO_LOTE, fraccion_entrenamiento: float = FRACCION_ENTRENAMIENTO,
+                      lotes_por_grupo: int = LOTES_POR_GRUPO, semilla: int = SEMILLA) -> Tuple[DataLoader, DataLoader]:
+    """
+    Divide al azar en entrenamiento y validacion y arma los DataLoaders con padding dinamico.
+    :return: (dataloader de entrenamiento, agrupado por largo; dataloader de validacion, ordenado por largo)
+    """
+    dataset = DatasetTokenizado(codificados, labels)
+    indices = np.random.default_rng(semilla).permutation(len(dataset))
+    corte = int(fraccion_entrenamiento * len(dataset))
+    entrenamiento, validacion = dataset.subconjunto(indices[:corte]), dataset.subconjunto(indices[corte:])
+    colacionador = _Colacionador(id_pad)
+    dataloader_entrenamiento = DataLoader(
+        entrenamiento, collate_fn=colacionador,
+        batch_sampler=MuestreadorPorLargo(entrenamiento.largos, tamanio_lote, lotes_por_grupo, semilla))
+    # para validacion el orden no importa: ordenar por largo directamente
+    orden_validacion = np.argsort(validacion.largos, kind="stable")
+    validacion = validacion.subconjunto(orden_validacion)
+    dataloader_validacion = DataLoader(validacion, batch_size=tamanio_lote, sampler=SequentialSampler(validacion),
+                                       collate_fn=colacionador)
+    return dataloader_entrenamiento, dataloader_validacion
+
+
+def crear_dataloaders_padding_fijo(input_ids: torch.Tensor, attention_masks: torch.Tensor, labels: Sequence[int],
+                                   tamanio_lote: int = TAMANIO_LOTE,
+                                   fraccion_entrenamiento: float = FRACCION_ENTRENAMIENTO,
+                                   semilla: int = SEMILLA) -> Tuple[DataLoader, DataLoader]:
+    """
+    Los DataLoaders de la notebook (TensorDataset, RandomSampler), con la misma division que crear_dataloaders.
+    Solo para comparar.
+    """
+    from torch.utils.data import RandomSampler, Subset, TensorDataset
+
+    dataset = TensorDataset(input_ids, attention_masks, torch.as_tensor(np.asarray(labels, dtype=np.int64)))
+    indices = np.random.default_rng(semilla).permutation(len(dataset))
+    corte = int(fraccion_entrenamiento * len(dataset))
+    entrenamiento, validacion = Subset(dataset, indices[:corte].tolist()), Subset(dataset, indices[corte:].tolist())
+    generador = torch.Generator().manual_seed(semilla)
+    return (DataLoader(entrenamiento, sampler=RandomSampler(entrenamiento, generator=generador), batch_size=tamanio_lote),
+            DataLoader(validacion, sampler=SequentialSampler(validacion), batch_size=tamanio_lote))
+
+
+def format_time(elapsed: float) -> str:
+    """
+    Recibe un timestamp en segundos y retorna un string hh:mm:ss
+    """
+    return str(datetime.timedelta(seconds=int(round(elapsed))))
+
+
+def entrenar_epoca(model, dataloader: DataLoader, optimizer, scheduler=None, device: torch.device = torch.device("cpu"),
+                   informar_cada: int = 40) -> Dict[str, float]:
+    """
+    1 pasada sobre el dataset de entrenamiento: el mismo loop de fine-tuning-de-BERT.ipynb.
+    :return: loss promedio, segundos, tokens (sin padding) y tokens_con_padding procesados, y tokens/s.
+    """
+    model.train()
+    total_train_loss = 0.0
+    tokens, tokens_con_padding = 0, 0
+    t0 = time.perf_counter()
+    for step, batch in enumerate(dataloader):
+        if step % informar_cada == 0 and step != 0:
+            print(f"  Batch {step:>5,}  of  {len(dataloader):>5,}.    Elapsed: {format_time(time.perf_counter() - t0)}.")
+        b_input_ids, b_input_mask, b_labels = (tensor.to(device) for tensor in batch)
+        tokens += int(b_input_mask.sum())
+        tokens_con_padding += b_input_ids.numel()
+        model.zero_grad()
+        salida = model(b_input_ids, token_type_ids=None, attention_mask=b_input_mask, labels=b_labels)
+        total_train_loss += salida.loss.item()
+        salida.loss.backward()
+        torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+        optimizer.step()
+        if scheduler is not None:
+            scheduler.step()
+    segundos = time.perf_counter() - t0
+    return {"loss": total_train_loss / max(len(dataloader), 1), "segundos": segundos, "tokens": tokens,
+            "tokens_con_padding": tokens_con_padding, "tokens_por_segundo": tokens / segundos if segundos else 0.0}
+
+
+def evaluar(model, dataloader: DataLoader, device: torch.device = torch.device("cpu")) -> Dict[str, float]:
+    """
+    :return: loss y accuracy promedio sobre el dataset de validacion, y segundos.
+    """
+    model.eval()
+    total_loss, aciertos, ejemplos = 0.0, 0, 0
+    t0 = time.perf_counter()
+    with torch.inference_mode():
+        for batch in dataloader:
+            b_input_ids, b_input_mask, b_labels = (tensor.to(device) for tensor in batch)
+            salida = model(b_input_ids, token_type_ids=None, attention_mask=b_input_mask, labels=b_labels)
+            total_loss += salida.loss.item()
+            aciertos += int((salida.logits.argmax(dim=1) == b_labels).sum())
+            ejemplos += len(b_labels)
+    return {"loss": total_loss / max(len(dataloader), 1), "accuracy": aciertos / max(ejemplos, 1),
+            "segundos": time.perf_counter() - t0}
+
+
+def cargar_clasificador(modelo: str, num_labels: int, semilla: int = SEMILLA):
+    """
+    :return: BertForSequenceClassification con una capa de clasificacion nueva de num_labels categorias.
+    """
+    from transformers import BertForSequenceClassification
+
+    torch.manual_seed(semilla)
+    return BertForSequenceClassification.from_pretrained(modelo, num_labels=num_labels, ignore_mismatched_sizes=True,
+                                                         output_attentions=False, output_hidden_states=False)
+
+
+def entrenar(modelo: str, dataloader_entrenamiento: DataLoader, dataloader_validacion: DataLoader, num_labels: int,
+             epocas: int = EPOCAS, lr: float = 2e-5, semilla: int = SEMILLA):
+    """
+    Fine-tuning como en la notebook: AdamW, schedule lineal sin warmup, validacion despues de cada epoch.
+    :return: (modelo entrenado, estadisticas de cada epoch)
+    """
+    from transformers import get_linear_schedule_with_warmup
+
+    random.seed(semilla)
+    np.random.seed(semilla)
+    model = cargar_clasificador(modelo, num_labels, semilla)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model.to(device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, eps=1e-8)
+    scheduler = get_linear_schedule_with_warmup(optimizer, num_warmup_steps=0,
+                                                num_training_steps=len(dataloader_entrenamiento) * epocas)
+    training_stats = []
+    for epoch_i in range(epocas):
+        print(f"\n======== Epoch {epoch_i + 1} / {epocas} ========")
+        entrenamiento = entrenar_epoca(model, dataloader_entrenamiento, optimizer, scheduler, device)
+        validacion = evaluar(model, dataloader_validacion, device)
+        print(f"  Training loss: {entrenamiento['loss']:.2f}  ({format_time(entrenamiento['segundos'])}, "
+              f"{entrenamiento['tokens_por_segundo']:.0f} tokens/s)")
+        print(f"  Valid. loss: {validacion['loss']:.2f}  Valid. Accur.: {validacion['accuracy']:.2f}")
+        training_stats.append({"epoch": epoch_i + 1, "Training Loss": entrenamiento["loss"],
+                               "Valid. Loss": validacion["loss"], "Valid. Accur.": validacion["accuracy"],
+                               "Training Time": format_time(entrenamiento["segundos"]),
+                               "Validation Time": format_time(validacion["segundos"]),
+                               "Tokens/s": entrenamiento["tokens_por_segundo"]})
+    return model, training_stats
+
+
+def _leer_corpus(dir_paginas: str, campo: str) -> Tuple[List[str], List[str]]:
+    """
+    :param campo: "titulo" (como el dataset de ejemplo de la notebook) o "texto" (la nota completa).
+    :return: (textos, seccion de cada texto), extraidos como en 2-html-a-dataframe.py.
+    """
+    from benchmark_pipeline import listar_corpus
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    textos, secciones = [], []
+    for path, seccion in zip(*listar_corpus(dir_paginas)):
+        datos = script.extraer_datos_nota(script.leer_archivo(str(path)))
+        if datos is None:
+            continue
+        titulo, _, texto = datos
+        valor = titulo if campo == "titulo" else texto
+        if valor:
+            textos.append(valor)
+            secciones.append(seccion)
+    return textos, secciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tuning de BERT en CPU con tokenizacion de a lotes y padding dinamico")
+    parser.add_argument("--modelo", default=MODELO_BERT, help=f"Modelo de Huggingface o directorio local (default: {MODELO_BERT})")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio con 1 subdirectorio por seccion (default: ./paginas)")
+    parser.add_argument("--campo", default="texto", choices=("titulo", "texto"), help="Que clasificar (default: texto)")
+    parser.add_argument("--largo-maximo", type=int, default=LARGO_MAXIMO, help=f"Tokens por texto (default: {LARGO_MAXIMO})")
+    parser.add_argument("--tokens-cabeza", type=int, default=None,
+                        help="Tokens del comienzo que se conservan de los textos largos (default: 1/4 del largo maximo)")
+    parser.add_argument("--tamanio-lote", type=int, default=TAMANIO_LOTE, help=f"Textos por lote (default: {TAMANIO_LOTE})")
+    parser.add_argument("--epocas", type=int, default=EPOCAS, help=f"Epochs de entrenamiento (default: {EPOCAS})")
+    parser.add_argument("--limite", type=int, default=None, help="Usar solo N notas (al azar)")
+    parser.add_argument("--guardar", metavar="DIRECTORIO", help="Guardar el modelo entrenado, label_texts.txt y training_stats.json en DIRECTORIO")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Medir tokenizacion y 1 epoch con padding fijo (como la notebook) y con padding dinamico")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    textos, secciones = _leer_corpus(args.paginas, args.campo)
+    if args.limite is not None:
+        elegidos = np.random.default_rng(SEMILLA).permutation(len(textos))[:args.limite]
+        textos, secciones = [textos[i] for i in elegidos], [secciones[i] for i in elegidos]
+    label_texts = sorted(set(secciones))
+    labels = [label_texts.index(seccion) for seccion in secciones]
+    print(f"[INFO] {len(textos)} notas ({args.campo}) de {len(label_texts)} secciones leidas de {args.paginas}")
+    tokenizador = AutoTokenizer.from_pretrained(args.modelo, use_fast=True)
+
+    inicio = time.perf_counter()
+    codificados = codificar_textos(tokenizador, textos, args.largo_maximo, args.tokens_cabeza)
+    segundos_tokenizacion = time.perf_counter() - inicio
+    dataloaders = crear_dataloaders(codificados, labels, tokenizador.pad_token_id, args.tamanio_lote)
+
+    if not args.comparar:
+        print(f"[INFO] Tokenizacion: {segundos_tokenizacion:.2f}s")
+        model, training_stats = entrenar(args.modelo, *dataloaders, num_labels=len(label_texts), epocas=args.epocas)
+        if args.guardar:
+            Path(args.guardar).mkdir(parents=True, exist_ok=True)
+            model.save_pretrained(args.guardar)
+            tokenizador.save_pretrained(args.guardar)
+            Path(args.guardar, "label_texts.txt").write_text("\n".join(label_texts) + "\n", encoding="utf-8")
+            # loss, accuracy y tiempos de cada epoch, para comparar corridas
+            Path(args.guardar, "training_stats.json").write_text(json.dumps(training_stats, indent=2, default=float),
+                                                                 encoding="utf-8")
+            print(f"[OK] Modelo guardado en {args.guardar}")
+        return
+
+    inicio = time.perf_counter()
+    input_ids, attention_masks = codificar_1_a_1(tokenizador, textos, args.largo_maximo)
+    segundos_1_a_1 = time.perf_counter() - inicio
+    dataloaders_fijos = crear_dataloaders_padding_fijo(input_ids, attention_masks, labels, args.tamanio_lote)
+    print(f"\n{'corrida':<22}{'tokenizar s':>12}{'epoch s':>10}{'tokens/s':>10}{'% padding':>11}{'accuracy':>10}")
+    for nombre, segundos_tok, (entrenamiento, validacion) in [
+            ("padding fijo (1 a 1)", segundos_1_a_1, dataloaders_fijos),
+            ("padding dinamico", segundos_tokenizacion, dataloaders)]:
+        model = cargar_clasificador(args.modelo, len(label_texts))
+        optimizer = torch.optim.AdamW(model.parameters(), lr=2e-5, eps=1e-8)
+        estadisticas = entrenar_epoca(model, entrenamiento, optimizer, informar_cada=10 ** 9)
+        accuracy = evaluar(model, validacion)["accuracy"]
+        padding = 1 - estadisticas["tokens"] / max(estadisticas["tokens_con_padding"], 1)
+        print(f"{nombre:<22}{segundos_tok:>12.2f}{estadisticas['segundos']:>10.2f}"
+              f"{estadisticas['tokens_por_segundo']:>10.0f}{100 * padding:>10.1f}%{accuracy:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+Deteccion de notas casi duplicadas (plantillas diarias como el pronostico o las efemerides, o la misma nota en
+varias secciones) con MinHash + LSH.
+
+1. Cada nota es el conjunto de sus "shingles": secuencias de tamanio_shingle tokens consecutivos, hasheadas a 64
+   bits a partir de los IDs de un CorpusTokenizado.
+2. La firma MinHash de la nota es el minimo de cada una de las "permutaciones" funciones de hash sobre sus shingles;
+   la fraccion de posiciones iguales entre 2 firmas estima la similitud de Jaccard entre las notas. Se calcula con
+   NumPy de a bloques de shingles (np.minimum.reduceat por nota), sin loops por nota.
+3. LSH: la firma se corta en "bandas" de filas consecutivas; 2 notas son candidatas si coinciden en alguna banda
+   entera. Dentro de cada balde se comparan solo notas vecinas (despues de ordenar), asi el costo es lineal en la
+   cantidad de notas y no cuadratico. Los candidatos con Jaccard estimado >= umbral se unen, y las componentes
+   conexas son los grupos de duplicados.
+4. Las notas de plantilla (pronostico, efemerides) cambian casi todo el texto de un dia al otro, asi que no son
+   casi duplicadas por el texto: se agrupan ademas por el titulo, sin numeros ni nombres de dias y meses
+   ("clima en buenos aires: el pronostico del tiempo para este # # de #").
+
+Con los grupos se puede:
+- "eliminar": conservar 1 nota por grupo (representantes);
+- "ponderar": peso 1 / tamaño del grupo para cada nota (pesos_por_grupo), para que una plantilla repetida 30 veces
+  pese como 1 nota;
+- "agrupar": conservar todas y usar el grupo en la cross-validation (StratifiedGroupKFold en
+  3-entrenar-y-evaluar.py), para que 2 copias de la misma nota no queden 1 en train y otra en test.
+
+Ejemplos:
+    python deduplicacion.py                                   # grupos de duplicados en ./paginas
+    python deduplicacion.py --benchmark 100000                # notas/s con notas sinteticas
+"""
+import argparse
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import joblib
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.feature_extraction.text import strip_accents_unicode
+
+from corpus_tokenizado import CorpusTokenizado, config_tokenizador
+
+TAMANIO_SHINGLE = 5
+PERMUTACIONES = 128
+UMBRAL_JACCARD = 0.8
+MODOS = ("eliminar", "ponderar", "agrupar")
+# shingles por bloque al calcular las firmas: bloques de (SHINGLES_POR_BLOQUE, permutaciones) hashes de 8 bytes
+SHINGLES_POR_BLOQUE = 1 << 16
+# la firma de una nota sin shingles (menos de tamanio_shingle tokens): nunca coincide con otra
+FIRMA_VACIA = np.iinfo(np.uint32).max
+# lo que cambia entre los titulos de una misma plantilla: numeros, dias de la semana y meses
+regex_fecha_en_titulo = re.compile(r"\b(\d+|lunes|martes|miercoles|jueves|viernes|sabado|domingo|enero|febrero|marzo"
+                                   r"|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\b")
+
+
+def _mezclar(x: np.ndarray) -> np.ndarray:
+    """
+    Mezcla los bits de enteros de 64 bits (el finalizador de splitmix64), para que claves parecidas den hashes
+    independientes.
+    """
+    x = x.astype(np.uint64, copy=True)
+    with np.errstate(over="ignore"):
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return x
+
+
+def hashes_shingles(corpus: CorpusTokenizado, tamanio_shingle: int = TAMANIO_SHINGLE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: (hash de 64 bits de cada shingle, cantidad de shingles de cada nota), con los shingles en el orden de
+        las notas.
+    """
+    tokens = np.asarray(corpus.tokens, dtype=np.uint64)
+    largos = np.diff(corpus.offsets)
+    shingles_por_nota = np.maximum(largos - tamanio_shingle + 1, 0)
+    # posicion de comienzo de cada shingle: todas las de cada nota menos las ultimas tamanio_shingle - 1
+    comienzos = np.repeat(corpus.offsets[:-1], shingles_por_nota)
+    comienzos += np.arange(len(comienzos)) - np.repeat(np.cumsum(shingles_por_nota) - shingles_por_nota, shingles_por_nota)
+    hashes = np.zeros(len(comienzos), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for k in range(tamanio_shingle):
+            hashes = _mezclar(hashes * np.uint64(0x9E3779B97F4A7C15) + tokens[comienzos + k])
+    return hashes, shingles_por_nota
+
+
+def firmas_minhash(corpus: CorpusTokenizado, tamanio_shingle: int = TAMANIO_SHINGLE,
+                   permutaciones: int = PERMUTACIONES, semilla: int = 0) -> np.ndarray:
+    """
+    :return: Matriz uint32 (notas, permutaciones) con la firma MinHash de cada nota.
+    """
+    hashes, shingles_por_nota = hashes_shingles(corpus, tamanio_shingle)
+    rng = np.random.default_rng(semilla)
+    # h_i(x) = (a_i * x + b_i) mod 2^64, los 32 bits altos; a_i impar
+    a = rng.integers(0, 1 << 63, permutaciones, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, permutaciones, dtype=np.uint64)
+    firmas = np.full((len(shingles_por_nota), permutaciones), FIRMA_VACIA, dtype=np.uint32)
+    con_shingles = np.flatnonzero(shingles_por_nota > 0)
+    fin_notas = np.cumsum(shingles_por_nota[con_shingles])
+    inicio_notas = fin_notas - shingles_por_nota[con_shingles]
+    # bloques de notas enteras con ~SHINGLES_POR_BLOQUE shingles
+    nota = 0
+    while nota < len(con_shingles):
+        ultima = max(nota + 1, int(np.searchsorted(fin_notas, inicio_notas[nota] + SHINGLES_POR_BLOQUE, side="right")))
+        desde, hasta = inicio_notas[nota], fin_notas[ultima - 1]
+        with np.errstate(over="ignore"):
+            valores = ((hashes[desde:hasta, None] * a[None, :] + b[None, :]) >> np.uint64(32)).astype(np.uint32)
+        firmas[con_shingles[nota:ultima]] = np.minimum.reduceat(valores, inicio_notas[nota:ultima] - desde, axis=0)
+        nota = ultima
+    return firmas
+
+
+def elegir_bandas(permutaciones: int, umbral: float) -> Tuple[int, int]:
+    """
+    Elige (bandas, filas por banda) con bandas * filas == permutaciones y el umbral de LSH (1/bandas)^(1/filas)
+    lo mas cerca posible del umbral de Jaccard, pero sin pasarse (para no perder pares por arriba del umbral).
+    """
+    opciones = [(bandas, permutaciones // bandas) for bandas in range(1, permutaciones + 1) if permutaciones % bandas == 0]
+    debajo = [(b, r) for b, r in opciones if (1 / b) ** (1 / r) <= umbral] or opciones
+    return min(debajo, key=lambda opcion: umbral - (1 / opcion[0]) ** (1 / opcion[1]))
+
+
+def pares_candidatos(firmas: np.ndarray, bandas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    LSH: para cada banda, ordena las notas por el hash de su banda y toma como candidatas a las notas vecinas con
+    el mismo hash. Las notas sin shingles no son candidatas.
+    :return: (nota a, nota b) de cada par candidato, sin repetir.
+    """
+    n, permutaciones = firmas.shape
+    filas = permutaciones // bandas
+    validas = firmas[:, 0] != FIRMA_VACIA
+    pares_a, pares_b = [], []
+    for banda in range(bandas):
+        claves = np.zeros(n, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for columna in range(banda * filas, (banda + 1) * filas):
+                claves = _mezclar(claves * np.uint64(0x9E3779B97F4A7C15) + firmas[:, columna].astype(np.uint64))
+        orden = np.argsort(claves, kind="stable")
+        orden = orden[validas[orden]]
+        iguales = claves[orden[1:]] == claves[orden[:-1]]
+        pares_a.append(orden[:-1][iguales])
+        pares_b.append(orden[1:][iguales])
+    a = np.concatenate(pares_a) if pares_a else np.zeros(0, dtype=np.int64)
+    b = np.concatenate(pares_b) if pares_b else np.zeros(0, dtype=np.int64)
+    pares = np.unique(np.stack([np.minimum(a, b), np.maximum(a, b)], axis=1), axis=0)
+    return pares[:, 0], pares[:, 1]
+
+
+def jaccard_estimado(firmas: np.ndarray, a: np.ndarray, b: np.ndarray, bloque: int = 1 << 16) -> np.ndarray:
+    """
+    :return: La fraccion de posiciones iguales entre las firmas de cada par (a[i], b[i]).
+    """
+    return np.concatenate([(firmas[a[i:i + bloque]] == firmas[b[i:i + bloque]]).mean(axis=1)
+                           for i in range(0, len(a), bloque)]) if len(a) else np.zeros(0)
+
+
+def grupos_duplicados(firmas: np.ndarray, umbral: float = UMBRAL_JACCARD,
+                      bandas: Optional[int] = None) -> Tuple[np.ndarray, Dict]:
+    """
+    :param bandas: Bandas de LSH; None para elegirlas segun el umbral.
+    :return: (grupo de cada nota, numerado desde 0; las notas sin duplicados quedan solas en su grupo,
+        estadisticas)
+    """
+    n, permutaciones = firmas.shape
+    if bandas is None:
+        bandas, _ = elegir_bandas(permutaciones, umbral)
+    a, b = pares_candidatos(firmas, bandas)
+    similitudes = jaccard_estimado(firmas, a, b)
+    duplicados = similitudes >= umbral
+    grafo = coo_matrix((np.ones(int(duplicados.sum()), dtype=np.int8), (a[duplicados], b[duplicados])), shape=(n, n))
+    _, grupos = connected_components(grafo, directed=False)
+    tamanios = np.bincount(grupos)
+    estadisticas = {"notas": n, "bandas": bandas, "filas_por_banda": permutaciones // bandas,
+                    "candidatos": len(a), "pares_duplicados": int(duplicados.sum()),
+                    "grupos_con_duplicados": int((tamanios > 1).sum()),
+                    # las que sobran si se conserva 1 nota por grupo
+                    "notas_duplicadas": int(n - len(tamanios))}
+    return grupos, estadisticas
+
+
+def plantilla_de_titulo(titulo: Optional[str]) -> Optional[str]:
+    """
+    :return: El titulo en minusculas y sin acentos, con "#" en lugar de numeros, dias y meses; None si el titulo no
+        tiene nada de eso (no es de una plantilla).
+    """
+    if not titulo:
+        return None
+    plantilla, reemplazos = regex_fecha_en_titulo.subn("#", strip_accents_unicode(titulo.lower()).strip())
+    return plantilla if reemplazos else None
+
+
+def grupos_por_plantilla(titulos: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    :return: El grupo de cada nota: las notas con la misma plantilla de titulo comparten grupo, y las demas quedan
+        solas en el suyo.
+    """
+    grupo_de_plantilla: Dict[str, int] = {}
+    grupos = np.empty(len(titulos), dtype=np.int64)
+    for i, titulo in enumerate(titulos):
+        plantilla = plantilla_de_titulo(titulo)
+        grupos[i] = grupo_de_plantilla.setdefault(plantilla, i) if plantilla is not None else i
+    return unir_grupos(grupos)
+
+
+def unir_grupos(*agrupamientos: np.ndarray) -> np.ndarray:
+    """
+    :return: Los grupos que resultan de unir 2 notas si estan juntas en cualquiera de los agrupamientos,
+        numerados desde 0.
+    """
+    n = len(agrupamientos[0])
+    filas, columnas = [], []
+    for grupos in agrupamientos:
+        # cada nota se une a la 1ra nota de su grupo
+        _, primeras, inversa = np.unique(grupos, return_index=True, return_inverse=True)
+        filas.append(np.arange(n))
+        columnas.append(primeras[inversa])
+    filas, columnas = np.concatenate(filas), np.concatenate(columnas)
+    grafo = coo_matrix((np.ones(len(filas), dtype=np.int8), (filas, columnas)), shape=(n, n))
+    return connected_components(grafo, directed=False)[1]
+
+
+def detectar_duplicados(textos: Union[Sequence[str], CorpusTokenizado], umbral: float = UMBRAL_JACCARD,
+                        tamanio_shingle: int = TAMANIO_SHINGLE, permutaciones: int = PERMUTACIONES,
+                        bandas: Optional[int] = None, titulos: Optional[Sequence[Optional[str]]] = None,
+                        semilla: int = 0) -> Tuple[np.ndarray, Dict]:
+    """
+    :param textos: Los textos de las notas, o un CorpusTokenizado ya construido (p.ej. el de 2-html-a-dataframe.py).
+    :param titulos: Los titulos de las notas, para agrupar tambien por plantilla de titulo; None para no hacerlo.
+    :return: (grupo de cada nota, estadisticas), como grupos_duplicados.
+    """
+    corpus = textos if isinstance(textos, CorpusTokenizado) else CorpusTokenizado.desde_textos(list(textos), config_tokenizador())
+    firmas = firmas_minhash(corpus, tamanio_shingle, permutaciones, semilla)
+    grupos, estadisticas = grupos_duplicados(firmas, umbral, bandas)
+    if titulos is not None:
+        por_plantilla = grupos_por_plantilla(titulos)
+        grupos = unir_grupos(grupos, por_plantilla)
+        tamanios = np.bincount(grupos)
+        estadisticas.update({"grupos_de_plantilla": int((np.bincount(por_plantilla) > 1).sum()),
+                             "grupos_con_duplicados": int((tamanios > 1).sum()),
+                             "notas_duplicadas": int(len(grupos) - len(tamanios))})
+    return grupos, estadisticas
+
+
+def representantes(grupos: np.ndarray) -> np.ndarray:
+    """
+    :return: Los indices de la 1ra nota de cada grupo (para el modo "eliminar"), en orden.
+    """
+    _, primeras = np.unique(grupos, return_index=True)
+    return np.sort(primeras)
+
+
+def pesos_por_grupo(grupos: np.ndarray) -> np.ndarray:
+    """
+    :return: 1 / tamaño del grupo de cada nota (para el modo "ponderar"): cada grupo suma 1.
+    """
+    return 1.0 / np.bincount(grupos)[grupos]
+
+
+def guardar_grupos(archivo: str, grupos: np.ndarray, modo: str):
+    """
+    Guarda el grupo de cada nota junto con el modo ("ponderar" o "agrupar") con que se quieren usar.
+    """
+    joblib.dump({"modo": modo, "grupos": grupos}, archivo)
+
+
+def leer_grupos(archivo: str, n_notas: int) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """
+    :param n_notas: Filas de los vectores con los que se van a usar los grupos.
+    :return: (grupos, modo) que guardo 2-html-a-dataframe.py, o (None, None) si no hay o si no son de esas n_notas
+    (p.ej. quedaron de una corrida anterior con otro MODO_DUPLICADOS).
+    """
+    if not os.path.exists(archivo):
+        return None, None
+    guardado = joblib.load(archivo)
+    # los archivos anteriores tienen solo los grupos
+    grupos, modo = (guardado["grupos"], guardado["modo"]) if isinstance(guardado, dict) else (guardado, "agrupar")
+    if len(grupos) != n_notas:
+        print(f"[WARN] {archivo} tiene {len(grupos)} notas y los vectores {n_notas}: no son de la misma extraccion, "
+              "se ignoran los grupos de duplicados.")
+        return None, None
+    return grupos, modo
+
+
+def describir_grupos(grupos: np.ndarray, nombres: Sequence[str], maximo: int = 10) -> List[List[str]]:
+    """
+    :return: Los nombres de las notas de los "maximo" grupos mas grandes.
+    """
+    tamanios = np.bincount(grupos)
+    mayores = [g for g in np.argsort(-tamanios, kind="stable")[:maximo] if tamanios[g] > 1]
+    return [[nombres[i] for i in np.flatnonzero(grupos == g)] for g in mayores]
+
+
+def notas_sinteticas(n: int, palabras_por_nota: int = 400, fraccion_duplicadas: float = 0.3,
+                     fraccion_cambios: float = 0.01, tamanio_vocabulario: int = 50_000,
+                     semilla: int = 0) -> Tuple[CorpusTokenizado, np.ndarray]:
+    """
+    Corpus sintetico (como IDs de token): notas al azar y, de ellas, una fraccion de copias con una fraccion de las
+    palabras reemplazadas (como una plantilla que cambia la fecha y algunos datos).
+    :return: (corpus, la nota original de cada nota: ella misma si no es copia)
+    """
+    rng = np.random.default_rng(semilla)
+    n_copias = int(n * fraccion_duplicadas)
+    n_originales = n - n_copias
+    # frecuencias tipo Zipf, como las palabras de un idioma
+    probabilidades = 1.0 / np.arange(1, tamanio_vocabulario + 1)
+    probabilidades /= probabilidades.sum()
+    originales = rng.choice(tamanio_vocabulario, (n_originales, palabras_por_nota), p=probabilidades).astype(np.uint32)
+    origen = np.concatenate([np.arange(n_originales), rng.integers(0, n_originales, n_copias)])
+    notas = originales[origen]
+    cambios = rng.random((n_copias, palabras_por_nota)) < fraccion_cambios
+    notas[n_originales:][cambios] = rng.choice(tamanio_vocabulario, int(cambios.sum()), p=probabilidades)
+    offsets = np.arange(0, (n + 1) * palabras_por_nota, palabras_por_nota, dtype=np.int64)
+    corpus = CorpusTokenizado(notas.ravel(), offsets, [str(i) for i in range(tamanio_vocabulario)], config_tokenizador())
+    return corpus, origen
+
+
+def benchmark(n: int, umbral: float = UMBRAL_JACCARD, semilla: int = 0) -> Dict:
+    """
+    Notas/s de firmas y agrupamiento con notas sinteticas, y recall/precision de los pares encontrados contra los
+    pares reales (cada copia con su original, y las copias de un mismo original entre si).
+    """
+    corpus, origen = notas_sinteticas(n, semilla=semilla)
+    inicio = time.perf_counter()
+    firmas = firmas_minhash(corpus)
+    segundos_firmas = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    grupos, estadisticas = grupos_duplicados(firmas, umbral)
+    segundos_grupos = time.perf_counter() - inicio
+    # las notas con el mismo origen deberian quedar en el mismo grupo, y las de distinto origen no
+    _, grupos_reales = np.unique(origen, return_inverse=True)
+    mismo_grupo = np.bincount(grupos_reales)[grupos_reales] > 1
+    encontradas = np.bincount(grupos)[grupos] > 1
+    pureza = np.mean([len(np.unique(grupos_reales[grupos == g])) == 1
+                      for g in np.flatnonzero(np.bincount(grupos) > 1)[:2000]]) if encontradas.any() else 1.0
+    resultado = {"notas": n, "segundos_firmas": segundos_firmas, "segundos_grupos": segundos_grupos,
+                 "notas_por_segundo": n / (segundos_firmas + segundos_grupos),
+                 "recall_notas": float((mismo_grupo & encontradas).sum() / max(mismo_grupo.sum(), 1)),
+                 "pureza_grupos": float(pureza), **estadisticas}
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notas casi duplicadas con MinHash + LSH")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio con 1 subdirectorio por seccion (default: ./paginas)")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_JACCARD, help=f"Jaccard minimo (default: {UMBRAL_JACCARD})")
+    parser.add_argument("--shingle", type=int, default=TAMANIO_SHINGLE, help=f"Tokens por shingle (default: {TAMANIO_SHINGLE})")
+    parser.add_argument("--sin-plantillas", action="store_true", help="No agrupar por plantilla de titulo")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Medir con N notas sinteticas")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        for clave, valor in benchmark(args.benchmark, args.umbral).items():
+            print(f"{clave:<24}{valor:.3f}" if isinstance(valor, float) else f"{clave:<24}{valor}")
+        return
+
+    from benchmark_pipeline import listar_corpus
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    nombres, titulos, textos = [], [], []
+    for path, seccion in zip(*listar_corpus(args.paginas)):
+        datos = script.extraer_datos_nota(script.leer_archivo(str(path)))
+        if datos is not None and datos[2]:
+            nombres.append(f"{seccion}/{path.name}")
+            titulos.append(datos[0])
+            textos.append(datos[2])
+    inicio = time.perf_counter()
+    grupos, estadisticas = detectar_duplicados(textos, args.umbral, args.shingle,
+                                               titulos=None if args.sin_plantillas else titulos)
+    print(f"[INFO] {estadisticas} en {time.perf_counter() - inicio:.2f}s")
+    for grupo in describir_grupos(grupos, nombres):
+        print(f"\n{len(grupo)} notas:")
+        for nombre in grupo:
+            print(f"  {nombre}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+Descubrimiento de notas a partir de los sitemaps XML y los feeds RSS del sitio, en vez de recorrer los indices.
+
+El crawl de 1-web-scrapping.py pide todas las paginas de indice de cada seccion (~150 KB cada una, ~30 notas) para
+encontrar los links. Los sitemaps listan las mismas URLs con su fecha de modificacion en unos pocos KB comprimidos:
+- se lee el sitemapindex y de cada sitemap hijo (1 por seccion y mes) solo se piden los que tienen lastmod dentro
+  de la ventana [desde, hasta]; los hijos pueden venir comprimidos con gzip;
+- el XML se parsea en streaming (ElementTree.iterparse sobre la respuesta, descomprimiendo al vuelo) y cada <url>
+  se libera apenas se procesa, asi un sitemap de 50.000 URLs no se carga entero en memoria;
+- las URLs se filtran con la misma regla de notas que NewsSpider (ID de 6+ digitos, sin catamarca12/dialogo), por
+  lastmod y contra los IDs ya guardados; las que pasan van directo a la cola de DescargadorNotas (poller_secciones.py);
+- las secciones que no aparecen en los sitemaps se buscan en su feed RSS y, si tampoco tienen feed o el feed no
+  llega hasta "desde", se recorren las paginas de indice como antes, cortando cuando las notas son mas viejas que "desde".
+
+Con --fixture corre contra servidor_fixture.py (con 1 seccion sin sitemap ni feed, para probar la vuelta a los
+indices) y compara pedidos y bytes por nota descubierta contra el recorrido completo de los indices.
+
+Ejemplos:
+    python descubrimiento_sitemaps.py --desde 2025-08-01 --sin-descargar
+    python descubrimiento_sitemaps.py --desde 2025-05-01 --hasta 2025-05-31 --secciones economia el-mundo
+    python descubrimiento_sitemaps.py --fixture
+"""
+import argparse
+import email.utils
+import gzip
+import json
+import queue
+import re
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from poller_secciones import (DIR_PAGINAS, SECCIONES, TIMEOUT, URL_BASE, USER_AGENT, DescargadorNotas,
+                              ids_guardados, links_de_notas)
+
+URL_SITEMAP = f"{URL_BASE}/sitemap.xml"
+# como se arma el feed RSS de una seccion a partir de URL_BASE
+RUTA_RSS = "/rss/secciones/{seccion}/notas"
+# limite de paginas de indice al recorrerlas cuando una seccion no tiene sitemap ni feed
+PAGINAS_MAXIMAS_INDICE = 500
+
+# misma regla de links a notas que NewsSpider (1-web-scrapping.py)
+regex_url_nota = re.compile(r'.+/(\d{6,})-[^/]+')
+regex_url_excluida = re.compile(r'.+(/catamarca12|/dialogo).+')
+# seccion y mes en el nombre de un sitemap hijo: .../sitemaps/<seccion>-<AAAA-MM>.xml[.gz]
+regex_sitemap_seccion = re.compile(r'/([a-z0-9-]+?)-(\d{4}-\d{2})\.xml(?:\.gz)?$')
+# fecha de cada tarjeta en una pagina de indice
+regex_fecha_tarjeta = re.compile(r'<time datetime="([^"]+)"')
+
+
+def parsear_fecha(texto: Optional[str]) -> Optional[datetime]:
+    """
+    Interpreta las fechas de los sitemaps (ISO 8601, p.ej. 2025-05-15T03:01:00.000Z o 2025-05-15) y de los feeds
+    (RFC 822, p.ej. Thu, 15 May 2025 03:01:00 +0000).
+    :return: La fecha con zona horaria (UTC si no trae), o None si no se puede interpretar.
+    """
+    if not texto:
+        return None
+    texto = texto.strip()
+    try:
+        fecha = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            fecha = email.utils.parsedate_to_datetime(texto)
+        except (TypeError, ValueError):
+            return None
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+def en_ventana(fecha: Optional[datetime], desde: Optional[datetime], hasta: Optional[datetime]) -> bool:
+    """
+    Las entradas sin fecha se aceptan: es preferible descargar de mas que perder notas.
+    """
+    if fecha is None:
+        return True
+    return (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+
+
+def id_de_nota(url: str) -> Optional[str]:
+    """
+    :return: El ID de la nota si la URL cumple la regla de NewsSpider, o None.
+    """
+    if regex_url_excluida.match(url):
+        return None
+    m = regex_url_nota.fullmatch(url)
+    return m.group(1) if m else None
+
+
+def _nombre_local(tag: str) -> str:
+    # "{http://www.sitemaps.org/schemas/sitemap/0.9}loc" -> "loc"
+    return tag.rsplit("}", 1)[-1]
+
+
+class LectorXML:
+    """
+    Pide documentos XML (sitemaps y feeds) y los recorre en streaming, contando pedidos y bytes transferidos.
+    """
+
+    def __init__(self, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self.estadisticas = {"pedidos": 0, "bytes": 0, "no_encontrados": 0, "errores": 0}
+
+    def _abrir(self, url: str):
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"})
+        self.estadisticas["pedidos"] += 1
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def elementos(self, url: str, etiquetas: Set[str]) -> Iterator[Dict[str, str]]:
+        """
+        Recorre el documento a medida que llega y devuelve, por cada elemento con nombre en "etiquetas" (p.ej.
+        "url", "sitemap", "item"), un dict con el texto de sus hijos y el nombre del elemento en "_etiqueta".
+        Si la URL no existe no devuelve nada.
+        """
+        try:
+            respuesta = self._abrir(url)
+        except urllib.error.HTTPError as e:
+            self.estadisticas["no_encontrados" if e.code == 404 else "errores"] += 1
+            if e.code != 404:
+                print(f"[ERROR] {url}: {e}")
+            return
+        except (urllib.error.URLError, TimeoutError) as e:
+            self.estadisticas["errores"] += 1
+            print(f"[ERROR] {url}: {e}")
+            return
+        with respuesta:
+            contador = _ContadorBytes(respuesta)
+            flujo = contador
+            # los sitemaps hijos se publican como .xml.gz; el servidor tambien puede comprimir la respuesta
+            if (respuesta.headers.get("Content-Encoding") == "gzip" or url.endswith(".gz")
+                    or contador.peek(2) == b"\x1f\x8b"):
+                flujo = gzip.GzipFile(fileobj=contador)
+            try:
+                raiz = None
+                for evento, elemento in ET.iterparse(flujo, events=("start", "end")):
+                    if evento == "start":
+                        if raiz is None:
+                            raiz = elemento
+                        continue
+                    if _nombre_local(elemento.tag) in etiquetas:
+                        entrada = {_nombre_local(hijo.tag): (hijo.text or "").strip() for hijo in elemento}
+                        entrada["_etiqueta"] = _nombre_local(elemento.tag)
+                        yield entrada
+                        # liberar lo ya procesado para no acumular el arbol entero
+                        elemento.clear()
+                        if raiz is not None:
+                            raiz.clear()
+            except (ET.ParseError, OSError, EOFError) as e:
+                self.estadisticas["errores"] += 1
+                print(f"[ERROR] {url}: XML invalido ({e})")
+            finally:
+                self.estadisticas["bytes"] += contador.leidos
+
+
+class _ContadorBytes:
+    """
+    Envuelve la respuesta HTTP para contar los bytes leidos (comprimidos) y poder mirar los primeros sin consumirlos.
+    """
+
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+        self.leidos = 0
+        self._inicio = b""
+
+    def peek(self, n: int) -> bytes:
+        if len(self._inicio) < n:
+            datos = self.respuesta.read(n - len(self._inicio))
+            self.leidos += len(datos)
+            self._inicio += datos
+        return self._inicio[:n]
+
+    def read(self, n: int = -1) -> bytes:
+        inicio, self._inicio = self._inicio, b""
+        if n is not None and 0 <= n <= len(inicio):
+            self._inicio = inicio[n:]
+            return inicio[:n]
+        datos = self.respuesta.read(-1 if n is None or n < 0 else n - len(inicio))
+        self.leidos += len(datos)
+        return inicio + datos
+
+
+class DescubridorSitemaps:
+    """
+    Encuentra las notas de las secciones pedidas a partir del sitemap, los feeds RSS o, en ultimo caso, los indices,
+    y encola las nuevas para DescargadorNotas.
+    """
+
+    def __init__(self, url_sitemap: str, url_rss: Callable[[str], str], url_indice: Callable[[str, int], str],
+                 secciones: List[str], ids_conocidos: Set[str], cola: Optional[queue.Queue] = None,
+                 desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+                 paginas_maximas_indice: int = PAGINAS_MAXIMAS_INDICE):
+        """
+        :param url_sitemap: URL del sitemapindex (o de un urlset, si el sitio tiene 1 solo sitemap).
+        :param url_rss: Funcion seccion -> URL del feed RSS de la seccion.
+        :param url_indice: Funcion (seccion, pagina) -> URL de la pagina de indice, para la vuelta a los indices.
+        :param ids_conocidos: IDs de notas ya guardadas; se actualiza con las encoladas.
+        :param cola: Cola de DescargadorNotas; si es None las notas solo se acumulan en self.notas.
+        :param desde: Solo notas modificadas desde esta fecha (None: sin limite).
+        :param hasta: Solo notas modificadas hasta esta fecha (None: sin limite).
+        """
+        self.url_sitemap = url_sitemap
+        self.url_rss = url_rss
+        self.url_indice = url_indice
+        self.secciones = list(secciones)
+        self.ids_conocidos = ids_conocidos
+        self.cola = cola
+        self.desde = desde
+        self.hasta = hasta
+        self.paginas_maximas_indice = paginas_maximas_indice
+        self.lector = LectorXML()
+        self.notas: List[Dict] = []
+        # de donde salieron las notas de cada seccion: "sitemap", "rss" o "indice"
+        self.fuentes: Dict[str, str] = {}
+        self.estadisticas = {"sitemaps_hijos": 0, "sitemaps_salteados": 0, "urls_leidas": 0, "fuera_de_ventana": 0,
+                             "no_notas": 0, "ya_conocidas": 0, "encoladas": 0, "pedidos_indice": 0,
+                             "bytes_indice": 0}
+
+    def _encolar(self, url: str, seccion: str, fecha: Optional[datetime]) -> bool:
+        self.estadisticas["urls_leidas"] += 1
+        id_nota = id_de_nota(url)
+        if id_nota is None:
+            self.estadisticas["no_notas"] += 1
+            return False
+        if not en_ventana(fecha, self.desde, self.hasta):
+            self.estadisticas["fuera_de_ventana"] += 1
+            return False
+        if id_nota in self.ids_conocidos:
+            self.estadisticas["ya_conocidas"] += 1
+            return False
+        self.ids_conocidos.add(id_nota)
+        nota = {"id": id_nota, "url": url, "seccion": seccion, "detectada": time.time(),
+                "fecha": fecha.isoformat() if fecha else None}
+        self.notas.append(nota)
+        if self.cola is not None:
+            self.cola.put(nota)
+        self.estadisticas["encoladas"] += 1
+        return True
+
+    def _sitemaps_por_seccion(self) -> Dict[str, List[Tuple[str, Optional[datetime]]]]:
+        """
+        Lee el sitemapindex.
+        :return: seccion -> [(URL del sitemap hijo, lastmod)]. Si la URL es directamente un urlset, sus notas se
+                 encolan en seccion "sin-seccion".
+        """
+        hijos: Dict[str, List[Tuple[str, Optional[datetime]]]] = {}
+        for entrada in self.lector.elementos(self.url_sitemap, {"sitemap", "url"}):
+            loc = entrada.get("loc", "")
+            if entrada["_etiqueta"] == "url" or not regex_sitemap_seccion.search(loc):
+                # entrada <url> de un urlset plano, o sitemap hijo que no es de una seccion
+                self._encolar(loc, "sin-seccion", parsear_fecha(entrada.get("lastmod")))
+                continue
+            seccion = regex_sitemap_seccion.search(loc).group(1)
+            hijos.setdefault(seccion, []).append((loc, parsear_fecha(entrada.get("lastmod"))))
+        return hijos
+
+    def desde_sitemaps(self, hijos: Dict[str, List[Tuple[str, Optional[datetime]]]]):
+        for seccion in self.secciones:
+            for url, lastmod in hijos.get(seccion, []):
+                # un sitemap cuya ultima modificacion es anterior a "desde" no puede tener notas de la ventana
+                if self.desde is not None and lastmod is not None and lastmod < self.desde:
+                    self.estadisticas["sitemaps_salteados"] += 1
+                    continue
+                self.estadisticas["sitemaps_hijos"] += 1
+                for entrada in self.lector.elementos(url, {"url"}):
+                    self._encolar(entrada.get("loc", ""), seccion, parsear_fecha(entrada.get("lastmod")))
+            if seccion in hijos:
+                self.fuentes[seccion] = "sitemap"
+
+    def desde_rss(self, seccion: str) -> bool:
+        """
+        :return: True si el feed existe y alcanza para cubrir la ventana (su nota mas vieja es anterior a "desde").
+        """
+        pedidos_antes = self.lector.estadisticas["pedidos"] - self.lector.estadisticas["no_encontrados"]
+        mas_vieja = None
+        items = 0
+        for item in self.lector.elementos(self.url_rss(seccion), {"item"}):
+            items += 1
+            fecha = parsear_fecha(item.get("pubDate"))
+            if fecha is not None and (mas_vieja is None or fecha < mas_vieja):
+                mas_vieja = fecha
+            self._encolar(item.get("link", ""), seccion, fecha)
+        if self.lector.estadisticas["pedidos"] - self.lector.estadisticas["no_encontrados"] == pedidos_antes:
+            return False
+        self.fuentes[seccion] = "rss"
+        # un feed solo trae las ultimas notas: si no llega hasta "desde", faltan notas y hay que ir a los indices
+        return items > 0 and self.desde is not None and mas_vieja is not None and mas_vieja < self.desde
+
+    def desde_indices(self, seccion: str):
+        """
+        Vuelta al recorrido de las paginas de indice, como NewsSpider, hasta una pagina vacia o con todas sus notas
+        anteriores a "desde".
+        """
+        self.fuentes[seccion] = "indice"
+        for pagina in range(1, self.paginas_maximas_indice + 1):
+            url = self.url_indice(seccion, pagina)
+            self.estadisticas["pedidos_indice"] += 1
+            try:
+                request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+                with urllib.request.urlopen(request, timeout=TIMEOUT) as respuesta:
+                    cuerpo = respuesta.read()
+            except (urllib.error.URLError, TimeoutError) as e:
+                print(f"[ERROR] {url}: {e}")
+                return
+            self.estadisticas["bytes_indice"] += len(cuerpo)
+            html = cuerpo.decode("utf-8", errors="ignore")
+            links = links_de_notas(html, url)
+            if not links:
+                return
+            fechas = [parsear_fecha(f) for f in regex_fecha_tarjeta.findall(html)]
+            # las tarjetas traen la fecha en el mismo orden que los links; si no coinciden se ignora la fecha
+            if len(fechas) != len(links):
+                fechas = [None] * len(links)
+            for link, fecha in zip(links, fechas):
+                self._encolar(link["url"], seccion, fecha)
+            if self.desde is not None and fechas and all(f is not None and f < self.desde for f in fechas):
+                return
+
+    def descubrir(self) -> List[Dict]:
+        """
+        :return: Las notas nuevas encontradas ({"id", "url", "seccion", "detectada", "fecha"}), ya encoladas.
+        """
+        hijos = self._sitemaps_por_seccion()
+        self.desde_sitemaps(hijos)
+        for seccion in self.secciones:
+            if seccion in hijos:
+                continue
+            if not self.desde_rss(seccion):
+                self.desde_indices(seccion)
+        return self.notas
+
+    def pedidos(self) -> Tuple[int, int]:
+        """
+        :return: (pedidos, bytes) de descubrimiento: sitemaps, feeds y paginas de indice.
+        """
+        return (self.lector.estadisticas["pedidos"] + self.estadisticas["pedidos_indice"],
+                self.lector.estadisticas["bytes"] + self.estadisticas["bytes_indice"])
+
+
+def recorrer_indices(url_indice: Callable[[str, int], str], secciones: List[str]) -> Dict:
+    """
+    Recorrido completo de los indices, como el crawl de NewsSpider, para comparar.
+    :return: Notas encontradas y pedidos y bytes usados.
+    """
+    ids, pedidos, transferidos = set(), 0, 0
+    for seccion in secciones:
+        for pagina in range(1, PAGINAS_MAXIMAS_INDICE + 1):
+            request = urllib.request.Request(url_indice(seccion, pagina), headers={"User-Agent": USER_AGENT})
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as respuesta:
+                cuerpo = respuesta.read()
+            pedidos += 1
+            transferidos += len(cuerpo)
+            links = links_de_notas(cuerpo.decode("utf-8", errors="ignore"), request.full_url)
+            if not links:
+                break
+            ids.update(link["id"] for link in links)
+    return {"notas": len(ids), "pedidos": pedidos, "bytes": transferidos}
+
+
+def demo_fixture(dir_paginas: str, desde: Optional[datetime] = None) -> Dict:
+    """
+    Compara sitemaps/feeds contra el recorrido de los indices en servidor_fixture.py, con la ultima seccion sin
+    sitemap ni feed.
+    :return: Pedidos y bytes por nota descubierta de cada estrategia.
+    """
+    from servidor_fixture import ServidorFixture
+
+    with ServidorFixture(dir_paginas) as servidor:
+        secciones = list(servidor.corpus.secciones)
+    resultado = {"secciones_sin_sitemap": secciones[-1:]}
+    with ServidorFixture(dir_paginas, secciones_sin_sitemap=secciones[-1:]) as servidor:
+        for nombre, ventana in (("completo", None), ("ventana", desde)):
+            servidor.estadisticas.reiniciar()
+            descubridor = DescubridorSitemaps(servidor.url_sitemap(), servidor.url_rss, servidor.url_indice,
+                                              secciones, set(), desde=ventana)
+            inicio = time.perf_counter()
+            notas = descubridor.descubrir()
+            segundos = time.perf_counter() - inicio
+            # pedidos y bytes contados del lado del cliente: las estadisticas del servidor se actualizan despues de
+            # responder y el ultimo pedido puede no estar contado todavia
+            pedidos, transferidos = descubridor.pedidos()
+            resultado[f"sitemaps_{nombre}"] = {
+                "desde": ventana.isoformat() if ventana else None,
+                "notas": len(notas),
+                "fuentes": descubridor.fuentes,
+                "pedidos": pedidos,
+                "kb": round(transferidos / 1024, 1),
+                "pedidos_por_nota": round(pedidos / max(len(notas), 1), 3),
+                "kb_por_nota": round(transferidos / 1024 / max(len(notas), 1), 2),
+                "segundos": round(segundos, 3),
+                "estadisticas": descubridor.estadisticas,
+            }
+        inicio = time.perf_counter()
+        indices = recorrer_indices(servidor.url_indice, secciones)
+        segundos = time.perf_counter() - inicio
+        resultado["indices"] = {
+            "notas": indices["notas"],
+            "pedidos": indices["pedidos"],
+            "kb": round(indices["bytes"] / 1024, 1),
+            "pedidos_por_nota": round(indices["pedidos"] / max(indices["notas"], 1), 3),
+            "kb_por_nota": round(indices["bytes"] / 1024 / max(indices["notas"], 1), 2),
+            "segundos": round(segundos, 3),
+        }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descubre notas a partir de los sitemaps y feeds RSS del sitio")
+    parser.add_argument("--sitemap", default=URL_SITEMAP, help=f"URL del sitemap (default: {URL_SITEMAP})")
+    parser.add_argument("--secciones", nargs="+", default=SECCIONES, help="Secciones a buscar (default: todas)")
+    parser.add_argument("--paginas", default=DIR_PAGINAS, help=f"Directorio de las notas guardadas (default: {DIR_PAGINAS})")
+    parser.add_argument("--desde", help="Solo notas modificadas desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Solo notas modificadas hasta esta fecha (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--sin-descargar", action="store_true", help="Solo listar las notas nuevas, sin descargarlas")
+    parser.add_argument("--fixture", action="store_true", help="Comparar contra los indices en servidor_fixture.py")
+    args = parser.parse_args()
+
+    desde = parsear_fecha(args.desde) if args.desde else None
+    # "hasta" inclusive: hasta el final de ese dia
+    hasta = parsear_fecha(args.hasta + "T23:59:59") if args.hasta else None
+
+    if args.fixture:
+        resultado = demo_fixture(args.paginas, desde or parsear_fecha("2025-08-01"))
+        print(json.dumps(resultado, indent=1, ensure_ascii=False))
+        return
+
+    ids_conocidos = ids_guardados(args.paginas)
+    print(f"[INFO] {len(ids_conocidos)} notas ya guardadas en {args.paginas}")
+    cola = None if args.sin_descargar else queue.Queue()
+    descubridor = DescubridorSitemaps(args.sitemap, lambda seccion: URL_BASE + RUTA_RSS.format(seccion=seccion),
+                                      lambda seccion, pagina: f"{URL_BASE}/secciones/{seccion}?page={pagina}",
+                                      args.secciones, ids_conocidos, cola, desde=desde, hasta=hasta)
+    descargador = None
+    if cola is not None:
+        descargador = DescargadorNotas(cola, args.paginas)
+        descargador.start()
+    notas = descubridor.descubrir()
+    pedidos, transferidos = descubridor.pedidos()
+    print(f"[INFO] {len(notas)} notas nuevas en {pedidos} pedidos ({transferidos / 1024:.1f} KB) | "
+          f"Fuentes: {descubridor.fuentes}")
+    if descargador is None:
+        for nota in notas:
+            print(f"  {nota['seccion']}: {nota['url']} ({nota['fecha']})")
+    else:
+        cola.put(None)
+        descargador.join()
+        print(f"[OK] Descargas: {descargador.estadisticas}")
+    print(f"[OK] Descubrimiento: {descubridor.estadisticas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Embeddings de notas con BERT en CPU, de a lotes.
+
+A diferencia de embeddings-de-frases-con-BERT.ipynb (1 frase a la vez, guardando las 13 capas):
+- los textos se tokenizan juntos con el tokenizador rapido, se ordenan por largo y se procesan de a lotes con
+  padding solo hasta el texto mas largo de cada lote;
+- se corre con torch.inference_mode, y de las capas solo se acumula la suma de las ultimas "capas" (con hooks),
+  sin pedir output_hidden_states;
+- pooling "cls" (el vector del token [CLS]) o "media" (promedio de los tokens, sin el padding), sobre el promedio
+  de las ultimas "capas" capas;
+- opcionalmente cuantiza las capas lineales a int8 (torch dynamic quantization), mas rapido en CPU;
+- guarda los vectores en disco por ID de nota y modelo (y configuracion): una nueva corrida solo calcula las notas
+  que no estaban.
+
+EmbeddingsBert es un transformer de sklearn, asi puede reemplazar al TF-IDF en el pipeline de
+5-entrenar_y_guardar_modelo_pipeline.py. Como en un Pipeline no llegan los IDs de nota, ahi la clave de la cache
+es un hash del texto.
+
+Ejemplos:
+    python embeddings_bert.py --crear-modelo-aleatorio ./bert_chico      # BERT chico con pesos al azar, para probar
+    python embeddings_bert.py --modelo ./bert_chico --comparar            # docs/s: 1 a 1 vs lotes vs int8 vs cache
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from sklearn.base import BaseEstimator, TransformerMixin
+
+# el mismo modelo que usa embeddings-de-frases-con-BERT.ipynb
+MODELO_BERT = "mrm8488/distill-bert-base-spanish-wwm-cased-finetuned-spa-squad2-es"
+DIR_CACHE_EMBEDDINGS = "./cache_embeddings"
+POOLINGS = ("cls", "media")
+LARGO_MAXIMO = 512
+TAMANIO_LOTE = 16
+
+
+def cargar_modelo(modelo: str = MODELO_BERT, cuantizar: bool = False):
+    """
+    :param modelo: Nombre del modelo en Huggingface o directorio local con el modelo y su tokenizador.
+    :param cuantizar: Cuantizar las capas lineales a int8 (solo CPU).
+    :return: (tokenizador rapido, modelo en modo evaluacion)
+    """
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizador = AutoTokenizer.from_pretrained(modelo, use_fast=True)
+    red = AutoModel.from_pretrained(modelo)
+    red.eval()
+    if cuantizar:
+        from torch.ao.quantization import quantize_dynamic
+        red = quantize_dynamic(red, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizador, red
+
+
+def _capas_encoder(red) -> Optional[List[torch.nn.Module]]:
+    """
+    :return: Las capas del encoder (BertModel y similares), o None si el modelo no tiene esa estructura.
+    """
+    encoder = getattr(red, "encoder", None)
+    capas = getattr(encoder, "layer", None)
+    return list(capas) if capas is not None else None
+
+
+def _embeber_lote(red, lote: Dict[str, torch.Tensor], pooling: str, capas: int) -> torch.Tensor:
+    """
+    :return: Tensor (tamaño del lote, dimension) con 1 vector por texto.
+    """
+    capas_encoder = _capas_encoder(red)
+    suma = []
+    ganchos = []
+    if capas_encoder is not None and capas <= len(capas_encoder):
+        # acumular la salida de las ultimas capas a medida que se calculan, sin guardar las demas
+        def acumular(modulo, entrada, salida):
+            estado = salida[0] if isinstance(salida, tuple) else salida
+            if suma:
+                suma[0] = suma[0] + estado
+            else:
+                suma.append(estado)
+        ganchos = [capa.register_forward_hook(acumular) for capa in capas_encoder[-capas:]]
+        try:
+            red(**lote)
+        finally:
+            for gancho in ganchos:
+                gancho.remove()
+        estados = suma[0] / capas
+    else:
+        salida = red(**lote, output_hidden_states=capas > 1)
+        estados = torch.stack(salida.hidden_states[-capas:]).mean(dim=0) if capas > 1 else salida.last_hidden_state
+    if pooling == "cls":
+        return estados[:, 0]
+    mascara = lote["attention_mask"].unsqueeze(-1).to(estados.dtype)
+    return (estados * mascara).sum(dim=1) / mascara.sum(dim=1).clamp(min=1)
+
+
+class CacheEmbeddings:
+    """
+    Vectores ya calculados, por ID, en un directorio por modelo y configuracion. Cada corrida agrega un archivo
+    parte-*.npz con los vectores nuevos; nunca se reescriben los anteriores.
+    """
+
+    def __init__(self, dir_cache: str, modelo: str, config: Dict):
+        nombre = re.sub(r"[^0-9a-zA-Z_.-]+", "_", Path(modelo).name if os.path.isdir(modelo) else modelo)
+        clave = hashlib.sha1(json.dumps({"modelo": str(modelo), **config}, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self.directorio = Path(dir_cache) / f"{nombre}-{clave}"
+        self.vectores: Dict[str, np.ndarray] = {}
+        if self.directorio.exists():
+            for parte in sorted(self.directorio.glob("parte-*.npz")):
+                with np.load(parte, allow_pickle=False) as datos:
+                    self.vectores.update(zip(datos["ids"].tolist(), datos["vectores"]))
+
+    def __contains__(self, id_nota: str) -> bool:
+        return id_nota in self.vectores
+
+    def __getitem__(self, id_nota: str) -> np.ndarray:
+        return self.vectores[id_nota]
+
+    def guardar(self, ids: Sequence[str], vectores: np.ndarray):
+        if len(ids) == 0:
+            return
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, prefix=".tmp-", suffix=".npz")
+        with os.fdopen(descriptor, "wb") as f:
+            np.savez(f, ids=np.array(ids, dtype=str), vectores=vectores.astype(np.float32))
+        # el nombre lleva la hora y un hash de los IDs, para que 2 procesos no pisen la misma parte
+        huella = hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()[:8]
+        os.replace(temporal, self.directorio / f"parte-{time.time_ns()}-{huella}.npz")
+        self.vectores.update(zip(ids, vectores.astype(np.float32)))
+
+
+def id_de_texto(texto: str) -> str:
+    return hashlib.sha1(texto.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingsBert(BaseEstimator, TransformerMixin):
+    """
+    Transformer de sklearn: lista de textos -> matriz (n_textos, dimension) de embeddings de BERT.
+    El modelo se carga la 1ra vez que se usa, y no se guarda al serializar (joblib) el transformer.
+    """
+
+    def __init__(self, modelo: str = MODELO_BERT, pooling: str = "media", capas: int = 4,
+                 largo_maximo: int = LARGO_MAXIMO, tamanio_lote: int = TAMANIO_LOTE, cuantizar: bool = False,
+                 dir_cache: Optional[str] = DIR_CACHE_EMBEDDINGS, hilos: Optional[int] = None):
+        self.modelo = modelo
+        self.pooling = pooling
+        self.capas = capas
+        self.largo_maximo = largo_maximo
+        self.tamanio_lote = tamanio_lote
+        self.cuantizar = cuantizar
+        self.dir_cache = dir_cache
+        self.hilos = hilos
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        estado.pop("_tokenizador_y_red_", None)
+        estado.pop("_cache", None)
+        return estado
+
+    def _config(self) -> Dict:
+        return {"pooling": self.pooling, "capas": self.capas, "largo_maximo": self.largo_maximo, "cuantizar": self.cuantizar}
+
+    def _tokenizador_y_red(self):
+        if getattr(self, "_tokenizador_y_red_", None) is None:
+            self._tokenizador_y_red_ = cargar_modelo(self.modelo, self.cuantizar)
+        return self._tokenizador_y_red_
+
+    def fit(self, X, y=None):
+        if self.pooling not in POOLINGS:
+            raise ValueError(f"pooling debe ser uno de {POOLINGS}, no {self.pooling!r}")
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        if isinstance(X, str):
+            raise ValueError("Se esperaba una lista de textos, no 1 texto")
+        textos = list(X)
+        return self.embeber(textos, [id_de_texto(texto) for texto in textos])
+
+    def embeber(self, textos: Sequence[str], ids: Optional[Sequence] = None) -> np.ndarray:
+        """
+        :param textos: Los textos a embeber.
+        :param ids: Un ID por texto (p.ej. el ID de la nota) para la cache; None para no usar la cache.
+        :return: Matriz float32 (len(textos), dimension), en el mismo orden que textos.
+        """
+        if self.pooling not in POOLINGS:
+            raise ValueError(f"pooling debe ser uno de {POOLINGS}, no {self.pooling!r}")
+        cache = None
+        if ids is not None and self.dir_cache is not None:
+            if getattr(self, "_cache", None) is None:
+                self._cache = CacheEmbeddings(self.dir_cache, self.modelo, self._config())
+            cache = self._cache
+        ids = [str(i) for i in ids] if ids is not None else None
+        faltantes = [i for i in range(len(textos)) if cache is None or ids[i] not in cache]
+        self.estadisticas_ = {"textos": len(textos), "en_cache": len(textos) - len(faltantes)}
+
+        nuevos = self._embeber_sin_cache([textos[i] for i in faltantes]) if faltantes else None
+        if cache is not None and nuevos is not None:
+            cache.guardar([ids[i] for i in faltantes], nuevos)
+        if cache is None:
+            return nuevos if nuevos is not None else np.zeros((0, 0), dtype=np.float32)
+        return np.vstack([cache[i] for i in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+
+    def _embeber_sin_cache(self, textos: List[str]) -> np.ndarray:
+        tokenizador, red = self._tokenizador_y_red()
+        if self.hilos:
+            torch.set_num_threads(self.hilos)
+        # 1 sola llamada al tokenizador rapido para todos los textos, sin padding
+        codificados = tokenizador(textos, truncation=True, max_length=self.largo_maximo)
+        largos = np.array([len(ids) for ids in codificados["input_ids"]])
+        # ordenar por largo: cada lote tiene textos de largo parecido y casi no hay padding
+        orden = np.argsort(-largos, kind="stable")
+        vectores = None
+        tokens, tokens_con_padding = 0, 0
+        with torch.inference_mode():
+            for inicio in range(0, len(orden), self.tamanio_lote):
+                indices = orden[inicio:inicio + self.tamanio_lote]
+                lote = tokenizador.pad({clave: [codificados[clave][i] for i in indices] for clave in codificados.keys()},
+                                       return_tensors="pt")
+                salida = _embeber_lote(red, dict(lote), self.pooling, self.capas).float().numpy()
+                if vectores is None:
+                    vectores = np.empty((len(textos), salida.shape[1]), dtype=np.float32)
+                vectores[indices] = salida
+                tokens += int(largos[indices].sum())
+                tokens_con_padding += int(lote["input_ids"].numel())
+        self.estadisticas_.update({"tokens": tokens, "tokens_con_padding": tokens_con_padding})
+        return vectores
+
+
+def crear_bert_aleatorio(directorio: str, textos: Sequence[str], tamanio_vocabulario: int = 8000, capas: int = 4,
+                         dimension: int = 128, semilla: int = 0) -> str:
+    """
+    Crea un BERT chico con pesos al azar y un tokenizador WordPiece con las palabras mas frecuentes de los textos,
+    para probar el pipeline sin descargar un modelo. Los embeddings no significan nada, pero el costo por token
+    escala como el de un BERT real.
+    :return: El directorio del modelo.
+    """
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    torch.manual_seed(semilla)
+    Path(directorio).mkdir(parents=True, exist_ok=True)
+    especiales = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    caracteres = sorted({c for texto in textos for c in texto if not c.isspace()})
+    palabras = Counter(p for texto in textos for p in re.findall(r"\w+", texto))
+    vocabulario = especiales + caracteres + ["##" + c for c in caracteres]
+    vocabulario += [p for p, _ in palabras.most_common(max(tamanio_vocabulario - len(vocabulario), 0)) if p not in set(caracteres)]
+    archivo_vocabulario = Path(directorio) / "vocab.txt"
+    archivo_vocabulario.write_text("\n".join(vocabulario) + "\n", encoding="utf-8")
+    tokenizador = BertTokenizerFast(vocab_file=str(archivo_vocabulario), do_lower_case=False)
+    tokenizador.save_pretrained(directorio)
+    config = BertConfig(vocab_size=len(vocabulario), hidden_size=dimension, num_hidden_layers=capas,
+                        num_attention_heads=max(dimension // 64, 1), intermediate_size=4 * dimension,
+                        max_position_embeddings=LARGO_MAXIMO)
+    BertModel(config).save_pretrained(directorio)
+    return directorio
+
+
+def embeber_1_a_1(textos: Sequence[str], modelo: str, largo_maximo: int = LARGO_MAXIMO) -> np.ndarray:
+    """
+    Como en embeddings-de-frases-con-BERT.ipynb: 1 texto a la vez, con todas las capas (output_hidden_states),
+    promedio de los tokens de la anteultima capa. Solo para comparar velocidades.
+    """
+    tokenizador, red = cargar_modelo(modelo)
+    vectores = []
+    with torch.no_grad():
+        for texto in textos:
+            lote = tokenizador([texto], truncation=True, max_length=largo_maximo, return_tensors="pt")
+            capas = red(**lote, output_hidden_states=True).hidden_states
+            vectores.append(torch.stack(capas, dim=0)[-2][0].mean(dim=0).numpy())
+    return np.vstack(vectores)
+
+
+def _leer_textos(dir_paginas: str) -> Tuple[List[str], List[str]]:
+    """
+    :return: (IDs de nota, textos) del corpus, extraidos como en 2-html-a-dataframe.py.
+    """
+    from benchmark_pipeline import listar_corpus
+    from cargador_scripts import importar_script
+
+    script = importar_script("2-html-a-dataframe.py")
+    ids, textos = [], []
+    for path, _ in zip(*listar_corpus(dir_paginas)):
+        datos = script.extraer_datos_nota(script.leer_archivo(str(path)))
+        if datos is not None and datos[2] is not None:
+            ids.append(str(script.id_de_nota(path.name) or path.name))
+            textos.append(datos[2])
+    return ids, textos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embeddings de notas con BERT en CPU, de a lotes y con cache")
+    parser.add_argument("--modelo", default=MODELO_BERT, help=f"Modelo de Huggingface o directorio local (default: {MODELO_BERT})")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio con 1 subdirectorio por seccion (default: ./paginas)")
+    parser.add_argument("--pooling", default="media", choices=POOLINGS)
+    parser.add_argument("--capas", type=int, default=4, help="Promediar las ultimas N capas (default: 4)")
+    parser.add_argument("--largo-maximo", type=int, default=LARGO_MAXIMO, help=f"Tokens por texto (default: {LARGO_MAXIMO})")
+    parser.add_argument("--tamanio-lote", type=int, default=TAMANIO_LOTE, help=f"Textos por lote (default: {TAMANIO_LOTE})")
+    parser.add_argument("--cuantizar", action="store_true", help="Cuantizar las capas lineales a int8")
+    parser.add_argument("--cache", default=DIR_CACHE_EMBEDDINGS, help=f"Directorio de la cache (default: {DIR_CACHE_EMBEDDINGS})")
+    parser.add_argument("--limite", type=int, default=None, help="Embeber solo las primeras N notas")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Medir docs/s de 1 a 1 (como la notebook), de a lotes, de a lotes con int8 y desde la cache")
+    parser.add_argument("--crear-modelo-aleatorio", metavar="DIRECTORIO",
+                        help="Crear un BERT chico con pesos al azar (vocabulario del corpus) en DIRECTORIO y salir")
+    args = parser.parse_args()
+
+    ids, textos = _leer_textos(args.paginas)
+    ids, textos = ids[:args.limite], textos[:args.limite]
+    print(f"[INFO] {len(textos)} notas leidas de {args.paginas}")
+    if args.crear_modelo_aleatorio:
+        crear_bert_aleatorio(args.crear_modelo_aleatorio, textos)
+        print(f"[OK] Modelo aleatorio guardado en {args.crear_modelo_aleatorio}")
+        return
+
+    parametros = dict(modelo=args.modelo, pooling=args.pooling, capas=args.capas, largo_maximo=args.largo_maximo,
+                      tamanio_lote=args.tamanio_lote)
+    if not args.comparar:
+        embeddings = EmbeddingsBert(cuantizar=args.cuantizar, dir_cache=args.cache, **parametros)
+        inicio = time.perf_counter()
+        vectores = embeddings.embeber(textos, ids)
+        segundos = time.perf_counter() - inicio
+        print(f"[OK] {vectores.shape[0]} vectores de {vectores.shape[1]} dimensiones en {segundos:.2f}s "
+              f"({embeddings.estadisticas_['en_cache']} ya estaban en {embeddings._cache.directorio})")
+        return
+
+    with tempfile.TemporaryDirectory() as dir_cache:
+        corridas = [
+            ("1 a 1, todas las capas", lambda: embeber_1_a_1(textos, args.modelo, args.largo_maximo)),
+            ("lotes ordenados por largo", lambda: EmbeddingsBert(dir_cache=None, **parametros).embeber(textos)),
+            ("lotes + int8", lambda: EmbeddingsBert(dir_cache=None, cuantizar=True, **parametros).embeber(textos)),
+            ("lotes -> cache", lambda: EmbeddingsBert(dir_cache=dir_cache, **parametros).embeber(textos, ids)),
+            ("desde la cache", lambda: EmbeddingsBert(dir_cache=dir_cache, **parametros).embeber(textos, ids)),
+        ]
+        print(f"\n{'corrida':<28}{'segundos':>10}{'docs/s':>10}")
+        for nombre, correr in corridas:
+            inicio = time.perf_counter()
+            correr()
+            segundos = time.perf_counter() - inicio
+            print(f"{nombre:<28}{segundos:>10.2f}{len(textos) / segundos:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Explicacion de cada prediccion de un pipeline lineal (TF-IDF -> SelectKBest -> OneVsRest(SVC lineal), el de 5-):
+los n-gramas que mas aportaron al score de la clase predicha, para todas las notas a la vez.
+
+El score lineal de la clase c para la nota i es sum_j x_ij * w_jc + b_c, asi que el aporte del n-grama j es
+x_ij * w_jc. Se calcula solo sobre los no ceros de X (ya seleccionada): cada valor se multiplica por el peso de su
+columna en la clase predicha de su fila, con 1 indexado de W, sin densificar X ni recorrer las notas de a 1. El
+top-k de cada fila sale de 1 solo ordenamiento de los no ceros por (fila, -aporte): los k primeros de cada fila
+(solo aportes positivos, los que empujan hacia la clase predicha).
+
+Con scikit-learn, el pipeline se separa en la transformacion (todo menos el ultimo paso) y el clasificador, asi la
+matriz TF-IDF se calcula 1 sola vez para predecir y para explicar; lo que se agrega es proporcional a los no ceros
+de X (ver --benchmark).
+
+Ejemplos:
+    python explicaciones_lineales.py --benchmark
+    python explicaciones_lineales.py --benchmark --docs 5000 --top 10
+"""
+import argparse
+import json
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+TOP_NGRAMAS = 5
+SEPARADOR = " | "
+
+
+def pesos_lineales(clasificador) -> Optional[np.ndarray]:
+    """
+    :return: Los pesos (n_features, n_clases) del clasificador, en el orden de clasificador.classes_, o None si no
+    es lineal (p.ej. SVC con kernel rbf o kNN).
+    """
+    try:
+        if hasattr(clasificador, "estimators_"):
+            # OneVsRest: 1 estimador binario por clase (1 solo si hay 2 clases)
+            coeficientes = [estimador.coef_ for estimador in clasificador.estimators_]
+        else:
+            coeficientes = [clasificador.coef_]
+    except AttributeError:
+        return None
+    # SVC entrenado con matrices ralas deja coef_ ralo
+    W = np.vstack([c.toarray() if sp.issparse(c) else np.asarray(c) for c in coeficientes]).T
+    if W.shape[1] == 1 and len(getattr(clasificador, "classes_", ())) == 2:
+        W = np.hstack([-W, W])
+    return W
+
+
+def separar_pipeline(modelo) -> Optional[Tuple[object, object, np.ndarray]]:
+    """
+    :return: (transformacion, clasificador, nombre de cada feature que recibe el clasificador) de un Pipeline con
+    clasificador lineal, o None si no se puede explicar.
+    """
+    if not hasattr(modelo, "named_steps") or len(modelo.steps) < 2:
+        return None
+    clasificador = modelo.steps[-1][1]
+    if pesos_lineales(clasificador) is None:
+        return None
+    transformacion = modelo[:-1]
+    try:
+        nombres = np.asarray(transformacion.get_feature_names_out())
+    except (AttributeError, ValueError):
+        # p.ej. embeddings: las features no son n-gramas
+        return None
+    return transformacion, clasificador, nombres
+
+
+def nombres_de_features(vectorizador, selector=None) -> Optional[np.ndarray]:
+    """
+    :return: El nombre de cada feature de un vectorizador (y selector) guardados aparte, o None.
+    """
+    try:
+        nombres = np.asarray(vectorizador.get_feature_names_out())
+        return np.asarray(selector.get_feature_names_out(nombres)) if selector is not None else nombres
+    except (AttributeError, ValueError):
+        return None
+
+
+def aportes_top(X, W: np.ndarray, columnas: np.ndarray, k: int = TOP_NGRAMAS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param X: Features (n, n_features), rala.
+    :param W: Pesos (n_features, n_clases).
+    :param columnas: Columna de W a explicar en cada fila (la de la clase predicha).
+    :return: (indices (n, k) de las features con mayor aporte positivo, de mayor a menor, -1 si hay menos de k;
+    aportes (n, k), NaN donde no hay feature).
+    """
+    X = sp.csr_matrix(X)
+    n = X.shape[0]
+    filas = np.repeat(np.arange(n), np.diff(X.indptr))
+    aportes = X.data * W[X.indices, np.asarray(columnas)[filas]]
+    # las filas ya estan en orden, asi que ordenar por (fila, -aporte) solo reordena dentro de cada fila
+    orden = np.lexsort((-aportes, filas))
+    posicion = np.arange(len(orden)) - X.indptr[filas]
+    elegidos = (posicion < k) & (aportes[orden] > 0)
+    indices = np.full((n, k), -1, dtype=np.int64)
+    valores = np.full((n, k), np.nan)
+    indices[filas[elegidos], posicion[elegidos]] = X.indices[orden[elegidos]]
+    valores[filas[elegidos], posicion[elegidos]] = aportes[orden[elegidos]]
+    return indices, valores
+
+
+def formatear_explicaciones(indices: np.ndarray, aportes: np.ndarray, nombres: Sequence[str]) -> List[str]:
+    """
+    :return: Por fila, "ngrama:aporte | ngrama:aporte | ..." (mismo formato que las columnas top de 6-).
+    """
+    nombres = np.asarray(nombres)
+    return [SEPARADOR.join(f"{nombre}:{aporte:.4f}" for nombre, aporte in zip(nombres[fila[fila >= 0]], valores))
+            for fila, valores in zip(indices, aportes)]
+
+
+def explicar(X, clasificador, y_pred, nombres: Sequence[str], k: int = TOP_NGRAMAS) -> Optional[List[str]]:
+    """
+    :param X: Lo que recibio el clasificador para predecir (rala, ya seleccionada).
+    :param y_pred: Lo que predijo el clasificador (en sus mismas etiquetas, clasificador.classes_).
+    :return: La explicacion de cada prediccion (ver formatear_explicaciones), o None si el clasificador no es lineal.
+    """
+    W = pesos_lineales(clasificador)
+    if W is None or W.shape[0] != X.shape[1] or len(nombres) != X.shape[1]:
+        return None
+    columnas = np.searchsorted(clasificador.classes_, np.asarray(y_pred))
+    return formatear_explicaciones(*aportes_top(X, W, columnas, k), nombres)
+
+
+def textos_sinteticos(n_docs: int, n_clases: int = 4, palabras_por_doc: int = 300, vocabulario: int = 20000,
+                      semilla: int = 0) -> Tuple[List[str], np.ndarray]:
+    """
+    Textos con palabras tipo Zipf y algunas palabras mas probables en cada clase.
+    """
+    rng = np.random.default_rng(semilla)
+    y = rng.integers(0, n_clases, n_docs)
+    probabilidades = 1.0 / np.arange(1, vocabulario + 1)
+    probabilidades /= probabilidades.sum()
+    palabras = rng.choice(vocabulario, size=(n_docs, palabras_por_doc), p=probabilidades)
+    propias = rng.random(palabras.shape) < 0.1
+    palabras[propias] = (np.broadcast_to(y[:, None], palabras.shape)[propias] * 97
+                         + rng.integers(0, 50, propias.sum())) % vocabulario
+    return [" ".join(f"p{palabra}" for palabra in fila) for fila in palabras], y
+
+
+def benchmark(n_docs: int, k: int = TOP_NGRAMAS) -> dict:
+    """
+    Tiempo de predecir con el pipeline de 5- (predict + predict_proba sobre los textos, como hacia 6-) contra
+    vectorizar 1 vez, predecir y explicar; y las explicaciones contra un loop fila por fila.
+    """
+    from cargador_scripts import importar_script
+
+    pipeline = importar_script("5-entrenar_y_guardar_modelo_pipeline.py").construir_pipeline()
+    textos_train, y_train = textos_sinteticos(1000, semilla=1)
+    pipeline.fit(textos_train, y_train)
+    textos, _ = textos_sinteticos(n_docs)
+
+    inicio = time.perf_counter()
+    pipeline.predict(textos)
+    pipeline.predict_proba(textos)
+    segundos_antes = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    transformacion, clasificador, nombres = separar_pipeline(pipeline)
+    X = transformacion.transform(textos)
+    y_pred = clasificador.predict(X)
+    clasificador.predict_proba(X)
+    segundos_prediccion = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    explicaciones = explicar(X, clasificador, y_pred, nombres, k)
+    segundos_explicacion = time.perf_counter() - inicio
+
+    # referencia: fila por fila con la fila densa
+    W = pesos_lineales(clasificador)
+    X = sp.csr_matrix(X)
+    iguales = True
+    for i in range(min(n_docs, 200)):
+        aportes = X[i].toarray().ravel() * W[:, np.searchsorted(clasificador.classes_, y_pred[i])]
+        mejores = [j for j in np.argsort(-aportes, kind="stable")[:k] if aportes[j] > 0]
+        esperado = SEPARADOR.join(f"{nombres[j]}:{aportes[j]:.4f}" for j in mejores)
+        iguales &= esperado == explicaciones[i]
+
+    resultado = {"docs": n_docs, "nnz": int(X.nnz), "segundos_predict_pipeline": round(segundos_antes, 3),
+                 "segundos_vectorizar_y_predecir": round(segundos_prediccion, 3),
+                 "segundos_explicar": round(segundos_explicacion, 3),
+                 "factor": round((segundos_prediccion + segundos_explicacion) / segundos_antes, 3),
+                 "iguales_a_loop": bool(iguales)}
+    print(f"[INFO] {n_docs} docs: predict + predict_proba del pipeline {segundos_antes:.2f}s; vectorizar 1 vez + "
+          f"predecir {segundos_prediccion:.2f}s + explicar {segundos_explicacion:.3f}s")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="N-gramas que mas aportan a cada prediccion de un pipeline lineal")
+    parser.add_argument("--benchmark", action="store_true", help="Medir con textos sinteticos y el pipeline de 5-")
+    parser.add_argument("--docs", type=int, default=2000, help="Docs a predecir en el benchmark (default: 2000)")
+    parser.add_argument("--top", type=int, default=TOP_NGRAMAS, help=f"N-gramas por prediccion (default: {TOP_NGRAMAS})")
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.error("las explicaciones se calculan en 6-predecir_en_validacion.py (EXPLICAR_PREDICCIONES); "
+                     "aca solo esta --benchmark")
+    print(json.dumps(benchmark(args.docs, args.top), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Descargas mas baratas para el crawler de Scrapy:
+
+- FetchCondicionalMiddleware: guarda el ETag y el Last-Modified de cada url descargada y en la proxima corrida
+  pide la url con If-None-Match / If-Modified-Since; si no cambio el servidor responde 304 sin cuerpo.
+  El validador de un indice solo se guarda si todas las notas que se pidieron desde ese indice (segun el Referer)
+  se pudieron visitar (200 o 304; una descarga cortada a proposito por CorteTempranoExtension tambien cuenta): si
+  alguna dio error, con un 304 esos links no se volverian a extraer y la nota no se reintentaria.
+- CorteTempranoExtension: corta la descarga de una nota apenas aparece en el stream un marcador de paywall o
+  de pagina de autor (la nota se descarta igual), o cuando el tamaño supera un maximo.
+
+Las notas cuyo ID ya esta guardado ni se piden: eso lo hace NewsSpider.filtrar_links_guardados.
+
+Settings (ver NewsSpider.custom_settings en 1-web-scrapping.py):
+    DOWNLOADER_MIDDLEWARES = {"fetch_eficiente.FetchCondicionalMiddleware": 580}
+    FETCH_CONDICIONAL_ENABLED, FETCH_CONDICIONAL_ARCHIVO (default: <directorio de guardado>/.validadores_http.json)
+    EXTENSIONS = {"fetch_eficiente.CorteTempranoExtension": 500}
+    CORTE_TEMPRANO_ENABLED, CORTE_TEMPRANO_MARCADORES, CORTE_TEMPRANO_TAMANIO_MAXIMO (bytes)
+"""
+import json
+import os
+from os import path
+from typing import Dict, Optional
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured, StopDownload
+
+ARCHIVO_VALIDADORES = ".validadores_http.json"
+MARCADORES = ['<div class="paywall-inner-text">', '<div class="author-hero">']
+# las notas guardadas pesan ~120 KB; una pagina mucho mas grande no es una nota
+TAMANIO_MAXIMO = 2 * 1024 * 1024
+
+
+def es_request_de_nota(request) -> bool:
+    """
+    :return: True si el request lo genero la regla de notas del CrawlSpider (y no es una pagina de indice).
+    """
+    return "rule" in request.meta
+
+
+class FetchCondicionalMiddleware:
+    """
+    Downloader middleware que hace pedidos condicionales con los validadores (ETag / Last-Modified)
+    de la corrida anterior. Los 304 los descarta despues HttpErrorMiddleware, sin llegar al spider.
+    """
+
+    def __init__(self, crawler):
+        if not crawler.settings.getbool("FETCH_CONDICIONAL_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.archivo = crawler.settings.get("FETCH_CONDICIONAL_ARCHIVO")
+        # url -> {"etag": ..., "last_modified": ...}
+        self.validadores: Dict[str, Dict[str, str]] = {}
+        # urls de indices descargadas en esta corrida: si el crawl no termina no se guardan sus validadores,
+        # porque en la proxima corrida un 304 haria saltear notas que no se llegaron a procesar
+        self.indices_nuevos = set()
+        # url de nota que fallo (error o status inesperado) -> url del indice desde el que se pidio (None si no hay Referer)
+        self.notas_fallidas: Dict[str, Optional[str]] = {}
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def spider_opened(self, spider):
+        if self.archivo is None:
+            self.archivo = path.join(getattr(spider, "basedir", "."), ARCHIVO_VALIDADORES)
+        if path.exists(self.archivo):
+            with open(self.archivo, "rt", encoding="utf-8") as f:
+                self.validadores = json.load(f)
+
+    def process_request(self, request, spider):
+        validador = self.validadores.get(request.url)
+        if validador is not None:
+            if "etag" in validador:
+                request.headers.setdefault("If-None-Match", validador["etag"])
+            if "last_modified" in validador:
+                request.headers.setdefault("If-Modified-Since", validador["last_modified"])
+        return None
+
+    def _registrar_nota(self, request, visitada: bool):
+        # un reintento exitoso de la misma url borra la falla
+        if visitada:
+            self.notas_fallidas.pop(request.url, None)
+        else:
+            referer = request.headers.get("Referer")
+            self.notas_fallidas[request.url] = referer.decode("latin-1") if referer else None
+
+    def process_response(self, request, response, spider):
+        stats = self.crawler.stats
+        if es_request_de_nota(request):
+            # una descarga cortada por un marcador de paywall o de autor es una visita exitosa: se descarta igual
+            self._registrar_nota(request, response.status in (200, 304))
+        if response.status == 304:
+            stats.inc_value("fetch_condicional/no_modificadas")
+        elif response.status == 200:
+            validador = {}
+            if b"ETag" in response.headers:
+                validador["etag"] = response.headers["ETag"].decode("latin-1")
+            if b"Last-Modified" in response.headers:
+                validador["last_modified"] = response.headers["Last-Modified"].decode("latin-1")
+            # una descarga cortada no tiene el cuerpo completo: no sirve como version de referencia
+            if validador and "download_stopped" not in response.flags:
+                self.validadores[request.url] = validador
+                if not es_request_de_nota(request):
+                    self.indices_nuevos.add(request.url)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if es_request_de_nota(request):
+            self._registrar_nota(request, visitada=False)
+        return None
+
+    def spider_closed(self, spider, reason):
+        indices = set(self.notas_fallidas.values())
+        if reason != "finished" or None in indices:
+            # sin Referer no se sabe de que indice era la nota: se descartan los de toda la corrida
+            indices = self.indices_nuevos
+        for url in indices:
+            if self.validadores.pop(url, None) is not None:
+                self.crawler.stats.inc_value("fetch_condicional/indices_sin_validador")
+        directorio = path.dirname(self.archivo)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(self.archivo, "wt", encoding="utf-8") as f:
+            json.dump(self.validadores, f)
+
+
+class CorteTempranoExtension:
+    """
+    Corta la descarga de una nota (StopDownload) cuando aparece un marcador en lo recibido o cuando el
+    tamaño supera CORTE_TEMPRANO_TAMANIO_MAXIMO. El spider recibe la respuesta parcial, con el flag
+    "download_stopped", y decide que hacer con ella.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CORTE_TEMPRANO_ENABLED"):
+            raise NotConfigured
+        self.crawler = crawler
+        self.marcadores = [m.encode("utf-8") for m in settings.getlist("CORTE_TEMPRANO_MARCADORES", MARCADORES)]
+        self.tamanio_maximo = settings.getint("CORTE_TEMPRANO_TAMANIO_MAXIMO", TAMANIO_MAXIMO)
+        # cola de los ultimos bytes recibidos por request, para encontrar marcadores partidos entre 2 chunks
+        self.largo_cola = max(len(m) for m in self.marcadores) - 1
+        self.recibido: Dict[int, int] = {}
+        self.colas: Dict[int, bytes] = {}
+        crawler.signals.connect(self.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(self.bytes_received, signal=signals.bytes_received)
+        crawler.signals.connect(self.response_downloaded, signal=signals.response_downloaded)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _cortar(self, request, motivo: str):
+        self.crawler.stats.inc_value(f"corte_temprano/{motivo}")
+        self.recibido.pop(id(request), None)
+        self.colas.pop(id(request), None)
+        raise StopDownload(fail=False)
+
+    def headers_received(self, headers, body_length, request, spider):
+        if es_request_de_nota(request) and body_length is not None and body_length > self.tamanio_maximo:
+            self._cortar(request, "tamanio")
+
+    def bytes_received(self, data, request, spider):
+        if not es_request_de_nota(request):
+            return
+        clave = id(request)
+        self.recibido[clave] = self.recibido.get(clave, 0) + len(data)
+        ventana = self.colas.get(clave, b"") + data
+        if any(marcador in ventana for marcador in self.marcadores):
+            self._cortar(request, "marcador")
+        if self.recibido[clave] > self.tamanio_maximo:
+            self._cortar(request, "tamanio")
+        self.colas[clave] = ventana[-self.largo_cola:]
+
+    def response_downloaded(self, response, request, spider):
+        self.recibido.pop(id(request), None)
+        self.colas.pop(id(request), None)
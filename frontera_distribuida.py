@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+Crawl distribuido: varios procesos (en 1 o varias maquinas) comparten una frontera de URLs en SQLite.
+
+1-web-scrapping.py corre como un unico proceso por seccion, sin coordinacion entre maquinas. Aca la frontera es una
+base SQLite (en un volumen compartido si los trabajadores corren en maquinas distintas) con 1 fila por tarea:
+- tareas de 2 tipos: paginas de indice (clave "indice:<seccion>:<pagina>") y notas (clave "nota:<id>"); la clave es
+  UNIQUE, asi una nota linkeada desde varias paginas o encontrada por varios trabajadores se encola 1 sola vez;
+- cada trabajador arrienda un lote de tareas pendientes por ARRIENDO_SEGUNDOS (cada lote empieza por 1 pagina de
+  indice, para repartir el descubrimiento entre los trabajadores); si el trabajador se cae sin completarlas, el arriendo vence y otro las toma. Una tarea que falla
+  (o cuyo arriendo vence) MAX_INTENTOS veces queda como "fallida";
+- el limite de pedidos por dominio es global: cada pedido reserva en la base el siguiente turno del dominio
+  (1 / PEDIDOS_POR_SEGUNDO segundos despues del anterior, sea del trabajador que sea);
+- al procesar una pagina de indice con notas se encolan las PAGINAS_ADELANTE siguientes, asi varios trabajadores
+  recorren la misma seccion en paralelo en vez de esperar pagina por pagina; una pagina vacia (o un 404, pasada la
+  ultima pagina) corta la seccion;
+- cada trabajador acumula sus contadores en la tabla trabajadores, y --progreso los muestra sumados.
+
+Todas las modificaciones se hacen en transacciones BEGIN IMMEDIATE, que SQLite serializa entre procesos. En un volumen
+de red (NFS, SMB) conviene --sin-wal: el modo WAL necesita memoria compartida entre los procesos.
+
+Con --fixture levanta servidor_fixture.py con latencia, corre el crawl completo con 1, 2, 4... trabajadores (con un
+trabajador "caido" que arrienda tareas y no las completa) y compara el throughput de descubrimiento.
+
+Ejemplos:
+    python frontera_distribuida.py --frontera frontera.db --sembrar
+    python frontera_distribuida.py --frontera frontera.db --trabajar --nombre maquina1-a   # en cada maquina/proceso
+    python frontera_distribuida.py --frontera frontera.db --progreso
+    python frontera_distribuida.py --fixture --trabajadores 1 2 4 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import urlsplit
+
+from poller_secciones import (DIR_PAGINAS, MARCADORES_OMISION, SECCIONES, TIMEOUT, URL_BASE, USER_AGENT,
+                              guardar_nota, ids_guardados, links_de_notas)
+
+ARCHIVO_FRONTERA = "frontera.db"
+# URL de una pagina de indice; se guarda en la frontera para que los trabajadores no necesiten configurarla
+PLANTILLA_INDICE = URL_BASE + "/secciones/{seccion}?page={pagina}"
+TAREAS_POR_ARRIENDO = 5
+ARRIENDO_SEGUNDOS = 60.0
+MAX_INTENTOS = 3
+# limite global de pedidos por dominio, entre todos los trabajadores
+PEDIDOS_POR_SEGUNDO = 4.0
+PAGINAS_ADELANTE = 4
+# espera de un trabajador sin tareas mientras otros todavia tienen arriendos activos
+ESPERA_SIN_TAREAS = 0.5
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    clave TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    url TEXT NOT NULL,
+    seccion TEXT NOT NULL,
+    pagina INTEGER,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    trabajador TEXT,
+    vence REAL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    creada REAL NOT NULL,
+    terminada REAL
+);
+CREATE INDEX IF NOT EXISTS tareas_estado ON tareas (estado, tipo);
+CREATE TABLE IF NOT EXISTS dominios (
+    dominio TEXT PRIMARY KEY,
+    proximo_turno REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trabajadores (
+    nombre TEXT PRIMARY KEY,
+    host TEXT,
+    pedidos INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    descubiertas INTEGER NOT NULL DEFAULT 0,
+    guardadas INTEGER NOT NULL DEFAULT 0,
+    omitidas INTEGER NOT NULL DEFAULT 0,
+    errores INTEGER NOT NULL DEFAULT 0,
+    espera_turnos REAL NOT NULL DEFAULT 0,
+    ultimo_latido REAL
+);
+CREATE TABLE IF NOT EXISTS config (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+
+class FronteraSQLite:
+    """
+    Frontera compartida en un archivo SQLite. Cada proceso abre su propia instancia sobre el mismo archivo.
+    """
+
+    def __init__(self, ruta: str = ARCHIVO_FRONTERA, wal: bool = True):
+        self.ruta = ruta
+        # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+        self.conexion = sqlite3.connect(ruta, timeout=60, isolation_level=None)
+        if wal:
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+
+    def _transaccion(self):
+        return _Transaccion(self.conexion)
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def configurar(self, **valores):
+        with self._transaccion() as c:
+            c.executemany("INSERT OR REPLACE INTO config (clave, valor) VALUES (?, ?)",
+                          [(k, json.dumps(v)) for k, v in valores.items()])
+
+    def config(self) -> Dict:
+        return {k: json.loads(v) for k, v in self.conexion.execute("SELECT clave, valor FROM config")}
+
+    def agregar_indices(self, seccion: str, paginas: Iterable[int], plantilla: str) -> int:
+        """
+        :return: Cuantas paginas de indice eran nuevas para la frontera.
+        """
+        ahora = time.time()
+        filas = [(f"indice:{seccion}:{p}", "indice", plantilla.format(seccion=seccion, pagina=p), seccion, p, ahora)
+                 for p in paginas]
+        with self._transaccion() as c:
+            antes = c.total_changes
+            c.executemany("INSERT OR IGNORE INTO tareas (clave, tipo, url, seccion, pagina, creada) "
+                          "VALUES (?, ?, ?, ?, ?, ?)", filas)
+            return c.total_changes - antes
+
+    def agregar_notas(self, notas: List[Dict[str, str]], seccion: str, estado: str = "pendiente") -> int:
+        """
+        :param notas: [{"id", "url"}], como las devuelve links_de_notas.
+        :param estado: "hecha" para registrar notas ya guardadas, que no se tienen que volver a bajar.
+        :return: Cuantas notas eran nuevas (las repetidas por ID se ignoran).
+        """
+        ahora = time.time()
+        filas = [(f"nota:{n['id']}", "nota", n["url"], seccion, estado, ahora) for n in notas]
+        with self._transaccion() as c:
+            antes = c.total_changes
+            c.executemany("INSERT OR IGNORE INTO tareas (clave, tipo, url, seccion, estado, creada) "
+                          "VALUES (?, ?, ?, ?, ?, ?)", filas)
+            return c.total_changes - antes
+
+    def arrendar(self, trabajador: str, cantidad: int = TAREAS_POR_ARRIENDO,
+                 segundos: float = ARRIENDO_SEGUNDOS, max_intentos: int = MAX_INTENTOS) -> List[Dict]:
+        """
+        Devuelve las tareas vencidas a pendientes (o a fallidas, si ya se arrendaron max_intentos veces: una tarea
+        que tira abajo al trabajador no se arrienda para siempre) y arrienda hasta "cantidad" pendientes: 1 pagina
+        de indice (si hay) y el resto notas.
+        :return: Las tareas arrendadas ({"clave", "tipo", "url", "seccion", "pagina", "intentos"}).
+        """
+        ahora = time.time()
+        with self._transaccion() as c:
+            c.execute("UPDATE tareas SET estado = CASE WHEN intentos >= ? THEN 'fallida' ELSE 'pendiente' END, "
+                      "trabajador = NULL WHERE estado = 'arrendada' AND vence < ?", (max_intentos, ahora))
+            # a lo sumo 1 pagina de indice por lote: cada indice genera trabajo nuevo, conviene repartirlos
+            filas = c.execute("SELECT clave, tipo, url, seccion, pagina, intentos FROM tareas "
+                              "WHERE estado = 'pendiente' AND tipo = 'indice' ORDER BY creada LIMIT 1").fetchall()
+            filas += c.execute("SELECT clave, tipo, url, seccion, pagina, intentos FROM tareas "
+                               "WHERE estado = 'pendiente' AND tipo = 'nota' ORDER BY creada LIMIT ?",
+                               (cantidad - len(filas),)).fetchall()
+            c.executemany("UPDATE tareas SET estado = 'arrendada', trabajador = ?, vence = ?, intentos = intentos + 1 "
+                          "WHERE clave = ?", [(trabajador, ahora + segundos, f[0]) for f in filas])
+        return [dict(zip(("clave", "tipo", "url", "seccion", "pagina", "intentos"), f)) for f in filas]
+
+    def completar(self, clave: str, trabajador: str) -> bool:
+        """
+        :return: False si el arriendo ya habia vencido y la tarea la tomo otro trabajador.
+        """
+        with self._transaccion() as c:
+            cursor = c.execute("UPDATE tareas SET estado = 'hecha', terminada = ? "
+                               "WHERE clave = ? AND trabajador = ? AND estado = 'arrendada'",
+                               (time.time(), clave, trabajador))
+            return cursor.rowcount == 1
+
+    def fallar(self, clave: str, trabajador: str, max_intentos: int = MAX_INTENTOS):
+        with self._transaccion() as c:
+            c.execute("UPDATE tareas SET estado = CASE WHEN intentos >= ? THEN 'fallida' ELSE 'pendiente' END, "
+                      "trabajador = NULL WHERE clave = ? AND trabajador = ? AND estado = 'arrendada'",
+                      (max_intentos, clave, trabajador))
+
+    def reservar_turno(self, dominio: str, pedidos_por_segundo: float) -> float:
+        """
+        Reserva el siguiente turno para pedir a "dominio", respetando el limite entre todos los trabajadores.
+        :return: Segundos a esperar hasta el turno reservado.
+        """
+        ahora = time.time()
+        with self._transaccion() as c:
+            fila = c.execute("SELECT proximo_turno FROM dominios WHERE dominio = ?", (dominio,)).fetchone()
+            turno = max(ahora, fila[0] if fila else 0.0)
+            c.execute("INSERT OR REPLACE INTO dominios (dominio, proximo_turno) VALUES (?, ?)",
+                      (dominio, turno + 1.0 / pedidos_por_segundo))
+        return turno - ahora
+
+    def pendientes(self) -> int:
+        """
+        :return: Tareas sin terminar (pendientes o arrendadas).
+        """
+        return self.conexion.execute(
+            "SELECT COUNT(*) FROM tareas WHERE estado IN ('pendiente', 'arrendada')").fetchone()[0]
+
+    def sumar(self, trabajador: str, **contadores):
+        campos = "".join(f"{k} = {k} + ?, " for k in contadores)
+        with self._transaccion() as c:
+            c.execute("INSERT OR IGNORE INTO trabajadores (nombre, host) VALUES (?, ?)",
+                      (trabajador, socket.gethostname()))
+            c.execute(f"UPDATE trabajadores SET {campos}ultimo_latido = ? WHERE nombre = ?",
+                      (*contadores.values(), time.time(), trabajador))
+
+    def progreso(self) -> Dict:
+        """
+        :return: Tareas por tipo y estado, contadores sumados de todos los trabajadores y los de cada uno.
+        """
+        tareas: Dict[str, Dict[str, int]] = {}
+        for tipo, estado, cantidad in self.conexion.execute(
+                "SELECT tipo, estado, COUNT(*) FROM tareas GROUP BY tipo, estado"):
+            tareas.setdefault(tipo, {})[estado] = cantidad
+        columnas = ("nombre", "host", "pedidos", "bytes", "descubiertas", "guardadas", "omitidas", "errores",
+                    "espera_turnos", "ultimo_latido")
+        trabajadores = [dict(zip(columnas, f)) for f in
+                        self.conexion.execute(f"SELECT {', '.join(columnas)} FROM trabajadores ORDER BY nombre")]
+        totales = {k: sum(t[k] for t in trabajadores) for k in columnas[2:-1]}
+        ahora = time.time()
+        activos = sum(1 for t in trabajadores if t["ultimo_latido"] and ahora - t["ultimo_latido"] < ARRIENDO_SEGUNDOS)
+        return {"tareas": tareas, "totales": totales, "trabajadores_activos": activos, "trabajadores": trabajadores}
+
+    def tiempos(self) -> Dict[str, Optional[float]]:
+        """
+        :return: Primer creacion y ultima terminacion de indices y de notas, para medir throughput.
+        """
+        inicio = self.conexion.execute("SELECT MIN(creada) FROM tareas WHERE tipo = 'indice'").fetchone()[0]
+        fin_indices, fin_notas = (self.conexion.execute(
+            f"SELECT MAX(terminada) FROM tareas WHERE tipo = '{tipo}'").fetchone()[0] for tipo in ("indice", "nota"))
+        return {"inicio": inicio, "fin_indices": fin_indices, "fin_notas": fin_notas}
+
+
+class _Transaccion:
+    """
+    Context manager de BEGIN IMMEDIATE / COMMIT (ROLLBACK si hay una excepcion).
+    """
+
+    def __init__(self, conexion: sqlite3.Connection):
+        self.conexion = conexion
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conexion.execute("BEGIN IMMEDIATE")
+        return self.conexion
+
+    def __exit__(self, tipo, valor, traza):
+        self.conexion.execute("ROLLBACK" if tipo else "COMMIT")
+        return False
+
+
+def sembrar(frontera: FronteraSQLite, secciones: List[str], plantilla: str = PLANTILLA_INDICE,
+            ids_conocidos: Optional[Set[str]] = None, paginas_adelante: int = PAGINAS_ADELANTE,
+            pedidos_por_segundo: float = PEDIDOS_POR_SEGUNDO):
+    """
+    Carga las primeras paginas de indice de cada seccion, las notas ya guardadas (como hechas) y la configuracion
+    que van a leer los trabajadores.
+    """
+    frontera.configurar(plantilla_indice=plantilla, paginas_adelante=paginas_adelante,
+                        pedidos_por_segundo=pedidos_por_segundo)
+    for seccion in secciones:
+        frontera.agregar_indices(seccion, range(1, paginas_adelante + 1), plantilla)
+    if ids_conocidos:
+        frontera.agregar_notas([{"id": i, "url": ""} for i in ids_conocidos], "", estado="hecha")
+
+
+def pedir(url: str) -> bytes:
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=TIMEOUT) as respuesta:
+        return respuesta.read()
+
+
+def trabajar(ruta_frontera: str, nombre: str, dir_paginas: str = DIR_PAGINAS, wal: bool = True,
+             tareas_por_arriendo: int = TAREAS_POR_ARRIENDO, segundos_arriendo: float = ARRIENDO_SEGUNDOS) -> Dict:
+    """
+    Loop de un trabajador: arrienda tareas, las procesa y las completa, hasta que no queden tareas sin terminar.
+    :return: Los contadores de este trabajador.
+    """
+    frontera = FronteraSQLite(ruta_frontera, wal=wal)
+    config = frontera.config()
+    plantilla = config.get("plantilla_indice", PLANTILLA_INDICE)
+    paginas_adelante = config.get("paginas_adelante", PAGINAS_ADELANTE)
+    pedidos_por_segundo = config.get("pedidos_por_segundo", PEDIDOS_POR_SEGUNDO)
+    estadisticas = {"pedidos": 0, "bytes": 0, "descubiertas": 0, "guardadas": 0, "omitidas": 0, "errores": 0,
+                    "espera_turnos": 0.0}
+    frontera.sumar(nombre)
+    while True:
+        tareas = frontera.arrendar(nombre, tareas_por_arriendo, segundos_arriendo)
+        if not tareas:
+            if frontera.pendientes() == 0:
+                break
+            # quedan tareas arrendadas por otros: esperar a que terminen o a que venzan sus arriendos
+            time.sleep(ESPERA_SIN_TAREAS)
+            continue
+        for tarea in tareas:
+            contadores = {"pedidos": 1, "bytes": 0, "descubiertas": 0, "guardadas": 0, "omitidas": 0, "errores": 0,
+                          "espera_turnos": 0.0}
+            espera = frontera.reservar_turno(urlsplit(tarea["url"]).netloc, pedidos_por_segundo)
+            if espera > 0:
+                contadores["espera_turnos"] = espera
+                time.sleep(espera)
+            error = None
+            try:
+                cuerpo = pedir(tarea["url"])
+            except urllib.error.HTTPError as e:
+                # una pagina de indice pasada la ultima: como una pagina vacia, sin reintentos ni paginas siguientes
+                if e.code == 404 and tarea["tipo"] == "indice":
+                    cuerpo = b""
+                else:
+                    error = e
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                error = e
+            if error is not None:
+                contadores["errores"] = 1
+                print(f"[ERROR] {nombre}: {tarea['url']}: {error}")
+                frontera.fallar(tarea["clave"], nombre)
+            else:
+                contadores["bytes"] = len(cuerpo)
+                html = cuerpo.decode("utf-8", errors="ignore")
+                if tarea["tipo"] == "indice":
+                    links = links_de_notas(html, tarea["url"])
+                    if links:
+                        contadores["descubiertas"] = frontera.agregar_notas(links, tarea["seccion"])
+                        pagina = tarea["pagina"]
+                        frontera.agregar_indices(tarea["seccion"], range(pagina + 1, pagina + paginas_adelante + 1),
+                                                 plantilla)
+                elif any(marcador in html for marcador in MARCADORES_OMISION):
+                    contadores["omitidas"] = 1
+                else:
+                    guardar_nota(dir_paginas, tarea["seccion"], tarea["url"], html)
+                    contadores["guardadas"] = 1
+                frontera.completar(tarea["clave"], nombre)
+            frontera.sumar(nombre, **contadores)
+            for k, v in contadores.items():
+                estadisticas[k] += v
+    frontera.cerrar()
+    return estadisticas
+
+
+def _trabajar_en_proceso(ruta_frontera: str, nombre: str, dir_paginas: str, segundos_arriendo: float):
+    trabajar(ruta_frontera, nombre, dir_paginas, segundos_arriendo=segundos_arriendo)
+
+
+def _crawl_fixture(servidor, secciones: List[str], cantidad: int, pedidos_por_segundo: float,
+                   segundos_arriendo: float, caido: bool) -> Dict:
+    """
+    Crawl completo de servidor_fixture.py con "cantidad" trabajadores (procesos) sobre una frontera nueva.
+    :param caido: Antes de arrancar, un trabajador "caido" arrienda tareas que nunca completa.
+    """
+    plantilla = servidor.url_base + "/secciones/{seccion}?page={pagina}"
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, ARCHIVO_FRONTERA)
+        frontera = FronteraSQLite(ruta)
+        sembrar(frontera, secciones, plantilla, pedidos_por_segundo=pedidos_por_segundo)
+        caidas = [t["clave"] for t in frontera.arrendar("caido", 2, segundos_arriendo)] if caido else []
+        servidor.estadisticas.reiniciar()
+        inicio = time.time()
+        procesos = [multiprocessing.Process(target=_trabajar_en_proceso,
+                                            args=(ruta, f"trabajador-{i}", os.path.join(directorio, "paginas"),
+                                                  segundos_arriendo))
+                    for i in range(cantidad)]
+        for proceso in procesos:
+            proceso.start()
+        for proceso in procesos:
+            proceso.join()
+        segundos = time.time() - inicio
+        progreso = frontera.progreso()
+        tiempos = frontera.tiempos()
+        recuperadas = frontera.conexion.execute(
+            f"SELECT clave, trabajador, estado FROM tareas WHERE clave IN ({','.join('?' * len(caidas))})",
+            caidas).fetchall() if caidas else []
+        frontera.cerrar()
+    descubiertas = progreso["totales"]["descubiertas"]
+    segundos_descubrimiento = (tiempos["fin_indices"] or inicio) - inicio
+    resultado = {
+        "trabajadores": cantidad,
+        "segundos": round(segundos, 2),
+        "segundos_descubrimiento": round(segundos_descubrimiento, 2),
+        "notas_descubiertas": descubiertas,
+        "descubiertas_por_segundo": round(descubiertas / max(segundos_descubrimiento, 1e-9), 1),
+        "pedidos_por_segundo": round(progreso["totales"]["pedidos"] / segundos, 1),
+        "tareas": progreso["tareas"],
+        "totales": {k: round(v, 2) for k, v in progreso["totales"].items()},
+        "pedidos_servidor": servidor.estadisticas.como_dict()["pedidos"],
+    }
+    if caido:
+        resultado["arriendos_vencidos_recuperados"] = [
+            {"clave": clave, "trabajador": trabajador, "estado": estado} for clave, trabajador, estado in recuperadas]
+    return resultado
+
+
+def demo_fixture(dir_paginas: str, cantidades: List[int], latencia: float, pedidos_por_segundo: float,
+                 segundos_arriendo: float = 2.0) -> Dict:
+    """
+    Mide el crawl de servidor_fixture.py con cada cantidad de trabajadores y despues repite la mayor con un
+    trabajador caido, para comprobar que sus tareas se recuperan al vencer el arriendo.
+    :return: {"escalado": [resultado por cantidad, con su eficiencia respecto de 1 trabajador], "con_caido": ...}
+    """
+    from servidor_fixture import ServidorFixture
+
+    escalado = []
+    with ServidorFixture(dir_paginas, latencia=latencia) as servidor:
+        secciones = list(servidor.corpus.secciones)
+        for cantidad in cantidades:
+            escalado.append(_crawl_fixture(servidor, secciones, cantidad, pedidos_por_segundo, segundos_arriendo,
+                                           caido=False))
+            print(f"[INFO] {cantidad} trabajadores: {escalado[-1]['segundos']}s, "
+                  f"{escalado[-1]['descubiertas_por_segundo']} notas descubiertas/s")
+        con_caido = _crawl_fixture(servidor, secciones, max(cantidades), pedidos_por_segundo, segundos_arriendo,
+                                   caido=True)
+    base = escalado[0]["descubiertas_por_segundo"] / escalado[0]["trabajadores"]
+    for r in escalado:
+        r["eficiencia"] = round(r["descubiertas_por_segundo"] / (base * r["trabajadores"]), 2)
+    return {"escalado": escalado, "con_caido": con_caido}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl distribuido con una frontera compartida en SQLite")
+    parser.add_argument("--frontera", default=ARCHIVO_FRONTERA, help=f"Archivo SQLite de la frontera (default: {ARCHIVO_FRONTERA})")
+    parser.add_argument("--sin-wal", action="store_true", help="No usar modo WAL (para volumenes de red)")
+    parser.add_argument("--sembrar", action="store_true", help="Cargar las secciones y las notas ya guardadas")
+    parser.add_argument("--trabajar", action="store_true", help="Correr un trabajador hasta vaciar la frontera")
+    parser.add_argument("--progreso", action="store_true", help="Mostrar el progreso sumado de los trabajadores")
+    parser.add_argument("--nombre", default=f"{socket.gethostname()}-{os.getpid()}", help="Nombre del trabajador")
+    parser.add_argument("--secciones", nargs="+", default=SECCIONES, help="Secciones a crawlear (default: todas)")
+    parser.add_argument("--paginas", default=DIR_PAGINAS, help=f"Directorio de las notas guardadas (default: {DIR_PAGINAS})")
+    parser.add_argument("--pedidos-por-segundo", type=float,
+                        help=f"Limite global de pedidos por dominio (default: {PEDIDOS_POR_SEGUNDO}; "
+                             f"con --fixture, sin limite)")
+    parser.add_argument("--arriendo", type=float, default=ARRIENDO_SEGUNDOS,
+                        help=f"Segundos de arriendo de cada lote (default: {ARRIENDO_SEGUNDOS})")
+    parser.add_argument("--fixture", action="store_true", help="Comparar 1..N trabajadores contra servidor_fixture.py")
+    parser.add_argument("--trabajadores", nargs="+", type=int, default=[1, 2, 4, 8],
+                        help="Cantidades de trabajadores para --fixture (default: 1 2 4 8)")
+    parser.add_argument("--latencia", type=float, default=0.05,
+                        help="Latencia del servidor para --fixture (default: 0.05)")
+    args = parser.parse_args()
+
+    if args.fixture:
+        resultado = demo_fixture(args.paginas, args.trabajadores, args.latencia,
+                                 pedidos_por_segundo=args.pedidos_por_segundo or 1e6)
+        print(json.dumps(resultado, indent=1, ensure_ascii=False))
+        return
+    if not (args.sembrar or args.trabajar or args.progreso):
+        parser.error("indicar --sembrar, --trabajar, --progreso o --fixture")
+
+    if args.sembrar:
+        frontera = FronteraSQLite(args.frontera, wal=not args.sin_wal)
+        ids_conocidos = ids_guardados(args.paginas)
+        sembrar(frontera, args.secciones, ids_conocidos=ids_conocidos,
+                pedidos_por_segundo=args.pedidos_por_segundo or PEDIDOS_POR_SEGUNDO)
+        print(f"[OK] Frontera {args.frontera}: {len(args.secciones)} secciones, {len(ids_conocidos)} notas ya guardadas")
+        frontera.cerrar()
+    if args.trabajar:
+        print(f"[INFO] Trabajador {args.nombre} sobre {args.frontera}")
+        estadisticas = trabajar(args.frontera, args.nombre, args.paginas, wal=not args.sin_wal,
+                                segundos_arriendo=args.arriendo)
+        print(f"[OK] {args.nombre}: {estadisticas}")
+    if args.progreso:
+        frontera = FronteraSQLite(args.frontera, wal=not args.sin_wal)
+        print(json.dumps(frontera.progreso(), indent=1, ensure_ascii=False))
+        frontera.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+"""
+Almacen de vectores de notas en disco y busqueda de vecinos cercanos (coseno).
+
+- AlmacenVectores: matriz float32 en un archivo que se lee con np.memmap (no se carga entera en memoria), con el
+  ID de nota de cada fila. Solo se agregan filas al final; un ID que ya esta no se vuelve a agregar. Los vectores
+  se guardan normalizados, asi el producto interno es el coseno.
+- buscar_exacto: top-k por fuerza bruta, de a bloques de consultas y de vectores (argpartition por fila).
+- IndiceIVF: indice aproximado "inverted file": k-means sobre una muestra para elegir n_listas centroides, cada
+  vector va a la lista de su centroide mas cercano, y una consulta solo recorre las n_sondas listas de los
+  centroides mas cercanos. Las consultas se procesan juntas: por cada lista, 1 producto de matrices con todas las
+  consultas que la visitan.
+- ClasificadorKNN: clasificador de sklearn por votos de los k vecinos (exacto o con IndiceIVF), para usar en
+  3-entrenar-y-evaluar.py o en el pipeline de 5-entrenar_y_guardar_modelo_pipeline.py.
+
+Ejemplos:
+    python indice_vectores.py --indexar --modelo ./bert_chico          # embeddings de las notas -> ./vectores
+    python indice_vectores.py --similares 2025-04-01-nota-123          # notas mas parecidas
+    python indice_vectores.py --benchmark --tamanios 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+DIR_VECTORES = "./vectores"
+ARCHIVO_VECTORES = "vectores.f32"
+ARCHIVO_IDS = "ids.txt"
+ARCHIVO_META = "almacen.json"
+# filas de la base y consultas por producto de matrices: bloques de 16384 x 1024 puntajes (64 MB)
+TAMANIO_BLOQUE = 16_384
+CONSULTAS_POR_BLOQUE = 1024
+# vectores por lista del IVF: n_listas = n / VECTORES_POR_LISTA (aprox. 4 * raiz(n) para 1M)
+VECTORES_POR_LISTA = 256
+N_SONDAS = 8
+K_VECINOS = 10
+
+
+def normalizar_filas(vectores: np.ndarray) -> np.ndarray:
+    vectores = np.asarray(vectores, dtype=np.float32)
+    normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+    return vectores / np.maximum(normas, 1e-12)
+
+
+class AlmacenVectores:
+    """
+    Vectores float32 (normalizados) por ID de nota, en <directorio>/vectores.f32 + ids.txt.
+    """
+
+    def __init__(self, directorio: str = DIR_VECTORES, dimension: Optional[int] = None):
+        self.directorio = Path(directorio)
+        archivo_meta = self.directorio / ARCHIVO_META
+        if archivo_meta.exists():
+            meta = json.loads(archivo_meta.read_text(encoding="utf-8"))
+            if dimension is not None and dimension != meta["dimension"]:
+                raise ValueError(f"El almacen {directorio} tiene vectores de {meta['dimension']} dimensiones, no {dimension}")
+            dimension = meta["dimension"]
+        self.dimension = dimension
+        self.ids: List[str] = []
+        if (self.directorio / ARCHIVO_IDS).exists():
+            self.ids = (self.directorio / ARCHIVO_IDS).read_text(encoding="utf-8").splitlines()
+        if self.dimension is not None and (self.directorio / ARCHIVO_VECTORES).exists():
+            # si una corrida se corto entre escribir los vectores y los IDs, quedan solo las filas completas de ambos
+            filas = os.path.getsize(self.directorio / ARCHIVO_VECTORES) // (4 * self.dimension)
+            self.ids = self.ids[:filas]
+        self.posiciones: Dict[str, int] = {id_nota: i for i, id_nota in enumerate(self.ids)}
+        self._matriz = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, id_nota: str) -> bool:
+        return id_nota in self.posiciones
+
+    def __getitem__(self, id_nota: str) -> np.ndarray:
+        return np.array(self.vectores[self.posiciones[id_nota]])
+
+    @property
+    def vectores(self) -> np.ndarray:
+        """
+        :return: Matriz (len(self), dimension) de solo lectura, mapeada del archivo.
+        """
+        if self._matriz is None or self._matriz.shape[0] != len(self.ids):
+            if not self.ids:
+                return np.zeros((0, self.dimension or 0), dtype=np.float32)
+            self._matriz = np.memmap(self.directorio / ARCHIVO_VECTORES, dtype=np.float32, mode="r",
+                                     shape=(len(self.ids), self.dimension))
+        return self._matriz
+
+    def agregar(self, ids: Sequence[str], vectores: np.ndarray) -> int:
+        """
+        Agrega al final los vectores de los IDs que no estaban (los repetidos se ignoran).
+        :return: Cuantos vectores se agregaron.
+        """
+        vectores = np.asarray(vectores)
+        if vectores.ndim != 2 or len(ids) != vectores.shape[0]:
+            raise ValueError(f"Se esperaba una matriz de {len(ids)} filas, pero tiene forma {vectores.shape}")
+        if self.dimension is None:
+            self.dimension = int(vectores.shape[1])
+        elif vectores.shape[1] != self.dimension:
+            raise ValueError(f"El almacen tiene vectores de {self.dimension} dimensiones, no {vectores.shape[1]}")
+        ids = [str(i) for i in ids]
+        nuevos, vistos = [], set()
+        for fila, id_nota in enumerate(ids):
+            if id_nota not in self.posiciones and id_nota not in vistos:
+                nuevos.append(fila)
+                vistos.add(id_nota)
+        if not nuevos:
+            return 0
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        archivo_meta = self.directorio / ARCHIVO_META
+        if not archivo_meta.exists():
+            archivo_meta.write_text(json.dumps({"dimension": self.dimension}), encoding="utf-8")
+        # 1ro los vectores y despues los IDs: una fila solo existe cuando su ID esta escrito
+        with open(self.directorio / ARCHIVO_VECTORES, "ab") as f:
+            for inicio in range(0, len(nuevos), TAMANIO_BLOQUE):
+                f.write(normalizar_filas(vectores[nuevos[inicio:inicio + TAMANIO_BLOQUE]]).tobytes())
+        with open(self.directorio / ARCHIVO_IDS, "a", encoding="utf-8") as f:
+            f.write("".join(ids[fila] + "\n" for fila in nuevos))
+        for fila in nuevos:
+            self.posiciones[ids[fila]] = len(self.ids)
+            self.ids.append(ids[fila])
+        return len(nuevos)
+
+
+def _fusionar_top_k(puntajes: np.ndarray, indices: np.ndarray, nuevos_puntajes: np.ndarray, nuevos_indices: np.ndarray,
+                    k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Se queda con los k mayores puntajes de cada fila entre los que ya tenia y los nuevos (sin ordenar).
+    """
+    puntajes = np.concatenate([puntajes, nuevos_puntajes], axis=1)
+    indices = np.concatenate([indices, nuevos_indices], axis=1)
+    if puntajes.shape[1] > k:
+        mejores = np.argpartition(-puntajes, k - 1, axis=1)[:, :k]
+        puntajes = np.take_along_axis(puntajes, mejores, axis=1)
+        indices = np.take_along_axis(indices, mejores, axis=1)
+    return puntajes, indices
+
+
+def _ordenar_top_k(puntajes: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    orden = np.argsort(-puntajes, axis=1, kind="stable")
+    return np.take_along_axis(puntajes, orden, axis=1), np.take_along_axis(indices, orden, axis=1)
+
+
+def buscar_exacto(base, consultas, k: int = K_VECINOS, tamanio_bloque: int = TAMANIO_BLOQUE,
+                  consultas_por_bloque: int = CONSULTAS_POR_BLOQUE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k por producto interno (coseno si las filas estan normalizadas), por fuerza bruta.
+    :param base: Matriz (n, d) densa (puede ser un memmap) o rala.
+    :param consultas: Matriz (m, d) densa o rala.
+    :return: (puntajes, indices), matrices (m, min(k, n)) ordenadas de mayor a menor puntaje.
+    """
+    n, m = base.shape[0], consultas.shape[0]
+    k = min(k, n)
+    if sp.issparse(base) or sp.issparse(consultas):
+        # ralas (p.ej. TF-IDF): 1 producto por bloque de consultas, sin recorrer la base de a bloques
+        base = sp.csr_matrix(base)
+        puntajes_todos, indices_todos = [], []
+        for inicio in range(0, m, consultas_por_bloque):
+            bloque = consultas[inicio:inicio + consultas_por_bloque]
+            puntajes = np.asarray((base @ bloque.T).T.todense() if sp.issparse(bloque) else (base @ np.asarray(bloque).T).T,
+                                  dtype=np.float32)
+            mejores = np.argpartition(-puntajes, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(puntajes), 1))
+            puntajes_todos.append(np.take_along_axis(puntajes, mejores, axis=1))
+            indices_todos.append(mejores)
+        return _ordenar_top_k(np.vstack(puntajes_todos), np.vstack(indices_todos))
+
+    consultas = np.asarray(consultas, dtype=np.float32)
+    puntajes_todos, indices_todos = [], []
+    for inicio_consultas in range(0, m, consultas_por_bloque):
+        bloque_consultas = consultas[inicio_consultas:inicio_consultas + consultas_por_bloque]
+        puntajes = np.full((len(bloque_consultas), 0), -np.inf, dtype=np.float32)
+        indices = np.zeros((len(bloque_consultas), 0), dtype=np.int64)
+        for inicio in range(0, n, tamanio_bloque):
+            bloque = np.asarray(base[inicio:inicio + tamanio_bloque], dtype=np.float32)
+            puntajes_bloque = bloque_consultas @ bloque.T
+            k_bloque = min(k, bloque.shape[0])
+            mejores = np.argpartition(-puntajes_bloque, k_bloque - 1, axis=1)[:, :k_bloque]
+            puntajes, indices = _fusionar_top_k(puntajes, indices, np.take_along_axis(puntajes_bloque, mejores, axis=1),
+                                                mejores + inicio, k)
+        puntajes_todos.append(puntajes)
+        indices_todos.append(indices)
+    if not puntajes_todos:
+        return np.zeros((0, k), dtype=np.float32), np.zeros((0, k), dtype=np.int64)
+    return _ordenar_top_k(np.vstack(puntajes_todos), np.vstack(indices_todos))
+
+
+def _kmeans(muestra: np.ndarray, n_centroides: int, iteraciones: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    k-means esferico (centroides normalizados, asignacion por producto interno).
+    """
+    centroides = muestra[rng.choice(len(muestra), n_centroides, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignaciones = buscar_exacto(centroides, muestra, k=1)[1][:, 0]
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asignaciones, muestra)
+        cantidades = np.bincount(asignaciones, minlength=n_centroides)
+        # los centroides que quedaron vacios se reinician con puntos al azar de la muestra
+        vacios = np.flatnonzero(cantidades == 0)
+        sumas[vacios] = muestra[rng.choice(len(muestra), len(vacios), replace=False)]
+        centroides = normalizar_filas(sumas)
+    return centroides
+
+
+class IndiceIVF:
+    """
+    Indice aproximado de vecinos por producto interno: listas invertidas sobre centroides de k-means.
+    El indice guarda el orden de las filas por lista y lee los vectores de la matriz base (p.ej. el memmap de un
+    AlmacenVectores), o de una copia ordenada por lista si contiguos=True.
+    """
+
+    def __init__(self, n_listas: Optional[int] = None, n_sondas: int = N_SONDAS, iteraciones: int = 10,
+                 tamanio_muestra: Optional[int] = None, contiguos: bool = True, semilla: int = 0):
+        """
+        :param n_listas: Cantidad de listas (centroides); None para n / VECTORES_POR_LISTA.
+        :param n_sondas: Listas que recorre cada consulta (mas sondas = mas recall y mas lento).
+        :param tamanio_muestra: Vectores para entrenar k-means; None para 40 por lista.
+        :param contiguos: Guardar una copia de los vectores ordenados por lista (mas rapido, el doble de memoria);
+            False para leer las filas de la base en cada consulta.
+        """
+        self.n_listas = n_listas
+        self.n_sondas = n_sondas
+        self.iteraciones = iteraciones
+        self.tamanio_muestra = tamanio_muestra
+        self.contiguos = contiguos
+        self.semilla = semilla
+
+    def construir(self, base) -> "IndiceIVF":
+        """
+        :param base: Matriz (n, d) con filas normalizadas; se guarda una referencia, no una copia.
+        """
+        rng = np.random.default_rng(self.semilla)
+        n = base.shape[0]
+        n_listas = self.n_listas or max(1, int(round(n / VECTORES_POR_LISTA)))
+        n_listas = min(n_listas, n)
+        tamanio_muestra = min(n, self.tamanio_muestra or 40 * n_listas)
+        muestra = np.asarray(base[np.sort(rng.choice(n, tamanio_muestra, replace=False))], dtype=np.float32)
+        self.centroides_ = _kmeans(muestra, n_listas, self.iteraciones, rng)
+        self.base_ = base
+        self.orden_ = np.zeros(0, dtype=np.int64)
+        self.inicios_ = np.zeros(n_listas + 1, dtype=np.int64)
+        self.agregar(0)
+        return self
+
+    def agregar(self, desde: int):
+        """
+        Agrega a las listas las filas de la base desde "desde" (p.ej. despues de agregar vectores al almacen; la
+        base tiene que ser la matriz con las filas nuevas).
+        """
+        n = self.base_.shape[0]
+        if desde >= n:
+            if self.contiguos and getattr(self, "vectores_", None) is None:
+                self._copiar_vectores()
+            return
+        asignaciones = np.concatenate([buscar_exacto(self.centroides_, self.base_[inicio:inicio + TAMANIO_BLOQUE], k=1)[1][:, 0]
+                                       for inicio in range(desde, n, TAMANIO_BLOQUE)])
+        listas_actuales = np.repeat(np.arange(len(self.centroides_)), np.diff(self.inicios_))
+        listas = np.concatenate([listas_actuales, asignaciones])
+        filas = np.concatenate([self.orden_, np.arange(desde, n, dtype=np.int64)])
+        orden = np.argsort(listas, kind="stable")
+        self.orden_ = filas[orden]
+        self.inicios_ = np.concatenate([[0], np.cumsum(np.bincount(listas, minlength=len(self.centroides_)))])
+        if self.contiguos:
+            self._copiar_vectores()
+
+    def _copiar_vectores(self):
+        # copia de los vectores ordenados por lista: recorrer una lista es leer 1 bloque de memoria
+        self.vectores_ = np.empty((len(self.orden_), self.base_.shape[1]), dtype=np.float32)
+        for inicio in range(0, len(self.orden_), TAMANIO_BLOQUE):
+            self.vectores_[inicio:inicio + TAMANIO_BLOQUE] = self.base_[self.orden_[inicio:inicio + TAMANIO_BLOQUE]]
+
+    def actualizar_base(self, base):
+        """
+        Cambia la matriz base (p.ej. el memmap nuevo de un almacen al que se le agregaron filas) e indexa las filas nuevas.
+        """
+        desde = self.base_.shape[0]
+        self.base_ = base
+        self.agregar(desde)
+
+    def buscar(self, consultas, k: int = K_VECINOS, n_sondas: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param consultas: Matriz (m, d) con filas normalizadas.
+        :return: (puntajes, indices), matrices (m, k) ordenadas de mayor a menor puntaje; si una consulta tiene menos
+            de k candidatos en sus listas, sobran columnas con puntaje -inf e indice -1.
+        """
+        consultas = np.asarray(consultas, dtype=np.float32)
+        m = consultas.shape[0]
+        n_sondas = min(n_sondas or self.n_sondas, len(self.centroides_))
+        listas_consultas = buscar_exacto(self.centroides_, consultas, k=n_sondas)[1]
+        # invertir: para cada lista, las consultas que la visitan
+        pares_lista = listas_consultas.ravel()
+        pares_consulta = np.repeat(np.arange(m), n_sondas)
+        orden = np.argsort(pares_lista, kind="stable")
+        pares_lista, pares_consulta = pares_lista[orden], pares_consulta[orden]
+        cortes = np.flatnonzero(np.diff(pares_lista)) + 1
+
+        puntajes = np.full((m, k), -np.inf, dtype=np.float32)
+        indices = np.full((m, k), -1, dtype=np.int64)
+        for grupo_consultas, lista in zip(np.split(pares_consulta, cortes), pares_lista[np.r_[0, cortes]] if m else []):
+            inicio, fin = self.inicios_[lista], self.inicios_[lista + 1]
+            if fin == inicio:
+                continue
+            filas = self.orden_[inicio:fin]
+            vectores = self.vectores_[inicio:fin] if self.contiguos else np.asarray(self.base_[filas], dtype=np.float32)
+            puntajes_lista = consultas[grupo_consultas] @ vectores.T
+            k_lista = min(k, len(filas))
+            mejores = np.argpartition(-puntajes_lista, k_lista - 1, axis=1)[:, :k_lista]
+            nuevos_puntajes, nuevos_indices = _fusionar_top_k(
+                puntajes[grupo_consultas], indices[grupo_consultas],
+                np.take_along_axis(puntajes_lista, mejores, axis=1), filas[mejores], k)
+            puntajes[grupo_consultas], indices[grupo_consultas] = nuevos_puntajes, nuevos_indices
+        return _ordenar_top_k(puntajes, indices)
+
+    def guardar(self, archivo: str):
+        np.savez(archivo, centroides=self.centroides_, orden=self.orden_, inicios=self.inicios_,
+                 n_sondas=self.n_sondas)
+
+    @classmethod
+    def cargar(cls, archivo: str, base, contiguos: bool = True) -> "IndiceIVF":
+        """
+        :param base: La matriz indexada (puede tener filas nuevas al final, que se agregan al indice).
+        """
+        with np.load(archivo) as datos:
+            indice = cls(n_listas=len(datos["centroides"]), n_sondas=int(datos["n_sondas"]), contiguos=contiguos)
+            indice.centroides_, indice.orden_, indice.inicios_ = datos["centroides"], datos["orden"], datos["inicios"]
+        indice.base_ = base
+        indice.agregar(len(indice.orden_))
+        return indice
+
+
+class ClasificadorKNN(BaseEstimator, ClassifierMixin):
+    """
+    Clasificador de sklearn por votos de los k vecinos mas cercanos (coseno), ponderados por similitud.
+    Con matrices ralas (TF-IDF) o pocos vectores busca por fuerza bruta; con vectores densos (embeddings) desde
+    minimo_ivf vectores usa un IndiceIVF.
+    """
+
+    def __init__(self, k: int = K_VECINOS, ponderar: bool = True, n_listas: Optional[int] = None,
+                 n_sondas: int = N_SONDAS, minimo_ivf: int = 50_000):
+        self.k = k
+        self.ponderar = ponderar
+        self.n_listas = n_listas
+        self.n_sondas = n_sondas
+        self.minimo_ivf = minimo_ivf
+
+    @staticmethod
+    def _normalizar(X):
+        from sklearn.preprocessing import normalize
+
+        return normalize(X) if sp.issparse(X) else normalizar_filas(X)
+
+    def fit(self, X, y):
+        self.classes_, self.targets_ = np.unique(np.asarray(y), return_inverse=True)
+        self.X_ = self._normalizar(X)
+        self.indice_ = None
+        if not sp.issparse(self.X_) and self.X_.shape[0] >= self.minimo_ivf:
+            self.indice_ = IndiceIVF(n_listas=self.n_listas, n_sondas=self.n_sondas).construir(self.X_)
+        return self
+
+    def vecinos(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (similitudes, indices de las filas de entrenamiento), matrices (n, k); indice -1 si no hay vecino.
+        """
+        consultas = self._normalizar(X)
+        if self.indice_ is not None:
+            return self.indice_.buscar(consultas, self.k)
+        return buscar_exacto(self.X_, consultas, self.k)
+
+    def predict_proba(self, X) -> np.ndarray:
+        similitudes, indices = self.vecinos(X)
+        pesos = np.maximum(similitudes, 0) + 1e-6 if self.ponderar else np.ones_like(similitudes)
+        pesos = np.where(indices >= 0, pesos, 0)
+        votos = np.zeros((indices.shape[0], len(self.classes_)), dtype=np.float64)
+        filas = np.repeat(np.arange(indices.shape[0]), indices.shape[1])
+        np.add.at(votos, (filas, self.targets_[np.maximum(indices, 0)].ravel()), pesos.ravel())
+        totales = votos.sum(axis=1, keepdims=True)
+        # una consulta sin vecinos queda con probabilidades uniformes
+        return np.where(totales > 0, votos / np.maximum(totales, 1e-300), 1.0 / len(self.classes_))
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def vectores_sinteticos(n: int, dimension: int = 128, n_grupos: int = 1000, dispersion: float = 1.0,
+                        semilla: int = 0, tamanio_bloque: int = TAMANIO_BLOQUE):
+    """
+    Genera n vectores normalizados alrededor de n_grupos centros al azar (como temas de notas), de a bloques.
+    :return: Iterador de bloques float32 (tamanio_bloque, dimension).
+    """
+    rng = np.random.default_rng(semilla)
+    centros = normalizar_filas(rng.standard_normal((n_grupos, dimension)))
+    for inicio in range(0, n, tamanio_bloque):
+        cantidad = min(tamanio_bloque, n - inicio)
+        grupos = rng.integers(0, n_grupos, cantidad)
+        ruido = rng.standard_normal((cantidad, dimension)).astype(np.float32) * (dispersion / np.sqrt(dimension))
+        yield normalizar_filas(centros[grupos] + ruido)
+
+
+def benchmark(tamanios: Sequence[int], dimension: int = 128, consultas: int = 1000, k: int = K_VECINOS,
+              sondas: Sequence[int] = (1, 4, 8, 16, 32), directorio: Optional[str] = None) -> List[Dict]:
+    """
+    Recall@k y latencia del IndiceIVF contra la busqueda exacta, con vectores sinteticos en un AlmacenVectores.
+    """
+    import shutil
+    import tempfile
+
+    resultados = []
+    for n in tamanios:
+        dir_almacen = tempfile.mkdtemp(prefix="almacen-", dir=directorio)
+        try:
+            almacen = AlmacenVectores(dir_almacen, dimension)
+            inicio = time.perf_counter()
+            for numero, bloque in enumerate(vectores_sinteticos(n, dimension)):
+                almacen.agregar([f"{numero}-{i}" for i in range(len(bloque))], bloque)
+            segundos_almacen = time.perf_counter() - inicio
+            base = almacen.vectores
+            # consultas: vectores de la base con ruido (notas parecidas a notas ya vistas)
+            rng = np.random.default_rng(1)
+            elegidos = np.sort(rng.choice(n, consultas, replace=False))
+            q = normalizar_filas(np.asarray(base[elegidos]) + rng.standard_normal((consultas, dimension)).astype(np.float32) * 0.02)
+
+            inicio = time.perf_counter()
+            _, exactos = buscar_exacto(base, q, k)
+            ms_exacto = 1000 * (time.perf_counter() - inicio) / consultas
+            inicio = time.perf_counter()
+            indice = IndiceIVF().construir(base)
+            segundos_indice = time.perf_counter() - inicio
+            print(f"[INFO] n={n}: almacen {segundos_almacen:.1f}s, indice {segundos_indice:.1f}s "
+                  f"({len(indice.centroides_)} listas), exacto {ms_exacto:.3f} ms/consulta")
+            for n_sondas in sondas:
+                inicio = time.perf_counter()
+                _, aproximados = indice.buscar(q, k, n_sondas=n_sondas)
+                ms = 1000 * (time.perf_counter() - inicio) / consultas
+                recall = np.mean([len(np.intersect1d(a, e)) / k for a, e in zip(aproximados, exactos)])
+                resultados.append({"n": n, "n_listas": len(indice.centroides_), "n_sondas": n_sondas,
+                                   "recall": float(recall), "ms_ivf": ms, "ms_exacto": ms_exacto,
+                                   "segundos_indice": segundos_indice})
+                print(f"  sondas {n_sondas:>3}: recall@{k} {recall:.3f}, {ms:.3f} ms/consulta ({ms_exacto / ms:.1f}x)")
+            del base, indice, almacen
+        finally:
+            shutil.rmtree(dir_almacen, ignore_errors=True)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacen de vectores de notas y busqueda de vecinos cercanos")
+    parser.add_argument("--almacen", default=DIR_VECTORES, help=f"Directorio del almacen (default: {DIR_VECTORES})")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio con 1 subdirectorio por seccion (default: ./paginas)")
+    parser.add_argument("--indexar", action="store_true", help="Agregar al almacen los embeddings de las notas nuevas")
+    parser.add_argument("--modelo", default=None, help="Modelo de BERT para --indexar (ver embeddings_bert.py)")
+    parser.add_argument("--similares", metavar="ID_NOTA", help="Mostrar las notas mas parecidas a ID_NOTA")
+    parser.add_argument("-k", type=int, default=K_VECINOS, help=f"Vecinos (default: {K_VECINOS})")
+    parser.add_argument("--benchmark", action="store_true", help="Recall y latencia del IVF vs fuerza bruta, con vectores sinteticos")
+    parser.add_argument("--tamanios", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--salida", default=None, help="Guardar los resultados del benchmark en este JSON")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        resultados = benchmark(args.tamanios, args.dimension, k=args.k)
+        if args.salida:
+            Path(args.salida).write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+            print(f"[OK] Resultados guardados en {args.salida}")
+        return
+
+    almacen = AlmacenVectores(args.almacen)
+    if args.indexar:
+        from embeddings_bert import MODELO_BERT, EmbeddingsBert, _leer_textos
+
+        ids, textos = _leer_textos(args.paginas)
+        faltantes = [i for i, id_nota in enumerate(ids) if id_nota not in almacen]
+        print(f"[INFO] {len(ids)} notas, {len(faltantes)} sin vector en {args.almacen}")
+        if faltantes:
+            embeddings = EmbeddingsBert(modelo=args.modelo or MODELO_BERT)
+            vectores = embeddings.embeber([textos[i] for i in faltantes], [ids[i] for i in faltantes])
+            agregados = almacen.agregar([ids[i] for i in faltantes], vectores)
+            print(f"[OK] {agregados} vectores agregados ({len(almacen)} en total)")
+    if args.similares:
+        if args.similares not in almacen:
+            raise SystemExit(f"[ERROR] {args.similares} no esta en {args.almacen}")
+        similitudes, indices = buscar_exacto(almacen.vectores, almacen[args.similares][None, :], args.k + 1)
+        for similitud, indice in zip(similitudes[0], indices[0]):
+            if almacen.ids[indice] != args.similares:
+                print(f"{similitud:.3f}\t{almacen.ids[indice]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentacion liviana para los scripts del TP: tiempos y contadores por etapa, pico de memoria,
+un log de la ejecucion en formato JSON-lines, y una tabla resumen al final.
+
+Uso:
+    registro = RegistroEjecucion("2-html-a-dataframe")
+    with registro.etapa("extraccion"):
+        ...
+    registro.contar("notas_sin_texto")
+    registro.detalle("solo se imprime con verbosidad 2")
+    registro.resumen()
+
+Se configura con variables de entorno, asi funciona igual desde la consola o con Run ▶️ en VS Code:
+    TP_VERBOSIDAD      0 = solo errores, 1 = normal (default), 2 = una linea por archivo
+    TP_LOG_EJECUCION   archivo JSON-lines donde se agregan los eventos (default: registro_ejecuciones.jsonl)
+    TP_PERFILAR        etapas a perfilar, separadas por coma (p.ej. "extraccion,entrenamiento")
+    TP_PERFILADOR      "cprofile" (default) o "pyinstrument"
+"""
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+VERBOSIDAD_ENV = "TP_VERBOSIDAD"
+LOG_ENV = "TP_LOG_EJECUCION"
+PERFILAR_ENV = "TP_PERFILAR"
+PERFILADOR_ENV = "TP_PERFILADOR"
+
+ARCHIVO_LOG = "registro_ejecuciones.jsonl"
+DIR_PERFILES = "perfiles"
+# cada cuantos segundos se mide la memoria mientras corre una etapa
+INTERVALO_MUESTREO_MEMORIA = 0.05
+
+
+def pico_rss_mb() -> Optional[float]:
+    """
+    :return: El pico de memoria residente (RSS) del proceso actual en MB, o None si no se puede medir.
+    """
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KB, macOS reporta bytes
+        return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        # en Windows, peak_wset es el pico de working set
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+# (pid, psutil.Process) del proceso actual; False si psutil no esta instalado
+_proceso_psutil = None
+
+
+def rss_actual_mb() -> Optional[float]:
+    """
+    :return: La memoria residente (RSS) actual del proceso en MB, o None si psutil no esta instalado.
+    """
+    global _proceso_psutil
+    if _proceso_psutil is False:
+        return None
+    # el pid cambia en los procesos hijos creados con fork
+    if _proceso_psutil is None or _proceso_psutil[0] != os.getpid():
+        try:
+            import psutil
+        except ImportError:
+            _proceso_psutil = False
+            return None
+        _proceso_psutil = (os.getpid(), psutil.Process())
+    return _proceso_psutil[1].memory_info().rss / (1024 * 1024)
+
+
+def verbosidad_de_entorno(default: int = 1) -> int:
+    try:
+        return int(os.environ.get(VERBOSIDAD_ENV, default))
+    except ValueError:
+        return default
+
+
+class _MuestreadorMemoria(threading.Thread):
+    """
+    Thread que mide el RSS periodicamente y actualiza el pico de cada etapa activa.
+    """
+
+    def __init__(self, intervalo: float):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.etapas_activas: List[Dict] = []
+        self._lock = threading.Lock()
+        self._terminar = threading.Event()
+
+    def muestrear(self):
+        rss = rss_actual_mb()
+        if rss is None:
+            return
+        with self._lock:
+            for estado in self.etapas_activas:
+                if rss > estado["pico_rss_mb"]:
+                    estado["pico_rss_mb"] = rss
+
+    def activar(self, estado: Dict):
+        with self._lock:
+            self.etapas_activas.append(estado)
+
+    def desactivar(self, estado: Dict):
+        with self._lock:
+            # por identidad: dos etapas anidadas pueden tener estados iguales
+            self.etapas_activas = [e for e in self.etapas_activas if e is not estado]
+
+    def run(self):
+        while not self._terminar.wait(self.intervalo):
+            self.muestrear()
+
+    def terminar(self):
+        self._terminar.set()
+
+
+class RegistroEjecucion:
+    """
+    Acumula tiempos, contadores y pico de memoria por etapa de un script, y los escribe en un log JSON-lines.
+    """
+
+    def __init__(self, script: str, verbosidad: Optional[int] = None, archivo_log: Optional[str] = None,
+                 perfilar: Optional[Iterable[str]] = None, perfilador: Optional[str] = None):
+        """
+        :param script: Nombre del script, se guarda en cada evento del log.
+        :param verbosidad: 0, 1 o 2. Si es None se toma de TP_VERBOSIDAD (default 1).
+        :param archivo_log: Archivo JSON-lines. Si es None se toma de TP_LOG_EJECUCION. "" desactiva el log.
+        :param perfilar: Nombres de etapas a perfilar. Si es None se toma de TP_PERFILAR.
+        :param perfilador: "cprofile" o "pyinstrument". Si es None se toma de TP_PERFILADOR.
+        """
+        self.script = script
+        self.id_ejecucion = uuid.uuid4().hex[:12]
+        self.verbosidad = verbosidad_de_entorno() if verbosidad is None else verbosidad
+        self.archivo_log = os.environ.get(LOG_ENV, ARCHIVO_LOG) if archivo_log is None else archivo_log
+        if perfilar is None:
+            perfilar = [e.strip() for e in os.environ.get(PERFILAR_ENV, "").split(",") if e.strip()]
+        self.etapas_a_perfilar = set(perfilar)
+        self.perfilador = (perfilador or os.environ.get(PERFILADOR_ENV, "cprofile")).lower()
+        self.inicio = time.perf_counter()
+        # nombre de etapa -> {"llamadas", "segundos", "items", "pico_rss_mb"}, en orden de aparicion
+        self.etapas: Dict[str, Dict] = {}
+        self.contadores: Dict[str, int] = {}
+        self._perfiles: Dict[str, object] = {}
+        self._muestreador: Optional[_MuestreadorMemoria] = None
+        self._lock_log = threading.Lock()
+
+    # ==========
+    # Salida por consola
+    # ==========
+    def info(self, mensaje: str):
+        if self.verbosidad >= 1:
+            print(mensaje)
+
+    def detalle(self, mensaje: str):
+        """
+        Mensajes por archivo/por item: solo se imprimen con verbosidad 2, porque con miles de archivos
+        la consola misma se vuelve una parte importante del tiempo de ejecucion.
+        """
+        if self.verbosidad >= 2:
+            print(mensaje)
+
+    # ==========
+    # Log JSON-lines
+    # ==========
+    def evento(self, tipo: str, **datos):
+        """
+        Agrega una linea al log de ejecucion, p.ej. evento("fold", n_fold=1, accuracy=0.93).
+        """
+        if not self.archivo_log:
+            return
+        linea = {
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "id_ejecucion": self.id_ejecucion,
+            "script": self.script,
+            "pid": os.getpid(),
+            "tipo": tipo,
+        }
+        linea.update(datos)
+        texto = json.dumps(linea, ensure_ascii=False, default=_a_json) + "\n"
+        with self._lock_log:
+            with open(self.archivo_log, "a", encoding="utf-8") as log:
+                log.write(texto)
+
+    # ==========
+    # Etapas y contadores
+    # ==========
+    def contar(self, nombre: str, n: int = 1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    @contextmanager
+    def etapa(self, nombre: str, items: int = 1):
+        """
+        Mide el tiempo y el pico de memoria de un bloque. Las llamadas con el mismo nombre se acumulan.
+        :param nombre: Nombre de la etapa, p.ej. "lectura", "extraccion", "vectorizacion", "entrenamiento".
+        :param items: Cantidad de items (archivos, documentos) que procesa el bloque, para calcular throughput.
+        """
+        estado = {"pico_rss_mb": rss_actual_mb() or 0.0}
+        muestreador = self._muestreador_de_memoria()
+        if muestreador is not None:
+            muestreador.activar(estado)
+        perfil = self._iniciar_perfil(nombre)
+        inicio = time.perf_counter()
+        try:
+            yield self
+        finally:
+            segundos = time.perf_counter() - inicio
+            if perfil is not None:
+                self._detener_perfil(perfil)
+            if muestreador is not None:
+                muestreador.desactivar(estado)
+                muestreador.muestrear()
+                pico = max(estado["pico_rss_mb"], rss_actual_mb() or 0.0)
+            else:
+                pico = pico_rss_mb()
+            acumulado = self.etapas.setdefault(nombre, {"llamadas": 0, "segundos": 0.0, "items": 0, "pico_rss_mb": None})
+            acumulado["llamadas"] += 1
+            acumulado["segundos"] += segundos
+            acumulado["items"] += items
+            if pico is not None:
+                acumulado["pico_rss_mb"] = max(acumulado["pico_rss_mb"] or 0.0, pico)
+            if self.verbosidad >= 2:
+                self.evento("etapa", etapa=nombre, segundos=round(segundos, 6), items=items, pico_rss_mb=pico)
+
+    def _muestreador_de_memoria(self) -> Optional[_MuestreadorMemoria]:
+        if self._muestreador is None and rss_actual_mb() is not None:
+            self._muestreador = _MuestreadorMemoria(INTERVALO_MUESTREO_MEMORIA)
+            self._muestreador.start()
+        return self._muestreador
+
+    # ==========
+    # Perfilado opcional por etapa
+    # ==========
+    def _iniciar_perfil(self, nombre: str):
+        if nombre not in self.etapas_a_perfilar:
+            return None
+        perfil = self._perfiles.get(nombre)
+        if perfil is None:
+            if self.perfilador == "pyinstrument":
+                from pyinstrument import Profiler
+                perfil = Profiler()
+            else:
+                import cProfile
+                perfil = cProfile.Profile()
+            self._perfiles[nombre] = perfil
+        if self.perfilador == "pyinstrument":
+            perfil.start()
+        else:
+            perfil.enable()
+        return perfil
+
+    def _detener_perfil(self, perfil):
+        if self.perfilador == "pyinstrument":
+            perfil.stop()
+        else:
+            perfil.disable()
+
+    def _guardar_perfiles(self) -> List[str]:
+        archivos = []
+        if not self._perfiles:
+            return archivos
+        Path(DIR_PERFILES).mkdir(exist_ok=True)
+        for nombre, perfil in self._perfiles.items():
+            base = Path(DIR_PERFILES) / f"{self.script}-{nombre}-{self.id_ejecucion}"
+            if self.perfilador == "pyinstrument":
+                archivo = base.with_suffix(".html")
+                archivo.write_text(perfil.output_html(), encoding="utf-8")
+            else:
+                # se puede ver con: python -m pstats <archivo>  o  snakeviz <archivo>
+                archivo = base.with_suffix(".prof")
+                perfil.dump_stats(str(archivo))
+            archivos.append(str(archivo))
+        return archivos
+
+    # ==========
+    # Resumen final
+    # ==========
+    def resumen(self, imprimir: bool = True) -> Dict:
+        """
+        Escribe el evento "resumen" en el log y, si corresponde, imprime una tabla con las etapas y contadores.
+        :return: El resumen como diccionario.
+        """
+        if self._muestreador is not None:
+            self._muestreador.terminar()
+            self._muestreador = None
+        total = time.perf_counter() - self.inicio
+        etapas = {}
+        for nombre, e in self.etapas.items():
+            etapas[nombre] = {
+                "llamadas": e["llamadas"],
+                "segundos": round(e["segundos"], 4),
+                "items": e["items"],
+                "items_por_segundo": round(e["items"] / e["segundos"], 2) if e["segundos"] > 0 else None,
+                "pico_rss_mb": round(e["pico_rss_mb"], 1) if e["pico_rss_mb"] is not None else None,
+            }
+        perfiles = self._guardar_perfiles()
+        datos = {
+            "segundos_totales": round(total, 4),
+            "pico_rss_mb": pico_rss_mb(),
+            "etapas": etapas,
+            "contadores": dict(self.contadores),
+            "perfiles": perfiles,
+        }
+        self.evento("resumen", **datos)
+        if imprimir and self.verbosidad >= 1:
+            print(formatear_tabla_resumen(self.script, datos))
+        return datos
+
+
+def formatear_tabla_resumen(script: str, datos: Dict) -> str:
+    lineas = [f"\n[RESUMEN] {script} | total {datos['segundos_totales']:.2f} s"]
+    if datos["etapas"]:
+        lineas.append(f"{'etapa':<20}{'llamadas':>10}{'segundos':>11}{'%':>7}{'items/s':>12}{'pico RSS MB':>13}")
+        total = datos["segundos_totales"] or 1.0
+        for nombre, e in datos["etapas"].items():
+            items_s = f"{e['items_por_segundo']:.1f}" if e["items_por_segundo"] is not None else "-"
+            rss = f"{e['pico_rss_mb']:.1f}" if e["pico_rss_mb"] is not None else "?"
+            lineas.append(f"{nombre:<20}{e['llamadas']:>10}{e['segundos']:>11.3f}{100 * e['segundos'] / total:>7.1f}{items_s:>12}{rss:>13}")
+    for nombre, valor in datos["contadores"].items():
+        lineas.append(f"  {nombre}: {valor}")
+    for archivo in datos["perfiles"]:
+        lineas.append(f"  perfil guardado en {archivo}")
+    return "\n".join(lineas)
+
+
+def _a_json(valor):
+    # numpy y otros tipos no serializables
+    if hasattr(valor, "tolist"):
+        return valor.tolist()
+    if hasattr(valor, "item"):
+        return valor.item()
+    return str(valor)
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Intervalos de confianza por bootstrap para las metricas de evaluacion, a partir de predicciones ya guardadas
+(out-of-fold de 3-entrenar-y-evaluar.py o de validacion de 6-predecir_en_validacion.py), sin volver a entrenar.
+
+Un remuestreo bootstrap de n predicciones es un vector de multiplicidades (cuantas veces salio cada prediccion,
+suma n). Se sortean REMUESTREOS remuestreos juntos como una matriz (n x remuestreos, 1 columna por remuestreo) y
+cada metrica sale de productos de esa matriz con matrices ralas fijas de las predicciones, sin loops de Python
+por remuestreo:
+- matriz de confusion: multiplicidades @ one-hot de (clase real, clase predicha) -> (remuestreos, k, k);
+- accuracy y F1 macro: de la matriz de confusion (F1 macro promedia las clases presentes, como sklearn);
+- AUC por clase (uno contra el resto): Mann-Whitney pesado por las multiplicidades. Los scores de cada clase se
+  ordenan 1 sola vez; con la suma acumulada de las multiplicidades en ese orden, el rango medio de cada positiva
+  (los empates cuentan 1/2) se lee en el comienzo y el fin de su grupo de scores iguales, y la suma de rangos de
+  las positivas menos P^2 / 2 da los pares (positiva, negativa) bien ordenados.
+Los remuestreos se procesan de a bloques de REMUESTREOS_POR_BLOQUE para acotar la memoria, con multiplicidades en
+float32 (son enteros chicos, exactos). Los intervalos son de percentiles; la estimacion puntual es la metrica con
+todas las multiplicidades en 1.
+
+Comparacion de 2 modelos sobre las mismas notas: bootstrap pareado (los 2 con los mismos remuestreos; intervalo de
+la diferencia y p-valor de que la diferencia sea 0) y test de McNemar exacto sobre las notas en que solo 1 de los
+2 acierta.
+
+Ejemplos:
+    python intervalos_bootstrap.py predicciones_cv.npz                 # IC 95% de accuracy, F1 macro, AUC y confusion
+    python intervalos_bootstrap.py reportes/predicciones_validacion.npz --remuestreos 5000 --nivel 0.99
+    python intervalos_bootstrap.py predicciones_cv.npz --comparar predicciones_cv_k300.npz
+    python intervalos_bootstrap.py --benchmark --n 10000 --remuestreos 2000
+"""
+import argparse
+import json
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.stats import binomtest
+
+REMUESTREOS = 2000
+NIVEL = 0.95
+# remuestreos por bloque: la matriz de multiplicidades de un bloque ocupa n x REMUESTREOS_POR_BLOQUE x 4 bytes
+REMUESTREOS_POR_BLOQUE = 250
+METRICAS = ("accuracy", "f1_macro", "auc")
+
+
+def guardar_predicciones(archivo: str, y: np.ndarray, preds: np.ndarray, scores: Optional[np.ndarray] = None,
+                         clases: Optional[Sequence[str]] = None, ids: Optional[Sequence[str]] = None):
+    """
+    Guarda predicciones para calcular intervalos despues (npz comprimido).
+    :param y: Clase real de cada nota, como indice en "clases".
+    :param preds: Clase predicha de cada nota, como indice en "clases".
+    :param scores: Scores continuos (n, n_clases) para AUC (probabilidades o decision_function), o None.
+    :param ids: Identificador de cada nota (p.ej. la ruta), para comprobar que 2 modelos se comparan en las mismas.
+    """
+    datos = {"y": np.asarray(y, dtype=np.int64), "preds": np.asarray(preds, dtype=np.int64)}
+    if scores is not None:
+        datos["scores"] = np.asarray(scores, dtype=np.float64)
+    if clases is not None:
+        datos["clases"] = np.asarray(clases, dtype=str)
+    if ids is not None:
+        datos["ids"] = np.asarray(ids, dtype=str)
+    np.savez_compressed(archivo, **datos)
+
+
+def leer_predicciones(archivo: str) -> Dict[str, np.ndarray]:
+    """
+    :return: {"y", "preds"} y, si se guardaron, "scores", "clases" e "ids".
+    """
+    with np.load(archivo, allow_pickle=False) as datos:
+        return {nombre: datos[nombre] for nombre in datos.files}
+
+
+def multiplicidades(n: int, remuestreos: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    :return: (n, remuestreos): cuantas veces sale cada prediccion en cada remuestreo bootstrap.
+    """
+    # celda (prediccion sorteada, remuestreo) de la matriz aplanada
+    celdas = rng.integers(0, n, size=(n, remuestreos), dtype=np.int64)
+    celdas *= remuestreos
+    celdas += np.arange(remuestreos)
+    return np.bincount(celdas.ravel(), minlength=n * remuestreos).reshape(n, remuestreos).astype(np.float32)
+
+
+class Evaluador:
+    """
+    Las matrices ralas fijas de 1 conjunto de predicciones, para evaluar cualquier matriz de multiplicidades.
+    """
+
+    def __init__(self, y: np.ndarray, preds: np.ndarray, scores: Optional[np.ndarray] = None,
+                 n_clases: Optional[int] = None):
+        y, preds = np.asarray(y), np.asarray(preds)
+        self.n = len(y)
+        self.n_clases = n_clases or int(max(y.max(), preds.max())) + 1
+        k = self.n_clases
+        # (k * k, n): 1 en la fila (clase real, clase predicha) de cada prediccion
+        self.pares = sp.csr_matrix((np.ones(self.n), (y * k + preds, np.arange(self.n))), shape=(k * k, self.n))
+        self.rangos_auc = None
+        if scores is not None:
+            scores = np.asarray(scores, dtype=np.float64)
+            if scores.ndim == 1:
+                scores = np.column_stack([-scores, scores])
+            self.rangos_auc = [self._rangos_clase(scores[:, c], y == c) for c in range(k)]
+
+    @staticmethod
+    def _rangos_clase(scores: np.ndarray, positivas: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        :return: (orden de los scores, posiciones de las positivas en ese orden, y el comienzo y el fin de su grupo
+        de empates)
+        """
+        orden = np.argsort(scores, kind="stable")
+        ordenados = scores[orden]
+        # comienzo y fin (exclusivo) del grupo de scores iguales de cada posicion
+        nuevo_grupo = np.r_[True, ordenados[1:] != ordenados[:-1]]
+        comienzos = np.flatnonzero(nuevo_grupo)
+        grupo = np.cumsum(nuevo_grupo) - 1
+        fines = np.r_[comienzos[1:], len(scores)]
+        posiciones = np.flatnonzero(positivas[orden])
+        return orden, posiciones, comienzos[grupo[posiciones]], fines[grupo[posiciones]]
+
+    def evaluar(self, pesos: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        :param pesos: (n, remuestreos) multiplicidades.
+        :return: {"matriz_confusion": (r, k, k), "accuracy": (r,), "f1_macro": (r,), "auc": (r, k) (con scores)}
+        """
+        k = self.n_clases
+        confusion = np.asarray(self.pares @ pesos, dtype=np.float64).T.reshape(-1, k, k)
+        total = confusion.sum(axis=(1, 2))
+        aciertos = np.einsum("rii->ri", confusion)
+        reales, predichas = confusion.sum(axis=2), confusion.sum(axis=1)
+        denominador = reales + predichas
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f1 = np.where(denominador > 0, 2 * aciertos / denominador, np.nan)
+            resultado = {"matriz_confusion": confusion, "accuracy": aciertos.sum(axis=1) / total,
+                         "f1_macro": np.nanmean(f1, axis=1)}
+        if self.rangos_auc is not None:
+            resultado["auc"] = np.column_stack([self._auc(pesos, rangos, reales[:, c], total)
+                                                for c, rangos in enumerate(self.rangos_auc)])
+        return resultado
+
+    @staticmethod
+    def _auc(pesos: np.ndarray, rangos: Tuple[np.ndarray, ...], positivas: np.ndarray,
+             total: np.ndarray) -> np.ndarray:
+        """
+        :param positivas: Peso total de las positivas de la clase en cada remuestreo.
+        """
+        orden, posiciones, comienzos, fines = rangos
+        # filas de n x remuestreos: take y cumsum copian/suman filas contiguas de remuestreos
+        ordenados = np.take(pesos, orden, axis=0)
+        # acumulado[m] = peso de las m primeras en el orden de los scores
+        acumulado = np.zeros((pesos.shape[0] + 1, pesos.shape[1]), dtype=pesos.dtype)
+        np.cumsum(ordenados, axis=0, out=acumulado[1:])
+        rango_medio = 0.5 * (np.take(acumulado, comienzos, axis=0) + np.take(acumulado, fines, axis=0))
+        suma_rangos = (np.take(ordenados, posiciones, axis=0) * rango_medio).sum(axis=0, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (suma_rangos - positivas ** 2 / 2) / (positivas * (total - positivas))
+
+
+def _remuestrear(evaluadores: Sequence[Evaluador], remuestreos: int, semilla: Optional[int],
+                 por_bloque: int) -> Sequence[Dict[str, np.ndarray]]:
+    """
+    Evalua todos los evaluadores con los mismos remuestreos, de a bloques.
+    :return: Por evaluador, {metrica: valores de todos los remuestreos}.
+    """
+    rng = np.random.default_rng(semilla)
+    n = evaluadores[0].n
+    bloques = [[] for _ in evaluadores]
+    for inicio in range(0, remuestreos, por_bloque):
+        pesos = multiplicidades(n, min(por_bloque, remuestreos - inicio), rng)
+        for bloque, evaluador in zip(bloques, evaluadores):
+            bloque.append(evaluador.evaluar(pesos))
+    return [{metrica: np.concatenate([b[metrica] for b in bloque]) for metrica in bloque[0]} for bloque in bloques]
+
+
+def _intervalo(valores: np.ndarray, nivel: float) -> np.ndarray:
+    alfa = (1 - nivel) / 2
+    with np.errstate(invalid="ignore"):
+        return np.nanquantile(valores, [alfa, 1 - alfa], axis=0)
+
+
+def bootstrap(y: np.ndarray, preds: np.ndarray, scores: Optional[np.ndarray] = None, n_clases: Optional[int] = None,
+              remuestreos: int = REMUESTREOS, nivel: float = NIVEL, semilla: Optional[int] = 0,
+              por_bloque: int = REMUESTREOS_POR_BLOQUE) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Intervalos de confianza por percentiles de accuracy, F1 macro, AUC por clase (si hay scores) y de cada celda de
+    la matriz de confusion.
+    :return: {metrica: {"valor", "inferior", "superior"}}; para "auc" y "matriz_confusion" son arrays por clase.
+    """
+    evaluador = Evaluador(y, preds, scores, n_clases)
+    puntual = evaluador.evaluar(np.ones((evaluador.n, 1), dtype=np.float32))
+    valores = _remuestrear([evaluador], remuestreos, semilla, por_bloque)[0]
+    resultado = {}
+    for metrica, todos in valores.items():
+        inferior, superior = _intervalo(todos, nivel)
+        resultado[metrica] = {"valor": puntual[metrica][0], "inferior": inferior, "superior": superior}
+    return resultado
+
+
+def bootstrap_pareado(y: np.ndarray, preds_a: np.ndarray, preds_b: np.ndarray, scores_a: Optional[np.ndarray] = None,
+                      scores_b: Optional[np.ndarray] = None, n_clases: Optional[int] = None,
+                      remuestreos: int = REMUESTREOS, nivel: float = NIVEL, semilla: Optional[int] = 0,
+                      por_bloque: int = REMUESTREOS_POR_BLOQUE) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Diferencia de metricas entre 2 modelos (a - b) evaluados en las mismas notas, con los mismos remuestreos.
+    El p-valor (2 colas) es 2 veces la fraccion de remuestreos en que la diferencia tiene el signo contrario al
+    observado (o es 0), acotado a 1.
+    :return: {metrica: {"diferencia", "inferior", "superior", "p_valor"}} para accuracy, f1_macro y auc.
+    """
+    n_clases = n_clases or int(max(np.max(y), np.max(preds_a), np.max(preds_b))) + 1
+    con_scores = scores_a is not None and scores_b is not None
+    evaluadores = [Evaluador(y, preds_a, scores_a if con_scores else None, n_clases),
+                   Evaluador(y, preds_b, scores_b if con_scores else None, n_clases)]
+    unos = np.ones((len(y), 1), dtype=np.float32)
+    puntual_a, puntual_b = (evaluador.evaluar(unos) for evaluador in evaluadores)
+    valores_a, valores_b = _remuestrear(evaluadores, remuestreos, semilla, por_bloque)
+    resultado = {}
+    for metrica in METRICAS:
+        if metrica not in valores_a:
+            continue
+        observada = puntual_a[metrica][0] - puntual_b[metrica][0]
+        diferencias = valores_a[metrica] - valores_b[metrica]
+        inferior, superior = _intervalo(diferencias, nivel)
+        validas = np.isfinite(diferencias).sum(axis=0)
+        contrarias = np.where(observada >= 0, diferencias <= 0, diferencias >= 0).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_valor = np.minimum(1.0, 2 * contrarias / validas)
+        resultado[metrica] = {"diferencia": observada, "inferior": inferior, "superior": superior, "p_valor": p_valor}
+    return resultado
+
+
+def test_mcnemar(y: np.ndarray, preds_a: np.ndarray, preds_b: np.ndarray) -> Dict[str, float]:
+    """
+    Test de McNemar exacto (binomial) para accuracy: solo cuentan las notas en que acierta 1 solo de los 2 modelos.
+    :return: {"solo_a", "solo_b", "p_valor"}
+    """
+    acierta_a, acierta_b = np.asarray(preds_a) == np.asarray(y), np.asarray(preds_b) == np.asarray(y)
+    solo_a, solo_b = int((acierta_a & ~acierta_b).sum()), int((acierta_b & ~acierta_a).sum())
+    p_valor = binomtest(solo_a, solo_a + solo_b, 0.5).pvalue if solo_a + solo_b else 1.0
+    return {"solo_a": solo_a, "solo_b": solo_b, "p_valor": float(p_valor)}
+
+
+def imprimir_intervalos(resultado: Dict[str, Dict[str, np.ndarray]], clases: Sequence[str], nivel: float = NIVEL):
+    print(f"\tIntervalos de confianza del {nivel:.0%} (bootstrap):")
+    for metrica in ("accuracy", "f1_macro"):
+        r = resultado[metrica]
+        print(f"\t{metrica} = {r['valor']:.4f} [{r['inferior']:.4f}, {r['superior']:.4f}]")
+    if "auc" in resultado:
+        r = resultado["auc"]
+        for i, clase in enumerate(clases):
+            print(f"\tAUC {clase} = {r['valor'][i]:.4f} [{r['inferior'][i]:.4f}, {r['superior'][i]:.4f}]")
+    r = resultado["matriz_confusion"]
+    print("\tMatriz de confusion con intervalos (filas=real, columnas=prediccion):")
+    for i, clase in enumerate(clases):
+        celdas = [f"{r['valor'][i, j]:.0f} [{r['inferior'][i, j]:.0f}-{r['superior'][i, j]:.0f}]"
+                  for j in range(len(clases))]
+        print(f"\t{clase:>12}  " + "  ".join(f"{celda:>14}" for celda in celdas))
+
+
+def imprimir_comparacion(resultado: Dict[str, Dict[str, np.ndarray]], mcnemar: Dict[str, float],
+                         clases: Sequence[str], nivel: float = NIVEL):
+    print(f"Diferencia a - b con intervalos del {nivel:.0%} (bootstrap pareado):")
+    for metrica, r in resultado.items():
+        if metrica == "auc":
+            for i, clase in enumerate(clases):
+                print(f"  AUC {clase}: {r['diferencia'][i]:+.4f} [{r['inferior'][i]:+.4f}, {r['superior'][i]:+.4f}]"
+                      f"  p = {r['p_valor'][i]:.4f}")
+        else:
+            print(f"  {metrica}: {r['diferencia']:+.4f} [{r['inferior']:+.4f}, {r['superior']:+.4f}]"
+                  f"  p = {r['p_valor']:.4f}")
+    print(f"McNemar: solo acierta a = {mcnemar['solo_a']}, solo acierta b = {mcnemar['solo_b']}, "
+          f"p = {mcnemar['p_valor']:.4f}")
+
+
+def benchmark(n: int, remuestreos: int, n_clases: int = 4, semilla: int = 0) -> Dict:
+    """
+    Tiempo de bootstrap (con AUC) y de bootstrap pareado con predicciones sinteticas.
+    """
+    rng = np.random.default_rng(semilla)
+    y = rng.integers(0, n_clases, n)
+    scores = rng.normal(size=(n, n_clases)) + 1.5 * np.eye(n_clases)[y]
+    scores_b = scores + rng.normal(scale=0.5, size=scores.shape)
+    inicio = time.perf_counter()
+    bootstrap(y, scores.argmax(axis=1), scores, n_clases, remuestreos)
+    segundos = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    bootstrap_pareado(y, scores.argmax(axis=1), scores_b.argmax(axis=1), scores, scores_b, n_clases, remuestreos)
+    segundos_pareado = time.perf_counter() - inicio
+    return {"n": n, "remuestreos": remuestreos, "clases": n_clases, "segundos_bootstrap": round(segundos, 3),
+            "segundos_pareado": round(segundos_pareado, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intervalos de confianza por bootstrap de predicciones guardadas")
+    parser.add_argument("predicciones", nargs="?", help="npz de 3-entrenar-y-evaluar.py o 6-predecir_en_validacion.py")
+    parser.add_argument("--comparar", help="npz de otro modelo con las mismas notas: bootstrap pareado y McNemar")
+    parser.add_argument("--remuestreos", type=int, default=REMUESTREOS, help=f"Remuestreos bootstrap (default: {REMUESTREOS})")
+    parser.add_argument("--nivel", type=float, default=NIVEL, help=f"Nivel de confianza (default: {NIVEL})")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de los remuestreos (default: 0)")
+    parser.add_argument("--benchmark", action="store_true", help="Medir con predicciones sinteticas")
+    parser.add_argument("--n", type=int, default=10_000, help="Predicciones del benchmark (default: 10000)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.n, args.remuestreos), indent=2))
+        return
+    if not args.predicciones:
+        parser.error("Falta el archivo de predicciones (o --benchmark)")
+    a = leer_predicciones(args.predicciones)
+    n_clases = len(a["clases"]) if "clases" in a else None
+    clases = list(a["clases"]) if "clases" in a else [str(i) for i in range(int(max(a["y"].max(), a["preds"].max())) + 1)]
+    print(f"[INFO] {args.predicciones}: {len(a['y'])} predicciones")
+    if not args.comparar:
+        resultado = bootstrap(a["y"], a["preds"], a.get("scores"), n_clases, args.remuestreos, args.nivel, args.semilla)
+        imprimir_intervalos(resultado, clases, args.nivel)
+        return
+    b = leer_predicciones(args.comparar)
+    if len(a["y"]) != len(b["y"]) or not np.array_equal(a["y"], b["y"]) or \
+            ("ids" in a and "ids" in b and not np.array_equal(a["ids"], b["ids"])):
+        raise SystemExit("[ERROR] Las 2 predicciones no son de las mismas notas (en el mismo orden)")
+    resultado = bootstrap_pareado(a["y"], a["preds"], b["preds"], a.get("scores"), b.get("scores"), n_clases,
+                                  args.remuestreos, args.nivel, args.semilla)
+    imprimir_comparacion(resultado, test_mcnemar(a["y"], a["preds"], b["preds"]), clases, args.nivel)
+
+
+if __name__ == "__main__":
+    main()
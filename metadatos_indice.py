@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla de metadatos de notas sacada de las tarjetas de las paginas de indice, sin descargar las notas.
+
+Cada pagina de indice de una seccion ya trae, por cada nota, el link, el titulo, la fecha y la bajada. NewsSpider
+(1-web-scrapping.py) solo usaba los links; ahora cada tarjeta se agrega como una fila a ARCHIVO_METADATOS:
+
+    id_nota, seccion, url, titulo, fecha, bajada, pagina, posicion, vista
+
+(pagina y posicion: donde aparecia la tarjeta en el indice; vista: cuando se leyo). Con la tabla se puede:
+- decidir que notas bajar antes de bajarlas: ventana de fechas, cantidad balanceada por seccion (seleccionar);
+- ordenar por fecha real en el corte temporal de 4-split_validacion_por_id.py (--metadatos), en vez de por el ID
+  del nombre de archivo o el mtime;
+- entrenar modelos solo con titulo y bajada, con 0 descargas de notas.
+
+Las tarjetas se reconocen por su <article>; dentro, el 1er link a una nota da el ID y la URL, su texto el titulo
+(sin la volanta/bajada de <span class="title-prefix">), <time datetime> la fecha y la bajada sale de title-prefix o
+de un elemento con clase *summary*/*bajada*. Las notas que aparecen en varias lecturas quedan con la ultima.
+
+Con --fixture cosecha los indices de servidor_fixture.py, compara titulos y fechas con los de las notas, y entrena un
+clasificador de secciones solo con titulares.
+
+Ejemplos:
+    python metadatos_indice.py --paginas-indice 50                    # cosechar los indices del sitio
+    python metadatos_indice.py --sin-cosechar --desde 2025-08-01 --por-seccion 100 --urls a_descargar.txt
+    python metadatos_indice.py --fixture
+"""
+import argparse
+import html as html_lib
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from poller_secciones import SECCIONES, TIMEOUT, URL_BASE, USER_AGENT
+
+ARCHIVO_METADATOS = "metadatos_indice.csv"
+COLUMNAS = ["id_nota", "seccion", "url", "titulo", "fecha", "bajada", "pagina", "posicion", "vista"]
+# paginas de indice por seccion a cosechar como maximo, y cuantas se piden en paralelo
+PAGINAS_INDICE = 50
+HILOS = 4
+
+regex_tarjeta = re.compile(r'<article\b([^>]*)>(.*?)</article>', re.DOTALL | re.IGNORECASE)
+# primer link a una nota dentro de la tarjeta, como la regla de NewsSpider, con el texto del link
+regex_link_tarjeta = re.compile(r'<a\b[^>]*href="([^"#?]*?/(\d{6,})-[^"/#?]+)"[^>]*>(.*?)</a>', re.DOTALL)
+regex_prefijo_titulo = re.compile(r'<span class="title-prefix">(.*?)</span>', re.DOTALL)
+regex_bajada = re.compile(r'<(\w+)[^>]*class="[^"]*(?:summary|bajada)[^"]*"[^>]*>(.*?)</\1>', re.DOTALL)
+regex_fecha = re.compile(r'<time[^>]*datetime="([^"]+)"')
+regex_posicion = re.compile(r'data-position="(\d+)"')
+regex_etiquetas = re.compile(r'<[^>]+>')
+regex_seccion_url = re.compile(r'/secciones/([^/?#]+)')
+regex_pagina_url = re.compile(r'[?&]page=(\d+)')
+
+
+def _texto(fragmento: str) -> str:
+    return " ".join(html_lib.unescape(regex_etiquetas.sub(" ", fragmento)).split())
+
+
+def tarjetas_de_indice(html: str, url: str, seccion: Optional[str] = None, pagina: Optional[int] = None,
+                       vista: Optional[float] = None) -> List[Dict]:
+    """
+    :param url: URL de la pagina de indice, para resolver los links relativos y deducir seccion y pagina.
+    :return: 1 dict por tarjeta de nota (columnas COLUMNAS), en el orden del indice y sin repetir IDs.
+    """
+    if seccion is None:
+        m = regex_seccion_url.search(url)
+        seccion = m.group(1) if m else ""
+    if pagina is None:
+        m = regex_pagina_url.search(url)
+        pagina = int(m.group(1)) if m else 1
+    vista = time.time() if vista is None else vista
+    tarjetas, vistos = [], set()
+    for atributos, contenido in regex_tarjeta.findall(html):
+        link = regex_link_tarjeta.search(contenido)
+        if not link or link.group(2) in vistos:
+            continue
+        vistos.add(link.group(2))
+        prefijo = regex_prefijo_titulo.search(link.group(3))
+        bajada = prefijo.group(1) if prefijo else ""
+        if not bajada:
+            m_bajada = regex_bajada.search(contenido)
+            bajada = m_bajada.group(2) if m_bajada else ""
+        m_fecha = regex_fecha.search(contenido)
+        m_posicion = regex_posicion.search(atributos)
+        tarjetas.append({
+            "id_nota": link.group(2),
+            "seccion": seccion,
+            "url": urllib.request.urljoin(url, link.group(1)),
+            "titulo": _texto(regex_prefijo_titulo.sub(" ", link.group(3))),
+            "fecha": m_fecha.group(1) if m_fecha else "",
+            "bajada": _texto(bajada),
+            "pagina": pagina,
+            "posicion": int(m_posicion.group(1)) if m_posicion else len(tarjetas) + 1,
+            "vista": vista,
+        })
+    return tarjetas
+
+
+def agregar_tarjetas(archivo: str, tarjetas: List[Dict]):
+    """
+    Agrega las tarjetas al final de la tabla (CSV), escribiendo el encabezado si el archivo es nuevo.
+    """
+    if not tarjetas:
+        return
+    nuevo = not os.path.exists(archivo) or os.path.getsize(archivo) == 0
+    pd.DataFrame(tarjetas, columns=COLUMNAS).to_csv(archivo, mode="a", header=nuevo, index=False)
+
+
+def leer_metadatos(archivo: str = ARCHIVO_METADATOS) -> pd.DataFrame:
+    """
+    :return: La tabla con 1 fila por nota (la ultima lectura de cada una) y la fecha como Timestamp UTC.
+    """
+    if archivo.endswith(".parquet"):
+        df = pd.read_parquet(archivo)
+    else:
+        df = pd.read_csv(archivo, dtype={"id_nota": str, "bajada": str, "titulo": str}, keep_default_na=False)
+    df = df.sort_values("vista", kind="stable").drop_duplicates("id_nota", keep="last")
+    df["fecha"] = pd.to_datetime(df["fecha"].replace("", None), utc=True, errors="coerce")
+    return df.reset_index(drop=True)
+
+
+def fechas_por_id(archivo: str) -> Dict[int, pd.Timestamp]:
+    """
+    :return: ID numerico de nota -> fecha de publicacion, de las notas con fecha.
+    """
+    df = leer_metadatos(archivo).dropna(subset=["fecha"])
+    return dict(zip(df["id_nota"].astype(int), df["fecha"]))
+
+
+def seleccionar(df: pd.DataFrame, desde: Optional[str] = None, hasta: Optional[str] = None,
+                por_seccion: Optional[int] = None, secciones: Optional[Sequence[str]] = None,
+                semilla: int = 0) -> pd.DataFrame:
+    """
+    Elige notas a descargar segun los metadatos: ventana de fechas [desde, hasta] y a lo sumo por_seccion notas de
+    cada seccion (al azar, asi las secciones quedan balanceadas).
+    """
+    if secciones:
+        df = df[df["seccion"].isin(secciones)]
+    if desde is not None:
+        df = df[df["fecha"] >= pd.Timestamp(desde, tz="UTC")]
+    if hasta is not None:
+        # "hasta" inclusive: hasta el final de ese dia si viene sin hora
+        fin = pd.Timestamp(hasta, tz="UTC")
+        df = df[df["fecha"] < fin + pd.Timedelta(days=1)] if fin == fin.normalize() else df[df["fecha"] <= fin]
+    if por_seccion is not None:
+        # mezclar y quedarse con las primeras de cada seccion = muestra al azar sin reposicion por seccion
+        df = df.sample(frac=1.0, random_state=semilla).groupby("seccion").head(por_seccion)
+    return df.sort_values(["seccion", "fecha"]).reset_index(drop=True)
+
+
+def _pedir(url: str) -> Optional[str]:
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as respuesta:
+            return respuesta.read().decode("utf-8", errors="ignore")
+    except (urllib.error.URLError, TimeoutError) as e:
+        print(f"[ERROR] {url}: {e}")
+        return None
+
+
+def cosechar(url_indice: Callable[[str, int], str], secciones: List[str], paginas_maximas: int = PAGINAS_INDICE,
+             hilos: int = HILOS) -> Dict:
+    """
+    Lee las paginas de indice de cada seccion, de a "hilos" paginas en paralelo, hasta la primera sin tarjetas.
+    :return: {"tarjetas": [...], "pedidos": int, "bytes": int}
+    """
+    tarjetas, pedidos, transferidos = [], 0, 0
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        for seccion in secciones:
+            for primera in range(1, paginas_maximas + 1, hilos):
+                paginas = list(range(primera, min(primera + hilos, paginas_maximas + 1)))
+                urls = [url_indice(seccion, p) for p in paginas]
+                htmls = list(pool.map(_pedir, urls))
+                pedidos += len(urls)
+                fin = False
+                for pagina, url, html in zip(paginas, urls, htmls):
+                    if html is None:
+                        continue
+                    transferidos += len(html.encode("utf-8"))
+                    de_pagina = tarjetas_de_indice(html, url, seccion, pagina)
+                    tarjetas.extend(de_pagina)
+                    fin = fin or not de_pagina
+                if fin:
+                    break
+    return {"tarjetas": tarjetas, "pedidos": pedidos, "bytes": transferidos}
+
+
+def demo_fixture(dir_paginas: str) -> Dict:
+    """
+    Cosecha los indices de servidor_fixture.py, compara con los metadatos de las notas y entrena un clasificador de
+    seccion solo con titulo y bajada.
+    :return: Pedidos, coincidencia de titulos y fechas, y accuracy del clasificador de titulares.
+    """
+    import tempfile
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_val_score
+    from sklearn.pipeline import make_pipeline
+    from servidor_fixture import ServidorFixture
+
+    with ServidorFixture(dir_paginas) as servidor, tempfile.TemporaryDirectory() as directorio:
+        secciones = list(servidor.corpus.secciones)
+        inicio = time.perf_counter()
+        cosecha = cosechar(servidor.url_indice, secciones)
+        segundos = time.perf_counter() - inicio
+        por_tipo = servidor.estadisticas.como_dict()["por_tipo"]
+        archivo = os.path.join(directorio, ARCHIVO_METADATOS)
+        agregar_tarjetas(archivo, cosecha["tarjetas"])
+        df = leer_metadatos(archivo)
+        esperados = {ruta[1:].split("-", 1)[0]: servidor.corpus.metadatos(ruta)
+                     for rutas in servidor.corpus.secciones.values() for ruta in rutas}
+    # el titulo de la nota (JSON-LD) puede traer espacios de mas: se comparan normalizados
+    titulos_ok = sum(" ".join(esperados[i]["titulo"].split()) == t for i, t in zip(df["id_nota"], df["titulo"]) if i in esperados)
+    fechas_ok = sum(pd.Timestamp(esperados[i]["fecha"]) == f for i, f in zip(df["id_nota"], df["fecha"])
+                    if i in esperados and esperados[i]["fecha"])
+    modelo = make_pipeline(TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), min_df=1),
+                           LogisticRegression(max_iter=1000))
+    textos = (df["titulo"] + " " + df["bajada"]).tolist()
+    accuracy = cross_val_score(modelo, textos, df["seccion"], cv=5, scoring="accuracy")
+    return {
+        "notas": len(df),
+        "notas_en_el_sitio": len(esperados),
+        "pedidos": cosecha["pedidos"],
+        "descargas_de_notas": por_tipo.get("nota", 0),
+        "kb": round(cosecha["bytes"] / 1024, 1),
+        "segundos": round(segundos, 3),
+        "titulos_coinciden": titulos_ok,
+        "fechas_coinciden": fechas_ok,
+        "por_seccion": df["seccion"].value_counts().to_dict(),
+        "accuracy_cv_titulares": round(float(accuracy.mean()), 3),
+        "muestra_balanceada_agosto": seleccionar(df, desde="2025-08-01", por_seccion=10)["seccion"]
+                                     .value_counts().to_dict(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cosecha titulo, fecha y bajada de las tarjetas de los indices")
+    parser.add_argument("--salida", default=ARCHIVO_METADATOS, help=f"Tabla de metadatos (default: {ARCHIVO_METADATOS})")
+    parser.add_argument("--secciones", nargs="+", default=SECCIONES, help="Secciones a cosechar (default: todas)")
+    parser.add_argument("--paginas-indice", type=int, default=PAGINAS_INDICE,
+                        help=f"Paginas de indice por seccion como maximo (default: {PAGINAS_INDICE})")
+    parser.add_argument("--hilos", type=int, default=HILOS, help=f"Pedidos en paralelo (default: {HILOS})")
+    parser.add_argument("--sin-cosechar", action="store_true", help="Solo seleccionar sobre la tabla existente")
+    parser.add_argument("--desde", help="Seleccionar notas desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Seleccionar notas hasta esta fecha (AAAA-MM-DD, inclusive)")
+    parser.add_argument("--por-seccion", type=int, help="Seleccionar a lo sumo N notas por seccion")
+    parser.add_argument("--urls", help="Archivo donde escribir las URLs seleccionadas (1 por linea)")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio de las notas, para --fixture")
+    parser.add_argument("--fixture", action="store_true", help="Probar contra servidor_fixture.py")
+    args = parser.parse_args()
+
+    if args.fixture:
+        print(json.dumps(demo_fixture(args.paginas), indent=1, ensure_ascii=False))
+        return
+
+    if not args.sin_cosechar:
+        cosecha = cosechar(lambda seccion, pagina: f"{URL_BASE}/secciones/{seccion}?page={pagina}",
+                           args.secciones, args.paginas_indice, args.hilos)
+        agregar_tarjetas(args.salida, cosecha["tarjetas"])
+        print(f"[OK] {len(cosecha['tarjetas'])} tarjetas de {cosecha['pedidos']} paginas de indice "
+              f"({cosecha['bytes'] / 1024:.0f} KB) agregadas a {args.salida}")
+
+    if not os.path.exists(args.salida):
+        print(f"[ERROR] No existe la tabla {args.salida}")
+        return
+    df = leer_metadatos(args.salida)
+    seleccion = seleccionar(df, args.desde, args.hasta, args.por_seccion, args.secciones)
+    print(f"[INFO] {len(df)} notas en la tabla, {len(seleccion)} seleccionadas: "
+          f"{seleccion['seccion'].value_counts().to_dict()}")
+    if args.urls:
+        with open(args.urls, "w", encoding="utf-8") as f:
+            f.writelines(url + "\n" for url in seleccion["url"])
+        print(f"[OK] URLs seleccionadas en {args.urls}")
+
+
+if __name__ == "__main__":
+    main()
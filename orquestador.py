@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+Corre las etapas del TP (2- a 6-) y solo recalcula las que cambiaron, como un make con huellas de contenido.
+
+Cada etapa declara su comando, sus entradas (archivos o directorios), sus salidas, el codigo del que depende y sus
+parametros (constantes del script que se pisan con TP_PARAMETROS, ver cargador_scripts.aplicar_parametros). La huella
+de una etapa es un sha256 de:
+- el hash del contenido de cada entrada (un directorio: los hashes de todos sus archivos con su ruta relativa);
+- el hash del codigo: archivos enteros ("corpus_tokenizado.py") o solo 1 funcion/constante de un archivo
+  ("5-entrenar_y_guardar_modelo_pipeline.py:leer_html"), para que editar K_SELECT en 5- no invalide la lectura;
+- los parametros y el comando.
+Las salidas de cada corrida se guardan en DIR_CACHE (objetos direccionados por su sha256 + 1 manifiesto por huella).
+Antes de correr una etapa se busca su huella: si ya estaba y las salidas en disco coinciden, la etapa esta al dia;
+si estaba pero las salidas se borraron o cambiaron, se restauran desde la cache sin correr nada. Como las entradas de
+una etapa son salidas de otras, si una etapa se vuelve a correr y produce exactamente lo mismo, las siguientes no se
+recalculan.
+
+Las dependencias salen de las rutas (una etapa depende de la que produce alguna de sus entradas) y las etapas
+independientes corren en paralelo, cada una en su proceso. El hash de cada archivo se recuerda por (tamaño, mtime)
+en DIR_CACHE/hashes.json, asi no se relee todo el corpus en cada corrida.
+
+Etapas del TP (directorio de trabajo con paginas/ y config/):
+    extraccion     2-html-a-dataframe.py        paginas/ -> vectores/targets/features/grupos.joblib, dataset/
+    evaluacion     3-entrenar-y-evaluar.py      *.joblib -> evaluacion_cv.txt (lo que imprime), ranking_features.csv,
+                                                predicciones_cv.npz, predicciones_temporal.npz
+    division       4-split_validacion_por_id.py paginas/ -> raw/ (copia, con el 20% mas nuevo en raw/Validacion/)
+    textos         5- (solo lectura de HTML)    raw/ -> textos_entrenamiento.joblib
+    entrenamiento  5-entrenar_y_guardar...py    textos_entrenamiento.joblib -> modelos/
+    prediccion     6-predecir_en_validacion.py  raw/Validacion/ + modelos/ -> reportes/
+
+Ejemplos:
+    python orquestador.py                                         # corre lo que haga falta
+    python orquestador.py --param entrenamiento.K_SELECT=300      # solo reentrena y predice
+    python orquestador.py --param evaluacion.MAX_FEATURES=500 --etapas evaluacion
+    python orquestador.py --listar                                # estado de cada etapa, sin correr nada
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from cargador_scripts import DIR_SCRIPTS, PARAMETROS_ENV
+from instrumentacion import RegistroEjecucion
+
+DIR_CACHE = ".cache_orquestador"
+ARCHIVO_HASHES = "hashes.json"
+# hash que representa una entrada o salida que no existe
+AUSENTE = "ausente"
+TAMANIO_BLOQUE = 1 << 20
+
+registro = RegistroEjecucion("orquestador")
+
+
+class Etapa:
+    """
+    Una etapa del pipeline: un comando de python que lee "entradas" y escribe "salidas" en el directorio de trabajo.
+    """
+
+    def __init__(self, nombre: str, comando: List[str], entradas: Sequence[str] = (), salidas: Sequence[str] = (),
+                 codigo: Sequence[str] = (), parametros: Optional[Dict] = None, salida_estandar: Optional[str] = None):
+        """
+        :param comando: Argumentos de python: un script de DIR_SCRIPTS y sus argumentos, o ["-c", "..."].
+        :param entradas: Rutas (relativas al directorio de trabajo) de archivos o directorios que lee.
+        :param salidas: Rutas que escribe; se guardan en la cache y se restauran desde ahi.
+        :param codigo: Archivos de DIR_SCRIPTS ("x.py") o funciones/constantes de un archivo ("x.py:nombre").
+        :param parametros: Constantes del script a pisar, se pasan en TP_PARAMETROS.
+        :param salida_estandar: Si no es None, lo que imprime la etapa se guarda en esa ruta (y es una salida mas).
+        """
+        self.nombre = nombre
+        self.comando = comando
+        self.entradas = list(entradas)
+        self.salidas = list(salidas) + ([salida_estandar] if salida_estandar else [])
+        self.codigo = list(codigo)
+        self.parametros = dict(parametros or {})
+        self.salida_estandar = salida_estandar
+
+    def depende_de(self, otra: "Etapa") -> bool:
+        return any(_contiene(salida, entrada) or _contiene(entrada, salida)
+                   for entrada in self.entradas for salida in otra.salidas)
+
+
+def _contiene(ruta: str, otra: str) -> bool:
+    """
+    :return: True si "otra" es "ruta" o esta adentro de ella.
+    """
+    a, b = Path(ruta).parts, Path(otra).parts
+    return b[:len(a)] == a
+
+
+def etapas_tp(parametros: Optional[Dict[str, Dict]] = None) -> List[Etapa]:
+    """
+    Las etapas del TP, con las rutas de 5- y 6- relativas al directorio de trabajo.
+    :param parametros: {nombre de etapa: {constante: valor}} a pisar ademas de las rutas.
+    """
+    parametros = parametros or {}
+    script_5 = "5-entrenar_y_guardar_modelo_pipeline.py"
+    return [
+        Etapa("extraccion", ["2-html-a-dataframe.py"],
+              entradas=["paginas", "config"],
+              salidas=["vectores.joblib", "targets.joblib", "features.joblib", "grupos.joblib", "dataset"],
+              codigo=["2-html-a-dataframe.py", "corpus_tokenizado.py", "dataset_particionado.py", "deduplicacion.py"],
+              parametros=parametros.get("extraccion")),
+        Etapa("evaluacion", ["3-entrenar-y-evaluar.py"],
+              entradas=["vectores.joblib", "targets.joblib", "features.joblib", "grupos.joblib", "dataset"],
+              salidas=["ranking_features.csv", "predicciones_cv.npz", "predicciones_temporal.npz"],
+              codigo=["3-entrenar-y-evaluar.py", "dataset_particionado.py", "deduplicacion.py", "indice_vectores.py",
+                      "ranking_features.py", "intervalos_bootstrap.py"],
+              parametros={"PAUSAR": False, **parametros.get("evaluacion", {})}, salida_estandar="evaluacion_cv.txt"),
+        Etapa("division", ["-c", "import orquestador; orquestador.copiar_y_dividir('paginas', 'raw')"],
+              entradas=["paginas"], salidas=["raw"],
+              codigo=["4-split_validacion_por_id.py", "orquestador.py:copiar_y_dividir"],
+              parametros=parametros.get("division")),
+        Etapa("textos", ["-c", "import orquestador; orquestador.guardar_textos_entrenamiento("
+                               "'raw', 'textos_entrenamiento.joblib')"],
+              entradas=["raw"], salidas=["textos_entrenamiento.joblib"],
+              codigo=[f"{script_5}:EXTS", f"{script_5}:VALIDACION_DIRNAME", f"{script_5}:leer_html",
+                      f"{script_5}:cargar_textos_y_labels_entrenamiento", "orquestador.py:guardar_textos_entrenamiento"]),
+        Etapa("entrenamiento", [script_5],
+              entradas=["textos_entrenamiento.joblib"],
+              salidas=["modelos/modelo_pipeline.joblib", "modelos/label_encoder.joblib"],
+              codigo=[script_5, "corpus_tokenizado.py"],
+              parametros={"BASE_RAW": "raw", "MODELS_DIR": "modelos", "TEXTOS_ENTRENAMIENTO": "textos_entrenamiento.joblib",
+                          "CACHE_TOKENS_DIR": "cache_tokens", "CACHE_EMBEDDINGS_DIR": "cache_embeddings",
+                          **parametros.get("entrenamiento", {})}),
+        Etapa("prediccion", ["6-predecir_en_validacion.py"],
+              entradas=["raw/Validacion", "modelos/modelo_pipeline.joblib", "modelos/label_encoder.joblib"],
+              salidas=["reportes"],
+              codigo=["6-predecir_en_validacion.py", "intervalos_bootstrap.py", "explicaciones_lineales.py"],
+              parametros={"VALIDACION_DIR": "raw/Validacion", "MODELO_PATH": "modelos/modelo_pipeline.joblib",
+                          "LABELENC_PATH": "modelos/label_encoder.joblib",
+                          "VECTORIZER_PATH": "modelos/vectorizer.joblib", "SELECTOR_PATH": "modelos/selector.joblib",
+                          "SALIDA_DIR": "reportes", **parametros.get("prediccion", {})}),
+    ]
+
+
+def copiar_y_dividir(origen: str, destino: str):
+    """
+    Etapa "division": copia el corpus y corre 4-split_validacion_por_id.py sobre la copia (4- mueve archivos, y el
+    corpus original es la entrada de otras etapas).
+    """
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    shutil.copytree(origen, destino)
+    argumentos = json.loads(os.environ.get(PARAMETROS_ENV) or "{}")
+    comando = [sys.executable, str(DIR_SCRIPTS / "4-split_validacion_por_id.py"), "--base", destino]
+    for nombre, valor in argumentos.items():
+        comando += [f"--{nombre.lower().replace('_', '-')}", str(valor)]
+    subprocess.run(comando, check=True)
+
+
+def guardar_textos_entrenamiento(base_raw: str, destino: str):
+    """
+    Etapa "textos": la lectura de los HTML de entrenamiento de 5-, separada del entrenamiento, para no repetirla al
+    cambiar parametros del modelo.
+    """
+    import joblib
+    from cargador_scripts import importar_script
+
+    script = importar_script("5-entrenar_y_guardar_modelo_pipeline.py")
+    textos, labels = script.cargar_textos_y_labels_entrenamiento(Path(base_raw), script.VALIDACION_DIRNAME)
+    joblib.dump((textos, labels), destino)
+    print(f"[OK] {len(textos)} textos de entrenamiento en {destino}")
+
+
+class Cache:
+    """
+    Objetos direccionados por contenido (DIR_CACHE/objetos/ab/abcd...), manifiestos de salidas por etapa y huella
+    (DIR_CACHE/etapas/<etapa>/<huella>.json), y los hashes ya calculados de cada archivo.
+    """
+
+    def __init__(self, directorio: str = DIR_CACHE):
+        self.directorio = Path(directorio)
+        (self.directorio / "objetos").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._archivo_hashes = self.directorio / ARCHIVO_HASHES
+        try:
+            self._hashes: Dict[str, List] = json.loads(self._archivo_hashes.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._hashes = {}
+
+    def hash_archivo(self, ruta: Path) -> str:
+        estado = ruta.stat()
+        clave = str(ruta.resolve())
+        with self._lock:
+            guardado = self._hashes.get(clave)
+        if guardado and guardado[0] == estado.st_size and guardado[1] == estado.st_mtime_ns:
+            return guardado[2]
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(TAMANIO_BLOQUE), b""):
+                sha.update(bloque)
+        with self._lock:
+            self._hashes[clave] = [estado.st_size, estado.st_mtime_ns, sha.hexdigest()]
+        return sha.hexdigest()
+
+    def archivos(self, ruta: Path) -> Optional[Dict[str, str]]:
+        """
+        :return: {ruta relativa: sha256} de un archivo ("" como ruta relativa) o de todos los de un directorio,
+                 o None si no existe.
+        """
+        if ruta.is_file():
+            return {"": self.hash_archivo(ruta)}
+        if ruta.is_dir():
+            return {str(p.relative_to(ruta).as_posix()): self.hash_archivo(p)
+                    for p in sorted(ruta.rglob("*")) if p.is_file()}
+        return None
+
+    def hash_ruta(self, ruta: Path) -> str:
+        archivos = self.archivos(ruta)
+        if archivos is None:
+            return AUSENTE
+        if list(archivos) == [""]:
+            return archivos[""]
+        return hashlib.sha256("".join(f"{r}\0{h}\n" for r, h in archivos.items()).encode("utf-8")).hexdigest()
+
+    def guardar_hashes(self):
+        with self._lock:
+            temporal = self._archivo_hashes.with_suffix(".tmp")
+            temporal.write_text(json.dumps(self._hashes), encoding="utf-8")
+            os.replace(temporal, self._archivo_hashes)
+
+    def _objeto(self, sha: str) -> Path:
+        return self.directorio / "objetos" / sha[:2] / sha
+
+    def guardar_salidas(self, etapa: Etapa, huella: str, trabajo: Path) -> Dict:
+        """
+        Copia las salidas de la etapa a la cache y escribe el manifiesto de la huella.
+        :return: El manifiesto: {salida: {ruta relativa: sha256} o None si la etapa no la escribio}.
+        """
+        manifiesto = {}
+        for salida in etapa.salidas:
+            archivos = self.archivos(trabajo / salida)
+            manifiesto[salida] = archivos
+            for relativa, sha in (archivos or {}).items():
+                objeto = self._objeto(sha)
+                if not objeto.exists():
+                    objeto.parent.mkdir(parents=True, exist_ok=True)
+                    temporal = objeto.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                    shutil.copyfile(trabajo / salida / relativa if relativa else trabajo / salida, temporal)
+                    os.replace(temporal, objeto)
+        archivo = self.directorio / "etapas" / etapa.nombre / f"{huella}.json"
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+        archivo.write_text(json.dumps(manifiesto, indent=1), encoding="utf-8")
+        return manifiesto
+
+    def manifiesto(self, etapa: Etapa, huella: str) -> Optional[Dict]:
+        archivo = self.directorio / "etapas" / etapa.nombre / f"{huella}.json"
+        if not archivo.exists():
+            return None
+        manifiesto = json.loads(archivo.read_text(encoding="utf-8"))
+        # si se borraron objetos de la cache el manifiesto no sirve
+        if any(not self._objeto(sha).exists() for archivos in manifiesto.values() for sha in (archivos or {}).values()):
+            return None
+        return manifiesto
+
+    def restaurar(self, manifiesto: Dict, trabajo: Path) -> int:
+        """
+        Deja las salidas en disco como dice el manifiesto, copiando de la cache solo las que difieren.
+        :return: Cantidad de archivos copiados o borrados.
+        """
+        cambios = 0
+        for salida, archivos in manifiesto.items():
+            ruta = trabajo / salida
+            if archivos == self.archivos(ruta):
+                continue
+            if ruta.is_dir():
+                shutil.rmtree(ruta)
+            elif ruta.exists():
+                ruta.unlink()
+            cambios += 1
+            for relativa, sha in (archivos or {}).items():
+                destino = ruta / relativa if relativa else ruta
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(self._objeto(sha), destino)
+                cambios += 1
+        return cambios
+
+
+def hash_codigo(referencia: str) -> str:
+    """
+    :param referencia: "archivo.py" (todo el archivo) o "archivo.py:nombre" (solo esa funcion, clase o constante).
+    :return: sha256 del codigo referenciado.
+    """
+    archivo, _, nombre = referencia.partition(":")
+    fuente = (DIR_SCRIPTS / archivo).read_text(encoding="utf-8")
+    if nombre:
+        for nodo in ast.parse(fuente).body:
+            nombres = ([nodo.name] if isinstance(nodo, (ast.FunctionDef, ast.ClassDef))
+                       else [t.id for t in nodo.targets if isinstance(t, ast.Name)] if isinstance(nodo, ast.Assign)
+                       else [])
+            if nombre in nombres:
+                fuente = ast.get_source_segment(fuente, nodo)
+                break
+        else:
+            raise ValueError(f"No se encontro {nombre} en {archivo}")
+    return hashlib.sha256(fuente.encode("utf-8")).hexdigest()
+
+
+def huella(etapa: Etapa, cache: Cache, trabajo: Path) -> str:
+    contenido = {
+        "etapa": etapa.nombre,
+        "comando": etapa.comando,
+        "parametros": etapa.parametros,
+        "salidas": etapa.salidas,
+        "codigo": {ref: hash_codigo(ref) for ref in etapa.codigo},
+        "entradas": {entrada: cache.hash_ruta(trabajo / entrada) for entrada in etapa.entradas},
+    }
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _ejecutar(etapa: Etapa, trabajo: Path, cache: Cache) -> str:
+    """
+    Corre el comando de la etapa en su propio proceso.
+    :return: "ejecutada" o "fallida".
+    """
+    comando = etapa.comando
+    if comando and comando[0].endswith(".py"):
+        comando = [str(DIR_SCRIPTS / comando[0])] + comando[1:]
+    entorno = dict(os.environ)
+    entorno[PARAMETROS_ENV] = json.dumps(etapa.parametros)
+    entorno["PYTHONPATH"] = os.pathsep.join(filter(None, [str(DIR_SCRIPTS), entorno.get("PYTHONPATH")]))
+    registro_etapa = cache.directorio / "logs" / f"{etapa.nombre}.log"
+    registro_etapa.parent.mkdir(parents=True, exist_ok=True)
+    with open(registro_etapa, "wb") as log:
+        proceso = subprocess.run([sys.executable] + comando, cwd=trabajo, env=entorno,
+                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        log.write(proceso.stdout)
+    if etapa.salida_estandar:
+        (trabajo / etapa.salida_estandar).write_bytes(proceso.stdout)
+    if proceso.returncode != 0:
+        print(f"[ERROR] La etapa {etapa.nombre} termino con codigo {proceso.returncode}, ver {registro_etapa}:")
+        print(proceso.stdout.decode("utf-8", errors="ignore")[-2000:])
+        return "fallida"
+    return "ejecutada"
+
+
+def procesar_etapa(etapa: Etapa, trabajo: Path, cache: Cache, forzar: bool = False, simular: bool = False) -> Dict:
+    """
+    Calcula la huella de la etapa y, segun la cache: no hace nada, restaura las salidas o corre la etapa.
+    :param simular: Solo informar que haria, sin correr ni restaurar.
+    :return: {"etapa", "estado", "huella", "segundos"}; estado es "al dia", "restaurada", "ejecutada", "fallida" o,
+             con simular, "a ejecutar"/"a restaurar".
+    """
+    inicio = time.perf_counter()
+    h = huella(etapa, cache, trabajo)
+    manifiesto = None if forzar else cache.manifiesto(etapa, h)
+    if manifiesto is not None:
+        iguales = all(archivos == cache.archivos(trabajo / salida) for salida, archivos in manifiesto.items())
+        if iguales:
+            estado = "al dia"
+        elif simular:
+            estado = "a restaurar"
+        else:
+            cache.restaurar(manifiesto, trabajo)
+            estado = "restaurada"
+    elif simular:
+        estado = "a ejecutar"
+    else:
+        estado = _ejecutar(etapa, trabajo, cache)
+        if estado == "ejecutada":
+            cache.guardar_salidas(etapa, h, trabajo)
+    return {"etapa": etapa.nombre, "estado": estado, "huella": h[:12], "segundos": round(time.perf_counter() - inicio, 2)}
+
+
+def correr(etapas: List[Etapa], trabajo: str = ".", dir_cache: str = DIR_CACHE, paralelo: int = os.cpu_count() or 1,
+           forzar: Sequence[str] = (), simular: bool = False) -> List[Dict]:
+    """
+    Procesa las etapas en orden de dependencias, en paralelo las que no dependen entre si. Una etapa cuya
+    dependencia fallo no se corre. Con simular, las dependientes de una etapa "a ejecutar" o "a restaurar" se
+    informan como "pendiente" (su huella depende de salidas que todavia no estan en disco).
+    :param forzar: Nombres de etapas a correr aunque esten en la cache.
+    :return: El resultado de cada etapa, en el orden en que terminaron.
+    """
+    trabajo = Path(trabajo).resolve()
+    cache = Cache(dir_cache if os.path.isabs(dir_cache) else str(trabajo / dir_cache))
+    dependencias = {e.nombre: {o.nombre for o in etapas if o is not e and e.depende_de(o)} for e in etapas}
+    por_nombre = {e.nombre: e for e in etapas}
+    resultados, terminadas, en_curso = [], {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, paralelo)) as pool:
+        while len(terminadas) < len(etapas):
+            for nombre, deps in dependencias.items():
+                if nombre in terminadas or nombre in en_curso.values() or not deps <= set(terminadas):
+                    continue
+                malas = [d for d in deps
+                         if terminadas[d] in ("fallida", "salteada", "a ejecutar", "a restaurar", "pendiente")]
+                if malas:
+                    estado = "pendiente" if simular else "salteada"
+                    terminadas[nombre] = estado
+                    resultados.append({"etapa": nombre, "estado": estado, "huella": None, "segundos": 0.0})
+                    continue
+                futuro = pool.submit(procesar_etapa, por_nombre[nombre], trabajo, cache, nombre in forzar, simular)
+                en_curso[futuro] = nombre
+            if not en_curso:
+                continue
+            listos, _ = wait(list(en_curso), return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                nombre = en_curso.pop(futuro)
+                resultado = futuro.result()
+                terminadas[nombre] = resultado["estado"]
+                resultados.append(resultado)
+                registro.evento("etapa_pipeline", **resultado)
+                print(f"[{'OK' if resultado['estado'] != 'fallida' else 'ERROR'}] {nombre}: {resultado['estado']} "
+                      f"({resultado['segundos']}s)")
+    cache.guardar_hashes()
+    return resultados
+
+
+def _parsear_parametro(texto: str) -> tuple:
+    """
+    "entrenamiento.K_SELECT=300" -> ("entrenamiento", "K_SELECT", 300). El valor se interpreta como JSON si se puede.
+    """
+    clave, _, valor = texto.partition("=")
+    etapa, _, nombre = clave.partition(".")
+    if not etapa or not nombre or not valor:
+        raise argparse.ArgumentTypeError(f"Parametro invalido: {texto} (formato: etapa.CONSTANTE=valor)")
+    try:
+        valor = json.loads(valor)
+    except ValueError:
+        pass
+    return etapa, nombre, valor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corre las etapas del TP, recalculando solo las que cambiaron")
+    parser.add_argument("--directorio", default=".", help="Directorio de trabajo, con paginas/ y config/ (default: .)")
+    parser.add_argument("--cache", default=DIR_CACHE, help=f"Directorio de la cache, relativo al de trabajo (default: {DIR_CACHE})")
+    parser.add_argument("--param", action="append", type=_parsear_parametro, default=[],
+                        help="Pisar una constante de una etapa: etapa.CONSTANTE=valor (se puede repetir)")
+    parser.add_argument("--parametros", help="JSON con {etapa: {CONSTANTE: valor}}")
+    parser.add_argument("--etapas", nargs="+", help="Correr solo estas etapas y las que necesitan (default: todas)")
+    parser.add_argument("--forzar", nargs="*", default=[], help="Etapas a correr aunque esten en la cache")
+    parser.add_argument("--paralelo", type=int, default=os.cpu_count() or 1,
+                        help="Etapas a correr a la vez (default: cantidad de CPUs)")
+    parser.add_argument("--listar", action="store_true", help="Solo mostrar que etapas estan al dia")
+    args = parser.parse_args()
+
+    parametros: Dict[str, Dict] = {}
+    if args.parametros:
+        parametros = json.loads(Path(args.parametros).read_text(encoding="utf-8"))
+    for etapa, nombre, valor in args.param:
+        parametros.setdefault(etapa, {})[nombre] = valor
+    etapas = etapas_tp(parametros)
+    nombres = {e.nombre for e in etapas}
+    desconocidas = (set(parametros) | set(args.forzar) | set(args.etapas or [])) - nombres
+    if desconocidas:
+        parser.error(f"Etapas desconocidas: {sorted(desconocidas)} (etapas: {sorted(nombres)})")
+    if args.etapas:
+        # las pedidas y todas las que las alimentan
+        elegidas = set(args.etapas)
+        while True:
+            nuevas = {o.nombre for e in etapas if e.nombre in elegidas for o in etapas if e.depende_de(o)} - elegidas
+            if not nuevas:
+                break
+            elegidas |= nuevas
+        etapas = [e for e in etapas if e.nombre in elegidas]
+
+    inicio = time.perf_counter()
+    resultados = correr(etapas, args.directorio, args.cache, args.paralelo, args.forzar, simular=args.listar)
+    print(f"\n{'etapa':<15}{'estado':<14}{'huella':<14}segundos")
+    for r in sorted(resultados, key=lambda r: [e.nombre for e in etapas].index(r["etapa"])):
+        print(f"{r['etapa']:<15}{r['estado']:<14}{r['huella'] or '-':<14}{r['segundos']}")
+    print(f"[INFO] Total: {time.perf_counter() - inicio:.1f}s")
+    registro.resumen(imprimir=False)
+    if any(r["estado"] == "fallida" for r in resultados):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline en streaming: crawl -> extraccion -> clasificacion, sin pasar por directorios.
+
+En vez de correr 1-web-scrapping.py, 2-html-a-dataframe.py y 6-predecir_en_validacion.py uno despues del otro,
+cada nota pasa por las 3 etapas apenas se descarga:
+- crawl: NewsSpider (en el thread del reactor de Scrapy) pone cada nota descargada en una cola acotada, en vez de
+  escribirla a disco. Si la cola esta llena el callback espera (sin bloquear al reactor) a que un worker saque una
+  nota; mientras tanto Scrapy deja de pedir paginas nuevas, porque las respuestas sin procesar se acumulan en el
+  scraper (ver SCRAPER_SLOT_MAX_ACTIVE_SIZE). Esa es la contrapresion: el crawl va a la velocidad de la etapa mas lenta.
+- extraccion: HILOS_EXTRACCION threads con extraer_datos_nota de 2-html-a-dataframe.py (titulo, fecha, texto),
+  que ponen las notas en otra cola acotada.
+- clasificacion: 1 thread que junta lotes de hasta TAMANIO_LOTE notas (o lo que haya llegado en ESPERA_MAXIMA_LOTE
+  segundos), los clasifica con el pipeline guardado por 5-entrenar_y_guardar_modelo_pipeline.py y agrega las
+  predicciones al archivo de salida (JSON-lines) apenas salen, 1 lote por vez.
+
+Si un worker falla, avisa a la etapa siguiente (con la marca de fin), le pide al reactor que cierre el crawl y sigue
+vaciando su cola sin procesar, asi ninguna otra etapa queda bloqueada en una cola llena; correr_pipeline termina y
+vuelve a lanzar el 1er error.
+
+Por etapa se cuentan notas, segundos de trabajo, notas/s y espera por la cola siguiente; por nota, la latencia
+desde que se descargo hasta que su prediccion quedo escrita (p50/p95/max).
+
+Ejemplos:
+    python pipeline_streaming.py --modelo models/modelo_pipeline.joblib --label-encoder models/label_encoder.joblib
+    python pipeline_streaming.py --fixture                      # contra servidor_fixture.py, con un pipeline
+                                                                # entrenado con ./paginas
+    python pipeline_streaming.py --fixture --latencia 0.05 --capacidad 4 --lote 8
+"""
+import argparse
+import json
+import queue
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cargador_scripts import importar_script
+from instrumentacion import RegistroEjecucion
+
+SECCIONES = ['el-mundo', 'el-pais', 'economia', 'sociedad']
+URL_BASE = 'http://www.pagina12.com.ar'
+PAGINAS_INDICE = 1
+ARCHIVO_SALIDA = "predicciones_streaming.jsonl"
+# notas entre etapas: si la cola se llena, la etapa anterior espera
+CAPACIDAD_COLA = 32
+HILOS_EXTRACCION = 2
+TAMANIO_LOTE = 16
+# segundos que espera el clasificador a completar un lote antes de clasificar lo que tiene
+ESPERA_MAXIMA_LOTE = 0.5
+# bytes de respuestas descargadas sin procesar en el scraper a partir de los cuales Scrapy deja de pedir (default 5 MB)
+MAXIMO_SIN_PROCESAR = 1024 * 1024
+
+registro = RegistroEjecucion("pipeline_streaming")
+
+# marca de fin en las colas
+_FIN = None
+
+
+class EstadisticasEtapa:
+    """
+    Contadores de 1 etapa, compartidos por sus threads.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.notas = 0
+        self.descartadas = 0
+        self.segundos_trabajo = 0.0
+        self.segundos_espera = 0.0
+        self.primera: Optional[float] = None
+        self.ultima: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def registrar(self, notas: int, segundos_trabajo: float, segundos_espera: float = 0.0, descartadas: int = 0):
+        ahora = time.perf_counter()
+        with self._lock:
+            self.notas += notas
+            self.descartadas += descartadas
+            self.segundos_trabajo += segundos_trabajo
+            self.segundos_espera += segundos_espera
+            if self.primera is None:
+                self.primera = ahora - segundos_trabajo
+            self.ultima = ahora
+
+    def como_dict(self) -> Dict:
+        duracion = (self.ultima - self.primera) if self.primera is not None else 0.0
+        return {"etapa": self.nombre, "notas": self.notas, "descartadas": self.descartadas,
+                "segundos_trabajo": round(self.segundos_trabajo, 3),
+                "notas_por_segundo": round(self.notas / duracion, 2) if duracion > 0 else None,
+                "segundos_esperando_cola": round(self.segundos_espera, 3)}
+
+
+class ColaConContrapresion:
+    """
+    Cola acotada que se llena desde el thread del reactor de Twisted y se vacia desde threads comunes.
+    El reactor no puede bloquearse en put() (frenaria todas las descargas en curso): si la cola esta llena,
+    poner() espera un Deferred que se dispara en el reactor cada vez que un worker saca algo.
+    """
+
+    def __init__(self, capacidad: int):
+        self.cola = queue.Queue(capacidad)
+        self._esperando = []
+        self.esperas = 0
+        self.maximo = 0
+
+    async def poner(self, item):
+        """
+        Solo desde el thread del reactor (p.ej. en un callback async del spider).
+        """
+        from scrapy.utils.defer import maybe_deferred_to_future
+        from twisted.internet.defer import Deferred
+
+        if self.cola.full():
+            self.esperas += 1
+        while self.cola.full():
+            lugar = Deferred()
+            self._esperando.append(lugar)
+            await maybe_deferred_to_future(lugar)
+        self.cola.put_nowait(item)
+        self.maximo = max(self.maximo, self.cola.qsize())
+
+    def poner_y_esperar(self, item):
+        """
+        Desde un thread que no es el del reactor (o con el reactor ya detenido).
+        """
+        self.cola.put(item)
+
+    def sacar(self):
+        item = self.cola.get()
+        # se importa recien aca: importarlo antes de que Scrapy instale su reactor instalaria el de default
+        from twisted.internet import reactor
+
+        # siempre, aunque nadie espere: el reactor pudo ver la cola llena justo antes de este get()
+        reactor.callFromThread(self._liberar)
+        return item
+
+    def _liberar(self):
+        esperando, self._esperando = self._esperando, []
+        for lugar in esperando:
+            lugar.callback(None)
+
+
+def crear_spider_streaming(cola: ColaConContrapresion, estadisticas: EstadisticasEtapa, settings: Optional[Dict] = None,
+                           dominios: Optional[Sequence[str]] = None):
+    """
+    Crea una subclase de NewsSpider que pone cada nota en la cola en vez de escribirla en un archivo.
+    :param dominios: Dominios permitidos, si no son los del sitio (p.ej. los del servidor local).
+    """
+    NewsSpider = importar_script("1-web-scrapping.py").NewsSpider
+
+    class NewsSpiderStreaming(NewsSpider):
+        custom_settings = {**NewsSpider.custom_settings, "SCRAPER_SLOT_MAX_ACTIVE_SIZE": MAXIMO_SIN_PROCESAR,
+                           **(settings or {})}
+        allowed_domains = tuple(dominios) if dominios else NewsSpider.allowed_domains
+
+        async def parse_response(self, response):
+            descargada = time.perf_counter()
+            if self.page_count > self.max_pages:
+                self.crawler.engine.close_spider(self, f"Alcanzado límite de {self.max_pages} páginas ")
+                return
+            html_content, descarga_cortada = self.decodificar(response)
+            motivo = self.motivo_omision(html_content, descarga_cortada)
+            if motivo is not None:
+                self.registro.contar(motivo)
+                estadisticas.registrar(0, time.perf_counter() - descargada, descartadas=1)
+                return
+            self.page_count += 1
+            trabajo = time.perf_counter() - descargada
+            await cola.poner({"url": response.url, "html": html_content, "descargada": descargada})
+            estadisticas.registrar(1, trabajo, time.perf_counter() - descargada - trabajo)
+
+    return NewsSpiderStreaming
+
+
+def _extraer(entrada: ColaConContrapresion, salida: queue.Queue, estadisticas: EstadisticasEtapa,
+             errores: List[BaseException], detener: Callable[[], None]):
+    """
+    Worker de extraccion: html -> titulo, fecha y texto de la nota.
+    :param errores: Adonde agregar la excepcion si falla.
+    :param detener: Pide cerrar el crawl (se llama si falla).
+    """
+    try:
+        script = importar_script("2-html-a-dataframe.py")
+        while True:
+            nota = entrada.sacar()
+            if nota is _FIN:
+                salida.put(_FIN)
+                return
+            inicio = time.perf_counter()
+            datos = script.extraer_datos_nota(nota.pop("html"))
+            trabajo = time.perf_counter() - inicio
+            if datos is None or not datos[2]:
+                estadisticas.registrar(0, trabajo, descartadas=1)
+                continue
+            nota["titulo"], nota["fecha"], nota["texto"] = datos
+            nota["id_nota"] = script.id_de_nota(nota["url"][nota["url"].rfind("/") + 1:])
+            salida.put(nota)
+            estadisticas.registrar(1, trabajo, time.perf_counter() - inicio - trabajo)
+    except Exception as e:
+        errores.append(e)
+        salida.put(_FIN)
+        detener()
+        # el crawl puede estar esperando lugar en la cola hasta que se cierre: vaciarla hasta el fin
+        while entrada.sacar() is not _FIN:
+            pass
+
+
+def _siguiente_lote(entrada: queue.Queue, tamanio_lote: int, espera_maxima: float, fines_pendientes: List[int]) -> List[Dict]:
+    """
+    Espera la 1ra nota y despues junta hasta tamanio_lote o hasta que pasen espera_maxima segundos.
+    :param fines_pendientes: [cantidad de workers de extraccion que no terminaron]; se descuenta al recibir _FIN.
+    """
+    lote, limite = [], None
+    while fines_pendientes[0] > 0 and len(lote) < tamanio_lote:
+        try:
+            nota = entrada.get(timeout=None if limite is None else max(limite - time.perf_counter(), 0))
+        except queue.Empty:
+            break
+        if nota is _FIN:
+            fines_pendientes[0] -= 1
+            continue
+        lote.append(nota)
+        if limite is None:
+            limite = time.perf_counter() + espera_maxima
+    return lote
+
+
+def _clasificar(entrada: queue.Queue, modelo, clases: Sequence[str], archivo_salida: str, hilos_extraccion: int,
+                estadisticas: EstadisticasEtapa, latencias: List[float], errores: List[BaseException],
+                detener: Callable[[], None], tamanio_lote: int = TAMANIO_LOTE,
+                espera_maxima: float = ESPERA_MAXIMA_LOTE):
+    """
+    Clasifica de a lotes y agrega 1 linea JSON por nota al archivo de salida.
+    :param errores: Adonde agregar la excepcion si falla.
+    :param detener: Pide cerrar el crawl (se llama si falla).
+    """
+    fines_pendientes = [hilos_extraccion]
+    try:
+        _clasificar_lotes(entrada, modelo, clases, archivo_salida, fines_pendientes, estadisticas, latencias,
+                          tamanio_lote, espera_maxima)
+    except Exception as e:
+        errores.append(e)
+        detener()
+        # los extractores pueden estar esperando lugar en la cola: vaciarla hasta el fin de todos
+        while fines_pendientes[0] > 0:
+            if entrada.get() is _FIN:
+                fines_pendientes[0] -= 1
+
+
+def _clasificar_lotes(entrada: queue.Queue, modelo, clases: Sequence[str], archivo_salida: str,
+                      fines_pendientes: List[int], estadisticas: EstadisticasEtapa, latencias: List[float],
+                      tamanio_lote: int, espera_maxima: float):
+    with open(archivo_salida, "a", encoding="utf-8") as salida:
+        while True:
+            lote = _siguiente_lote(entrada, tamanio_lote, espera_maxima, fines_pendientes)
+            if not lote:
+                return
+            inicio = time.perf_counter()
+            textos = [nota["texto"] for nota in lote]
+            if hasattr(modelo, "predict_proba"):
+                probabilidades = modelo.predict_proba(textos)
+                indices = probabilidades.argmax(axis=1)
+                predichas = np.asarray(modelo.classes_)[indices]
+                confianzas = probabilidades[np.arange(len(lote)), indices]
+            else:
+                predichas, confianzas = modelo.predict(textos), [None] * len(lote)
+            for nota, predicha, confianza in zip(lote, predichas, confianzas):
+                # el pipeline de 5- se entrena con las clases codificadas por el LabelEncoder
+                seccion = clases[int(predicha)] if np.issubdtype(type(predicha), np.integer) else str(predicha)
+                salida.write(json.dumps({"id_nota": nota["id_nota"], "url": nota["url"], "titulo": nota["titulo"],
+                                         "fecha": nota["fecha"], "seccion_predicha": seccion,
+                                         "probabilidad": None if confianza is None else round(float(confianza), 4)},
+                                        ensure_ascii=False) + "\n")
+            salida.flush()
+            fin = time.perf_counter()
+            latencias.extend(fin - nota["descargada"] for nota in lote)
+            estadisticas.registrar(len(lote), fin - inicio)
+
+
+def correr_pipeline(start_urls: List[str], modelo, clases: Sequence[str], archivo_salida: str = ARCHIVO_SALIDA,
+                    capacidad: int = CAPACIDAD_COLA, hilos_extraccion: int = HILOS_EXTRACCION,
+                    tamanio_lote: int = TAMANIO_LOTE, espera_maxima: float = ESPERA_MAXIMA_LOTE,
+                    max_paginas: int = 10 ** 9, dir_guardadas: Optional[str] = None, settings: Optional[Dict] = None,
+                    dominios: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Corre el crawl desde start_urls (paginas de indice) con las 3 etapas en paralelo, hasta que termina el crawl
+    y se vacian las colas. Si falla la extraccion o la clasificacion, se cierra el crawl y se lanza ese error.
+    :param dir_guardadas: Directorio con notas ya guardadas, para no volver a pedir sus IDs.
+    :return: Estadisticas por etapa, de las colas y de latencia.
+    """
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    cola_html = ColaConContrapresion(capacidad)
+    cola_notas = queue.Queue(capacidad)
+    estadisticas = {nombre: EstadisticasEtapa(nombre) for nombre in ("crawl", "extraccion", "clasificacion")}
+    latencias: List[float] = []
+    errores: List[BaseException] = []
+
+    resultado = {}
+
+    def spider_closed(spider, reason):
+        resultado["razon"] = reason
+        resultado["contadores_spider"] = dict(spider.registro.contadores)
+
+    spider_cls = crear_spider_streaming(cola_html, estadisticas["crawl"], settings, dominios)
+    inicio = time.perf_counter()
+    with tempfile.TemporaryDirectory() as dir_vacio:
+        process = CrawlerProcess({"LOG_LEVEL": (settings or {}).get("LOG_LEVEL", "INFO")})
+        crawler = process.create_crawler(spider_cls)
+        crawler.signals.connect(spider_closed, signal=scrapy.signals.spider_closed)
+
+        def cerrar_crawl():
+            if crawler.engine is not None and crawler.engine.running:
+                crawler.engine.close_spider(crawler.spider, "error_en_pipeline").addErrback(lambda _: None)
+
+        def detener():
+            # desde un worker: el cierre lo tiene que hacer el reactor
+            from twisted.internet import reactor
+            reactor.callFromThread(cerrar_crawl)
+
+        extractores = [threading.Thread(target=_extraer, daemon=True,
+                                        args=(cola_html, cola_notas, estadisticas["extraccion"], errores, detener))
+                       for _ in range(hilos_extraccion)]
+        clasificador = threading.Thread(target=_clasificar, daemon=True,
+                                        args=(cola_notas, modelo, clases, archivo_salida, hilos_extraccion,
+                                              estadisticas["clasificacion"], latencias, errores, detener,
+                                              tamanio_lote, espera_maxima))
+        for hilo in extractores + [clasificador]:
+            hilo.start()
+        process.crawl(crawler, save_pages_in_dir=dir_guardadas or dir_vacio, start_urls=start_urls, max_pages=max_paginas)
+        with registro.etapa("streaming"):
+            process.start()
+            # el crawl termino: vaciar las colas
+            for _ in extractores:
+                cola_html.poner_y_esperar(_FIN)
+            for hilo in extractores + [clasificador]:
+                hilo.join()
+    segundos = time.perf_counter() - inicio
+    if errores:
+        registro.evento("streaming_error", error=repr(errores[0]), razon=resultado.get("razon"))
+        raise errores[0]
+
+    resultado.update({
+        "segundos": round(segundos, 3),
+        "notas_clasificadas": estadisticas["clasificacion"].notas,
+        "notas_por_segundo": round(estadisticas["clasificacion"].notas / segundos, 2) if segundos > 0 else None,
+        "etapas": [e.como_dict() for e in estadisticas.values()],
+        "cola_html": {"capacidad": capacidad, "maximo": cola_html.maximo, "esperas_del_crawler": cola_html.esperas},
+        "latencia_segundos": ({"p50": round(float(np.percentile(latencias, 50)), 3),
+                               "p95": round(float(np.percentile(latencias, 95)), 3),
+                               "max": round(float(np.max(latencias)), 3)} if latencias else None),
+        "respuestas": crawler.stats.get_value("response_received_count", 0),
+    })
+    registro.evento("streaming", **resultado)
+    return resultado
+
+
+def entrenar_pipeline_fixture(dir_paginas: str):
+    """
+    Entrena el pipeline de 5-entrenar_y_guardar_modelo_pipeline.py con el texto de las notas de dir_paginas, para
+    probar sin un modelo guardado.
+    :return: (pipeline, clases)
+    """
+    from sklearn.preprocessing import LabelEncoder
+    from benchmark_pipeline import listar_corpus
+
+    script = importar_script("2-html-a-dataframe.py")
+    textos, secciones = [], []
+    for path, seccion in zip(*listar_corpus(dir_paginas)):
+        datos = script.extraer_datos_nota(script.leer_archivo(str(path)))
+        if datos is not None and datos[2]:
+            textos.append(datos[2])
+            secciones.append(seccion)
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(secciones)
+    pipeline = importar_script("5-entrenar_y_guardar_modelo_pipeline.py").construir_pipeline()
+    return pipeline.fit(textos, y), list(label_encoder.classes_)
+
+
+def imprimir_resultado(resultado: Dict):
+    print(f"\n[OK] {resultado['notas_clasificadas']} notas clasificadas en {resultado['segundos']}s "
+          f"({resultado['notas_por_segundo']} notas/s, {resultado['respuestas']} respuestas)")
+    print(f"{'etapa':<15}{'notas':>7}{'descart.':>10}{'seg trabajo':>13}{'notas/s':>10}{'seg espera cola':>17}")
+    for etapa in resultado["etapas"]:
+        print(f"{etapa['etapa']:<15}{etapa['notas']:>7}{etapa['descartadas']:>10}{etapa['segundos_trabajo']:>13.3f}"
+              f"{etapa['notas_por_segundo'] or 0:>10.2f}{etapa['segundos_esperando_cola']:>17.3f}")
+    print(f"Cola de html: {resultado['cola_html']}")
+    print(f"Latencia descarga -> prediccion escrita: {resultado['latencia_segundos']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl -> extraccion -> clasificacion en streaming")
+    parser.add_argument("--modelo", help="Pipeline guardado por 5-entrenar_y_guardar_modelo_pipeline.py")
+    parser.add_argument("--label-encoder", help="LabelEncoder guardado por 5-entrenar_y_guardar_modelo_pipeline.py")
+    parser.add_argument("--secciones", nargs="+", default=SECCIONES, help="Secciones a recorrer (default: todas)")
+    parser.add_argument("--paginas-indice", type=int, default=PAGINAS_INDICE,
+                        help=f"Paginas de indice por seccion (default: {PAGINAS_INDICE})")
+    parser.add_argument("--salida", default=ARCHIVO_SALIDA, help=f"Archivo JSON-lines de predicciones (default: {ARCHIVO_SALIDA})")
+    parser.add_argument("--guardadas", help="Directorio con las notas ya guardadas, para no volver a pedirlas")
+    parser.add_argument("--capacidad", type=int, default=CAPACIDAD_COLA, help=f"Notas por cola (default: {CAPACIDAD_COLA})")
+    parser.add_argument("--hilos", type=int, default=HILOS_EXTRACCION, help=f"Threads de extraccion (default: {HILOS_EXTRACCION})")
+    parser.add_argument("--lote", type=int, default=TAMANIO_LOTE, help=f"Notas por lote del clasificador (default: {TAMANIO_LOTE})")
+    parser.add_argument("--fixture", action="store_true",
+                        help="Crawlear servidor_fixture.py con ./paginas (y entrenar ahi el pipeline si no hay --modelo)")
+    parser.add_argument("--paginas", default="./paginas", help="Directorio del fixture (default: ./paginas)")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia del servidor del fixture (default: 0)")
+    args = parser.parse_args()
+
+    import joblib
+
+    if args.modelo:
+        modelo = joblib.load(args.modelo)
+        clases = list(joblib.load(args.label_encoder).classes_) if args.label_encoder else list(modelo.classes_)
+    elif args.fixture:
+        print(f"[INFO] Entrenando el pipeline con las notas de {args.paginas}...")
+        modelo, clases = entrenar_pipeline_fixture(args.paginas)
+    else:
+        parser.error("falta --modelo (o --fixture)")
+
+    if not args.fixture:
+        start_urls = [f"{URL_BASE}/secciones/{seccion}?page={pagina}"
+                      for seccion in args.secciones for pagina in range(1, args.paginas_indice + 1)]
+        resultado = correr_pipeline(start_urls, modelo, clases, args.salida, args.capacidad, args.hilos, args.lote,
+                                    dir_guardadas=args.guardadas)
+    else:
+        from servidor_fixture import ServidorFixture
+
+        with ServidorFixture(args.paginas, latencia=args.latencia) as servidor:
+            secciones = [s for s in args.secciones if s in servidor.corpus.secciones]
+            start_urls = [servidor.url_indice(seccion, pagina)
+                          for seccion in secciones for pagina in range(1, args.paginas_indice + 1)]
+            resultado = correr_pipeline(start_urls, modelo, clases, args.salida, args.capacidad, args.hilos, args.lote,
+                                        dir_guardadas=args.guardadas, dominios=("127.0.0.1", "localhost"),
+                                        settings={"DOWNLOAD_DELAY": 0, "LOG_LEVEL": "WARNING",
+                                                  "CONCURRENT_REQUESTS_PER_DOMAIN": 8, "ADAPTATIVO_ENABLED": False})
+    imprimir_resultado(resultado)
+    print(f"[OK] Predicciones agregadas a {args.salida}")
+    registro.resumen()
+
+
+if __name__ == "__main__":
+    main()
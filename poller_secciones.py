@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+Deteccion de notas nuevas casi en tiempo real, consultando solo la 1ra pagina del indice de cada seccion.
+
+En vez de volver a correr el crawl paginado de 1-web-scrapping.py desde page=1, un proceso (daemon) consulta
+periodicamente la portada de cada seccion:
+- pedido condicional (If-None-Match / If-Modified-Since con los validadores de la consulta anterior): si el indice
+  no cambio el servidor responde 304 sin cuerpo;
+- los IDs de las notas linkeadas se comparan con los ya guardados (los archivos de paginas/<seccion>, como en
+  NewsSpider.filtrar_links_guardados) y con los ya encolados; solo las nuevas se encolan para descargar. Si todas
+  las notas de la pagina son nuevas (se publicaron mas de 1 pagina desde la consulta anterior) se pide la pagina
+  siguiente, hasta PAGINAS_MAXIMAS;
+- el intervalo de cada seccion se adapta a su ritmo de publicacion: se estima la tasa de notas nuevas por segundo
+  (promedio exponencial) y se consulta cada NUEVAS_POR_CONSULTA / tasa segundos, entre INTERVALO_MINIMO e
+  INTERVALO_MAXIMO; si no aparece nada, el intervalo se duplica.
+Un thread descarga las notas encoladas y las guarda en paginas/<seccion>/, salteando las de paywall o de autor.
+
+Los validadores y el intervalo y la tasa de cada seccion se guardan en ARCHIVO_ESTADO, asi al reiniciar el daemon
+sigue con el ritmo que ya aprendio.
+
+Con --fixture corre contra servidor_fixture.py, escondiendo las notas mas nuevas de cada seccion y "publicandolas"
+de a 1 con ritmos distintos por seccion, y compara la cantidad de pedidos contra volver a crawlear los indices.
+
+Ejemplos:
+    python poller_secciones.py                                  # daemon contra el sitio (Ctrl+C para terminar)
+    python poller_secciones.py --una-vez --sin-descargar        # 1 consulta por seccion, solo lista las nuevas
+    python poller_secciones.py --fixture --duracion 60
+"""
+import argparse
+import heapq
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+SECCIONES = ['el-mundo', 'el-pais', 'economia', 'sociedad']
+URL_BASE = 'http://www.pagina12.com.ar'
+DIR_PAGINAS = "./paginas"
+ARCHIVO_ESTADO = "poller_estado.json"
+# segundos entre consultas de 1 seccion
+INTERVALO_INICIAL = 120.0
+INTERVALO_MINIMO = 30.0
+INTERVALO_MAXIMO = 1800.0
+# notas nuevas que se espera encontrar en cada consulta: menos es consultar de mas, mas es detectar tarde
+NUEVAS_POR_CONSULTA = 1.0
+# peso de la ultima observacion en el promedio exponencial de la tasa de publicacion
+SUAVIZADO = 0.3
+PAGINAS_MAXIMAS = 3
+TIMEOUT = 30
+# mismo user agent que NewsSpider (1-web-scrapping.py)
+USER_AGENT = ('Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) '
+              'AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148')
+# los mismos que corta fetch_eficiente.CorteTempranoExtension
+MARCADORES_OMISION = ['<div class="paywall-inner-text">', '<div class="author-hero">']
+
+# link a una nota en un indice: .../<id de 6+ digitos>-<slug>, como la regla de NewsSpider
+regex_link_nota = re.compile(r'href="([^"#?]*?/(\d{6,})-[^"/#?]+)"')
+# ID de la nota al comienzo del nombre de archivo
+regex_id_nota = re.compile(r'(\d{6,})-')
+
+
+def ids_guardados(dir_paginas: str = DIR_PAGINAS) -> Set[str]:
+    """
+    :return: Los IDs de las notas ya guardadas en dir_paginas/<seccion>/.
+    """
+    ids = set()
+    if os.path.isdir(dir_paginas):
+        for _, _, archivos in os.walk(dir_paginas):
+            for nombre in archivos:
+                m = regex_id_nota.match(nombre)
+                if m:
+                    ids.add(m.group(1))
+    return ids
+
+
+def links_de_notas(html: str, url_base: str) -> List[Dict[str, str]]:
+    """
+    :return: [{"id", "url"}] de las notas linkeadas en una pagina de indice, sin repetir y en orden.
+    """
+    links, vistos = [], set()
+    for ruta, id_nota in regex_link_nota.findall(html):
+        if id_nota not in vistos:
+            vistos.add(id_nota)
+            links.append({"id": id_nota, "url": urllib.request.urljoin(url_base, ruta)})
+    return links
+
+
+def guardar_nota(dir_paginas: str, seccion: str, url: str, html: str) -> Path:
+    """
+    Guarda el html de una nota en dir_paginas/<seccion>/ con el mismo nombre de archivo que NewsSpider.
+    :return: La ruta del archivo guardado.
+    """
+    directorio = Path(dir_paginas) / seccion
+    directorio.mkdir(parents=True, exist_ok=True)
+    nombre = urllib.request.quote(url[url.rfind("/") + 1:])
+    ruta = directorio / (nombre if nombre.endswith(".html") else nombre + ".html")
+    ruta.write_text(html, encoding="utf-8")
+    return ruta
+
+
+class EstadoSeccion:
+    """
+    Lo que el poller sabe de 1 seccion: cada cuanto consultarla y los validadores HTTP de su indice.
+    """
+
+    def __init__(self, seccion: str, intervalo: float = INTERVALO_INICIAL, tasa: Optional[float] = None,
+                 validadores: Optional[Dict[str, Dict[str, str]]] = None):
+        self.seccion = seccion
+        self.intervalo = intervalo
+        # notas nuevas por segundo (promedio exponencial); None hasta la 2da consulta
+        self.tasa = tasa
+        # url -> {"etag", "last_modified"}
+        self.validadores = validadores or {}
+        self.ultima_consulta: Optional[float] = None
+
+    def como_dict(self) -> Dict:
+        return {"intervalo": self.intervalo, "tasa": self.tasa, "validadores": self.validadores}
+
+
+class PollerSecciones:
+    """
+    Consulta la portada de cada seccion cuando le toca y encola las notas nuevas.
+    """
+
+    def __init__(self, url_indice: Callable[[str, int], str], secciones: List[str], ids_conocidos: Set[str],
+                 cola: queue.Queue, archivo_estado: Optional[str] = ARCHIVO_ESTADO,
+                 intervalo_minimo: float = INTERVALO_MINIMO, intervalo_maximo: float = INTERVALO_MAXIMO,
+                 intervalo_inicial: float = INTERVALO_INICIAL):
+        """
+        :param url_indice: (seccion, numero de pagina) -> url de esa pagina del indice.
+        :param ids_conocidos: IDs ya guardados; se le agregan los que se van encolando.
+        :param cola: Adonde se encolan las notas nuevas, como {"id", "url", "seccion", "detectada"}.
+        :param archivo_estado: JSON con el estado de las secciones, o None para no guardarlo.
+        """
+        self.url_indice = url_indice
+        self.ids_conocidos = ids_conocidos
+        self.cola = cola
+        self.archivo_estado = archivo_estado
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_maximo = intervalo_maximo
+        guardado = {}
+        if archivo_estado and os.path.exists(archivo_estado):
+            with open(archivo_estado, encoding="utf-8") as f:
+                guardado = json.load(f)
+        self.estados = {seccion: EstadoSeccion(seccion, **guardado.get(seccion, {"intervalo": intervalo_inicial}))
+                        for seccion in secciones}
+        self.estadisticas = {"consultas": 0, "pedidos": 0, "no_modificadas": 0, "bytes": 0, "errores": 0, "nuevas": 0}
+        # ID de nota -> momento (time.time()) en que se detecto
+        self.detectadas: Dict[str, float] = {}
+
+    def _pedir(self, url: str, estado: EstadoSeccion) -> Optional[str]:
+        """
+        Pedido condicional con los validadores guardados de la url.
+        :return: El html, o None si no cambio (304) o hubo un error.
+        """
+        headers = {"User-Agent": USER_AGENT}
+        validadores = estado.validadores.get(url, {})
+        if validadores.get("etag"):
+            headers["If-None-Match"] = validadores["etag"]
+        if validadores.get("last_modified"):
+            headers["If-Modified-Since"] = validadores["last_modified"]
+        self.estadisticas["pedidos"] += 1
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=TIMEOUT) as respuesta:
+                cuerpo = respuesta.read()
+                estado.validadores[url] = {"etag": respuesta.headers.get("ETag"),
+                                           "last_modified": respuesta.headers.get("Last-Modified")}
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                self.estadisticas["no_modificadas"] += 1
+            else:
+                self.estadisticas["errores"] += 1
+                print(f"[ERROR] {url}: HTTP {e.code}")
+            return None
+        except (urllib.error.URLError, TimeoutError) as e:
+            self.estadisticas["errores"] += 1
+            print(f"[ERROR] {url}: {e}")
+            return None
+        self.estadisticas["bytes"] += len(cuerpo)
+        return cuerpo.decode("utf-8", errors="ignore")
+
+    def consultar(self, seccion: str) -> int:
+        """
+        Consulta la portada de la seccion (y las paginas siguientes mientras todas sus notas sean nuevas),
+        encola las notas nuevas y ajusta el intervalo de la seccion.
+        :return: La cantidad de notas nuevas encoladas.
+        """
+        estado = self.estados[seccion]
+        ahora = time.time()
+        self.estadisticas["consultas"] += 1
+        nuevas = 0
+        for pagina in range(1, PAGINAS_MAXIMAS + 1):
+            url = self.url_indice(seccion, pagina)
+            # las paginas siguientes se piden sin condicion: se piden justamente porque la portada cambio
+            html = self._pedir(url, estado if pagina == 1 else EstadoSeccion(seccion))
+            if html is None:
+                break
+            links = links_de_notas(html, url)
+            nuevas_pagina = [link for link in links if link["id"] not in self.ids_conocidos]
+            for link in nuevas_pagina:
+                self.ids_conocidos.add(link["id"])
+                self.detectadas[link["id"]] = time.time()
+                self.cola.put({**link, "seccion": seccion, "detectada": self.detectadas[link["id"]]})
+            nuevas += len(nuevas_pagina)
+            if not links or len(nuevas_pagina) < len(links):
+                break
+        self.estadisticas["nuevas"] += nuevas
+        if estado.ultima_consulta is not None:
+            self._ajustar_intervalo(estado, nuevas, ahora - estado.ultima_consulta)
+        estado.ultima_consulta = ahora
+        return nuevas
+
+    def _ajustar_intervalo(self, estado: EstadoSeccion, nuevas: int, segundos: float):
+        tasa_observada = nuevas / max(segundos, 1e-6)
+        estado.tasa = tasa_observada if estado.tasa is None else SUAVIZADO * tasa_observada + (1 - SUAVIZADO) * estado.tasa
+        intervalo = NUEVAS_POR_CONSULTA / estado.tasa if estado.tasa > 0 else estado.intervalo * 2
+        if nuevas == 0:
+            # sin novedades no acortar, aunque la tasa promedio todavia sea alta
+            intervalo = max(intervalo, estado.intervalo)
+        estado.intervalo = min(max(intervalo, self.intervalo_minimo), self.intervalo_maximo)
+
+    def guardar_estado(self):
+        if self.archivo_estado:
+            with open(self.archivo_estado, "w", encoding="utf-8") as f:
+                json.dump({seccion: estado.como_dict() for seccion, estado in self.estados.items()}, f, indent=1)
+
+    def correr(self, duracion: Optional[float] = None, una_vez: bool = False,
+               terminar: Optional[threading.Event] = None):
+        """
+        Consulta cada seccion cuando le toca, hasta que pasen "duracion" segundos (None: para siempre) o se
+        active "terminar". Con una_vez, consulta 1 vez cada seccion y termina.
+        """
+        terminar = terminar or threading.Event()
+        fin = None if duracion is None else time.monotonic() + duracion
+        # (cuando le toca, seccion); arrancan escalonadas para no pedir todas juntas
+        agenda = [(time.monotonic() + i * 0.5, seccion) for i, seccion in enumerate(self.estados)]
+        heapq.heapify(agenda)
+        try:
+            while agenda and not terminar.is_set():
+                cuando, seccion = heapq.heappop(agenda)
+                if fin is not None and cuando > fin:
+                    break
+                if terminar.wait(max(cuando - time.monotonic(), 0)):
+                    break
+                nuevas = self.consultar(seccion)
+                estado = self.estados[seccion]
+                print(f"[INFO] {seccion}: {nuevas} notas nuevas; proxima consulta en {estado.intervalo:.0f}s")
+                if not una_vez:
+                    heapq.heappush(agenda, (time.monotonic() + estado.intervalo, seccion))
+        finally:
+            self.guardar_estado()
+
+
+class DescargadorNotas(threading.Thread):
+    """
+    Descarga las notas encoladas por el poller y las guarda en dir_paginas/<seccion>/, como NewsSpider.
+    """
+
+    def __init__(self, cola: queue.Queue, dir_paginas: str = DIR_PAGINAS):
+        super().__init__(daemon=True)
+        self.cola = cola
+        self.dir_paginas = dir_paginas
+        self.estadisticas = {"guardadas": 0, "omitidas": 0, "errores": 0, "pedidos": 0, "bytes": 0}
+        # segundos desde que se detecto cada nota hasta que quedo guardada
+        self.demoras: List[float] = []
+
+    def run(self):
+        while True:
+            nota = self.cola.get()
+            if nota is None:
+                return
+            self.estadisticas["pedidos"] += 1
+            try:
+                request = urllib.request.Request(nota["url"], headers={"User-Agent": USER_AGENT})
+                with urllib.request.urlopen(request, timeout=TIMEOUT) as respuesta:
+                    cuerpo = respuesta.read()
+            except (urllib.error.URLError, TimeoutError) as e:
+                self.estadisticas["errores"] += 1
+                print(f"[ERROR] {nota['url']}: {e}")
+                continue
+            self.estadisticas["bytes"] += len(cuerpo)
+            html = cuerpo.decode("utf-8", errors="ignore")
+            if any(marcador in html for marcador in MARCADORES_OMISION):
+                self.estadisticas["omitidas"] += 1
+                continue
+            guardar_nota(self.dir_paginas, nota["seccion"], nota["url"], html)
+            self.estadisticas["guardadas"] += 1
+            self.demoras.append(time.time() - nota["detectada"])
+
+
+def simular_publicaciones(servidor, escondidas_por_seccion: int, segundos_entre_notas: Dict[str, float],
+                          terminar: threading.Event, publicadas: Dict[str, float]):
+    """
+    Esconde las notas mas nuevas de cada seccion del servidor de servidor_fixture.py y las vuelve a poner en la
+    portada de a 1, cada segundos_entre_notas[seccion] segundos (con variacion al azar).
+    :param publicadas: Se llena con ID de nota -> momento (time.time()) en que se publico.
+    """
+    pendientes = {}
+    for seccion, rutas in servidor.corpus.secciones.items():
+        pendientes[seccion] = rutas[:escondidas_por_seccion]
+        del rutas[:escondidas_por_seccion]
+    agenda = [(time.monotonic() + random.expovariate(1 / segundos_entre_notas[s]), s) for s in pendientes]
+    heapq.heapify(agenda)
+    while agenda and not terminar.is_set():
+        cuando, seccion = heapq.heappop(agenda)
+        if terminar.wait(max(cuando - time.monotonic(), 0)):
+            return
+        if pendientes[seccion]:
+            ruta = pendientes[seccion].pop()
+            servidor.corpus.secciones[seccion].insert(0, ruta)
+            publicadas[ruta[1:].split("-", 1)[0]] = time.time()
+            heapq.heappush(agenda, (time.monotonic() + random.expovariate(1 / segundos_entre_notas[seccion]), seccion))
+
+
+def demo_fixture(dir_paginas: str, duracion: float, descargar: bool = True, semilla: int = 0) -> Dict:
+    """
+    Corre el poller contra servidor_fixture.py mientras se "publican" notas con ritmos distintos por seccion.
+    :return: Estadisticas de pedidos y de demora de deteccion, y los pedidos que haria el crawl paginado.
+    """
+    import tempfile
+    from servidor_fixture import ServidorFixture
+
+    random.seed(semilla)
+    with ServidorFixture(dir_paginas) as servidor, tempfile.TemporaryDirectory() as dir_salida:
+        secciones = list(servidor.corpus.secciones)
+        # una seccion publica cada ~2s, la siguiente cada ~4s, ...
+        segundos_entre_notas = {s: 2.0 * 2 ** i for i, s in enumerate(secciones)}
+        terminar = threading.Event()
+        publicadas: Dict[str, float] = {}
+        simulador = threading.Thread(target=simular_publicaciones, daemon=True,
+                                     args=(servidor, 10, segundos_entre_notas, terminar, publicadas))
+        # lo que sigue en el indice es lo "ya guardado"; el simulador saca las notas escondidas antes de arrancar
+        simulador.start()
+        time.sleep(0.1)
+        ids_conocidos = {ruta[1:].split("-", 1)[0] for rutas in servidor.corpus.secciones.values() for ruta in rutas}
+        cola = queue.Queue()
+        poller = PollerSecciones(servidor.url_indice, secciones, ids_conocidos, cola, archivo_estado=None,
+                                 intervalo_minimo=1.0, intervalo_maximo=30.0, intervalo_inicial=5.0)
+        descargador = DescargadorNotas(cola, dir_salida)
+        if descargar:
+            descargador.start()
+        poller.correr(duracion=duracion)
+        terminar.set()
+        if descargar:
+            cola.put(None)
+            descargador.join()
+        detecciones = poller.detectadas
+        demoras = sorted(detecciones[i] - publicadas[i] for i in detecciones if i in publicadas)
+        # el crawl paginado pide en cada corrida todas las paginas de indice de todas las secciones
+        paginas_indice = sum(servidor.corpus.cantidad_paginas_indice(s) for s in secciones)
+    return {
+        "segundos": duracion,
+        "publicadas": len(publicadas),
+        "detectadas": len(detecciones),
+        "demora_deteccion_p50": round(demoras[len(demoras) // 2], 2) if demoras else None,
+        "demora_deteccion_max": round(demoras[-1], 2) if demoras else None,
+        "poller": poller.estadisticas,
+        "intervalos_finales": {s: round(e.intervalo, 1) for s, e in poller.estados.items()},
+        "segundos_entre_notas": segundos_entre_notas,
+        "descargas": descargador.estadisticas,
+        "pedidos_por_nota_nueva": round(poller.estadisticas["pedidos"] / max(len(detecciones), 1), 2),
+        "pedidos_indice_crawl_paginado_por_corrida": paginas_indice,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta notas nuevas consultando la portada de cada seccion")
+    parser.add_argument("--secciones", nargs="+", default=SECCIONES, help="Secciones a consultar (default: todas)")
+    parser.add_argument("--paginas", default=DIR_PAGINAS, help=f"Directorio de las notas guardadas (default: {DIR_PAGINAS})")
+    parser.add_argument("--estado", default=ARCHIVO_ESTADO, help=f"Archivo de estado (default: {ARCHIVO_ESTADO})")
+    parser.add_argument("--duracion", type=float, help="Segundos a correr (default: para siempre)")
+    parser.add_argument("--una-vez", action="store_true", help="Consultar 1 vez cada seccion y terminar")
+    parser.add_argument("--sin-descargar", action="store_true", help="Solo listar las notas nuevas, sin descargarlas")
+    parser.add_argument("--fixture", action="store_true", help="Simular publicaciones en servidor_fixture.py")
+    args = parser.parse_args()
+
+    if args.fixture:
+        resultado = demo_fixture(args.paginas, args.duracion or 60, descargar=not args.sin_descargar)
+        print(json.dumps(resultado, indent=1, ensure_ascii=False))
+        return
+
+    cola = queue.Queue()
+    ids_conocidos = ids_guardados(args.paginas)
+    print(f"[INFO] {len(ids_conocidos)} notas ya guardadas en {args.paginas}")
+    poller = PollerSecciones(lambda seccion, pagina: f"{URL_BASE}/secciones/{seccion}?page={pagina}",
+                             args.secciones, ids_conocidos, cola, archivo_estado=args.estado)
+    descargador = DescargadorNotas(cola, args.paginas)
+    if not args.sin_descargar:
+        descargador.start()
+    try:
+        poller.correr(duracion=args.duracion, una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        print("[INFO] Terminando...")
+    if args.sin_descargar:
+        while not cola.empty():
+            nota = cola.get()
+            print(f"  {nota['seccion']}: {nota['url']}")
+    else:
+        cola.put(None)
+        descargador.join()
+    print(f"[OK] Poller: {poller.estadisticas} | Descargas: {descargador.estadisticas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Ranking de features para seleccion y para imprimir las mas informativas: chi2, F de ANOVA, informacion mutua y
+log-odds por clase, todos juntos y para todas las features a la vez.
+
+Los 4 puntajes salen de 3 productos de matrices ralas con la matriz one-hot de las clases (clases x docs), que
+comparten los indices de X y solo cambian los valores: la suma de cada feature por clase, la suma de sus cuadrados
+y la cantidad de docs de cada clase que la tienen. De ahi:
+- chi2: el mismo de sklearn.feature_selection.chi2 (observado = suma por clase, esperado = suma total * P(clase)).
+- f_anova: el de sklearn.feature_selection.f_classif, con la varianza entre clases y dentro de cada clase.
+- info_mutua: informacion mutua (en nats) entre la clase y la presencia de la feature en el doc, lo mismo que
+  mutual_info_classif(X > 0, discrete_features=True) pero sin recorrer las columnas de a 1 ni densificar X.
+- log_odds: log-odds ratio suavizado de la presencia de la feature en la clase contra el resto, dividido por su
+  desvio (z-score); el puntaje de la feature es el de la clase donde es mas alto, y esa clase se informa.
+Features sin ningun valor (o con varianza 0) tienen puntaje 0 en vez de NaN.
+
+El top-k de cada puntaje se elige con argpartition (O(n)) y solo se ordenan las k elegidas. RankingFeatures junta
+los top-k de varios folds: cuantas veces entro cada feature al top, su posicion promedio (k + 1 en los folds en que
+no entro) y su puntaje promedio; el ranking final ordena por cantidad de folds y despues por posicion promedio, asi
+las primeras son las que se eligen siempre y no las que tuvieron un puntaje alto en 1 solo fold.
+
+Ejemplos:
+    python ranking_features.py                                  # CV de 5 folds con vectores/targets/features.joblib
+    python ranking_features.py --top 300 --folds 10 --salida ranking_features.csv
+    python ranking_features.py --benchmark --tamanios 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+VECTORS_FILE = "vectores.joblib"
+TARGETS_FILE = "targets.joblib"
+FEATURE_NAMES_FILE = "features.joblib"
+ARCHIVO_RANKING = "ranking_features.csv"
+PUNTAJES = ("chi2", "f_anova", "info_mutua", "log_odds")
+TOP_FEATURES = 150
+CANT_FOLDS = 5
+# suavizado (pseudo-docs) de las tablas de 2x2 del log-odds, para que una feature ausente de una clase no de infinito
+ALFA_LOG_ODDS = 0.5
+
+
+def estadisticas_por_clase(X, y: np.ndarray, n_clases: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Suma, suma de cuadrados y cantidad de docs con la feature, por clase, para todas las features a la vez.
+    :param X: Matriz docs x features (rala o densa).
+    :param y: Clase de cada doc, como enteros 0..n_clases - 1 (p.ej. de un LabelEncoder).
+    :param n_clases: Cantidad de clases; por defecto max(y) + 1 (un fold puede no tener todas).
+    :return: {"sumas", "cuadrados", "docs"} de forma (n_clases, n_features), y "n_por_clase".
+    """
+    X = sp.csr_matrix(X, dtype=np.float64)
+    X.eliminate_zeros()
+    y = np.asarray(y)
+    n_clases = int(y.max()) + 1 if n_clases is None else n_clases
+    n_docs = X.shape[0]
+    one_hot = sp.csr_matrix((np.ones(n_docs), (y, np.arange(n_docs))), shape=(n_clases, n_docs))
+
+    def por_clase(valores: np.ndarray) -> np.ndarray:
+        # misma estructura que X (sin copiar los indices), otros valores
+        return (one_hot @ sp.csr_matrix((valores, X.indices, X.indptr), shape=X.shape)).toarray()
+
+    return {"sumas": por_clase(X.data), "cuadrados": por_clase(X.data ** 2),
+            "docs": por_clase(np.ones_like(X.data)), "n_por_clase": np.bincount(y, minlength=n_clases)}
+
+
+def _sin_nan(valores: np.ndarray) -> np.ndarray:
+    return np.nan_to_num(valores, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def puntaje_chi2(estadisticas: Dict[str, np.ndarray]) -> np.ndarray:
+    observado = estadisticas["sumas"]
+    n_por_clase = estadisticas["n_por_clase"]
+    esperado = np.outer(n_por_clase / n_por_clase.sum(), observado.sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _sin_nan(((observado - esperado) ** 2 / esperado).sum(axis=0))
+
+
+def puntaje_f_anova(estadisticas: Dict[str, np.ndarray]) -> np.ndarray:
+    sumas, n_por_clase = estadisticas["sumas"], estadisticas["n_por_clase"]
+    n_docs, n_clases = n_por_clase.sum(), np.count_nonzero(n_por_clase)
+    correccion = sumas.sum(axis=0) ** 2 / n_docs
+    total = estadisticas["cuadrados"].sum(axis=0) - correccion
+    con_docs = n_por_clase > 0
+    entre_clases = (sumas[con_docs] ** 2 / n_por_clase[con_docs, None]).sum(axis=0) - correccion
+    dentro_clases = total - entre_clases
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _sin_nan((entre_clases / (n_clases - 1)) / (dentro_clases / (n_docs - n_clases)))
+
+
+def puntaje_info_mutua(estadisticas: Dict[str, np.ndarray]) -> np.ndarray:
+    con_feature = estadisticas["docs"]
+    n_por_clase = estadisticas["n_por_clase"][:, None].astype(np.float64)
+    n_docs = n_por_clase.sum()
+    docs_feature = con_feature.sum(axis=0)
+    info = np.zeros(con_feature.shape[1])
+    # celdas (clase, presente) y (clase, ausente) de la tabla de contingencia; 0 * log(0) = 0
+    for conjunta, marginal in ((con_feature, docs_feature), (n_por_clase - con_feature, n_docs - docs_feature)):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terminos = conjunta / n_docs * np.log(conjunta * n_docs / (n_por_clase * marginal))
+        info += np.where(conjunta > 0, terminos, 0.0).sum(axis=0)
+    return np.maximum(info, 0.0)
+
+
+def log_odds_por_clase(estadisticas: Dict[str, np.ndarray], alfa: float = ALFA_LOG_ODDS) -> np.ndarray:
+    """
+    :return: z-score del log-odds ratio de cada feature en cada clase contra el resto, (n_clases, n_features).
+    """
+    en_clase = estadisticas["docs"]
+    n_por_clase = estadisticas["n_por_clase"][:, None]
+    en_resto = en_clase.sum(axis=0) - en_clase
+    n_resto = n_por_clase.sum() - n_por_clase
+    celdas = (en_clase + alfa, n_por_clase - en_clase + alfa, en_resto + alfa, n_resto - en_resto + alfa)
+    log_odds = np.log(celdas[0] / celdas[1]) - np.log(celdas[2] / celdas[3])
+    return log_odds / np.sqrt(sum(1.0 / celda for celda in celdas))
+
+
+def puntajes_features(X, y: np.ndarray, n_clases: Optional[int] = None,
+                      puntajes: Sequence[str] = PUNTAJES) -> Dict[str, np.ndarray]:
+    """
+    Calcula los puntajes pedidos para todas las features, con 1 sola pasada de estadisticas_por_clase.
+    :return: {puntaje: array (n_features,)}; con "log_odds" tambien "clase_log_odds", la clase donde es maximo.
+    """
+    estadisticas = estadisticas_por_clase(X, y, n_clases)
+    resultado = {}
+    for nombre in puntajes:
+        if nombre == "chi2":
+            resultado[nombre] = puntaje_chi2(estadisticas)
+        elif nombre == "f_anova":
+            resultado[nombre] = puntaje_f_anova(estadisticas)
+        elif nombre == "info_mutua":
+            resultado[nombre] = puntaje_info_mutua(estadisticas)
+        elif nombre == "log_odds":
+            z = log_odds_por_clase(estadisticas)
+            resultado["clase_log_odds"] = z.argmax(axis=0)
+            resultado[nombre] = z.max(axis=0)
+        else:
+            raise ValueError(f"Puntaje desconocido: {nombre} (puntajes: {PUNTAJES})")
+    return resultado
+
+
+def top_k(puntajes: np.ndarray, k: int) -> np.ndarray:
+    """
+    :return: Los indices de los k puntajes mas altos, de mayor a menor (argpartition + ordenar solo esos k).
+    """
+    puntajes = np.asarray(puntajes).ravel()
+    k = len(puntajes) if k is None or k < 0 else min(k, len(puntajes))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    elegidos = np.argpartition(-puntajes, k - 1)[:k] if k < len(puntajes) else np.arange(k)
+    return elegidos[np.argsort(-puntajes[elegidos], kind="stable")]
+
+
+def imprimir_top(puntajes: np.ndarray, nombres_features: Sequence[str], k: int):
+    for i in top_k(puntajes, k):
+        print(nombres_features[i], '\t', float(puntajes[i]))
+
+
+class RankingFeatures:
+    """
+    Junta los puntajes de varios folds y arma un ranking estable de las features.
+    """
+
+    def __init__(self, n_features: int, n_clases: int, top: int = TOP_FEATURES, puntajes: Sequence[str] = PUNTAJES):
+        """
+        :param top: Cuantas features por puntaje entran al top de cada fold.
+        """
+        self.n_features = n_features
+        self.n_clases = n_clases
+        self.top = top
+        self.puntajes = list(puntajes)
+        self.folds = 0
+        self.veces_en_top = {p: np.zeros(n_features, dtype=np.int32) for p in self.puntajes}
+        self.suma_posiciones = {p: np.zeros(n_features) for p in self.puntajes}
+        self.suma_puntajes = {p: np.zeros(n_features) for p in self.puntajes}
+        self.votos_clase = np.zeros((n_clases, n_features), dtype=np.int32) if "log_odds" in self.puntajes else None
+
+    def agregar_fold(self, X, y: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Calcula los puntajes del fold y suma su top a los acumulados.
+        :return: Los puntajes del fold (ver puntajes_features).
+        """
+        puntajes = puntajes_features(X, y, self.n_clases, self.puntajes)
+        for nombre in self.puntajes:
+            elegidos = top_k(puntajes[nombre], self.top)
+            self.veces_en_top[nombre][elegidos] += 1
+            # top + 1 para todas, y las elegidas bajan a su posicion (1, 2, ...)
+            self.suma_posiciones[nombre] += self.top + 1
+            self.suma_posiciones[nombre][elegidos] -= self.top - np.arange(len(elegidos))
+            self.suma_puntajes[nombre] += puntajes[nombre]
+        if self.votos_clase is not None:
+            self.votos_clase[puntajes["clase_log_odds"], np.arange(self.n_features)] += 1
+        self.folds += 1
+        return puntajes
+
+    def ranking(self, puntaje: str, k: Optional[int] = None) -> np.ndarray:
+        """
+        :return: Los indices de las features que entraron al top en algun fold, por cantidad de folds (desc) y
+        posicion promedio (asc); las primeras k, o todas con k = None.
+        """
+        candidatas = np.flatnonzero(self.veces_en_top[puntaje])
+        orden = np.lexsort((self.suma_posiciones[puntaje][candidatas], -self.veces_en_top[puntaje][candidatas]))
+        return candidatas[orden][:k]
+
+    def reporte(self, nombres_features: Sequence[str], clases: Optional[Sequence[str]] = None,
+                k: Optional[int] = None) -> pd.DataFrame:
+        """
+        :param clases: Nombre de cada clase (p.ej. LabelEncoder.classes_), para la columna "clase".
+        :return: Una fila por (puntaje, feature) del ranking, con la clase donde mas pesa segun el log-odds.
+        """
+        filas = []
+        for nombre in self.puntajes:
+            for posicion, i in enumerate(self.ranking(nombre, k), start=1):
+                fila = {"puntaje": nombre, "posicion": posicion, "feature": nombres_features[i],
+                        "folds_en_top": int(self.veces_en_top[nombre][i]), "folds": self.folds,
+                        "posicion_promedio": self.suma_posiciones[nombre][i] / self.folds,
+                        "valor_promedio": self.suma_puntajes[nombre][i] / self.folds}
+                if self.votos_clase is not None:
+                    clase = int(self.votos_clase[:, i].argmax())
+                    fila["clase"] = clases[clase] if clases is not None else clase
+                filas.append(fila)
+        return pd.DataFrame(filas)
+
+    def escribir_reporte(self, archivo: str, nombres_features: Sequence[str],
+                         clases: Optional[Sequence[str]] = None, k: Optional[int] = None) -> pd.DataFrame:
+        reporte = self.reporte(nombres_features, clases, k)
+        reporte.to_csv(archivo, index=False)
+        return reporte
+
+
+def imprimir_ranking(ranking: RankingFeatures, nombres_features: Sequence[str], clases: Optional[Sequence[str]] = None,
+                     k: int = 20):
+    for nombre in ranking.puntajes:
+        print(f"\nTop {k} por {nombre} (folds en el top / {ranking.folds}, posicion promedio):")
+        for i in ranking.ranking(nombre, k):
+            clase = ""
+            if ranking.votos_clase is not None:
+                indice_clase = int(ranking.votos_clase[:, i].argmax())
+                clase = f"\t{clases[indice_clase] if clases is not None else indice_clase}"
+            print(f"  {nombres_features[i]}\t{ranking.veces_en_top[nombre][i]}"
+                  f"\t{ranking.suma_posiciones[nombre][i] / ranking.folds:.1f}{clase}")
+
+
+def matriz_sintetica(n_docs: int, n_features: int, n_clases: int = 4, terminos_por_doc: int = 200,
+                     semilla: int = 0):
+    """
+    Docs x features rala con frecuencias tipo Zipf y algunas features mas probables en cada clase.
+    """
+    rng = np.random.default_rng(semilla)
+    y = rng.integers(0, n_clases, n_docs)
+    probabilidades = 1.0 / np.arange(1, n_features + 1)
+    probabilidades /= probabilidades.sum()
+    columnas = rng.choice(n_features, size=n_docs * terminos_por_doc, p=probabilidades)
+    # 1 de cada 10 terminos sale de un bloque propio de la clase del doc
+    propias = rng.random(len(columnas)) < 0.1
+    clase_de_cada = np.repeat(y, terminos_por_doc)
+    columnas[propias] = (clase_de_cada[propias] * 97 + rng.integers(0, 50, propias.sum())) % n_features
+    filas = np.repeat(np.arange(n_docs), terminos_por_doc)
+    X = sp.csr_matrix((np.ones(len(columnas)), (filas, columnas)), shape=(n_docs, n_features))
+    X.sum_duplicates()
+    return X, y
+
+
+def benchmark(tamanios: Sequence[int], n_docs: int, top: int = TOP_FEATURES) -> List[Dict]:
+    """
+    Tiempo de los 4 puntajes + top-k, contra sklearn (chi2 y f_classif sobre la misma matriz).
+    """
+    from sklearn.feature_selection import chi2, f_classif
+
+    resultados = []
+    for n_features in tamanios:
+        X, y = matriz_sintetica(n_docs, n_features)
+        inicio = time.perf_counter()
+        puntajes = puntajes_features(X, y)
+        elegidos = {nombre: top_k(puntajes[nombre], top) for nombre in PUNTAJES}
+        segundos = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        chi2_sklearn = chi2(X, y)[0]
+        f_sklearn = f_classif(X, y)[0]
+        np.argsort(chi2_sklearn)[::-1][:top]
+        np.argsort(f_sklearn)[::-1][:top]
+        segundos_sklearn = time.perf_counter() - inicio
+        resultado = {"features": n_features, "docs": n_docs, "nnz": int(X.nnz), "segundos": round(segundos, 3),
+                     "segundos_sklearn_chi2_f": round(segundos_sklearn, 3),
+                     "top_chi2_igual_sklearn": bool(np.array_equal(np.sort(elegidos["chi2"]),
+                                                                   np.sort(top_k(_sin_nan(chi2_sklearn), top))))}
+        print(f"[INFO] {n_features} features, {X.nnz} no ceros: 4 puntajes + top-{top} en {segundos:.2f}s "
+              f"(sklearn chi2 + f_classif + argsort: {segundos_sklearn:.2f}s)")
+        resultados.append(resultado)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranking de features por chi2, F, info mutua y log-odds, con CV")
+    parser.add_argument("--vectores", default=VECTORS_FILE, help=f"Matriz de 2-html-a-dataframe.py (default: {VECTORS_FILE})")
+    parser.add_argument("--targets", default=TARGETS_FILE, help=f"Clase de cada nota (default: {TARGETS_FILE})")
+    parser.add_argument("--features", default=FEATURE_NAMES_FILE, help=f"Nombre de cada feature (default: {FEATURE_NAMES_FILE})")
+    parser.add_argument("--puntajes", nargs="+", default=list(PUNTAJES), choices=PUNTAJES, help="Puntajes a calcular (default: todos)")
+    parser.add_argument("--top", type=int, default=TOP_FEATURES, help=f"Features por puntaje en el top de cada fold (default: {TOP_FEATURES})")
+    parser.add_argument("--folds", type=int, default=CANT_FOLDS, help=f"Folds de la CV estratificada (default: {CANT_FOLDS})")
+    parser.add_argument("--salida", default=ARCHIVO_RANKING, help=f"Reporte CSV (default: {ARCHIVO_RANKING})")
+    parser.add_argument("--benchmark", action="store_true", help="Medir con matrices sinteticas en vez de leer el dataset")
+    parser.add_argument("--tamanios", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                        help="Cantidades de features del benchmark (default: 10000 100000 1000000)")
+    parser.add_argument("--docs", type=int, default=5000, help="Docs de las matrices del benchmark (default: 5000)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        resultados = benchmark(args.tamanios, args.docs, args.top)
+        print(json.dumps(resultados, indent=2))
+        return
+
+    import joblib
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.preprocessing import LabelEncoder
+
+    vectores = joblib.load(args.vectores)
+    label_encoder = LabelEncoder()
+    targets = label_encoder.fit_transform(joblib.load(args.targets))
+    nombres_features = joblib.load(args.features)
+    ranking = RankingFeatures(vectores.shape[1], len(label_encoder.classes_), args.top, args.puntajes)
+    inicio = time.perf_counter()
+    for train_index, _ in StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=0).split(vectores, targets):
+        ranking.agregar_fold(vectores[train_index], targets[train_index])
+    print(f"[INFO] {args.folds} folds x {vectores.shape[1]} features en {time.perf_counter() - inicio:.2f}s")
+    imprimir_ranking(ranking, nombres_features, label_encoder.classes_)
+    ranking.escribir_reporte(args.salida, nombres_features, label_encoder.classes_)
+    print(f"[OK] Ranking en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
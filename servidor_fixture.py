@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que sirve las notas guardadas en "paginas/" como si fuera el sitio de Pagina 12.
+Sirve para probar y medir el crawler sin depender del sitio real.
+
+Rutas:
+    /<id>-<slug>                      la nota "paginas/<seccion>/<id>-<slug>.html"
+    /secciones/<seccion>?page=N       indice de la seccion, con ARTICULOS_POR_PAGINA notas por pagina
+                                      (las mas nuevas primero, como en el sitio)
+    /sitemap.xml                      indice de sitemaps: 1 sitemap por seccion y mes de publicacion
+    /sitemaps/<seccion>-<AAAA-MM>.xml.gz
+                                      sitemap (comprimido con gzip) con las notas de ese mes, con su lastmod
+    /rss/secciones/<seccion>/notas    feed RSS con las ARTICULOS_RSS notas mas nuevas de la seccion
+
+Las secciones de secciones_sin_sitemap no aparecen en los sitemaps ni tienen feed (para probar la vuelta a los indices).
+
+Una fraccion configurable de las notas se sirve con el marcador de paywall o de pagina de autor,
+y se puede agregar latencia y errores (5xx, 429, cuelgues) para medir al crawler en condiciones reales.
+Las respuestas llevan ETag y Last-Modified, y los pedidos condicionales que no cambiaron se responden con 304.
+"""
+import argparse
+import datetime
+import email.utils
+import gzip
+import html
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DIR_PAGINAS = "./paginas"
+ARTICULOS_POR_PAGINA = 20
+# las respuestas se escriben de a pedazos, asi el cliente puede cortar la descarga a mitad de camino
+TAMANIO_CHUNK = 16 * 1024
+# los indices reales pesan ~150 KB; el relleno hace que los bytes transferidos sean comparables
+RELLENO_INDICE_KB = 100
+ARTICULOS_RSS = 20
+
+MARCADOR_PAYWALL = '<div class="paywall-inner-text">'
+MARCADOR_AUTOR = '<div class="author-hero">'
+
+regex_headline = re.compile(r'"@type":\s*"(?:NewsArticle|LiveBlogPosting)".*?"headline":\s*"((?:[^"\\]|\\.)*)"', re.DOTALL)
+regex_fecha = re.compile(r'"datePublished":\s*"([^"]+)"')
+regex_descripcion = re.compile(r'<meta name="description" content="([^"]*)"')
+regex_ruta_sitemap = re.compile(r'/sitemaps/(.+)-(\d{4}-\d{2})\.xml\.gz')
+regex_ruta_rss = re.compile(r'/rss/secciones/([^/]+)/notas')
+
+
+class CorpusFixture:
+    """
+    Indice en memoria de las notas guardadas, por seccion y por ruta URL.
+    """
+
+    def __init__(self, dir_paginas: str = DIR_PAGINAS, fraccion_paywall: float = 0.0, fraccion_autor: float = 0.0):
+        """
+        :param dir_paginas: Directorio con 1 subdirectorio por seccion.
+        :param fraccion_paywall: Fraccion de notas que se sirven con el marcador de paywall.
+        :param fraccion_autor: Fraccion de notas que se sirven con el marcador de pagina de autor.
+        """
+        self.dir_paginas = Path(dir_paginas)
+        self.fraccion_paywall = fraccion_paywall
+        self.fraccion_autor = fraccion_autor
+        # ruta URL ("/818236-el-mapa-de-la-informalidad") -> path del archivo html
+        self.notas: Dict[str, Path] = {}
+        # seccion -> lista de rutas URL de sus notas, ordenadas por ID descendente (como el sitio)
+        self.secciones: Dict[str, List[str]] = {}
+        for dir_seccion in sorted(d for d in self.dir_paginas.iterdir() if d.is_dir()):
+            rutas = []
+            for archivo in dir_seccion.glob("*.html"):
+                ruta = "/" + archivo.stem
+                self.notas[ruta] = archivo
+                rutas.append(ruta)
+            rutas.sort(key=lambda r: int(r[1:].split("-", 1)[0]), reverse=True)
+            self.secciones[dir_seccion.name] = rutas
+        self._cache_bytes: Dict[str, bytes] = {}
+        self._cache_metadatos: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def variante(self, ruta: str) -> str:
+        """
+        Decide (siempre igual para la misma ruta) si la nota se sirve normal, con paywall o como pagina de autor.
+        :return: "normal", "paywall" o "autor".
+        """
+        u = zlib.crc32(ruta.encode("utf-8")) / 2 ** 32
+        if u < self.fraccion_paywall:
+            return "paywall"
+        if u < self.fraccion_paywall + self.fraccion_autor:
+            return "autor"
+        return "normal"
+
+    def leer_nota(self, ruta: str) -> Optional[bytes]:
+        """
+        :param ruta: La ruta URL de la nota, p.ej. "/818236-el-mapa-de-la-informalidad".
+        :return: Los bytes del html de la nota (con el marcador de su variante), o None si no existe.
+        """
+        if ruta not in self.notas:
+            return None
+        with self._lock:
+            if ruta not in self._cache_bytes:
+                cuerpo = self.notas[ruta].read_bytes()
+                variante = self.variante(ruta)
+                if variante != "normal":
+                    # como en el sitio: el paywall reemplaza al texto de la nota, y el encabezado
+                    # de autor va al comienzo del <body>
+                    pos = cuerpo.find(b'<div class="article-main-content') if variante == "paywall" else -1
+                    if pos < 0:
+                        pos = cuerpo.find(b">", cuerpo.find(b"<body")) + 1
+                    marcador = MARCADOR_PAYWALL if variante == "paywall" else MARCADOR_AUTOR
+                    cuerpo = cuerpo[:pos] + marcador.encode("utf-8") + b"</div>" + cuerpo[pos:]
+                self._cache_bytes[ruta] = cuerpo
+            return self._cache_bytes[ruta]
+
+    def metadatos(self, ruta: str) -> Dict:
+        """
+        :return: {"titulo", "fecha", "bajada"} de la nota, tomados de su JSON-LD y meta description.
+        """
+        with self._lock:
+            if ruta not in self._cache_metadatos:
+                texto = self.notas[ruta].read_text(encoding="utf-8", errors="ignore")
+                m_titulo = regex_headline.search(texto)
+                m_fecha = regex_fecha.search(texto)
+                m_bajada = regex_descripcion.search(texto)
+                titulo = json.loads(f'"{m_titulo.group(1)}"') if m_titulo else ruta[1:]
+                self._cache_metadatos[ruta] = {
+                    "titulo": titulo,
+                    "fecha": m_fecha.group(1) if m_fecha else "",
+                    "bajada": html.unescape(m_bajada.group(1)) if m_bajada else "",
+                }
+            return self._cache_metadatos[ruta]
+
+    def fecha_modificacion(self, ruta: str) -> float:
+        """
+        :return: La fecha de modificacion (epoch) del archivo de la nota.
+        """
+        return self.notas[ruta].stat().st_mtime
+
+    def rutas_pagina_indice(self, seccion: str, numero: int, articulos_por_pagina: int = ARTICULOS_POR_PAGINA) -> List[str]:
+        desde = (max(numero, 1) - 1) * articulos_por_pagina
+        return self.secciones.get(seccion, [])[desde:desde + articulos_por_pagina]
+
+    def cantidad_paginas_indice(self, seccion: str, articulos_por_pagina: int = ARTICULOS_POR_PAGINA) -> int:
+        return -(-len(self.secciones.get(seccion, [])) // articulos_por_pagina)
+
+    def pagina_indice(self, seccion: str, numero: int, articulos_por_pagina: int = ARTICULOS_POR_PAGINA,
+                      relleno_kb: int = RELLENO_INDICE_KB) -> Optional[bytes]:
+        """
+        Genera el html de la pagina "numero" (desde 1) del indice de una seccion.
+        :return: Los bytes del html, o None si la seccion no existe. Paginas mas alla del final no tienen notas.
+        """
+        if seccion not in self.secciones:
+            return None
+        rutas = self.rutas_pagina_indice(seccion, numero, articulos_por_pagina)
+        tarjetas = []
+        for posicion, ruta in enumerate(rutas, start=1):
+            meta = self.metadatos(ruta)
+            tarjetas.append(
+                f'<article class="article-item" data-position="{posicion}">'
+                f'<div class="article-title "><a href="{ruta}">{html.escape(meta["titulo"])}'
+                f'<span class="title-prefix">{html.escape(meta["bajada"])}</span></a></div>'
+                f'<div class="article-date"><time datetime="{meta["fecha"]}">{meta["fecha"][:10]}</time></div>'
+                f'</article>'
+            )
+        navegacion = "".join(f'<a href="/secciones/{s}">{s}</a>' for s in self.secciones)
+        siguiente = f'<a class="next" href="/secciones/{seccion}?page={numero + 1}">Siguiente</a>' if rutas else ""
+        relleno = "<!-- " + "x" * (relleno_kb * 1024) + " -->" if relleno_kb > 0 else ""
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{seccion} | Página12</title></head>'
+            f'<body><nav>{navegacion}<a href="/tags/12858-informalidad">tag</a></nav>'
+            f'<main class="section-{seccion}">{"".join(tarjetas)}</main>'
+            f'<div class="pagination">{siguiente}</div>{relleno}</body></html>'
+        ).encode("utf-8")
+
+
+    def rutas_por_mes(self, seccion: str) -> Dict[str, List[str]]:
+        """
+        :return: mes de publicacion ("AAAA-MM") -> rutas de las notas de la seccion publicadas ese mes.
+        """
+        meses: Dict[str, List[str]] = {}
+        for ruta in self.secciones.get(seccion, []):
+            meses.setdefault(self.metadatos(ruta)["fecha"][:7] or "sin-fecha", []).append(ruta)
+        return meses
+
+    def sitemap_indice(self, url_base: str, secciones: Sequence[str]) -> bytes:
+        """
+        :return: El sitemapindex con 1 sitemap por seccion y mes, con la fecha de su nota mas nueva como lastmod.
+        """
+        entradas = []
+        for seccion in secciones:
+            for mes, rutas in sorted(self.rutas_por_mes(seccion).items()):
+                lastmod = max(self.metadatos(ruta)["fecha"] for ruta in rutas)
+                entradas.append(f'<sitemap><loc>{url_base}/sitemaps/{seccion}-{mes}.xml.gz</loc>'
+                                f'<lastmod>{lastmod}</lastmod></sitemap>')
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'{"".join(entradas)}</sitemapindex>').encode("utf-8")
+
+    def sitemap(self, url_base: str, seccion: str, mes: str) -> Optional[bytes]:
+        """
+        :return: El urlset de las notas de la seccion publicadas en el mes, comprimido con gzip, o None si no hay.
+        """
+        rutas = self.rutas_por_mes(seccion).get(mes)
+        if not rutas:
+            return None
+        entradas = "".join(f'<url><loc>{url_base}{ruta}</loc><lastmod>{self.metadatos(ruta)["fecha"]}</lastmod></url>'
+                           for ruta in rutas)
+        return gzip.compress(('<?xml version="1.0" encoding="UTF-8"?>'
+                              '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                              f'{entradas}</urlset>').encode("utf-8"), mtime=0)
+
+    def rss(self, url_base: str, seccion: str, cantidad: int = ARTICULOS_RSS) -> Optional[bytes]:
+        """
+        :return: El feed RSS 2.0 con las "cantidad" notas mas nuevas de la seccion, o None si la seccion no existe.
+        """
+        if seccion not in self.secciones:
+            return None
+        items = []
+        for ruta in self.secciones[seccion][:cantidad]:
+            meta = self.metadatos(ruta)
+            try:
+                fecha = email.utils.format_datetime(datetime.datetime.fromisoformat(meta["fecha"].replace("Z", "+00:00")))
+            except ValueError:
+                fecha = ""
+            items.append(f'<item><title>{html.escape(meta["titulo"])}</title><link>{url_base}{ruta}</link>'
+                         f'<pubDate>{fecha}</pubDate><description>{html.escape(meta["bajada"])}</description></item>')
+        return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f'<title>{seccion} | Página12</title><link>{url_base}/secciones/{seccion}</link>'
+                f'{"".join(items)}</channel></rss>').encode("utf-8")
+
+
+def validadores_http(cuerpo: bytes, ultima_modificacion: float) -> Tuple[str, str]:
+    """
+    :return: (ETag, Last-Modified) de una respuesta.
+    """
+    return f'"{zlib.crc32(cuerpo):08x}"', email.utils.formatdate(ultima_modificacion, usegmt=True)
+
+
+class EstadisticasServidor:
+    """
+    Contadores de lo que sirvio el servidor, para reportar en los benchmarks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.pedidos = 0
+            self.bytes_enviados = 0
+            self.por_status: Dict[int, int] = {}
+            self.por_tipo: Dict[str, int] = {}
+
+    def registrar(self, status: int, bytes_enviados: int, tipo: str):
+        with self._lock:
+            self.pedidos += 1
+            self.bytes_enviados += bytes_enviados
+            self.por_status[status] = self.por_status.get(status, 0) + 1
+            self.por_tipo[tipo] = self.por_tipo.get(tipo, 0) + 1
+
+    def como_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "pedidos": self.pedidos,
+                "bytes_enviados": self.bytes_enviados,
+                "por_status": dict(self.por_status),
+                "por_tipo": dict(self.por_tipo),
+            }
+
+
+class ManejadorFixture(BaseHTTPRequestHandler):
+    """
+    Atiende los pedidos HTTP usando el CorpusFixture y la configuracion del servidor.
+    """
+    # HTTP/1.1 para que los clientes puedan reusar conexiones
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # no imprimir una linea por pedido; el servidor se usa para medir
+        pass
+
+    def _responder(self, status: int, cuerpo: bytes, tipo: str, content_type: str = "text/html; charset=utf-8",
+                   headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (headers or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        enviados = 0
+        if self.command != "HEAD":
+            try:
+                for desde in range(0, len(cuerpo), TAMANIO_CHUNK):
+                    self.wfile.write(cuerpo[desde:desde + TAMANIO_CHUNK])
+                    enviados += min(TAMANIO_CHUNK, len(cuerpo) - desde)
+            except (BrokenPipeError, ConnectionResetError):
+                # el cliente corto la descarga
+                self.close_connection = True
+                tipo += "_cortada"
+        self.server.estadisticas.registrar(status, enviados, tipo)
+
+    def _no_modificada(self, etag: str, ultima_modificacion: float) -> bool:
+        """
+        :return: True si el pedido es condicional y el recurso no cambio desde la version que tiene el cliente.
+        """
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [e.strip() for e in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                fecha = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(ultima_modificacion) <= fecha
+        return False
+
+    def _inyectar_demora_y_errores(self) -> bool:
+        """
+        Aplica la latencia configurada y, al azar, un error. :return: True si ya se respondio con un error.
+        """
+        config = self.server.config
+        demora = config["latencia"] + random.uniform(-config["jitter"], config["jitter"])
+        if demora > 0:
+            time.sleep(demora)
+        u = random.random()
+        if u < config["tasa_timeouts"]:
+            # colgarse sin responder; el cliente tiene que cortar por timeout
+            time.sleep(config["segundos_timeout"])
+            self.close_connection = True
+            self.server.estadisticas.registrar(0, 0, "timeout")
+            return True
+        u -= config["tasa_timeouts"]
+        if u < config["tasa_429"]:
+            self._responder(429, b"Too Many Requests", "error", "text/plain", {"Retry-After": "1"})
+            return True
+        u -= config["tasa_429"]
+        if u < config["tasa_errores"]:
+            self._responder(503, b"Service Unavailable", "error", "text/plain")
+            return True
+        return False
+
+    def do_GET(self):
+        if self._inyectar_demora_y_errores():
+            return
+        corpus: CorpusFixture = self.server.corpus
+        url = urlsplit(self.path)
+        url_base = "http://%s:%d" % self.server.server_address[:2]
+        con_sitemap = [s for s in corpus.secciones if s not in self.server.config["secciones_sin_sitemap"]]
+        content_type = "text/html; charset=utf-8"
+        if url.path == "/sitemap.xml":
+            cuerpo = corpus.sitemap_indice(url_base, con_sitemap)
+            ultima_modificacion = max((corpus.fecha_modificacion(r) for s in con_sitemap for r in corpus.secciones[s]),
+                                      default=0.0)
+            tipo, content_type = "sitemap", "application/xml"
+        elif regex_ruta_sitemap.fullmatch(url.path) or regex_ruta_rss.fullmatch(url.path):
+            m_sitemap = regex_ruta_sitemap.fullmatch(url.path)
+            seccion = (m_sitemap or regex_ruta_rss.fullmatch(url.path)).group(1)
+            cuerpo, ultima_modificacion = None, 0.0
+            if seccion in con_sitemap:
+                if m_sitemap:
+                    cuerpo = corpus.sitemap(url_base, seccion, m_sitemap.group(2))
+                    rutas = corpus.rutas_por_mes(seccion).get(m_sitemap.group(2), [])
+                else:
+                    cuerpo = corpus.rss(url_base, seccion)
+                    rutas = corpus.secciones[seccion][:ARTICULOS_RSS]
+                ultima_modificacion = max((corpus.fecha_modificacion(r) for r in rutas), default=0.0)
+            tipo = "sitemap" if m_sitemap else "rss"
+            content_type = "application/x-gzip" if m_sitemap else "application/rss+xml"
+        elif url.path.startswith("/secciones/"):
+            seccion = url.path[len("/secciones/"):].strip("/")
+            try:
+                numero = int(parse_qs(url.query).get("page", ["1"])[0])
+            except ValueError:
+                numero = 1
+            cuerpo = corpus.pagina_indice(seccion, numero, self.server.config["articulos_por_pagina"],
+                                          self.server.config["relleno_kb"])
+            rutas = corpus.rutas_pagina_indice(seccion, numero, self.server.config["articulos_por_pagina"])
+            ultima_modificacion = max((corpus.fecha_modificacion(r) for r in rutas), default=0.0)
+            tipo = "indice"
+        else:
+            cuerpo = corpus.leer_nota(url.path)
+            ultima_modificacion = corpus.fecha_modificacion(url.path) if cuerpo is not None else 0.0
+            tipo = "nota"
+        if cuerpo is None:
+            self._responder(404, b"<html><body>No encontrada</body></html>", "no_encontrada")
+            return
+        etag, last_modified = validadores_http(cuerpo, ultima_modificacion)
+        headers = {"ETag": etag, "Last-Modified": last_modified}
+        if self._no_modificada(etag, ultima_modificacion):
+            self._responder(304, b"", tipo + "_no_modificada", headers=headers)
+        else:
+            self._responder(200, cuerpo, tipo, content_type, headers=headers)
+
+    do_HEAD = do_GET
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+    # muchos clientes concurrentes: no rechazar conexiones (se usa en listen(), al construir el servidor)
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # los clientes que cortan la conexion no son errores del servidor
+        pass
+
+
+class ServidorFixture:
+    """
+    Servidor local en un thread aparte. Se usa como context manager:
+
+        with ServidorFixture(latencia=0.05, tasa_errores=0.01) as servidor:
+            url = servidor.url_indice("economia", 1)
+    """
+
+    def __init__(self, dir_paginas: str = DIR_PAGINAS, host: str = "127.0.0.1", puerto: int = 0,
+                 latencia: float = 0.0, jitter: float = 0.0, tasa_errores: float = 0.0, tasa_429: float = 0.0,
+                 tasa_timeouts: float = 0.0, segundos_timeout: float = 30.0,
+                 fraccion_paywall: float = 0.0, fraccion_autor: float = 0.0,
+                 articulos_por_pagina: int = ARTICULOS_POR_PAGINA, relleno_kb: int = RELLENO_INDICE_KB,
+                 secciones_sin_sitemap: Sequence[str] = ()):
+        """
+        :param latencia: Segundos de demora de cada respuesta.
+        :param jitter: Variacion uniforme (+/-) de la latencia, en segundos.
+        :param tasa_errores: Fraccion de pedidos que responden 503.
+        :param tasa_429: Fraccion de pedidos que responden 429 (Too Many Requests).
+        :param tasa_timeouts: Fraccion de pedidos que no responden durante segundos_timeout.
+        :param fraccion_paywall: Fraccion de notas servidas con el marcador de paywall.
+        :param fraccion_autor: Fraccion de notas servidas con el marcador de pagina de autor.
+        :param secciones_sin_sitemap: Secciones que no aparecen en los sitemaps ni tienen feed RSS.
+        """
+        self.corpus = CorpusFixture(dir_paginas, fraccion_paywall, fraccion_autor)
+        self.estadisticas = EstadisticasServidor()
+        self.config = {
+            "latencia": latencia,
+            "jitter": jitter,
+            "tasa_errores": tasa_errores,
+            "tasa_429": tasa_429,
+            "tasa_timeouts": tasa_timeouts,
+            "segundos_timeout": segundos_timeout,
+            "articulos_por_pagina": articulos_por_pagina,
+            "relleno_kb": relleno_kb,
+            "secciones_sin_sitemap": sorted(secciones_sin_sitemap),
+        }
+        self.host = host
+        self.puerto = puerto
+        self._httpd: Optional[_ServidorHTTP] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url_base(self) -> str:
+        return f"http://{self.host}:{self.puerto}"
+
+    def url_nota(self, ruta: str) -> str:
+        return self.url_base + ruta
+
+    def url_indice(self, seccion: str, pagina: int = 1) -> str:
+        return f"{self.url_base}/secciones/{seccion}?page={pagina}"
+
+    def url_sitemap(self) -> str:
+        return f"{self.url_base}/sitemap.xml"
+
+    def url_rss(self, seccion: str) -> str:
+        return f"{self.url_base}/rss/secciones/{seccion}/notas"
+
+    def iniciar(self) -> "ServidorFixture":
+        self._httpd = _ServidorHTTP((self.host, self.puerto), ManejadorFixture)
+        self._httpd.corpus = self.corpus
+        self._httpd.config = self.config
+        self._httpd.estadisticas = self.estadisticas
+        # si el puerto era 0, el sistema operativo eligio uno libre
+        self.puerto = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def detener(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "ServidorFixture":
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que sirve las notas guardadas en paginas/ como el sitio de Pagina 12")
+    parser.add_argument("--paginas", default=DIR_PAGINAS, help=f"Directorio con 1 subdirectorio por seccion (default: {DIR_PAGINAS})")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8012)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de demora por respuesta (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variacion +/- de la latencia en segundos (default: 0)")
+    parser.add_argument("--tasa-errores", type=float, default=0.0, help="Fraccion de respuestas 503 (default: 0)")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Fraccion de respuestas 429 (default: 0)")
+    parser.add_argument("--tasa-timeouts", type=float, default=0.0, help="Fraccion de pedidos que no responden (default: 0)")
+    parser.add_argument("--fraccion-paywall", type=float, default=0.1, help="Fraccion de notas con paywall (default: 0.1)")
+    parser.add_argument("--fraccion-autor", type=float, default=0.05, help="Fraccion de notas de autor (default: 0.05)")
+    args = parser.parse_args()
+
+    servidor = ServidorFixture(args.paginas, args.host, args.puerto, latencia=args.latencia, jitter=args.jitter,
+                               tasa_errores=args.tasa_errores, tasa_429=args.tasa_429, tasa_timeouts=args.tasa_timeouts,
+                               fraccion_paywall=args.fraccion_paywall, fraccion_autor=args.fraccion_autor).iniciar()
+    print(f"[INFO] {len(servidor.corpus.notas)} notas servidas en {servidor.url_base} (Ctrl+C para terminar)")
+    for seccion in servidor.corpus.secciones:
+        print(f"[INFO]   {servidor.url_indice(seccion)}  ({servidor.corpus.cantidad_paginas_indice(seccion)} paginas)")
+    try:
+        servidor._thread.join()
+    except KeyboardInterrupt:
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Punto de entrada unico del TP: "python tp.py <comando> [opciones]", 1 comando por etapa.
+
+Este modulo solo importa la biblioteca estandar. Cada comando corre el script de su etapa como si se lo llamara
+directamente (runpy, con __name__ == "__main__"), y recien ahi se importan Scrapy, scikit-learn, BeautifulSoup,
+NLTK o pandas; asi "python tp.py --help", "python tp.py train --help" o un --dry-run de split no pagan segundos de
+imports que no usan (ver benchmark_arranque.py).
+
+Los scripts que se configuran con constantes (1-, 2-, 3-, 5- y 6-) reciben "--param CONSTANTE=valor", que se pasa
+en TP_PARAMETROS (ver cargador_scripts.aplicar_parametros); su --help lista esas constantes con su valor por defecto,
+leyendolas del codigo con ast, sin importar el script. Los que tienen argparse propio (4-, servidor_fixture.py y
+orquestador.py) reciben el resto de los argumentos tal cual, incluido --help.
+
+Comandos:
+    crawl     1-web-scrapping.py                       descargar las notas de cada seccion a paginas/
+    extract   2-html-a-dataframe.py                    pasar los html a vectores y al dataset Parquet
+    split     4-split_validacion_por_id.py             mover las notas mas nuevas a Validacion/
+    train     5-entrenar_y_guardar_modelo_pipeline.py  entrenar y guardar el pipeline
+    evaluate  3-entrenar-y-evaluar.py                  cross-validation y division temporal
+    predict   6-predecir_en_validacion.py              predecir las notas de Validacion/
+    serve     servidor_fixture.py                      servir paginas/ como si fuera el sitio de Pagina 12
+    pipeline  orquestador.py                           correr las etapas que cambiaron
+
+Ejemplos:
+    python tp.py --help
+    python tp.py train --help                                   # constantes de 5- con su valor por defecto
+    python tp.py train --param K_SELECT=300 --param MODELS_DIR=modelos
+    python tp.py crawl --param MAX_PAGINAS_POR_SECCION=5 --param SECCIONES='["economia"]'
+    python tp.py split --base paginas --dry-run
+    python tp.py serve --puerto 8012
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import textwrap
+from typing import Dict, List, Optional, Tuple
+
+from cargador_scripts import DIR_SCRIPTS, PARAMETROS_ENV, constantes_de_script
+
+
+class Comando:
+    def __init__(self, script: str, descripcion: str, argparse_propio: bool = False):
+        """
+        :param script: Archivo del script de la etapa, en el directorio del TP.
+        :param descripcion: Ayuda de 1 linea del comando.
+        :param argparse_propio: Si el script tiene su propio argparse; si no, se configura con --param.
+        """
+        self.script = script
+        self.descripcion = descripcion
+        self.argparse_propio = argparse_propio
+
+
+COMANDOS = {
+    "crawl": Comando("1-web-scrapping.py", "Descargar las notas de cada seccion a paginas/"),
+    "extract": Comando("2-html-a-dataframe.py", "Pasar los html a vectores y al dataset Parquet"),
+    "split": Comando("4-split_validacion_por_id.py", "Mover las notas mas nuevas de cada seccion a Validacion/",
+                     argparse_propio=True),
+    "train": Comando("5-entrenar_y_guardar_modelo_pipeline.py", "Entrenar y guardar el pipeline"),
+    "evaluate": Comando("3-entrenar-y-evaluar.py", "Cross-validation y division temporal"),
+    "predict": Comando("6-predecir_en_validacion.py", "Predecir las notas de Validacion/ con el pipeline guardado"),
+    "serve": Comando("servidor_fixture.py", "Servir paginas/ como si fuera el sitio de Pagina 12",
+                     argparse_propio=True),
+    "pipeline": Comando("orquestador.py", "Correr las etapas que cambiaron (cache por huella de contenido)",
+                        argparse_propio=True),
+}
+ANCHO_AYUDA = 100
+
+
+def _parsear_parametro(texto: str) -> tuple:
+    """
+    "K_SELECT=300" -> ("K_SELECT", 300). El valor se interpreta como JSON si se puede (como en orquestador.py).
+    """
+    nombre, _, valor = texto.partition("=")
+    if not nombre or not valor:
+        raise argparse.ArgumentTypeError(f"Parametro invalido: {texto} (formato: CONSTANTE=valor)")
+    try:
+        valor = json.loads(valor)
+    except ValueError:
+        pass
+    return nombre, valor
+
+
+def ayuda_constantes(script: str) -> str:
+    """
+    :return: El texto con las constantes del script que se pueden pisar, su valor por defecto y su comentario.
+    """
+    lineas = [f"constantes de {script} (--param CONSTANTE=valor):"]
+    for nombre, valor, comentario in constantes_de_script(script):
+        lineas.append(f"  {nombre} = {valor}")
+        if comentario:
+            lineas.extend(textwrap.wrap(comentario, ANCHO_AYUDA, initial_indent=" " * 6, subsequent_indent=" " * 6))
+    return "\n".join(lineas)
+
+
+def correr_script(script: str, argumentos: List[str], parametros: Optional[Dict] = None):
+    """
+    Corre un script del TP en este mismo proceso, como "python <script> <argumentos>".
+    :param parametros: Constantes a pisar; se agregan a las que ya hubiera en TP_PARAMETROS.
+    """
+    if parametros:
+        actuales = json.loads(os.environ.get(PARAMETROS_ENV) or "{}")
+        os.environ[PARAMETROS_ENV] = json.dumps({**actuales, **parametros})
+    path_script = str(DIR_SCRIPTS / script)
+    sys.argv = [path_script] + argumentos
+    runpy.run_path(path_script, run_name="__main__")
+
+
+def armar_parser() -> Tuple[argparse.ArgumentParser, Dict[str, argparse.ArgumentParser]]:
+    """
+    :return: El parser de tp.py y el de cada comando.
+    """
+    parser = argparse.ArgumentParser(
+        prog="tp.py", description="Etapas del TP de web mining, con imports diferidos hasta correr cada una",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="'python tp.py <comando> --help' muestra las opciones o las constantes de cada comando")
+    subparsers = parser.add_subparsers(dest="comando", metavar="comando", required=True)
+    parsers_comandos = {}
+    for nombre, comando in COMANDOS.items():
+        # sin -h propio: el --help lo resuelve el script (argparse_propio) o ayuda_constantes, solo si se pide
+        sub = subparsers.add_parser(nombre, help=comando.descripcion, add_help=False,
+                                    description=f"{comando.descripcion} ({comando.script})",
+                                    formatter_class=argparse.RawDescriptionHelpFormatter)
+        if not comando.argparse_propio:
+            sub.add_argument("-h", "--help", action="store_true", help="Mostrar esta ayuda y las constantes del script")
+            sub.add_argument("--param", action="append", type=_parsear_parametro, default=[],
+                             help="Pisar una constante del script: CONSTANTE=valor (se puede repetir)")
+        parsers_comandos[nombre] = sub
+    return parser, parsers_comandos
+
+
+def main(argv: Optional[List[str]] = None):
+    parser, parsers_comandos = armar_parser()
+    args, resto = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    comando = COMANDOS[args.comando]
+    if comando.argparse_propio:
+        correr_script(comando.script, resto)
+        return
+    sub = parsers_comandos[args.comando]
+    if resto:
+        sub.error(f"argumentos no reconocidos: {' '.join(resto)} (las constantes se pasan con --param)")
+    if args.help:
+        sub.epilog = ayuda_constantes(comando.script)
+        sub.print_help()
+        return
+    parametros = dict(args.param)
+    validas = {nombre for nombre, _, _ in constantes_de_script(comando.script)}
+    desconocidas = sorted(set(parametros) - validas)
+    if desconocidas:
+        sub.error(f"Constantes desconocidas: {desconocidas} (ver 'python tp.py {args.comando} --help')")
+    correr_script(comando.script, [], parametros)
+
+
+if __name__ == "__main__":
+    main()
@@ -57,10 +57,10 @@ def calcular_e_imprimir_auc(clasificador, train_fold_selected, train_targets_bin
 
 
 def pesos_de_features(score_fn, train_fold, train_targets_fold) -> np.ndarray:
-    scores = np.empty((train_fold.shape[1]), dtype=np.float)
-    for i in range(0, train_fold.shape[1]):
-        scores[i] = score_fn(train_fold[:, i], train_targets_fold)[0]
-    return scores
+    # las funciones de sklearn.feature_selection (chi2, f_classif, ...) puntuan todas las columnas en 1 sola llamada;
+    # llamarlas de a 1 columna tarda ~2 ms por feature (minutos con 100.000 features)
+    scores, _ = score_fn(train_fold, train_targets_fold)
+    return np.nan_to_num(np.asarray(scores, dtype=np.float64).ravel())
 
 
 def imprimir_features_con_pesos(score_fn, train_fold, train_targets_fold, nombres_features, top_n=-1):
@@ -74,10 +74,12 @@ def imprimir_features_con_pesos(score_fn, train_fold, train_targets_fold, nombre
     """
     pesos_features = pesos_de_features(
         score_fn, train_fold, train_targets_fold)
-    # conseguir los indices que ordenarian a "pesos". Como argsort solo ordena en orden ascendente, damos vuelta el arreglo
-    indice_orden_desc_pesos = np.argsort(pesos_features)[::-1]
-    if top_n == -1:
+    if top_n == -1 or top_n > train_fold.shape[1]:
         top_n = train_fold.shape[1]
+    # conseguir los indices de los top_n pesos mas altos: argpartition los separa sin ordenar todo el arreglo, y despues
+    # se ordenan solo esos top_n. Como argsort solo ordena en orden ascendente, ordenamos por el peso negado
+    indice_top = np.argpartition(-pesos_features, top_n - 1)[:top_n]
+    indice_orden_desc_pesos = indice_top[np.argsort(-pesos_features[indice_top])]
     for i in range(0, top_n):
         print(nombres_features[indice_orden_desc_pesos[i]],
               '\t', pesos_features[indice_orden_desc_pesos[i]])